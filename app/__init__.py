@@ -1,5 +1,6 @@
 # app/__init__.py - Factory de la aplicación
 import os
+import click
 from flask import Flask
 from flask_socketio import SocketIO
 from flask_login import LoginManager
@@ -76,6 +77,15 @@ def initialize_extensions(app):
         ping_timeout=int(os.getenv('WS_PING_TIMEOUT', 10))
     )
     
+    # Push del dashboard: snapshot al unirse a la sesión y deltas del bot
+    from app.websocket.connection_manager import ConnectionManager
+    from app.services.data_service import DataService
+    app.connection_manager = ConnectionManager(
+        socketio,
+        resolve_session=DataService.resolve_dashboard_session,
+        snapshot=DataService.get_session_dashboard
+    )
+    
     # User loader para Flask-Login
     from app.models.users import User
     @login_manager.user_loader
@@ -169,6 +179,51 @@ def register_commands(app):
         init_db(app)
         print('✅ Base de datos inicializada.')
     
+    @app.cli.command('logs-partitions')
+    def logs_partitions_command():
+        """Crear particiones futuras de system_logs y expirar las antiguas"""
+        import yaml
+        from app.services.log_partitions import get_partition_manager
+        config_path = os.path.join(os.path.dirname(__file__), '../config.yaml')
+        with open(config_path, 'r', encoding='utf-8') as f:
+            retention_cfg = yaml.safe_load(f).get('logging', {}).get('retention', {})
+        created, expired = get_partition_manager(retention_cfg, start=False).run_maintenance()
+        print(f'✅ Particiones creadas: {len(created)} | expiradas: {len(expired)}')
+    
+    @app.cli.command('balance-rollups')
+    @click.option('--session-id', type=int, default=None, help='Sesión a reconstruir (por defecto todas)')
+    def balance_rollups_command(session_id):
+        """Reconstruir los rollups 1m/1h/1d desde balance_history"""
+        import yaml
+        from app.services.balance_service import get_balance_service
+        config_path = os.path.join(os.path.dirname(__file__), '../config.yaml')
+        with open(config_path, 'r', encoding='utf-8') as f:
+            balance_cfg = yaml.safe_load(f).get('persistence', {}).get('balance', {})
+        inserted = get_balance_service(balance_cfg).rebuild(session_id)
+        print(f'✅ Buckets de balance reconstruidos: {inserted}')
+    
+    @app.cli.command('performance-backfill')
+    @click.option('--session-id', type=int, default=None, help='Sesión a recalcular (por defecto todas)')
+    def performance_backfill_command(session_id):
+        """Recalcular el drawdown de las sesiones desde balance_history"""
+        from app.services.performance_service import backfill
+        print(f'✅ Drawdown recalculado para {backfill(session_id)} sesiones')
+    
+    @app.cli.command('dashboard-queries')
+    @click.option('--session-id', type=int, required=True, help='Sesión con la que construir el dashboard')
+    @click.option('--max-queries', type=int, default=1, help='Sentencias ORM permitidas')
+    @click.option('--max-checkouts', type=int, default=1, help='Conexiones del pool permitidas')
+    def dashboard_queries_command(session_id, max_queries, max_checkouts):
+        """Comprobar que el dashboard completo se construye con un número fijo de consultas"""
+        from app.core.database import db
+        from app.core.query_counter import assert_max_queries
+        from app.models.base import engine
+        from app.services.dashboard_cache import SECTIONS
+        from app.services.data_service import DataService
+        with assert_max_queries(max_queries, engine, db.engine, max_checkouts=max_checkouts) as counter:
+            DataService._build_sections(session_id, set(SECTIONS))
+        print(f'✅ Dashboard construido con {counter.report()}')
+
     @app.cli.command('create-user')
     def create_user_command():
         """Crear un usuario nuevo"""
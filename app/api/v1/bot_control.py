@@ -2,6 +2,7 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 
+from app.core.pagination import EXPORT_FORMATS, InvalidCursor, export_response, keyset, keyset_page
 from app.services.bot_service import BotService
 
 bot_bp = Blueprint('bot', __name__)
@@ -46,9 +47,11 @@ def start_bot():
 @login_required
 def stop_bot():
     """
-    Detiene el bot de trading
+    Detiene el bot de trading. Las posiciones abiertas se conservan para el
+    siguiente inicio salvo que se pida close_positions
     """
-    result = BotService.stop_bot(current_user.id)
+    data = request.get_json(silent=True) or {}
+    result = BotService.stop_bot(current_user.id, close_positions=bool(data.get('close_positions', False)))
     
     if result['success']:
         return jsonify(result), 200
@@ -102,7 +105,8 @@ def get_session_details(session_id):
 @login_required
 def get_session_logs(session_id):
     """
-    Obtiene los logs de una sesión específica
+    Obtiene los logs de una sesión específica, paginados por cursor sobre
+    (timestamp, id) o exportados completos en streaming con ?format=ndjson|csv
     """
     # Verificar que la sesión pertenece al usuario
     from app.models.bot_sessions import BotSession
@@ -120,17 +124,36 @@ def get_session_logs(session_id):
     level_filter = request.args.get('level')
     source_filter = request.args.get('source')
     limit = request.args.get('limit', 100, type=int)
+    cursor = request.args.get('cursor')
+    fmt = request.args.get('format', 'json')
+    
+    if fmt != 'json' and fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': f'Formato no soportado: {fmt}'}), 400
     
     query = SystemLog.query.filter_by(session_id=session_id)
+    if session.start_time:
+        # Acota el rango de timestamp para que sólo se lean las particiones de la sesión
+        query = query.filter(SystemLog.timestamp >= session.start_time)
     
     if level_filter:
         query = query.filter_by(level=level_filter.upper())
     if source_filter:
         query = query.filter_by(source=source_filter)
     
-    logs = query.order_by(SystemLog.timestamp.desc()).limit(limit).all()
+    # Índices (session_id, timestamp) y (session_id, level, timestamp): cada página es un rango
+    key = (SystemLog.timestamp, SystemLog.id)
+    try:
+        if fmt in EXPORT_FORMATS:
+            fields = ('id', 'timestamp', 'level', 'source', 'message', 'details')
+            export = keyset(query.with_entities(*(getattr(SystemLog, f) for f in fields)), key, cursor)
+            return export_response(export, fields, fmt, f'session_{session_id}_logs')
+        
+        logs, next_cursor = keyset_page(query, key, cursor, limit)
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
     return jsonify({
         'success': True,
-        'logs': [log.to_dict() for log in logs]
+        'logs': [log.to_dict() for log in logs],
+        'next_cursor': next_cursor
     }), 200
\ No newline at end of file
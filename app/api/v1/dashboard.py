@@ -2,7 +2,8 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 
-from app.services.data_service import DataService
+from app.core.pagination import EXPORT_FORMATS, InvalidCursor, export_response
+from app.services.data_service import DataService, TRADE_EXPORT_COLUMNS
 from app.services.bot_service import BotService
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -27,16 +28,30 @@ def get_dashboard_data():
 @login_required
 def get_trading_history():
     """
-    Obtiene el historial de trading
+    Obtiene el historial de trading, paginado por cursor (?cursor=next_cursor)
+    o exportado completo en streaming con ?format=ndjson|csv
     """
     days = request.args.get('days', 7, type=int)
     limit = request.args.get('limit', 100, type=int)
+    cursor = request.args.get('cursor')
+    fmt = request.args.get('format', 'json')
     
-    history = DataService.get_trading_history(current_user.id, days, limit)
+    if fmt != 'json' and fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': f'Formato no soportado: {fmt}'}), 400
+    
+    try:
+        if fmt in EXPORT_FORMATS:
+            query = DataService.trading_history_export(current_user.id, days, cursor)
+            return export_response(query, TRADE_EXPORT_COLUMNS, fmt, 'trading_history')
+        
+        page = DataService.get_trading_history_page(current_user.id, days, limit, cursor)
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
     return jsonify({
         'success': True,
-        'history': history
+        'history': page['history'],
+        'next_cursor': page['next_cursor']
     }), 200
 
 @dashboard_bp.route('/performance', methods=['GET'])
@@ -62,6 +77,7 @@ def get_balance_history():
     """
     session_id = request.args.get('session_id', type=int)
     hours = request.args.get('hours', 24, type=int)
+    max_points = request.args.get('max_points', type=int)
     
     # Obtener sesión
     from app.models.bot_sessions import BotSession
@@ -73,19 +89,17 @@ def get_balance_history():
             'message': 'Sesión no encontrada'
         }), 404
     
-    # Obtener historial
-    from app.models.balance_history import BalanceHistory
+    # Obtener historial desde los rollups a la resolución que cabe en max_points
+    from app.services.balance_service import get_balance_service
     from datetime import datetime, timedelta
     
     since_time = datetime.utcnow() - timedelta(hours=hours)
-    history = BalanceHistory.query.filter(
-        BalanceHistory.session_id == session_id,
-        BalanceHistory.timestamp >= since_time
-    ).order_by(BalanceHistory.timestamp.asc()).all()
+    history = get_balance_service().get_history(session_id, since=since_time, max_points=max_points)
     
     return jsonify({
         'success': True,
-        'history': [bh.to_dict() for bh in history]
+        'resolution': history['resolution'],
+        'history': history['points']
     }), 200
 
 @dashboard_bp.route('/active-positions', methods=['GET'])
@@ -106,11 +120,11 @@ def get_active_positions():
             'message': 'Sesión no encontrada'
         }), 404
     
-    # Obtener posiciones
-    from app.models.positions import Position
-    positions = Position.query.filter_by(session_id=session_id).all()
+    # Obtener posiciones (valoradas en memoria al último precio)
+    from app.services.mark_to_market import get_mark_to_market
+    positions = get_mark_to_market().positions(session_id)
     
     return jsonify({
         'success': True,
-        'positions': [position.to_dict() for position in positions]
+        'positions': positions
     }), 200
\ No newline at end of file
@@ -29,12 +29,15 @@ def init_db(app=None):
                 from app.models.bot_config import BotConfig
                 from app.models.bot_sessions import BotSession
                 from app.models.balance_history import BalanceHistory
+                from app.models.balance_rollup import BalanceRollup
+                from app.models.session_performance import SessionPerformance
                 from app.models.orders import Order
                 from app.models.trades import Trade
                 from app.models.positions import Position
                 from app.models.system_logs import SystemLog
                 from app.models.risk_metrics import RiskMetric
                 from app.models.audit_sessions import AuditSession
+                from app.models.market_data import MarketData
                 
                 # Crear todas las tablas
                 Base.metadata.create_all(bind=db.engine)
@@ -0,0 +1,119 @@
+# app/core/pagination.py
+import base64
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Response, stream_with_context
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Filas por viaje del cursor de servidor al exportar (memoria constante)
+STREAM_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class InvalidCursor(ValueError):
+    """Cursor de paginación mal formado o manipulado"""
+
+
+def page_size(limit: Optional[int]) -> int:
+    return max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+
+def _plain(value: Any) -> Any:
+    """Valor de columna -> tipo JSON (Decimal a float, fechas en ISO 8601)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Valores de la clave (p.ej. (exit_time, id)) de la última fila -> token opaco"""
+    raw = json.dumps([_plain(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str, columns: Sequence) -> Tuple:
+    """Token -> valores de la clave, convertidos al tipo de cada columna"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError('longitud')
+        return tuple(
+            datetime.fromisoformat(value) if column.type.python_type is datetime else column.type.python_type(value)
+            for column, value in zip(columns, values)
+        )
+    except Exception as e:
+        raise InvalidCursor(f"Cursor inválido: {token}") from e
+
+
+def keyset(query, columns: Sequence, cursor: Optional[str]):
+    """
+    Ordena por `columns` descendente y, con cursor, continúa justo después de
+    la última fila entregada. La comparación de filas (a, b) < (x, y) la
+    resuelve Postgres con el índice, así que la página N cuesta lo mismo que
+    la primera (OFFSET leería y descartaría todas las anteriores).
+    """
+    if cursor:
+        query = query.filter(tuple_(*columns) < tuple_(*decode_cursor(cursor, columns)))
+    return query.order_by(*(column.desc() for column in columns))
+
+
+def keyset_page(query, columns: Sequence, cursor: Optional[str], limit: Optional[int]) -> Tuple[List, Optional[str]]:
+    """(filas de la página, cursor de la siguiente o None si no hay más)"""
+    limit = page_size(limit)
+    rows = keyset(query, columns, cursor).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor([getattr(last, column.key) for column in columns])
+
+
+def stream_rows(query, batch_size: int = STREAM_BATCH_SIZE) -> Iterator:
+    """Filas desde un cursor de servidor en lotes de batch_size, sin cargar el resultado entero"""
+    return iter(query.execution_options(stream_results=True).yield_per(batch_size))
+
+
+def ndjson_lines(rows: Iterable, fields: Sequence[str]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps({field: _plain(value) for field, value in zip(fields, row)}, default=str) + '\n'
+
+
+def csv_lines(rows: Iterable, fields: Sequence[str]) -> Iterator[str]:
+    # Un único buffer reutilizado: cada fila se escribe, se entrega y se descarta
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([
+            json.dumps(value, default=str) if isinstance(value, (dict, list)) else _plain(value)
+            for value in row
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.getvalue():
+        yield buffer.getvalue()  # Sólo la cabecera: exportación vacía
+
+
+def export_response(query, fields: Sequence[str], fmt: str, filename: str) -> Response:
+    """
+    Respuesta en streaming NDJSON o CSV. query debe seleccionar columnas (no
+    entidades ORM) en el orden de `fields`; memoria constante con cualquier
+    número de filas.
+    """
+    lines = ndjson_lines if fmt == 'ndjson' else csv_lines
+    response = Response(stream_with_context(lines(stream_rows(query), fields)), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
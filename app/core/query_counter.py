@@ -0,0 +1,86 @@
+# app/core/query_counter.py
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """
+    Sentencias SQL ejecutadas y conexiones tomadas del pool por el hilo (o
+    greenlet) que abrió el contador. Los servicios que usan
+    engine.raw_connection() no pasan por los eventos de ejecución de
+    SQLAlchemy, pero sí por el checkout del pool: ambos números deben ser
+    constantes por petición.
+    """
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.statements: List[str] = []
+        self.checkouts = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self.thread:
+            self.statements.append(statement)
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        if threading.get_ident() == self.thread:
+            self.checkouts += 1
+
+    def report(self) -> str:
+        lines = [f"{self.count} sentencias, {self.checkouts} conexiones del pool"]
+        lines += [f"  {i + 1}. {' '.join(statement.split())[:200]}" for i, statement in enumerate(self.statements)]
+        return '\n'.join(lines)
+
+
+def _engines(engines):
+    if engines:
+        return engines
+    from app.models.base import engine
+    return (engine,)
+
+
+@contextmanager
+def count_queries(*engines) -> Iterator[QueryCounter]:
+    """
+    Cuenta lo ejecutado dentro del bloque en los engines indicados (por
+    defecto el de app.models.base):
+
+        with count_queries(engine, db.engine) as counter:
+            DataService.get_dashboard_data(user_id)
+        print(counter.report())
+    """
+    engines = _engines(engines)
+    counter = QueryCounter()
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', counter._before_cursor_execute)
+        event.listen(engine.pool, 'checkout', counter._checkout)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', counter._before_cursor_execute)
+            event.remove(engine.pool, 'checkout', counter._checkout)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, *engines, max_checkouts: int = None) -> Iterator[QueryCounter]:
+    """
+    Falla con AssertionError (y el listado de sentencias) si el bloque supera
+    el presupuesto. Pensado para tests y comprobaciones de regresión de N+1.
+    """
+    with count_queries(*engines) as counter:
+        yield counter
+    if counter.count > max_queries or (max_checkouts is not None and counter.checkouts > max_checkouts):
+        raise AssertionError(
+            f"Presupuesto de consultas superado (máx {max_queries} sentencias"
+            f"{'' if max_checkouts is None else f', {max_checkouts} conexiones'}): {counter.report()}"
+        )
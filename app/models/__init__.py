@@ -6,12 +6,15 @@ from app.models.api_keys import ApiKey
 from app.models.bot_config import BotConfig
 from app.models.bot_sessions import BotSession
 from app.models.balance_history import BalanceHistory
+from app.models.balance_rollup import BalanceRollup
+from app.models.session_performance import SessionPerformance
 from app.models.orders import Order
 from app.models.trades import Trade
 from app.models.positions import Position
 from app.models.system_logs import SystemLog
 from app.models.risk_metrics import RiskMetric
 from app.models.audit_sessions import AuditSession
+from app.models.market_data import MarketData
 
 __all__ = [
     'Base',
@@ -20,10 +23,13 @@ __all__ = [
     'BotConfig',
     'BotSession',
     'BalanceHistory',
+    'BalanceRollup',
+    'SessionPerformance',
     'Order',
     'Trade',
     'Position',
     'SystemLog',
     'RiskMetric',
-    'AuditSession'
+    'AuditSession',
+    'MarketData'
 ]
\ No newline at end of file
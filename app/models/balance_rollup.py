@@ -0,0 +1,53 @@
+# app/models/balance_rollup.py
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, ForeignKey, DECIMAL, UniqueConstraint, Index
+from .base import Base
+
+
+class BalanceRollup(Base):
+    """Bucket OHLC de balance/equity/pnl por sesión a resolución 1m, 1h o 1d"""
+    __tablename__ = "balance_rollups"
+    __table_args__ = (
+        # Un bucket por sesión/resolución/inicio: permite el upsert incremental
+        UniqueConstraint('session_id', 'resolution', 'bucket_start', name='uq_balance_rollups_bucket'),
+        # Poda por retención de cada resolución
+        Index('idx_balance_rollups_resolution_time', 'resolution', 'bucket_start'),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    session_id = Column(Integer, ForeignKey("bot_sessions.id", ondelete="CASCADE"), nullable=False)
+    resolution = Column(String(4), nullable=False)  # '1m', '1h', '1d'
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    last_timestamp = Column(DateTime(timezone=True), nullable=False)  # Último snapshot agregado
+    balance_open = Column(DECIMAL(15, 2), nullable=False)
+    balance_high = Column(DECIMAL(15, 2), nullable=False)
+    balance_low = Column(DECIMAL(15, 2), nullable=False)
+    balance_close = Column(DECIMAL(15, 2), nullable=False)
+    equity_open = Column(DECIMAL(15, 2), nullable=False)
+    equity_high = Column(DECIMAL(15, 2), nullable=False)
+    equity_low = Column(DECIMAL(15, 2), nullable=False)
+    equity_close = Column(DECIMAL(15, 2), nullable=False)
+    pnl_open = Column(DECIMAL(15, 2), nullable=False)
+    pnl_high = Column(DECIMAL(15, 2), nullable=False)
+    pnl_low = Column(DECIMAL(15, 2), nullable=False)
+    pnl_close = Column(DECIMAL(15, 2), nullable=False)
+    pnl_daily_close = Column(DECIMAL(15, 2), default=0)
+    samples = Column(Integer, nullable=False, default=1)
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "resolution": self.resolution,
+            "timestamp": self.bucket_start.isoformat() if self.bucket_start else None,
+            "balance": float(self.balance_close),
+            "balance_high": float(self.balance_high),
+            "balance_low": float(self.balance_low),
+            "equity": float(self.equity_close),
+            "equity_high": float(self.equity_high),
+            "equity_low": float(self.equity_low),
+            "pnl": float(self.pnl_close),
+            "pnl_daily": float(self.pnl_daily_close or 0),
+            "samples": self.samples
+        }
+
+    def __repr__(self):
+        return f"<BalanceRollup(session_id={self.session_id}, resolution='{self.resolution}', bucket_start={self.bucket_start})>"
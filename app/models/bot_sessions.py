@@ -1,7 +1,8 @@
 # models/bot_sessions.py - CON RELACIONES
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, DECIMAL
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, object_session
+from sqlalchemy import inspect
 from .base import Base
 from decimal import Decimal
 
@@ -17,6 +18,7 @@ class BotSession(Base):
     final_balance = Column(DECIMAL(15, 2))
     status = Column(String(20), default="running")  # running, stopped, paused, error
     trading_mode = Column(String(20), default="simulation")  # simulation, demo, real
+    heartbeat_at = Column(DateTime(timezone=True))  # Último latido del proceso que ejecuta el bot
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # RELACIONES
@@ -43,6 +45,31 @@ class BotSession(Base):
             return (self.get_total_pnl() / float(self.initial_balance)) * 100
         return 0.0
 
+    def get_trade_counts(self) -> dict:
+        """
+        Conteos de trades de la sesión. Si la relación ya viene cargada
+        (selectinload) se cuenta en memoria; si no, una sola consulta agregada
+        en lugar de cargar todos los trades.
+        """
+        if "trades" not in inspect(self).unloaded:
+            return {
+                "total_trades": len(self.trades),
+                "active_trades": sum(1 for t in self.trades if t.status == "open"),
+                "winning_trades": sum(1 for t in self.trades if t.pnl and t.pnl > 0)
+            }
+
+        session = object_session(self)
+        if session is None or self.id is None:
+            return {"total_trades": 0, "active_trades": 0, "winning_trades": 0}
+
+        from .trades import Trade
+        total, active, winning = session.query(
+            func.count(Trade.id),
+            func.count(Trade.id).filter(Trade.status == "open"),
+            func.count(Trade.id).filter(Trade.pnl > 0)
+        ).filter(Trade.session_id == self.id).one()
+        return {"total_trades": total, "active_trades": active, "winning_trades": winning}
+
     def to_dict(self, include_relations: bool = False):
         """Convierte el objeto a dict"""
         data = {
@@ -62,8 +89,6 @@ class BotSession(Base):
         }
 
         if include_relations:
-            data["total_trades"] = len(self.trades) if self.trades else 0
-            data["active_trades"] = len([t for t in self.trades if t.status == "open"]) if self.trades else 0
-            data["winning_trades"] = len([t for t in self.trades if t.pnl and t.pnl > 0]) if self.trades else 0
+            data.update(self.get_trade_counts())
 
         return data
\ No newline at end of file
@@ -0,0 +1,37 @@
+# app/models/market_data.py
+from sqlalchemy import Column, Integer, String, DateTime, DECIMAL, UniqueConstraint
+from sqlalchemy.sql import func
+from .base import Base
+
+class MarketData(Base):
+    __tablename__ = "market_data"
+    __table_args__ = (
+        # Una vela por símbolo/intervalo/apertura: permite ingestas idempotentes
+        UniqueConstraint('symbol', 'interval', 'timestamp', name='uq_market_data_symbol_interval_time'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String(20), nullable=False)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now())  # Hora de apertura de la vela
+    open = Column(DECIMAL(15, 6), nullable=False)
+    high = Column(DECIMAL(15, 6), nullable=False)
+    low = Column(DECIMAL(15, 6), nullable=False)
+    close = Column(DECIMAL(15, 6), nullable=False)
+    volume = Column(DECIMAL(20, 8), nullable=False)
+    interval = Column(String(10), nullable=False)  # '1m', '5m', '1h', '1d'
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'symbol': self.symbol,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'open': float(self.open),
+            'high': float(self.high),
+            'low': float(self.low),
+            'close': float(self.close),
+            'volume': float(self.volume),
+            'interval': self.interval
+        }
+
+    def __repr__(self):
+        return f"<MarketData(symbol='{self.symbol}', interval='{self.interval}', timestamp={self.timestamp})>"
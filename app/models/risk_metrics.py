@@ -1,11 +1,15 @@
 # app/models/risk_metrics.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, DECIMAL, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .base import Base
 
 class RiskMetric(Base):
     __tablename__ = "risk_metrics"
+    __table_args__ = (
+        # Último valor de cada (horizonte, métrica) de una sesión
+        Index('idx_risk_metrics_session_period_name_time', 'session_id', 'time_period', 'metric_name', 'timestamp'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
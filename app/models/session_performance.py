@@ -0,0 +1,36 @@
+# app/models/session_performance.py
+from sqlalchemy import Column, Integer, BigInteger, DateTime, ForeignKey, DECIMAL
+from .base import Base
+
+
+class SessionPerformance(Base):
+    """Estado incremental de drawdown de una sesión (una fila por sesión)"""
+    __tablename__ = "session_performance"
+
+    session_id = Column(Integer, ForeignKey("bot_sessions.id", ondelete="CASCADE"), primary_key=True)
+    last_timestamp = Column(DateTime(timezone=True), nullable=False)  # Último snapshot aplicado
+    current_equity = Column(DECIMAL(15, 2), nullable=False)
+    peak_equity = Column(DECIMAL(15, 2), nullable=False)
+    peak_time = Column(DateTime(timezone=True), nullable=False)  # Inicio del drawdown en curso
+    current_drawdown = Column(DECIMAL(10, 4), nullable=False, default=0)  # % bajo el pico
+    max_drawdown = Column(DECIMAL(10, 4), nullable=False, default=0)
+    max_drawdown_time = Column(DateTime(timezone=True))
+    max_drawdown_duration = Column(BigInteger, nullable=False, default=0)  # Segundos bajo el pico
+    samples = Column(Integer, nullable=False, default=1)
+
+    def to_dict(self):
+        in_drawdown = self.current_equity < self.peak_equity
+        return {
+            "session_id": self.session_id,
+            "current_equity": float(self.current_equity),
+            "peak_equity": float(self.peak_equity),
+            "current_drawdown": float(self.current_drawdown),
+            "max_drawdown": float(self.max_drawdown),
+            "max_drawdown_time": self.max_drawdown_time.isoformat() if self.max_drawdown_time else None,
+            "drawdown_duration": int((self.last_timestamp - self.peak_time).total_seconds()) if in_drawdown else 0,
+            "max_drawdown_duration": self.max_drawdown_duration,
+            "updated_at": self.last_timestamp.isoformat() if self.last_timestamp else None
+        }
+
+    def __repr__(self):
+        return f"<SessionPerformance(session_id={self.session_id}, max_drawdown={self.max_drawdown})>"
@@ -1,5 +1,5 @@
 # app/models/system_logs.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB
@@ -7,14 +7,24 @@ from .base import Base
 
 class SystemLog(Base):
     __tablename__ = "system_logs"
+    __table_args__ = (
+        # Consultas por sesión (y nivel) ordenadas por fecha descendente
+        Index('idx_logs_session_time', 'session_id', 'timestamp'),
+        Index('idx_logs_session_level_time', 'session_id', 'level', 'timestamp'),
+        Index('idx_logs_timestamp', 'timestamp'),
+        # Particionada por rango de timestamp: las particiones diarias/semanales
+        # las crea y expira LogPartitionManager (app/services/log_partitions.py)
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    # La clave primaria de una tabla particionada debe incluir la columna de partición
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
     
     # Relación con la sesión
     session_id = Column(Integer, ForeignKey("bot_sessions.id", ondelete="CASCADE"), nullable=False)
     
-    # Timestamp
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    # Timestamp (clave de partición)
+    timestamp = Column(DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now())
     
     # Nivel y fuente del log
     level = Column(String(10), nullable=False)  # 'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'
@@ -1,5 +1,5 @@
 # app/models/trades.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, DECIMAL, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, DECIMAL, Boolean, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB
@@ -8,6 +8,12 @@ from datetime import datetime  # ✅ IMPORTACIÓN FALTANTE
 
 class Trade(Base):
     __tablename__ = "trades"
+    __table_args__ = (
+        # Estadísticas y últimos trades cerrados de una sesión (dashboard)
+        Index('idx_trades_session_status_exit_time', 'session_id', 'status', 'exit_time'),
+        # Historial paginado por cursor (exit_time, id) de los trades cerrados
+        Index('idx_trades_status_exit_time_id', 'status', 'exit_time', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -32,7 +38,7 @@ class Trade(Base):
     
     # Estado y razón de cierre
     status = Column(String(20), default="open")  # 'open', 'closed', 'cancelled'
-    close_reason = Column(String(50))  # 'take_profit', 'stop_loss', 'manual', 'signal', 'trailing_stop'
+    close_reason = Column(String(50))  # 'take_profit', 'stop_loss', 'manual', 'signal', 'trailing_stop', 'bot_stopped'
     
     # Timestamps
     entry_time = Column(DateTime(timezone=True), server_default=func.now())
@@ -47,6 +53,7 @@ class Trade(Base):
     
     # Tipo de trade
     real_trade = Column(Boolean, default=False)  # True = trade real, False = simulado
+    needs_reconciliation = Column(Boolean, nullable=False, default=False)  # Real que quedó sin bot: revisar en el exchange
     
     # Métricas de riesgo adicionales
     risk_metrics = Column(JSONB)  # Datos estructurados de riesgo
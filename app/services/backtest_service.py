@@ -0,0 +1,398 @@
+# app/services/backtest_service.py
+import logging
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services import signal_engine
+from app.services.exit_engine import TRAILING_STOP, ExitRules
+from app.services.market_buffer import INTERVAL_MS
+from app.services.trigger_index import STOP_LOSS, TAKE_PROFIT
+
+logger = logging.getLogger(__name__)
+
+MS_PER_DAY = 86_400_000
+MS_PER_YEAR = 365 * MS_PER_DAY
+
+# Parámetros de `indicators` que usa BacktestEngine; el resto (rsi_period,
+# volume_threshold...) no cambia la simulación
+ENGINE_PARAMS = ('sma_fast', 'sma_slow')
+
+
+class FillModel:
+    """
+    Modelo de ejecución simulado: órdenes a mercado al cierre de la vela de
+    la decisión, con deslizamiento en puntos básicos y comisión sobre el nocional.
+    """
+
+    def __init__(self, fee_rate: float = 0.001, slippage_bps: float = 0.0):
+        self.fee_rate = fee_rate
+        self.slippage = slippage_bps / 10_000.0
+
+    def buy_price(self, price):
+        return price * (1.0 + self.slippage)
+
+    def sell_price(self, price):
+        return price * (1.0 - self.slippage)
+
+    def fee(self, notional):
+        return notional * self.fee_rate
+
+
+def _iso(ms: int) -> str:
+    return datetime.utcfromtimestamp(ms / 1000.0).isoformat()
+
+
+class BacktestEngine:
+    """
+    Reproduce velas históricas a través de la misma regla de decisión del bot
+    (signal_engine) con un reloj simulado (open_time de cada vela) y un
+    FillModel en lugar del exchange. No escribe en la BD: los resultados se
+    devuelven con la forma de Trade.to_dict() y BalanceHistory.to_dict().
+
+    Las decisiones se calculan vectorizadas sobre toda la serie; luego sólo
+    los eventos (aperturas y cierres de posición) se recorren en orden
+    temporal. Semántica del broker simulado, la de BotService: BUY abre una
+    posición larga si no hay una abierta y SELL la cierra al cierre de la
+    vela. Mientras está abierta, las salidas de TriggerIndex/ExitEngine se
+    evalúan vectorizadas sobre high/low de sus velas:
+
+    - stop-loss y take-profit fijos (stop_loss_percent/take_profit_percent);
+    - trailing stop: el stop de cada vela sale del máximo favorable de las
+      velas anteriores, así que una vela no mueve su propio stop;
+    - toma parcial de beneficios: cada nivel vende su fracción al precio del
+      nivel y el último cierra el resto (sustituye al objetivo fijo).
+
+    Los niveles se llenan a su precio, o a la apertura si la vela abre más
+    allá (gap). Sin ticks no se sabe el orden dentro de la vela: se supone
+    que el stop llega antes que cualquier objetivo de la misma vela.
+
+    No se modela: el límite de posiciones simultáneas entre símbolos, los
+    límites globales de riesgo (pérdida diaria, drawdown, trades por día),
+    el tamaño de posición por max_position_percent (cantidad fija), el precio
+    exacto del tick que dispara (varios niveles cruzados en un salto se
+    llenan cada uno a su nivel) ni la latencia o el rechazo de órdenes.
+    """
+
+    def __init__(self, strategy_params: Dict, initial_balance: float = 1000.0, quantity: float = 0.001,
+                 fill_model: Optional[FillModel] = None, decision_every: int = 3,
+                 snapshot_interval: str = '1h', stop_loss_percent: Optional[float] = None,
+                 take_profit_percent: Optional[float] = None, exit_rules: Optional[ExitRules] = None):
+        indicators = strategy_params.get('indicators', {})
+        self.fast_period = indicators.get('sma_fast', 5)
+        self.slow_period = indicators.get('sma_slow', 20)
+        self.initial_balance = initial_balance
+        self.quantity = quantity
+        self.fill_model = fill_model or FillModel()
+        self.decision_every = max(1, decision_every)
+        self.snapshot_ms = INTERVAL_MS.get(snapshot_interval, INTERVAL_MS['1h'])
+        self.stop_loss_percent = stop_loss_percent
+        self.take_profit_percent = take_profit_percent
+        self.exit_rules = exit_rules or ExitRules()
+
+    @classmethod
+    def from_config(cls, config_yaml: Dict, strategy_name: Optional[str] = None,
+                    overrides: Optional[Dict] = None) -> "BacktestEngine":
+        """Crea el motor con la estrategia y la sección backtest de config.yaml"""
+        strategies = config_yaml.get('strategies', {})
+        strategy_name = strategy_name or strategies.get('default', 'quantum_v1')
+        strategy_params = dict(strategies.get('available', {}).get(strategy_name, {}))
+        if overrides:
+            strategy_params['indicators'] = {**strategy_params.get('indicators', {}), **overrides}
+
+        backtest_cfg = config_yaml.get('backtest', {})
+        per_trade_cfg = config_yaml.get('risk_management', {}).get('per_trade', {})
+        return cls(
+            strategy_params,
+            initial_balance=backtest_cfg.get('initial_balance', 1000.0),
+            quantity=backtest_cfg.get('quantity', 0.001),
+            fill_model=FillModel(backtest_cfg.get('fee_rate', 0.001), backtest_cfg.get('slippage_bps', 0.0)),
+            decision_every=backtest_cfg.get('decision_every', 3),
+            snapshot_interval=backtest_cfg.get('snapshot_interval', '1h'),
+            stop_loss_percent=per_trade_cfg.get('stop_loss_percent'),
+            take_profit_percent=per_trade_cfg.get('take_profit_percent'),
+            exit_rules=ExitRules.from_config(per_trade_cfg)
+        )
+
+    # ==================== DATOS ====================
+
+    @staticmethod
+    def load_archive(archive, symbols: Iterable[str], interval: str, start_ms: Optional[int] = None,
+                     end_ms: Optional[int] = None) -> Dict[str, Dict[str, np.ndarray]]:
+        """Series por símbolo leídas del KlineArchive (vistas memmap, sin copia)"""
+        series = {}
+        for symbol in symbols:
+            columns = archive.read_range(symbol, interval, start_ms, end_ms)
+            if len(columns['open_time']):
+                series[symbol] = columns
+        return series
+
+    # ==================== SEÑALES ====================
+
+    def signals(self, closes: np.ndarray) -> np.ndarray:
+        """Decisiones BUY/SELL/HOLD por vela con la regla del bot en vivo"""
+        fast_ma = signal_engine.rolling_mean(closes, self.fast_period)
+        slow_ma = signal_engine.rolling_mean(closes, self.slow_period)
+        # La iteración n del loop en vivo corresponde a la vela n (base 1)
+        gate = (np.arange(1, len(closes) + 1) % self.decision_every) == 0
+        return signal_engine.sma_cross_decisions(fast_ma, slow_ma, gate)
+
+    def _exit_path(self, entry: int, last: int, closes: np.ndarray, highs: np.ndarray, lows: np.ndarray,
+                   opens: np.ndarray) -> Tuple[int, str, float, List[Tuple[int, float, float]]]:
+        """
+        Recorrido de una posición abierta al cierre de `entry` hasta, como muy
+        tarde, la vela `last` (SELL o fin de datos). Devuelve (vela de salida,
+        motivo, precio de salida, salidas parciales [(vela, fracción, precio)]).
+        """
+        price = closes[entry]
+        rules = self.exit_rules
+        high, low = highs[entry + 1:last + 1], lows[entry + 1:last + 1]
+        m = len(high)
+
+        # Stop vigente en cada vela: fijo, o trailing desde el máximo de las anteriores
+        stop = np.full(m, price * (1 - self.stop_loss_percent / 100) if self.stop_loss_percent else np.nan)
+        trailing = np.zeros(m, dtype=bool)
+        if rules.trailing_enabled and m:
+            high_water = np.maximum.accumulate(np.concatenate(([price], high[:-1])))
+            trailing = high_water >= price * (1 + rules.activation)
+            stop = np.where(trailing, np.fmax(stop, high_water * (1 - rules.distance)), stop)
+        stop_hit = low <= stop
+        stop_at = int(stop_hit.argmax()) if stop_hit.any() else m
+
+        # Objetivos: niveles parciales (el último cierra) o take-profit fijo
+        if rules.partial_enabled:
+            targets = price * (1 + rules.level_percents)
+            fractions = np.diff(rules.level_cumulative, prepend=0.0)
+        elif self.take_profit_percent:
+            targets = np.array([price * (1 + self.take_profit_percent / 100)])
+            fractions = np.array([1.0])
+        else:
+            targets = fractions = np.empty(0)
+        target_at = np.full(len(targets), m)
+        if m:
+            reached = high[:, None] >= targets[None, :]
+            target_at = np.where(reached.any(axis=0), reached.argmax(axis=0), m)
+
+        if stop_at < m and stop_at <= (target_at[-1] if len(targets) else m):
+            bar = entry + 1 + stop_at
+            exit_price = min(float(stop[stop_at]), float(opens[bar]))
+            reason = TRAILING_STOP if trailing[stop_at] else STOP_LOSS
+            filled = target_at < stop_at  # Lo de la vela del stop llega después
+        elif len(targets) and target_at[-1] < m:
+            bar = entry + 1 + int(target_at[-1])
+            exit_price = max(float(targets[-1]), float(opens[bar]))
+            reason = TAKE_PROFIT
+            filled = np.arange(len(targets)) < len(targets) - 1
+        else:
+            bar = last
+            exit_price = float(closes[last])
+            reason = None
+            filled = target_at < m
+
+        partials = [
+            (entry + 1 + int(target_at[k]), float(fractions[k]),
+             max(float(targets[k]), float(opens[entry + 1 + int(target_at[k])])))
+            for k in np.flatnonzero(filled)
+        ]
+        return bar, reason, exit_price, partials
+
+    def _simulate_symbol(self, closes: np.ndarray, highs: np.ndarray, lows: np.ndarray,
+                         opens: np.ndarray) -> Dict[str, np.ndarray]:
+        n = len(closes)
+        sig = self.signals(closes)
+        buys = np.flatnonzero(sig == signal_engine.BUY)
+        sells = np.flatnonzero(sig == signal_engine.SELL)
+
+        fm = self.fill_model
+        qty = self.quantity
+        realized_steps = np.zeros(n)
+        unrealized = np.zeros(n)
+        trades = {'entries': [], 'exits': [], 'entry_fill': [], 'exit_fill': [], 'pnl': [], 'reasons': []}
+
+        start = 0
+        while True:
+            k = np.searchsorted(buys, start)
+            if k == len(buys):
+                break
+            entry = int(buys[k])
+            k = np.searchsorted(sells, entry, side='right')
+            last = int(sells[k]) if k < len(sells) else n - 1
+
+            bar, reason, exit_price, partials = self._exit_path(entry, last, closes, highs, lows, opens)
+            if reason is None:
+                reason = 'signal' if k < len(sells) else 'end_of_data'
+
+            entry_fill = fm.buy_price(closes[entry])
+            entry_fee = fm.fee(entry_fill * qty)
+            sold = np.zeros(bar - entry)
+            pnl = 0.0
+            for partial_bar, fraction, partial_price in partials:
+                fill = fm.sell_price(partial_price)
+                partial_pnl = (fill - entry_fill) * qty * fraction - fm.fee(fill * qty * fraction)
+                realized_steps[partial_bar] += partial_pnl
+                pnl += partial_pnl
+                sold[partial_bar - entry:] += fraction
+
+            remaining = qty * (1.0 - sum(fraction for _, fraction, _ in partials))
+            exit_fill = fm.sell_price(exit_price)
+            final_pnl = (exit_fill - entry_fill) * remaining - fm.fee(exit_fill * remaining) - entry_fee
+            realized_steps[bar] += final_pnl
+            pnl += final_pnl
+
+            # Mientras está abierta: valoración de lo que queda al cierre de cada vela
+            unrealized[entry:bar] = (fm.sell_price(closes[entry:bar]) - entry_fill) * qty * (1.0 - sold) - entry_fee
+
+            for key, value in (('entries', entry), ('exits', bar), ('entry_fill', entry_fill),
+                               ('exit_fill', exit_fill), ('pnl', pnl), ('reasons', reason)):
+                trades[key].append(value)
+            if reason == 'end_of_data':
+                break
+            # Tras una salida intravela, un BUY al cierre de esa misma vela reabre
+            start = bar + 1 if reason == 'signal' else bar
+
+        realized = np.cumsum(realized_steps)
+        result = {key: np.asarray(values, dtype=np.int64 if key in ('entries', 'exits') else None)
+                  for key, values in trades.items() if key != 'reasons'}
+        result['pnl'] = result['pnl'].astype(np.float64)
+        result.update(reasons=trades['reasons'], realized=realized, curve=realized + unrealized)
+        return result
+
+    # ==================== EJECUCIÓN ====================
+
+    def run(self, series: Dict[str, Dict[str, np.ndarray]], include_details: bool = True) -> Dict:
+        """
+        Ejecuta el backtest sobre {symbol: {'open_time', 'open', 'high', 'low', 'close'}}.
+        Con include_details=False sólo se devuelve el resumen (barridos de parámetros).
+        """
+        per_symbol = {}
+        candles = 0
+        for symbol, columns in series.items():
+            closes = np.asarray(columns['close'], dtype=np.float64)
+            candles += len(closes)
+            if len(closes) < self.slow_period:
+                continue
+            # Sin high/low/open (series sólo de cierres) los niveles se evalúan al cierre
+            highs, lows, opens = (np.asarray(columns.get(name, closes), dtype=np.float64)
+                                  for name in ('high', 'low', 'open'))
+            per_symbol[symbol] = (np.asarray(columns['open_time'], dtype=np.int64),
+                                  self._simulate_symbol(closes, highs, lows, opens))
+
+        if not per_symbol:
+            return {'summary': self._summary([], np.array([self.initial_balance]), candles, 0),
+                    'trades': [], 'balance_history': []}
+
+        # Reloj común: unión de los open_time de todas las series
+        clock = np.unique(np.concatenate([open_time for open_time, _ in per_symbol.values()]))
+        total_curve = np.zeros(len(clock))
+        total_realized = np.zeros(len(clock))
+        for open_time, sim in per_symbol.values():
+            idx = np.searchsorted(open_time, clock, side='right') - 1
+            valid = idx >= 0
+            safe = np.maximum(idx, 0)
+            total_curve += np.where(valid, sim['curve'][safe], 0.0)
+            total_realized += np.where(valid, sim['realized'][safe], 0.0)
+        equity = self.initial_balance + total_curve
+
+        snapshots = self._snapshot_indices(clock)
+        all_pnl = np.concatenate([sim['pnl'] for _, sim in per_symbol.values()])
+        summary = self._summary(all_pnl, equity, candles, len(snapshots), equity[snapshots])
+
+        result = {'summary': summary, 'trades': [], 'balance_history': []}
+        if include_details:
+            result['trades'] = self._trade_records(per_symbol)
+            result['balance_history'] = self._balance_records(clock, equity, total_realized, snapshots)
+        return result
+
+    def _snapshot_indices(self, clock: np.ndarray) -> np.ndarray:
+        """Última posición del reloj dentro de cada intervalo de snapshot"""
+        bucket = clock // self.snapshot_ms
+        return np.flatnonzero(np.diff(bucket, append=bucket[-1] + 1))
+
+    def _summary(self, pnl, equity: np.ndarray, candles: int, n_snapshots: int,
+                 snapshot_equity: Optional[np.ndarray] = None) -> Dict:
+        pnl = np.asarray(pnl, dtype=np.float64)
+        total_trades = len(pnl)
+        winning = int((pnl > 0).sum())
+        gross_win = float(pnl[pnl > 0].sum())
+        gross_loss = float(-pnl[pnl < 0].sum())
+
+        peak = np.maximum.accumulate(equity)
+        drawdown = np.where(peak > 0, (peak - equity) / peak * 100, 0.0)
+        max_drawdown = float(drawdown.max()) if len(drawdown) else 0.0
+
+        sharpe = 0.0
+        if snapshot_equity is not None and len(snapshot_equity) > 2:
+            returns = np.diff(snapshot_equity) / snapshot_equity[:-1]
+            std = returns.std(ddof=1)
+            if std > 0:
+                sharpe = float(returns.mean() / std * math.sqrt(MS_PER_YEAR / self.snapshot_ms))
+
+        final_equity = float(equity[-1])
+        return {
+            'candles': candles,
+            'total_trades': total_trades,
+            'winning_trades': winning,
+            'losing_trades': total_trades - winning,
+            'win_rate': round(winning / total_trades * 100, 2) if total_trades else 0,
+            'total_pnl': round(final_equity - self.initial_balance, 2),
+            'profit_factor': round(gross_win / gross_loss, 2) if gross_loss > 0 else 0,
+            'max_drawdown': round(max_drawdown, 2),
+            'sharpe_ratio': round(sharpe, 2),
+            'initial_balance': self.initial_balance,
+            'final_balance': round(final_equity, 2),
+            'snapshots': n_snapshots
+        }
+
+    def _trade_records(self, per_symbol) -> List[Dict]:
+        """Trades con la forma de Trade.to_dict(), ordenados por cierre"""
+        records = []
+        qty = self.quantity
+        for symbol, (open_time, sim) in per_symbol.items():
+            for k in range(len(sim['pnl'])):
+                entry_fill = float(sim['entry_fill'][k])
+                exit_fill = float(sim['exit_fill'][k])
+                pnl = float(sim['pnl'][k])
+                records.append({
+                    'id': None,
+                    'session_id': None,
+                    'symbol': symbol,
+                    'side': 'buy',
+                    'entry_price': entry_fill,
+                    'exit_price': exit_fill,
+                    'quantity': qty,
+                    'pnl': round(pnl, 2),
+                    # Como en BotService: P&L total (con parciales) sobre el nocional de entrada
+                    'pnl_percent': round(pnl / (entry_fill * qty) * 100, 4) if entry_fill else 0,
+                    'status': 'closed',
+                    'close_reason': sim['reasons'][k],
+                    'entry_time': _iso(int(open_time[sim['entries'][k]])),
+                    'exit_time': _iso(int(open_time[sim['exits'][k]])),
+                    'real_trade': False,
+                    'is_winning': pnl > 0,
+                    'is_open': False
+                })
+        records.sort(key=lambda t: t['exit_time'])
+        return records
+
+    def _balance_records(self, clock: np.ndarray, equity: np.ndarray, realized: np.ndarray,
+                         snapshots: np.ndarray) -> List[Dict]:
+        """Snapshots con la forma de BalanceHistory.to_dict()"""
+        times = clock[snapshots]
+        day_start = times - times % MS_PER_DAY
+        prev = np.searchsorted(clock, day_start, side='left') - 1
+        equity_day_start = np.where(prev >= 0, equity[np.maximum(prev, 0)], self.initial_balance)
+
+        return [
+            {
+                'id': None,
+                'session_id': None,
+                'timestamp': _iso(int(t)),
+                'balance': round(float(self.initial_balance + r), 2),
+                'pnl': round(float(e - self.initial_balance), 2),
+                'pnl_daily': round(float(e - d), 2),
+                'equity': round(float(e), 2)
+            }
+            for t, e, r, d in zip(times, equity[snapshots], realized[snapshots], equity_day_start)
+        ]
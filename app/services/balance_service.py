@@ -0,0 +1,356 @@
+# app/services/balance_service.py
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from psycopg2.extras import execute_values
+
+from app.models.base import engine
+from app.services.performance_service import update_drawdown
+from app.services.dashboard_cache import get_dashboard_cache
+from app.services.dashboard_stream import get_dashboard_stream, BALANCE
+
+logger = logging.getLogger(__name__)
+
+# Resoluciones de los rollups, de la más fina a la más gruesa (segundos por bucket)
+RESOLUTIONS: Dict[str, int] = {'1m': 60, '1h': 3600, '1d': 86400}
+# Días que se conserva cada resolución (None = toda la sesión)
+DEFAULT_RETENTION_DAYS: Dict[str, Optional[int]] = {'1m': 7, '1h': 180, '1d': None}
+DEFAULT_MAX_POINTS = 500
+
+_METRICS = ('balance', 'equity', 'pnl')
+_CLOSE_COLUMNS = ('balance_close', 'equity_close', 'pnl_close', 'pnl_daily_close')
+_COLUMNS = ('session_id', 'resolution', 'bucket_start', 'last_timestamp',
+            *(f"{m}_{part}" for m in _METRICS for part in ('open', 'high', 'low', 'close')),
+            'pnl_daily_close', 'samples')
+
+
+def _build_upsert() -> str:
+    """Upsert de un snapshot en su bucket: high/low se extienden y close sólo avanza en el tiempo"""
+    newer = "EXCLUDED.last_timestamp >= r.last_timestamp"
+    updates = [f"{m}_high = GREATEST(r.{m}_high, EXCLUDED.{m}_high)" for m in _METRICS]
+    updates += [f"{m}_low = LEAST(r.{m}_low, EXCLUDED.{m}_low)" for m in _METRICS]
+    updates += [f"{c} = CASE WHEN {newer} THEN EXCLUDED.{c} ELSE r.{c} END" for c in _CLOSE_COLUMNS]
+    updates += ["last_timestamp = GREATEST(r.last_timestamp, EXCLUDED.last_timestamp)",
+                "samples = r.samples + EXCLUDED.samples"]
+    return (f"INSERT INTO balance_rollups AS r ({', '.join(_COLUMNS)}) VALUES %s "
+            f"ON CONFLICT (session_id, resolution, bucket_start) DO UPDATE SET {', '.join(updates)}")
+
+
+def _build_rebuild() -> str:
+    """Reconstrucción de una resolución desde balance_history con las mismas reglas que el upsert"""
+    aggregates = []
+    for m in _METRICS:
+        aggregates += [f"(array_agg({m} ORDER BY timestamp))[1]", f"max({m})", f"min({m})",
+                       f"(array_agg({m} ORDER BY timestamp DESC))[1]"]
+    aggregates.append("(array_agg(pnl_daily ORDER BY timestamp DESC))[1]")
+    # timestamp es TIMESTAMPTZ: extract(epoch) da el instante real, igual que bucket_start()
+    return f"""
+        INSERT INTO balance_rollups ({', '.join(_COLUMNS)})
+        SELECT session_id, %(resolution)s,
+               to_timestamp(floor(extract(epoch FROM timestamp) / %(seconds)s) * %(seconds)s) AS bucket,
+               to_timestamp(max(extract(epoch FROM timestamp))),
+               {', '.join(aggregates)},
+               count(*)
+        FROM balance_history
+        WHERE (%(session_id)s IS NULL OR session_id = %(session_id)s)
+          AND (%(since)s IS NULL OR timestamp >= %(since)s)
+        GROUP BY session_id, bucket
+    """
+
+
+_UPSERT_SQL = _build_upsert()
+_REBUILD_SQL = _build_rebuild()
+
+
+def _as_utc(timestamp: datetime) -> datetime:
+    """Los datetimes sin zona se toman como UTC"""
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """Inicio (UTC) del bucket de `resolution` que contiene `timestamp`"""
+    timestamp = _as_utc(timestamp)
+    seconds = RESOLUTIONS[resolution]
+    return datetime.fromtimestamp(timestamp.timestamp() // seconds * seconds, tz=timezone.utc)
+
+
+def _time_format(resolution: str) -> str:
+    return '%Y-%m-%d' if resolution == '1d' else '%H:%M' if resolution == '1m' else '%d/%m %H:%M'
+
+
+def format_points(rows, resolution: str) -> List[Dict]:
+    """Filas (bucket_start, balance, balance_high, balance_low, equity, equity_high,
+    equity_low, pnl, pnl_daily, samples) -> puntos de la serie del dashboard"""
+    time_format = _time_format(resolution)
+    points = []
+    for (start, balance, balance_high, balance_low, equity, equity_high, equity_low,
+         pnl, pnl_daily, samples) in rows:
+        # En UTC como format_delta(), sea cual sea el TimeZone de la conexión
+        start = _as_utc(start)
+        points.append({
+            'timestamp': start.isoformat(),
+            'time': start.strftime(time_format),
+            'balance': float(balance),
+            'balance_high': float(balance_high),
+            'balance_low': float(balance_low),
+            'equity': float(equity),
+            'equity_high': float(equity_high),
+            'equity_low': float(equity_low),
+            'pnl': float(pnl),
+            'pnl_daily': float(pnl_daily or 0),
+            'samples': samples
+        })
+    return points
+
+
+def format_delta(timestamp: datetime, balance: float, equity: float, pnl: float, pnl_daily: float) -> Dict:
+    """
+    Snapshot recién guardado -> delta del dashboard: valores de cierre y, por
+    resolución, el bucket al que pertenece (el cliente reemplaza ese punto de
+    su serie o lo añade si es nuevo)
+    """
+    initial = balance - pnl
+    buckets = {}
+    for resolution in RESOLUTIONS:
+        start = bucket_start(timestamp, resolution)
+        buckets[resolution] = {'timestamp': start.isoformat(), 'time': start.strftime(_time_format(resolution))}
+    return {
+        'timestamp': timestamp.isoformat(),
+        'balance': float(balance),
+        'equity': float(equity),
+        'pnl': float(pnl),
+        'pnl_daily': float(pnl_daily or 0),
+        'current_balance': float(balance),
+        'total_pnl': float(pnl),
+        'total_pnl_percent': float(pnl / initial * 100) if initial else 0.0,
+        'buckets': buckets
+    }
+
+
+def format_latest(row) -> Optional[Dict]:
+    """Fila (last_timestamp, balance, equity, pnl, pnl_daily) -> último snapshot"""
+    if row is None:
+        return None
+    timestamp, balance, equity, pnl, pnl_daily = row
+    return {
+        'timestamp': _as_utc(timestamp).isoformat(),
+        'balance': float(balance),
+        'equity': float(equity),
+        'pnl': float(pnl),
+        'pnl_daily': float(pnl_daily or 0)
+    }
+
+
+class BalanceService:
+    """
+    Historial de balance por sesión con rollups OHLC a 1m, 1h y 1d.
+
+    Cada snapshot se guarda en balance_history y, en la misma transacción, se
+    agrega a los tres buckets que lo contienen con un upsert. Las lecturas del
+    dashboard van siempre a balance_rollups: el coste depende del presupuesto
+    de puntos y no de la duración de la sesión.
+
+    La resolución de una consulta es la primera (de fina a gruesa) cuyo
+    periodo de retención cubre el rango pedido y que no supera max_points.
+    """
+
+    def __init__(self, max_points: int = DEFAULT_MAX_POINTS,
+                 retention_days: Optional[Dict[str, Optional[int]]] = None,
+                 prune_interval: float = 3600.0):
+        self.max_points = max_points
+        self.retention_days = {**DEFAULT_RETENTION_DAYS, **(retention_days or {})}
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    # ==================== ESCRITURA ====================
+
+    def record_snapshot(self, session_id: int, balance: float, equity: float, pnl: float,
+                        pnl_daily: float = 0.0, timestamp: Optional[datetime] = None) -> bool:
+        """Guarda el snapshot en balance_history y actualiza sus buckets 1m/1h/1d y el drawdown"""
+        timestamp = timestamp or datetime.now(timezone.utc)
+        rows = [
+            (session_id, resolution, bucket_start(timestamp, resolution), timestamp,
+             balance, balance, balance, balance,
+             equity, equity, equity, equity,
+             pnl, pnl, pnl, pnl,
+             pnl_daily, 1)
+            for resolution in RESOLUTIONS
+        ]
+
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO balance_history (session_id, timestamp, balance, pnl, pnl_daily, equity) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                (session_id, timestamp, balance, pnl, pnl_daily, equity)
+            )
+            execute_values(cursor, _UPSERT_SQL, rows)
+            update_drawdown(cursor, session_id, equity, timestamp)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error guardando snapshot de balance de la sesión {session_id}: {e}")
+            return False
+        finally:
+            conn.close()
+
+        get_dashboard_cache().invalidate(session_id, 'balance')
+        get_dashboard_stream().publish(session_id, BALANCE,
+                                       format_delta(timestamp, balance, equity, pnl, pnl_daily))
+        if time.monotonic() - self._last_prune >= self.prune_interval:
+            self.prune()
+        return True
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """Elimina los buckets más antiguos que la retención de su resolución"""
+        if not self._prune_lock.acquire(blocking=False):
+            return 0  # Otro bot ya está podando
+        now = now or datetime.now(timezone.utc)
+        deleted = 0
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            for resolution, days in self.retention_days.items():
+                if days is None:
+                    continue
+                cursor.execute("DELETE FROM balance_rollups WHERE resolution = %s AND bucket_start < %s",
+                               (resolution, now - timedelta(days=days)))
+                deleted += cursor.rowcount
+            conn.commit()
+            self._last_prune = time.monotonic()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error podando rollups de balance: {e}")
+        finally:
+            conn.close()
+            self._prune_lock.release()
+
+        if deleted:
+            logger.info(f"🧹 {deleted} buckets de balance expirados eliminados")
+        return deleted
+
+    def rebuild(self, session_id: Optional[int] = None) -> int:
+        """Regenera los rollups desde balance_history (una sesión o todas)"""
+        now = datetime.now(timezone.utc)
+        inserted = 0
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            for resolution, seconds in RESOLUTIONS.items():
+                days = self.retention_days.get(resolution)
+                since = bucket_start(now - timedelta(days=days), resolution) if days is not None else None
+                cursor.execute(
+                    "DELETE FROM balance_rollups WHERE resolution = %(resolution)s "
+                    "AND (%(session_id)s IS NULL OR session_id = %(session_id)s)",
+                    {'resolution': resolution, 'session_id': session_id}
+                )
+                cursor.execute(_REBUILD_SQL, {'resolution': resolution, 'seconds': seconds,
+                                              'session_id': session_id, 'since': since})
+                inserted += cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return inserted
+
+    # ==================== LECTURA ====================
+
+    def choose_resolution(self, since: datetime, until: datetime, max_points: Optional[int] = None,
+                          now: Optional[datetime] = None) -> str:
+        """
+        Resolución de la serie para [since, until]: la más fina cuya retención
+        cubre `since` y cuyo número de buckets no supera max_points. Toda
+        resolución más gruesa también cabe en el presupuesto, así que ésta es la
+        menos gruesa que basta para respetarlo (la que más detalle conserva).
+        Si ninguna cabe, la más gruesa.
+        """
+        max_points = max_points or self.max_points
+        now = now or datetime.now(timezone.utc)
+        span = max((until - since).total_seconds(), 0.0)
+        for resolution, seconds in RESOLUTIONS.items():
+            days = self.retention_days.get(resolution)
+            if days is not None and since < now - timedelta(days=days):
+                continue
+            if span / seconds <= max_points:
+                return resolution
+        return next(reversed(RESOLUTIONS))
+
+    def get_history(self, session_id: int, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None, max_points: Optional[int] = None) -> Dict:
+        """
+        Serie de la sesión entre since y until (por defecto, toda la sesión
+        hasta ahora) a la resolución elegida por choose_resolution().
+        """
+        until = until or datetime.now(timezone.utc)
+        if until.tzinfo is None:
+            until = until.replace(tzinfo=timezone.utc)
+
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            if since is None:
+                cursor.execute("SELECT min(bucket_start) FROM balance_rollups "
+                               "WHERE session_id = %s AND resolution = '1d'", (session_id,))
+                since = cursor.fetchone()[0]
+                if since is None:
+                    return {'resolution': None, 'points': []}
+            elif since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+
+            resolution = self.choose_resolution(since, until, max_points)
+            cursor.execute("""
+                SELECT bucket_start, balance_close, balance_high, balance_low,
+                       equity_close, equity_high, equity_low, pnl_close, pnl_daily_close, samples
+                FROM balance_rollups
+                WHERE session_id = %s AND resolution = %s AND bucket_start >= %s AND bucket_start < %s
+                ORDER BY bucket_start
+            """, (session_id, resolution, bucket_start(since, resolution), until))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        return {'resolution': resolution, 'points': format_points(rows, resolution)}
+
+    def get_latest(self, session_id: int) -> Optional[Dict]:
+        """Último snapshot de la sesión leído del bucket diario más reciente"""
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT last_timestamp, balance_close, equity_close, pnl_close, pnl_daily_close
+                FROM balance_rollups
+                WHERE session_id = %s AND resolution = '1d'
+                ORDER BY bucket_start DESC LIMIT 1
+            """, (session_id,))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+
+        return format_latest(row)
+
+
+_service: Optional[BalanceService] = None
+_service_lock = threading.Lock()
+
+
+def get_balance_service(config: Optional[Dict] = None) -> BalanceService:
+    """Servicio compartido por los bots y los endpoints del proceso"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            config = config or {}
+            _service = BalanceService(
+                max_points=config.get('max_points', DEFAULT_MAX_POINTS),
+                retention_days=config.get('retention_days'),
+                prune_interval=config.get('prune_interval', 3600)
+            )
+        return _service
@@ -1,17 +1,34 @@
 import logging
 import time
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, List
 import json
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from app import db, socketio
 from app.models.bot_sessions import BotSession
-from app.models.system_logs import SystemLog
-from app.models.trades import Trade
 from app.services.exchange_factory import ExchangeFactory
 from app.services.data_service import DataService
+from app.services.market_buffer import MarketDataBuffer
+from app.services.indicators import IndicatorEngine, IndicatorSet
+from app.services import signal_engine
+from app.services.market_data_ingestor import get_ingestor
+from app.services.kline_archive import get_archive
+from app.services.log_sink import get_log_sink
+from app.services.log_policy import LogPolicyEngine
+from app.services.log_partitions import get_partition_manager
+from app.services.trade_writer import get_trade_writer
+from app.services.balance_service import get_balance_service
+from app.services.risk_engine import RiskMetricsEngine
+from app.services.mark_to_market import get_mark_to_market
+from app.services.dashboard_cache import get_dashboard_cache
+from app.services.dashboard_stream import get_dashboard_stream, POSITION, SESSION
+from app.services.trigger_index import STOP_LOSS, TriggerIndex, Trigger
+from app.services.exit_engine import TRAILING_STOP, ExitEngine, ExitRules, ExitSignal
+from app.services.market_stream import get_market_stream, kline_stream
+from app.services.tick_handler import KlineTick, KlineTickHandler
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -29,8 +46,7 @@ class BotService:
         self.is_running = False
         self.current_session = None
         self.trades = []
-        self.websocket_manager = None
-        self.last_kline_data = {}
+        self.market_stream = None
         
         # Cargar variables de entorno
         from dotenv import load_dotenv
@@ -45,9 +61,6 @@ class BotService:
             logger.error("❌ No se encontraron credenciales de Binance en .env")
             raise ValueError("Se requieren credenciales de Binance para operar")
 
-        # Inicializar el exchange
-        self.initialize_exchange()
-        
         # Cargar config.yaml para estrategias
         import yaml
         config_path = os.path.join(os.path.dirname(__file__), '../../config.yaml')
@@ -60,39 +73,127 @@ class BotService:
         self.available_pairs = trading_cfg.get('available_pairs', ['BTCUSDT'])
         self.base_currency = trading_cfg.get('base_currency', 'USDT')
         self.max_simultaneous_positions = trading_cfg.get('max_simultaneous_positions', 3)
+        self.initial_balance = trading_cfg.get('initial_balance', 1000.0)
 
         strategies_cfg = self.config_yaml.get('strategies', {}).get('available', {})
         self.strategy_name = self.config_yaml.get('strategies', {}).get('default', 'quantum_v1')
         self.strategy_params = strategies_cfg.get(self.strategy_name, {})
+        self.batch_evaluation = self.strategy_params.get('evaluation', 'per_symbol') == 'batch'
+
+        # Buffers OHLCV en memoria por símbolo/timeframe
+        market_cfg = self.config_yaml.get('market_data', {})
+        self.market_buffer = MarketDataBuffer(capacity=market_cfg.get('buffer_capacity', 500))
+        self.indicators = IndicatorEngine(self.strategy_params.get('indicators', {}))
+
+        # Archivo columnar en disco para investigación y backtests
+        archive_cfg = market_cfg.get('archive', {})
+        self.kline_archive = get_archive(archive_cfg) if archive_cfg.get('enabled', True) else None
+
+        # Velas cerradas a market_data y al archivo desde un hilo en segundo plano
+        persist_cfg = market_cfg.get('persist', {})
+        self.market_ingestor = get_ingestor(persist_cfg, archive=self.kline_archive) \
+            if persist_cfg.get('enabled', True) or self.kline_archive else None
+
+        # Persistencia de logs en segundo plano (inserción por lotes)
+        logging_cfg = self.config_yaml.get('logging', {})
+        self.log_sink = get_log_sink(logging_cfg.get('sink', {}))
+        self.log_policy = LogPolicyEngine(logging_cfg.get('policies', {}))
+        retention_cfg = logging_cfg.get('retention', {})
+        if retention_cfg.get('enabled', True):
+            get_partition_manager(retention_cfg)
+
+        # Órdenes y trades: cola write-behind con journal local
+        self.trade_writer = get_trade_writer(self.config_yaml.get('persistence', {}).get('trades', {}))
+        # Posiciones abiertas valoradas en memoria con volcado masivo a BD
+        self.mark_to_market = get_mark_to_market(self.config_yaml.get('persistence', {}).get('positions', {}),
+                                                 self.trade_writer)
+
+        # Snapshots de balance (balance_history + rollups 1m/1h/1d)
+        balance_cfg = self.config_yaml.get('persistence', {}).get('balance', {})
+        self.balance_service = get_balance_service(balance_cfg)
+        self.snapshot_interval = balance_cfg.get('snapshot_interval', 60)
+        self.realized_pnl = 0.0
+        self._last_snapshot = 0.0
+        self._day_start = (None, self.initial_balance)
+        self.risk_metrics_cfg = self.config_yaml.get('risk_management', {}).get('metrics', {})
+        self.risk_engine = None
+        # Snapshots del dashboard: trades, posiciones, balance y riesgo se invalidan al persistirse
+        self.dashboard_cache = get_dashboard_cache(self.config_yaml)
+        self.dashboard_stream = get_dashboard_stream()
+
+        # Posiciones abiertas por este bot y sus niveles de protección indexados por precio
+        per_trade_cfg = self.config_yaml.get('risk_management', {}).get('per_trade', {})
+        self.stop_loss_percent = per_trade_cfg.get('stop_loss_percent', 1.5)
+        self.take_profit_percent = per_trade_cfg.get('take_profit_percent', 3.0)
+        self.open_positions = {}  # position_id -> {'symbol', 'quantity', 'entry_price', 'realized_pnl', 'trade'}
+        self._positions_lock = threading.RLock()
+        self.trigger_index = TriggerIndex()
+        # Trailing stop y toma parcial evaluados por tick (la config del bot en BD tiene prioridad)
+        self.exit_rules = ExitRules.from_config({**per_trade_cfg, **self._load_exit_config()})
+        self.exit_engine = ExitEngine(self.exit_rules, self.trigger_index, on_stop=self._on_trailing_stop)
+        # Las órdenes de los disparos salen de este hilo, no del event loop del stream
+        self.order_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"orders-{user_id}")
+
+        # Camino rápido de mensajes de kline: un KlineTick por símbolo actualizado en el lugar
+        self.publish_interval = market_cfg.get('publish_interval', 1.0)
+        self._last_publish = {}
+        self.tick_handler = KlineTickHandler([self._on_tick, self._mark_positions, self._check_exits,
+                                              self._publish_tick])
+
+        # Inicializar el exchange (requiere los pares y la config de market_data)
+        self.initialize_exchange()
 
         logger.info(f"BotService creado para user {user_id} modo {trading_mode} | testnet={self.testnet} | estrategia={self.strategy_name}")
 
+    def _load_exit_config(self) -> dict:
+        """trailing_stop/partial_take_profit de risk_management en bot_config (config_id), si existe"""
+        if not self.config_id:
+            return {}
+        try:
+            from app.models.bot_config import BotConfig
+            bot_config = db.session.get(BotConfig, self.config_id)
+            risk_cfg = bot_config.get_config_value('risk_management', {}) if bot_config else {}
+            return {k: risk_cfg[k] for k in ('trailing_stop', 'partial_take_profit') if k in risk_cfg}
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo leer la config de salidas del bot_config {self.config_id}: {e}")
+            return {}
+
+    def _session_changed(self):
+        """La sesión arrancó, se detuvo o falló: cambia su estado y la sesión actual del usuario"""
+        self.dashboard_cache.invalidate_user(self.user_id)
+        self.dashboard_cache.invalidate(self.current_session.id, 'session')
+        self.dashboard_stream.publish(self.current_session.id, SESSION, {
+            'status': self.current_session.status,
+            'trading_mode': self.current_session.trading_mode
+        })
+
     # ==================== LOGGING + SOCKET ====================
 
-    def _emit_log(self, level, message):
+    def _emit_log(self, level, message, source="bot_service"):
         """
-        Envía logs a BD + Websocket al dashboard
+        Envía logs a BD + Websocket al dashboard. Las políticas de logging.policies
+        (rate limit, muestreo, colapso de repetidos) deciden qué llega a ambos sinks.
         """
+        for line_level, line in self.log_policy.filter(source, level.upper(), message):
+            self._write_log(line_level, line, source)
+
+    def _write_log(self, level, message, source):
+        session_id = self.current_session.id if self.current_session else None
+
+        # La persistencia se encola en el sink de system_logs: el loop nunca espera a la BD
         try:
-            log_entry = SystemLog(
-                user_id=self.user_id,
-                session_id=self.current_session.id if self.current_session else None,
-                level=level.upper(),
-                source="bot_service",
-                message=message
-            )
-            db.session.add(log_entry)
-            db.session.commit()
+            self.log_sink.submit(session_id, level, source, message)
         except Exception as e:
-            logger.error(f"Error guardando log BD: {e}")
+            logger.error(f"Error encolando log BD: {e}")
 
         try:
             socketio.emit(
                 "bot_log",
                 {
                     "user_id": self.user_id,
-                    "session_id": self.current_session.id if self.current_session else None,
+                    "session_id": session_id,
                     "level": level,
+                    "source": source,
                     "message": message,
                     "time": datetime.utcnow().isoformat()
                 },
@@ -110,6 +211,7 @@ class BotService:
                 user_id=self.user_id,
                 trading_mode=self.trading_mode,
                 config_id=self.config_id,
+                initial_balance=self.initial_balance,
                 status='starting',
                 started_at=datetime.utcnow(),
                 configuration=json.dumps({
@@ -120,6 +222,7 @@ class BotService:
             )
             db.session.add(self.current_session)
             db.session.commit()
+            self.risk_engine = RiskMetricsEngine.from_config(self.current_session.id, self.risk_metrics_cfg)
 
             self._emit_log("INFO", "Iniciando bot...")
 
@@ -138,6 +241,9 @@ class BotService:
             self.is_running = True
             self.current_session.status = 'running'
             db.session.commit()
+            self.mark_to_market.attach(self.current_session.id)
+            self._adopt_positions()
+            self._session_changed()
 
             # Lanza loop en thread
             self.trading_thread = threading.Thread(target=self._trading_loop, daemon=True)
@@ -153,9 +259,11 @@ class BotService:
             self._emit_log("ERROR", err)
 
             if self.current_session:
+                self.mark_to_market.detach(self.current_session.id)
                 self.current_session.status = 'error'
                 self.current_session.error_message = str(e)
                 db.session.commit()
+                self._session_changed()
 
             return {"success": False, "message": err}
 
@@ -169,45 +277,38 @@ class BotService:
             self._emit_log("ERROR", "No se pudo iniciar la conexión con Binance")
             return
 
+        # Precargar buffers una sola vez; luego se actualizan desde el stream
+        timeframes = self.strategy_params.get('timeframes', ['1h'])
+        market_timeframes = self.config_yaml.get('market_data', {}).get('timeframes', [])
+        self.market_buffer.seed(self.exchange, self.available_pairs, [*market_timeframes, *timeframes])
+        self.indicators.seed(self.market_buffer, self.available_pairs, timeframes)
+
         iteration = 0
         wait_time = int(os.getenv("BOT_WAIT_TIME", 10))  # default 10s para pruebas
 
         while self.is_running:
             try:
                 iteration += 1
-                self._emit_log("INFO", f"Iteración #{iteration}")
+                self._emit_log("INFO", f"Iteración #{iteration}", source="loop")
+                self._record_balance_snapshot()
+
+                if self.batch_evaluation:
+                    # Todos los símbolos en una sola pasada vectorizada por timeframe
+                    for timeframe in timeframes:
+                        self._execute_strategy_batch(timeframe, iteration)
+                    time.sleep(wait_time)
+                    continue
 
                 # Usar datos en tiempo real de Binance
                 for symbol in self.available_pairs:
-                    if symbol in self.last_kline_data:
-                        kline_data = self.last_kline_data[symbol]
-                        
-                        # Obtener datos históricos para análisis
-                        timeframes = self.strategy_params.get('timeframes', ['1h'])
+                    if symbol in self.tick_handler.ticks:
                         for timeframe in timeframes:
-                            # Combinar datos históricos con datos en tiempo real
-                            historical_data = self.exchange.get_historical_klines(
-                                symbol, 
-                                timeframe, 
-                                "1 day ago UTC"
-                            )
-                            
-                            if not historical_data:
+                            indicators = self.indicators.get(symbol, timeframe)
+                            if not indicators:
                                 self._emit_log("WARNING", f"No hay datos históricos para {symbol} {timeframe}")
                                 continue
-                            
-                            # Agregar el último dato en tiempo real
-                            historical_data.append({
-                                'open_time': kline_data['timestamp'],
-                                'open': kline_data['open'],
-                                'high': kline_data['high'],
-                                'low': kline_data['low'],
-                                'close': kline_data['close'],
-                                'volume': kline_data['volume'],
-                                'close_time': kline_data['timestamp'] + 60000,  # +1 minuto
-                            })
-                            
-                            self._execute_strategy(symbol, historical_data, iteration)
+
+                            self._execute_strategy(symbol, indicators, iteration)
                     else:
                         self._emit_log("WARNING", f"No hay datos en tiempo real para {symbol}")
 
@@ -219,161 +320,353 @@ class BotService:
 
     # ==================== STRATEGY ====================
 
-    def _execute_strategy(self, symbol: str, data: List, iteration: int):
+    def _execute_strategy(self, symbol: str, indicators: IndicatorSet, iteration: int):
         try:
-            current_price = float(data[-1]['close'])
-            decision = self._make_trading_decision(symbol, data, iteration)
+            current_price = indicators.last_close
+            decision = self._make_trading_decision(symbol, indicators, iteration)
 
-            if decision == 'BUY':
-                self._place_order(symbol, 'BUY', 0.001, current_price)
-            elif decision == 'SELL':
-                self._place_order(symbol, 'SELL', 0.001, current_price)
+            if decision in ('BUY', 'SELL'):
+                self._execute_signal(symbol, decision, 0.001, current_price)
             else:
-                self._emit_log("INFO", f"HOLD @ {current_price}")
+                self._emit_log("INFO", f"HOLD @ {current_price}", source="strategy")
 
         except Exception as e:
             self._emit_log("ERROR", f"Estrategia error: {e}")
 
-    def _make_trading_decision(self, symbol: str, data: List, iteration: int) -> str:
+    def _execute_strategy_batch(self, timeframe: str, iteration: int):
+        """
+        Evalúa todos los pares de available_pairs a la vez con arrays numpy y
+        luego despacha las órdenes resultantes
+        """
         try:
-            closes = [float(c['close']) for c in data]
+            indicators_cfg = self.strategy_params.get('indicators', {})
+            symbols = [s for s in self.available_pairs if s in self.tick_handler.ticks]
+            window = signal_engine.batch_window(indicators_cfg, self.market_buffer.capacity)
 
-            # Usar parámetros de estrategia de config.yaml
-            fast_period = self.strategy_params.get('indicators', {}).get('sma_fast', 5)
-            slow_period = self.strategy_params.get('indicators', {}).get('sma_slow', 20)
+            symbols, closes, volumes = signal_engine.stack_series(
+                self.market_buffer, symbols, timeframe, window
+            )
+            if not symbols:
+                self._emit_log("WARNING", f"No hay datos suficientes para evaluar {timeframe}")
+                return
+
+            result = signal_engine.evaluate_batch(closes, volumes, indicators_cfg, iteration)
+            decisions = result['decision']
+            prices = result['close']
+
+            for row in decisions.nonzero()[0]:
+                side = signal_engine.DECISION_NAMES[int(decisions[row])]
+                self._execute_signal(symbols[row], side, 0.001, float(prices[row]))
+
+            buys = int((decisions == signal_engine.BUY).sum())
+            sells = int((decisions == signal_engine.SELL).sum())
+            self._emit_log(
+                "INFO",
+                f"Batch {timeframe}: {len(symbols)} pares | {buys} BUY | {sells} SELL | {len(symbols) - buys - sells} HOLD",
+                source="strategy"
+            )
 
-            fast_ma = sum(closes[-fast_period:]) / fast_period
-            slow_ma = sum(closes[-slow_period:]) / slow_period
+        except Exception as e:
+            self._emit_log("ERROR", f"Estrategia batch error: {e}")
 
-            if fast_ma > slow_ma and iteration % 3 == 0:
-                return "BUY"
-            if fast_ma < slow_ma and iteration % 3 == 0:
-                return "SELL"
-            return "HOLD"
+    def _make_trading_decision(self, symbol: str, indicators: IndicatorSet, iteration: int) -> str:
+        try:
+            # Valores incrementales: no se recorre el histórico
+            fast_ma = indicators.sma_fast.value
+            slow_ma = indicators.sma_slow.value
+            if fast_ma is None or slow_ma is None:
+                return "HOLD"
+
+            return signal_engine.sma_cross_decision(fast_ma, slow_ma, iteration % 3 == 0)
 
         except Exception as e:
             self._emit_log("ERROR", f"Error en decisión de trading: {e}")
             return "HOLD"
 
+    # ==================== BALANCE ====================
+
+    def _record_balance_snapshot(self, force: bool = False):
+        """Snapshot de balance cada snapshot_interval segundos (o forzado al detener)"""
+        now = time.monotonic()
+        if not self.current_session or (not force and now - self._last_snapshot < self.snapshot_interval):
+            return
+        self._last_snapshot = now
+
+        balance = self.initial_balance + self.realized_pnl
+        equity = balance + self.mark_to_market.unrealized_pnl(self.current_session.id)
+        timestamp = datetime.now(timezone.utc)
+        if self._day_start[0] != timestamp.date():
+            self._day_start = (timestamp.date(), equity)
+
+        self.balance_service.record_snapshot(
+            self.current_session.id,
+            balance=balance,
+            equity=equity,
+            pnl=equity - self.initial_balance,
+            pnl_daily=equity - self._day_start[1],
+            timestamp=timestamp
+        )
+
+        # Métricas de riesgo en streaming; se escriben cada write_interval, no por snapshot
+        if self.risk_engine:
+            self.risk_engine.observe(equity, timestamp)
+            self.risk_engine.maybe_write(force=force)
+
     # ==================== ORDERS ====================
 
     def _place_order(self, symbol: str, side: str, qty: float, price: float):
+        """Envía la orden (o la simula) y la encola en el write-behind; devuelve (id en BD, real)"""
+        if self.trading_mode == 'real':
+            order = self.exchange.create_order(
+                symbol=symbol,
+                side=side,
+                type='MARKET',
+                quantity=qty
+            )
+            order_id = order['orderId']
+            real = True
+        else:
+            order_id = f"SIM_{int(time.time())}"
+            real = False
+
+        self._emit_log("SUCCESS", f"Orden {side} {qty} {symbol} @ {price}", source="trading")
+
+        # Persistencia write-behind: IDs asignados en el cliente, sin esperar a la BD
+        now = datetime.utcnow()
+        db_order_id = self.trade_writer.next_id('orders')
+        self.trade_writer.submit('orders', {
+            'id': db_order_id,
+            'session_id': self.current_session.id,
+            'symbol': symbol,
+            'order_id': str(order_id),
+            'side': side,
+            'type': 'MARKET',
+            'status': 'filled',
+            'quantity': qty,
+            'price': price,
+            'executed_quantity': qty,
+            'executed_price': price,
+            'created_time': now,
+            'updated_time': now,
+            'real_trade': real
+        })
+
+        self.trades.append({
+            "symbol": symbol, "side": side, "price": price, "qty": qty, "id": order_id
+        })
+        return db_order_id, real
+
+    def _execute_signal(self, symbol: str, side: str, qty: float, price: float):
+        """BUY abre una posición protegida; SELL cierra las posiciones abiertas del símbolo"""
         try:
-            if self.trading_mode == 'real':
-                order = self.exchange.create_order(
-                    symbol=symbol,
-                    side=side,
-                    type='MARKET',
-                    quantity=qty
-                )
-                order_id = order['orderId']
-                real = True
+            if side == 'BUY':
+                self._open_position(symbol, qty, price)
             else:
-                order_id = f"SIM_{int(time.time())}"
-                real = False
-
-            self._emit_log("SUCCESS", f"Orden {side} {qty} {symbol} @ {price}")
+                with self._positions_lock:
+                    position_ids = [pid for pid, p in self.open_positions.items() if p['symbol'] == symbol]
+                for position_id in position_ids:
+                    self._close_position(position_id, price, 'signal')
+        except Exception as e:
+            self._emit_log("ERROR", f"Error placing order: {e}")
 
-            trade = Trade(
-                session_id=self.current_session.id,
-                symbol=symbol,
-                side=side.lower(),
-                entry_price=price,
-                quantity=qty,
-                real_trade=real,
-                status='closed',
-                entry_time=datetime.utcnow(),
-                exit_time=datetime.utcnow(),
-                pnl=0
+    def _open_position(self, symbol: str, qty: float, price: float):
+        with self._positions_lock:
+            if any(p['symbol'] == symbol for p in self.open_positions.values()):
+                return
+            if len(self.open_positions) >= self.max_simultaneous_positions:
+                self._emit_log("INFO", f"Máximo de posiciones alcanzado, BUY {symbol} ignorado", source="trading")
+                return
+
+            db_order_id, real = self._place_order(symbol, 'BUY', qty, price)
+            trade = {
+                'id': self.trade_writer.next_id('trades'),
+                'session_id': self.current_session.id,
+                'symbol': symbol,
+                'entry_order_id': db_order_id,
+                'entry_price': price,
+                'quantity': qty,
+                'real_trade': real,
+                'status': 'open',
+                'entry_time': datetime.utcnow()
+            }
+            self.trade_writer.submit('trades', trade)
+
+            stop_loss = price * (1 - self.stop_loss_percent / 100)
+            take_profit = price * (1 + self.take_profit_percent / 100)
+            if self.exit_rules.partial_enabled:
+                # Los niveles parciales sustituyen al objetivo fijo; el último cierra la posición
+                take_profit = price * (1 + float(self.exit_rules.level_percents[-1]))
+            position = self.mark_to_market.open_position(
+                self.current_session.id, trade['id'], symbol, qty, price, stop_loss, take_profit, real_trade=real
             )
-            db.session.add(trade)
-            db.session.commit()
-
-            self.trades.append({
-                "symbol": symbol, "side": side, "price": price, "qty": qty, "id": order_id
+            self.open_positions[position['id']] = {
+                'symbol': symbol, 'quantity': qty, 'entry_price': price, 'realized_pnl': 0.0, 'trade': trade
+            }
+            self.trigger_index.add(position['id'], symbol, qty, stop_loss,
+                                   None if self.exit_rules.partial_enabled else take_profit)
+            self.exit_engine.add(position['id'], symbol, qty, price, stop_loss)
+            self.dashboard_stream.publish(self.current_session.id, POSITION, position)
+
+    def _close_position(self, position_id: int, price: float, reason: str):
+        """Cierra la posición a mercado: orden de salida, trade cerrado y baja del libro y del índice"""
+        with self._positions_lock:
+            position = self.open_positions.pop(position_id, None)
+            if position is None:
+                return  # Ya cerrada por otra vía (señal o disparo previo)
+            self.trigger_index.remove(position_id)
+            self.exit_engine.remove(position_id)
+
+            symbol, qty, entry_price = position['symbol'], position['quantity'], position['entry_price']
+            exit_order_id, _ = self._place_order(symbol, 'SELL', qty, price)
+            self.realized_pnl += (price - entry_price) * qty
+            # Incluye lo realizado en salidas parciales previas
+            pnl = position['realized_pnl'] + (price - entry_price) * qty
+            initial_quantity = position['trade']['quantity']
+
+            self.trade_writer.submit('trades', {
+                **position['trade'],
+                'exit_order_id': exit_order_id,
+                'exit_price': price,
+                'pnl': round(pnl, 8),
+                'pnl_percent': round(pnl / (entry_price * initial_quantity) * 100, 4) if entry_price else 0,
+                'status': 'closed',
+                'close_reason': reason,
+                'exit_time': datetime.utcnow()
             })
+            self.mark_to_market.close_position(position_id, symbol)
+            self.dashboard_stream.publish(self.current_session.id, POSITION, {'id': position_id, 'removed': True})
+
+        self._emit_log("INFO", f"Posición {symbol} cerrada por {reason} @ {price} | PnL {pnl:.4f}", source="trading")
 
+    def _adopt_positions(self):
+        """
+        Retoma las posiciones que dejaron abiertas las sesiones anteriores de
+        este usuario (detenidas, o cuyo proceso dejó de latir): vuelven al
+        libro del bot, al índice de disparos y al motor de salidas. Lo
+        realizado en sus salidas parciales previas no se conserva (no se
+        persiste).
+        """
+        try:
+            adopted = self.mark_to_market.adopt(self.user_id, self.current_session.id)
         except Exception as e:
-            self._emit_log("ERROR", f"Error placing order: {e}")
+            self._emit_log("ERROR", f"Error retomando posiciones de sesiones anteriores: {e}")
+            return
 
-    # ==================== STOP ====================
+        with self._positions_lock:
+            for position in adopted:
+                position_id, symbol = position['id'], position['symbol']
+                qty, entry_price, stop_loss = position['quantity'], position['entry_price'], position['stop_loss']
+                trade = position['trade']
+                self.open_positions[position_id] = {
+                    'symbol': symbol, 'quantity': qty, 'entry_price': entry_price, 'realized_pnl': 0.0, 'trade': trade
+                }
+                self.trigger_index.add(position_id, symbol, qty, stop_loss,
+                                       None if self.exit_rules.partial_enabled else position['take_profit'])
+                self.exit_engine.add(position_id, symbol, qty, entry_price, stop_loss,
+                                     initial_quantity=trade['quantity'])
+        if adopted:
+            self._emit_log("INFO", f"{len(adopted)} posiciones retomadas de sesiones anteriores", source="trading")
+        real = [position['trade']['id'] for position in adopted if position['trade']['real_trade']]
+        if real:
+            self._emit_log("WARNING", f"Trades reales {real} retomados tras quedar sin vigilancia: "
+                                      f"conciliar con el exchange", source="trading")
+
+    def _close_all_positions(self, reason: str):
+        """Cierra a su última valoración todas las posiciones abiertas por este bot"""
+        prices = {p['id']: p['current_price'] for p in self.mark_to_market.positions(self.current_session.id)}
+        with self._positions_lock:
+            entry_prices = {position_id: p['entry_price'] for position_id, p in self.open_positions.items()}
+        for position_id, entry_price in entry_prices.items():
+            try:
+                self._close_position(position_id, prices.get(position_id, entry_price), reason)
+            except Exception as e:
+                self._emit_log("ERROR", f"Error cerrando posición {position_id} ({reason}): {e}")
+
+    def _reduce_position(self, signal: ExitSignal):
+        """Salida parcial: vende signal.quantity y deja el resto abierto con sus niveles"""
+        if signal.final:
+            self._close_position(signal.position_id, signal.price, 'take_profit')
+            return
 
-    def _handle_kline_message(self, msg):
-        """Maneja los mensajes de kline del WebSocket de Binance"""
+        with self._positions_lock:
+            position = self.open_positions.get(signal.position_id)
+            if position is None:
+                return
+            symbol, entry_price = position['symbol'], position['entry_price']
+            qty = min(signal.quantity, position['quantity'])
+            self._place_order(symbol, 'SELL', qty, signal.price)
+            pnl = (signal.price - entry_price) * qty
+            self.realized_pnl += pnl
+            position['realized_pnl'] += pnl
+            position['quantity'] -= qty
+            self.mark_to_market.update_position(signal.position_id, symbol, quantity=position['quantity'])
+            self.dashboard_stream.publish(self.current_session.id, POSITION,
+                                          {'id': signal.position_id, 'quantity': position['quantity']})
+
+        self._emit_log("INFO", f"{signal.level} {symbol}: vendido {qty} @ {signal.price} | PnL {pnl:.4f}",
+                       source="trading")
+
+    def _on_trailing_stop(self, position_id: int, symbol: str, stop: float):
+        self.mark_to_market.update_position(position_id, symbol, stop_loss=stop)
+        self.dashboard_stream.publish(self.current_session.id, POSITION, {'id': position_id, 'stop_loss': stop})
+
+    def _on_trigger(self, trigger: Trigger):
+        reason = trigger.reason
+        if reason == STOP_LOSS and self.exit_engine.is_trailing(trigger.position_id):
+            reason = TRAILING_STOP
         try:
-            if isinstance(msg, dict):
-                if msg.get('e') == 'error':
-                    self._emit_log("ERROR", f"Error WebSocket: {msg.get('m')}")
-                    return
-                    
-                if msg.get('e') != 'kline':
-                    return
-                    
-                # Extraer datos del kline
-                kline = msg.get('k', {})
-                symbol = msg.get('s')
-                
-                if not symbol or not kline:
-                    self._emit_log("WARNING", "Mensaje de kline inválido")
-                    return
-                
-                # Actualizar datos en tiempo real
-                try:
-                    self.last_kline_data[symbol] = {
-                        'timestamp': kline['t'],
-                        'open': float(kline['o']),
-                        'high': float(kline['h']), 
-                        'low': float(kline['l']),
-                        'close': float(kline['c']),
-                        'volume': float(kline['v'])
-                    }
-                    
-                    # Emitir actualización de precio
-                    price_data = {
-                        'symbol': symbol,
-                        'price': float(kline['c']),
-                        'timestamp': datetime.utcnow().isoformat()
-                    }
-                    logger.info(f"Emitiendo price_update: {price_data}")
-                    
-                    # Emitir a diferentes namespaces para asegurar que llegue
-                    socketio.emit('price_update', price_data)  # Default namespace
-                    socketio.emit('price_update', price_data, namespace='/')  # Root namespace
-                    socketio.emit('price_update', price_data, broadcast=True)  # Broadcast
-                    
-                    # Forzar envío inmediato
-                    try:
-                        socketio.sleep(0)
-                    except:
-                        pass
-                        
-                    logger.info("✅ Evento price_update emitido") # Asegurarnos que se emite al namespace correcto
-                    
-                    self._emit_log("DEBUG", f"Precio actualizado {symbol}: {kline['c']}")
-                    
-                except (KeyError, ValueError) as e:
-                    self._emit_log("ERROR", f"Error procesando datos de kline: {e}")
-            
+            self._close_position(trigger.position_id, trigger.price, reason)
         except Exception as e:
-            self._emit_log("ERROR", f"Error procesando kline: {e}")
-    
-    def stop(self):
-        """Detiene el bot y cierra conexiones"""
+            self._emit_log("ERROR", f"Error cerrando posición {trigger.position_id} ({reason}): {e}")
+
+    def _on_exit_signal(self, signal: ExitSignal):
+        try:
+            self._reduce_position(signal)
+        except Exception as e:
+            self._emit_log("ERROR", f"Error en salida parcial {signal.level} de {signal.position_id}: {e}")
+
+    # ==================== STOP ====================
+
+    def stop(self, close_positions: bool = False):
+        """
+        Detiene el bot y cierra conexiones. Las posiciones abiertas quedan en
+        BD para que el siguiente bot del usuario las adopte; con
+        close_positions=True se venden antes a mercado.
+        """
         self.is_running = False
         
-        if self.websocket_manager:
+        if self.market_stream:
             try:
-                self.websocket_manager.close()
-                self._emit_log("INFO", "WebSocket cerrado")
+                # La conexión es compartida: sólo se quitan las suscripciones de este bot
+                self.market_stream.unsubscribe_all(self.tick_handler)
+                self._emit_log("INFO", "Suscripciones de WebSocket cerradas")
             except:
                 pass
 
+        # Cierres por stop/objetivo ya disparados terminan antes del último snapshot
+        self.order_executor.shutdown(wait=True)
+
         if self.current_session:
+            if close_positions:
+                self._close_all_positions('bot_stopped')
+            else:
+                with self._positions_lock:
+                    left_open = len(self.open_positions)
+                if left_open:
+                    self._emit_log("WARNING", f"{left_open} posiciones quedan abiertas sin vigilancia de stops "
+                                              f"hasta que se vuelva a iniciar el bot", source="trading")
+            self.mark_to_market.detach(self.current_session.id)
+            self._record_balance_snapshot(force=True)
             self.current_session.status = 'stopped'
             self.current_session.ended_at = datetime.utcnow()
             db.session.commit()
+            self._session_changed()
 
         self._emit_log("INFO", "Bot detenido")
+
+        # Resúmenes de repetidos/omitidos que quedaron pendientes
+        for source, level, message in self.log_policy.flush():
+            self._write_log(level, message, source)
         return {"success": True, "message": "Bot detenido"}
 
     # ==================== STATUS ====================
@@ -389,39 +682,30 @@ class BotService:
                 paper_trading=self.is_testnet
             )
             
-            # Inicializar WebSocket Manager de Binance
-            from binance.streams import BinanceSocketManager
-            self.websocket_manager = BinanceSocketManager(self.exchange)
-            
-            # Suscribirse a streams de precios para cada par
-            for symbol in self.available_pairs:
-                try:
-                    # Obtener precio inicial
-                    ticker = self.exchange.get_symbol_ticker(symbol=symbol)
-                    price = float(ticker['price'])
-                    logger.info(f"✅ {symbol}: ${price:.2f}")
-                    
-                    # Emitir precio inicial
+            # Precios iniciales con una sola llamada REST
+            try:
+                tickers = {t['symbol']: float(t['price']) for t in self.exchange.get_symbol_ticker()}
+                for symbol in self.available_pairs:
+                    if symbol not in tickers:
+                        logger.error(f"❌ Error configurando {symbol}: sin ticker")
+                        continue
+                    logger.info(f"✅ {symbol}: ${tickers[symbol]:.2f}")
                     socketio.emit('price_update', {
                         'symbol': symbol,
-                        'price': price,
+                        'price': tickers[symbol],
                         'timestamp': datetime.now().isoformat()
                     })
-                    
-                    # Suscribirse al stream de klines usando v2
-                    stream_name = f"{symbol.lower()}@kline_1m"
-                    self.websocket_manager.start_kline_socket(
-                        callback=self._handle_kline_message,
-                        symbol=symbol.lower(),
-                        interval='1m'
-                    )
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error configurando {symbol}: {e}")
-            
-            # Iniciar WebSocket
-            self.websocket_manager.start()
-            logger.info("✅ WebSocket de Binance iniciado")
+            except Exception as e:
+                logger.error(f"❌ Error obteniendo precios iniciales: {e}")
+
+            # Suscribirse a los klines de 1m en la conexión combinada compartida
+            stream_cfg = self.config_yaml.get('market_data', {}).get('stream', {})
+            self.market_stream = get_market_stream(stream_cfg, testnet=self.is_testnet)
+            self.market_stream.subscribe(
+                [kline_stream(symbol, '1m') for symbol in self.available_pairs],
+                self.tick_handler
+            )
+            logger.info(f"✅ WebSocket de Binance suscrito a {len(self.available_pairs)} pares")
             
             return True
             
@@ -442,41 +726,56 @@ class BotService:
         }
 
         # Agregar datos en tiempo real si están disponibles
-        if self.last_kline_data:
-            status_data["real_time_data"] = self.last_kline_data
+        if self.tick_handler.ticks:
+            status_data["real_time_data"] = {s: t.as_dict() for s, t in self.tick_handler.ticks.items()}
+            status_data["indicators"] = self.indicators.snapshot()
 
         return status_data
 
-    def _handle_kline_message(self, msg):
-        """Maneja los mensajes de kline recibidos via websocket"""
-        try:
-            if msg['e'] == 'kline':
-                symbol = msg['s']
-                kline = msg['k']
-                
-                # Actualizar datos en tiempo real
-                self.last_kline_data[symbol] = {
-                    'symbol': symbol,
-                    'open': float(kline['o']),
-                    'high': float(kline['h']),
-                    'low': float(kline['l']),
-                    'close': float(kline['c']),
-                    'volume': float(kline['v']),
-                    'timestamp': kline['t'],
-                    'is_closed': kline['x']
-                }
-                
-                # Emitir datos via websocket a los clientes
-                socketio.emit('kline_update', {
-                    'data': self.last_kline_data[symbol],
-                    'timestamp': datetime.now().isoformat()
-                })
-                
-                # Log para debugging
-                logger.debug(f"Kline actualizado para {symbol}: {self.last_kline_data[symbol]['close']}")
-                
-        except Exception as e:
-            logger.error(f"Error procesando mensaje de kline: {e}")
+    # ==================== MARKET DATA ====================
+
+    def _on_tick(self, tick: KlineTick):
+        """Actualiza buffers, indicadores y persistencia con el tick ya parseado"""
+        closed_bars = self.market_buffer.on_kline(
+            tick.symbol, tick.open_time, tick.open, tick.high, tick.low,
+            tick.close, tick.volume, tick.is_closed
+        )
+        self.indicators.refresh(self.market_buffer, tick.symbol)
+
+        if tick.is_closed:
+            closed_bars.append((tick.interval, *tick.as_bar()))
+        if self.market_ingestor:
+            for interval, *bar in closed_bars:
+                self.market_ingestor.submit(tick.symbol, interval, *bar)
+
+    def _mark_positions(self, tick: KlineTick):
+        """Revalúa en memoria las posiciones abiertas del símbolo (sin tocar la BD)"""
+        self.mark_to_market.on_price(tick.symbol, tick.close)
+
+    def _check_exits(self, tick: KlineTick):
+        """
+        Salidas por tick: primero el motor de salidas (high-water marks, trailing
+        que sube en el índice, niveles parciales) y después el índice de niveles,
+        O(log n + k) aunque haya miles de stops vivos. Las órdenes resultantes
+        pasan al hilo de órdenes, así que la reacción la acota la latencia del tick.
+        """
+        if not self.is_running:
+            return
+        for signal in self.exit_engine.on_price(tick.symbol, tick.close):
+            self.order_executor.submit(self._on_exit_signal, signal)
+        for trigger in self.trigger_index.on_price(tick.symbol, tick.close):
+            self.order_executor.submit(self._on_trigger, trigger)
+
+    def _publish_tick(self, tick: KlineTick):
+        """Emite el precio al dashboard como máximo una vez por publish_interval y símbolo"""
+        now = time.monotonic()
+        if not tick.is_closed and now - self._last_publish.get(tick.symbol, 0.0) < self.publish_interval:
+            return
+        self._last_publish[tick.symbol] = now
+
+        timestamp = datetime.utcnow().isoformat()
+        socketio.emit('price_update', {'symbol': tick.symbol, 'price': tick.close, 'timestamp': timestamp})
+        socketio.emit('kline_update', {'data': tick.as_dict(), 'timestamp': timestamp})
 
     # ==================== STATIC API ====================
 
@@ -490,12 +789,12 @@ class BotService:
         return bot.start()
 
     @classmethod
-    def stop_bot(cls, user_id: int):
+    def stop_bot(cls, user_id: int, close_positions: bool = False):
         if user_id not in cls._active_bots:
             return {"success": False, "message": "No bot activo"}
 
         bot = cls._active_bots[user_id]
-        res = bot.stop()
+        res = bot.stop(close_positions=close_positions)
         del cls._active_bots[user_id]
         return res
 
@@ -0,0 +1,278 @@
+# app/services/dashboard_cache.py
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '../../config.yaml')
+
+SECTIONS = ('session', 'balance', 'trading', 'positions', 'risk', 'performance')
+
+# Evento emitido por BotService (o por quien persiste el dato) -> secciones que invalida
+EVENT_SECTIONS: Dict[str, Tuple[str, ...]] = {
+    'trade': ('trading', 'positions'),      # Trades/órdenes confirmados en BD
+    'position': ('positions',),             # Altas, bajas, parciales y volcados de mark-to-market (sólo versión)
+    'balance': ('balance', 'performance'),  # Snapshot de balance (+ drawdown en la misma transacción)
+    'risk': ('risk', 'performance'),        # Métricas escritas en risk_metrics
+    'session': SECTIONS,                    # Inicio/parada de la sesión
+}
+
+# Campo de las versiones con el instante en que se crearon: si el backend las
+# pierde (expulsión del LRU, TTL de Redis) las etiquetas viejas dejan de coincidir
+EPOCH = '_epoch'
+
+# {sección: (etiqueta "epoch:versión" con la que se calculó, datos)}
+CachedSections = Dict[str, Tuple[str, Any]]
+
+
+class MemoryCacheBackend:
+    """
+    LRU en proceso. Cada sesión guarda sus versiones por sección junto con las
+    vistas calculadas y se expulsan juntas.
+    """
+
+    def __init__(self, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[int, Dict]" = OrderedDict()
+        self._aliases: Dict[Tuple[int, str], int] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, session_id: int) -> Dict:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = self._sessions[session_id] = {'versions': {EPOCH: time.time_ns()}, 'views': {}}
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return entry
+
+    def versions(self, session_id: int) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._entry(session_id)['versions'])
+
+    def bump(self, session_id: int, sections: Iterable[str]):
+        with self._lock:
+            versions = self._entry(session_id)['versions']
+            for section in sections:
+                versions[section] = versions.get(section, 0) + 1
+
+    def get_sections(self, view: str, session_id: int) -> CachedSections:
+        with self._lock:
+            return dict(self._entry(session_id)['views'].get(view, {}))
+
+    def put_sections(self, view: str, session_id: int, sections: CachedSections):
+        with self._lock:
+            self._entry(session_id)['views'].setdefault(view, {}).update(sections)
+
+    def get_alias(self, user_id: int, key: str) -> Optional[int]:
+        with self._lock:
+            return self._aliases.get((user_id, key))
+
+    def set_alias(self, user_id: int, key: str, session_id: int):
+        with self._lock:
+            if len(self._aliases) >= self.max_sessions:
+                self._aliases.clear()
+            self._aliases[(user_id, key)] = session_id
+
+    def drop_aliases(self, user_id: int):
+        with self._lock:
+            for alias in [a for a in self._aliases if a[0] == user_id]:
+                del self._aliases[alias]
+
+
+class RedisCacheBackend:
+    """
+    Mismo contrato sobre Redis para compartir el caché entre workers. Las
+    versiones se renuevan (EXPIRE) en cada lectura y, si caducan, se recrean
+    con otro epoch.
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 6379, password: str = '', db: int = 0,
+                 ttl: int = 3600, prefix: str = 'dashboard'):
+        import redis
+        self.client = redis.Redis(host=host, port=port, password=password or None, db=db)
+        self.client.ping()
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, *parts) -> str:
+        return ':'.join([self.prefix, *map(str, parts)])
+
+    def versions(self, session_id: int) -> Dict[str, int]:
+        key = self._key(session_id, 'versions')
+        pipe = self.client.pipeline()
+        pipe.hsetnx(key, EPOCH, time.time_ns())
+        pipe.hgetall(key)
+        pipe.expire(key, self.ttl)
+        raw = pipe.execute()[1]
+        return {k.decode(): int(v) for k, v in raw.items()}
+
+    def bump(self, session_id: int, sections: Iterable[str]):
+        key = self._key(session_id, 'versions')
+        pipe = self.client.pipeline()
+        pipe.hsetnx(key, EPOCH, time.time_ns())
+        for section in sections:
+            pipe.hincrby(key, section, 1)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def get_sections(self, view: str, session_id: int) -> CachedSections:
+        raw = self.client.hgetall(self._key(session_id, 'view', view))
+        sections = {}
+        for section, payload in raw.items():
+            version, data = json.loads(payload)
+            sections[section.decode()] = (version, data)
+        return sections
+
+    def put_sections(self, view: str, session_id: int, sections: CachedSections):
+        if not sections:
+            return
+        key = self._key(session_id, 'view', view)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={
+            section: json.dumps([version, data], default=str) for section, (version, data) in sections.items()
+        })
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def get_alias(self, user_id: int, key: str) -> Optional[int]:
+        value = self.client.hget(self._key('user', user_id), key)
+        return int(value) if value is not None else None
+
+    def set_alias(self, user_id: int, key: str, session_id: int):
+        pipe = self.client.pipeline()
+        pipe.hset(self._key('user', user_id), key, session_id)
+        pipe.expire(self._key('user', user_id), self.ttl)
+        pipe.execute()
+
+    def drop_aliases(self, user_id: int):
+        self.client.delete(self._key('user', user_id))
+
+
+class DashboardCache:
+    """
+    Snapshot del dashboard por sesión, versionado por sección.
+
+    Los eventos (invalidate) sólo incrementan la versión de las secciones
+    afectadas; get() devuelve las secciones cuya versión sigue vigente y pide
+    al llamador que recalcule únicamente las demás. Un sondeo sin cambios no
+    toca la BD, de modo que N pestañas abiertas cuestan lo mismo que una.
+
+    Las secciones se etiquetan con la versión leída ANTES de calcularlas: si
+    llega un evento mientras tanto, la próxima lectura las recalcula.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._locks: Dict[Tuple[str, int], threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, session_id: Optional[int], *events: str):
+        if session_id is None:
+            return
+        sections = {section for event in events for section in EVENT_SECTIONS[event]}
+        try:
+            self.backend.bump(session_id, sections)
+        except Exception as e:
+            logger.error(f"❌ Error invalidando el caché del dashboard de la sesión {session_id}: {e}")
+
+    def invalidate_user(self, user_id: int):
+        """La sesión actual del usuario cambió (inicio/parada de bot)"""
+        try:
+            self.backend.drop_aliases(user_id)
+        except Exception as e:
+            logger.error(f"❌ Error invalidando sesiones del usuario {user_id}: {e}")
+
+    def session_id(self, user_id: int, key: str, resolve: Callable[[], Optional[int]]) -> Optional[int]:
+        """Sesión que corresponde a (usuario, key), resuelta en BD sólo la primera vez"""
+        session_id = self.backend.get_alias(user_id, key)
+        if session_id is None:
+            session_id = resolve()
+            if session_id is not None:
+                self.backend.set_alias(user_id, key, session_id)
+        return session_id
+
+    def get(self, view: str, session_id: int, compute: Callable[[Set[str]], Dict[str, Any]],
+            sections: Iterable[str] = SECTIONS, volatile: Iterable[str] = ()) -> Tuple[str, Dict[str, Any]]:
+        """
+        Devuelve (versión, {sección: datos}). compute(stale) recibe las
+        secciones a recalcular y devuelve sus datos. La versión es un token
+        opaco que cambia siempre que cambia alguna de las secciones.
+
+        Las secciones `volatile` se calculan en memoria en cada llamada y no
+        se guardan (p.ej. posiciones al último precio, que cambian con cada
+        delta de marks); sus eventos sí cambian la versión.
+        """
+        sections = tuple(sections)
+        volatile = set(volatile).intersection(sections)
+        with self._lock_for(view, session_id):
+            versions = self.backend.versions(session_id)
+            epoch = versions.get(EPOCH, 0)
+            tags = {s: f"{epoch}:{versions.get(s, 0)}" for s in sections}
+            cached = self.backend.get_sections(view, session_id)
+            stale = {s for s in sections
+                     if s not in volatile and (s not in cached or cached[s][0] != tags[s])}
+
+            if stale:
+                self.misses += 1
+                fresh = compute(stale | volatile)
+                updates = {s: (tags[s], fresh[s]) for s in stale if s in fresh}
+                self.backend.put_sections(view, session_id, updates)
+                cached.update(updates)
+            else:
+                self.hits += 1
+                fresh = compute(volatile) if volatile else {}
+
+        version = f"{session_id}.{epoch}.{sum(versions.get(s, 0) for s in sections)}"
+        data = {s: cached[s][1] for s in sections if s in cached and s not in volatile}
+        data.update({s: fresh[s] for s in volatile if s in fresh})
+        return version, {s: data[s] for s in sections if s in data}
+
+    def _lock_for(self, view: str, session_id: int) -> threading.Lock:
+        # Un solo cálculo por (vista, sesión): los demás sondeos esperan y leen el resultado
+        with self._locks_lock:
+            lock = self._locks.get((view, session_id))
+            if lock is None:
+                if len(self._locks) > 10_000:
+                    self._locks.clear()
+                lock = self._locks[(view, session_id)] = threading.Lock()
+            return lock
+
+
+_cache: Optional[DashboardCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_dashboard_cache(config_yaml: Optional[Dict] = None) -> DashboardCache:
+    """
+    Caché compartido por los endpoints y los bots del proceso. Usa
+    dashboard.cache de config.yaml (y el bloque redis si backend = "redis").
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if config_yaml is None:
+                with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+                    config_yaml = yaml.safe_load(f)
+            config = config_yaml.get('dashboard', {}).get('cache', {})
+            backend = None
+            if config.get('backend', 'memory') == 'redis':
+                try:
+                    backend = RedisCacheBackend(ttl=config.get('ttl', 3600), **config_yaml.get('redis', {}))
+                    logger.info("🗃️ Caché del dashboard en Redis")
+                except Exception as e:
+                    logger.warning(f"⚠️ Redis no disponible para el caché del dashboard, se usa memoria: {e}")
+            if backend is None:
+                backend = MemoryCacheBackend(max_sessions=config.get('max_sessions', 1000))
+            _cache = DashboardCache(backend)
+        return _cache
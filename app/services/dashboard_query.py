@@ -0,0 +1,177 @@
+# app/services/dashboard_query.py
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import DateTime
+
+from app.models.base import engine
+from app.models.bot_sessions import BotSession
+from app.models.trades import Trade
+from app.models.risk_metrics import RiskMetric
+
+logger = logging.getLogger(__name__)
+
+RECENT_TRADES = 10
+RISK_HISTORY = 10
+
+# Sesión del dashboard: la pedida, o la que está corriendo, o la más reciente
+SESSION_SQL = """
+    SELECT id FROM bot_sessions
+    WHERE user_id = %(user_id)s AND (%(session_id)s::int IS NULL OR id = %(session_id)s::int)
+    ORDER BY (status = 'running') DESC, created_at DESC
+    LIMIT 1
+"""
+
+# Secciones persistidas del dashboard en un único viaje a la BD. Cada CTE lee
+# por índice acotado a la sesión (trades por session/status/exit_time,
+# rollups por session/resolution/bucket, una fila de session_performance),
+# así que el coste no crece con el histórico de la sesión salvo el conteo de
+# trades cerrados, que se resuelve con FILTER en una sola pasada del índice.
+# Postgres no evalúa los CTE que la lista final no referencia, así que pedir
+# sólo algunas secciones sólo ejecuta sus lecturas.
+_CTES = f"""
+    WITH trade_stats AS (
+        SELECT count(*) AS total_trades,
+               count(*) FILTER (WHERE t.pnl > 0) AS winning_trades,
+               count(*) FILTER (WHERE t.real_trade) AS real_trades,
+               coalesce(sum(t.pnl), 0) AS total_pnl
+        FROM trades t
+        WHERE t.session_id = %(session_id)s AND t.status = 'closed'
+    ),
+    recent_trades AS (
+        SELECT t.* FROM trades t
+        WHERE t.session_id = %(session_id)s AND t.status = 'closed'
+        ORDER BY t.exit_time DESC
+        LIMIT {RECENT_TRADES}
+    ),
+    latest_balance AS (
+        SELECT last_timestamp, balance_close, equity_close, pnl_close, pnl_daily_close
+        FROM balance_rollups
+        WHERE session_id = %(session_id)s AND resolution = '1d'
+        ORDER BY bucket_start DESC
+        LIMIT 1
+    ),
+    balance_points AS (
+        SELECT bucket_start, balance_close, balance_high, balance_low,
+               equity_close, equity_high, equity_low, pnl_close, pnl_daily_close, samples
+        FROM balance_rollups
+        WHERE session_id = %(session_id)s AND resolution = %(resolution)s
+          AND bucket_start >= %(since)s AND bucket_start < %(until)s
+    ),
+    latest_risk AS (
+        SELECT DISTINCT ON (time_period, metric_name) time_period, metric_name, metric_value, timestamp
+        FROM risk_metrics
+        WHERE session_id = %(session_id)s
+        ORDER BY time_period, metric_name, timestamp DESC
+    ),
+    risk_history AS (
+        SELECT * FROM risk_metrics
+        WHERE session_id = %(session_id)s
+        ORDER BY timestamp DESC
+        LIMIT {RISK_HISTORY}
+    )
+"""
+
+# Columna del SELECT final -> expresión JSONB
+_COLUMNS = {
+    'session': "(SELECT to_jsonb(s) FROM bot_sessions s WHERE s.id = %(session_id)s)",
+    'trade_stats': "(SELECT to_jsonb(trade_stats) FROM trade_stats)",
+    'recent_trades': "(SELECT coalesce(jsonb_agg(to_jsonb(t) ORDER BY t.exit_time DESC), '[]') FROM recent_trades t)",
+    'latest_balance': """(SELECT jsonb_build_array(last_timestamp, balance_close, equity_close, pnl_close,
+                                                  pnl_daily_close) FROM latest_balance)""",
+    'balance_points': """(SELECT coalesce(jsonb_agg(jsonb_build_array(
+                              bucket_start, balance_close, balance_high, balance_low, equity_close,
+                              equity_high, equity_low, pnl_close, pnl_daily_close, samples
+                          ) ORDER BY bucket_start), '[]') FROM balance_points)""",
+    'latest_risk': """(SELECT coalesce(jsonb_agg(jsonb_build_array(time_period, metric_name, metric_value,
+                                                                   timestamp)), '[]') FROM latest_risk)""",
+    'risk_history': "(SELECT coalesce(jsonb_agg(to_jsonb(r) ORDER BY r.timestamp DESC), '[]') FROM risk_history r)",
+    'performance': "(SELECT to_jsonb(p) FROM session_performance p WHERE p.session_id = %(session_id)s)",
+}
+
+# Sección del dashboard -> columnas que necesita
+SECTION_COLUMNS = {
+    'session': ('session',),
+    'balance': ('latest_balance', 'balance_points'),
+    'trading': ('trade_stats', 'recent_trades'),
+    'risk': ('latest_risk', 'risk_history'),
+    'performance': ('performance', 'latest_risk'),
+}
+
+
+def _ts(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _hydrate(model, row: Dict):
+    """Instancia transitoria del modelo a partir de su fila JSON (sin sesión ORM ni consultas)"""
+    values = {}
+    for column in model.__table__.columns:
+        if column.name not in row:
+            continue
+        value = row[column.name]
+        values[column.key] = _ts(value) if isinstance(column.type, DateTime) else value
+    return model(**values)
+
+
+def _timestamps(rows: Iterable[list], index: int) -> list:
+    """Convierte a datetime la columna `index` de cada fila JSON"""
+    return [[*row[:index], _ts(row[index]), *row[index + 1:]] for row in rows]
+
+
+def resolve_session(user_id: int, session_id: Optional[int] = None) -> Optional[int]:
+    """ID de la sesión del dashboard del usuario (None si no tiene o no es suya)"""
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(SESSION_SQL, {'user_id': user_id, 'session_id': session_id})
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def fetch_dashboard(session_id: int, sections: Iterable[str], resolution: str,
+                    since: datetime, until: datetime) -> Dict:
+    """
+    Lee con una sola sentencia las columnas que necesitan `sections` (ver
+    SECTION_COLUMNS). Las filas vuelven ya tipadas: session/recent_trades/
+    risk_history como modelos transitorios (mismo to_dict() de siempre) y el
+    resto en el formato que esperan format_points, format_latest,
+    group_metrics y format_performance.
+    """
+    columns = list(dict.fromkeys(c for section in sections for c in SECTION_COLUMNS.get(section, ())))
+    if not columns:
+        return {}
+
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(_CTES + "SELECT " + ",\n".join(_COLUMNS[c] for c in columns), {
+            'session_id': session_id, 'resolution': resolution, 'since': since, 'until': until
+        })
+        raw = dict(zip(columns, cursor.fetchone()))
+    finally:
+        conn.close()
+
+    rows = {}
+    if 'session' in raw:
+        rows['session'] = _hydrate(BotSession, raw['session']) if raw['session'] else None
+    if 'trade_stats' in raw:
+        rows['trade_stats'] = raw['trade_stats']
+        rows['recent_trades'] = [_hydrate(Trade, row) for row in raw['recent_trades']]
+    if 'latest_balance' in raw:
+        rows['latest_balance'] = _timestamps([raw['latest_balance']], 0)[0] if raw['latest_balance'] else None
+        rows['balance_points'] = _timestamps(raw['balance_points'], 0)
+    if 'latest_risk' in raw:
+        rows['latest_risk'] = _timestamps(raw['latest_risk'], 3)
+    if 'risk_history' in raw:
+        rows['risk_history'] = [_hydrate(RiskMetric, row) for row in raw['risk_history']]
+    if 'performance' in raw:
+        performance = raw['performance']
+        if performance:
+            for column in ('last_timestamp', 'peak_time', 'max_drawdown_time'):
+                performance[column] = _ts(performance[column])
+        rows['performance'] = performance
+    return rows
@@ -0,0 +1,114 @@
+# app/services/dashboard_stream.py
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tipos de delta del dashboard. Todos son idempotentes para el cliente
+# (altas por ID, reemplazos por clave), así que aplicar uno que ya refleja
+# el snapshot no altera el resultado.
+TRADE = 'trade'          # Trade cerrado y confirmado en BD (alta por ID en recientes + contadores)
+POSITION = 'position'    # Alta/cambio de posición, o {id, removed: True} al cerrarse
+MARKS = 'marks'          # Valoración de posiciones al último precio (merge por ID)
+BALANCE = 'balance'      # Snapshot de balance: reemplaza el bucket actual de la serie
+METRICS = 'metrics'      # Métricas de riesgo por periodo (reemplazo por periodo/nombre)
+SESSION = 'session'      # Estado de la sesión
+
+
+def _float(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def format_trade(row: Dict) -> Dict:
+    """Fila de trades (columnas de TradeWriter) -> trade reciente del dashboard"""
+    pnl = _float(row.get('pnl')) or 0.0
+    return {
+        'id': row['id'],
+        'symbol': row['symbol'],
+        'entry_price': _float(row.get('entry_price')),
+        'exit_price': _float(row.get('exit_price')),
+        'pnl': pnl,
+        'status': 'WIN' if pnl > 0 else 'LOSS',
+        'real_trade': bool(row.get('real_trade')),
+        'exit_time': _iso(row.get('exit_time')),
+        'close_reason': row.get('close_reason')
+    }
+
+
+class DashboardStream:
+    """
+    Deltas del dashboard numerados por sesión para el push por Socket.IO.
+
+    Cada delta lleva (epoch, seq): seq crece de uno en uno por sesión y epoch
+    identifica al proceso que los numera. El cliente parte de un snapshot
+    (snapshot() fija el seq ANTES de construirlo, así que lo que llegue
+    durante la construcción se reaplica sin efecto) y pide un resync si ve un
+    salto de seq o un epoch distinto. El transporte lo registra
+    ConnectionManager con attach(); sin transporte publish() no hace nada.
+    """
+
+    def __init__(self):
+        self.epoch = time.time_ns()
+        self._seq: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._transport: Optional[Callable[[int, str, Dict], None]] = None
+        self.published = 0
+
+    def attach(self, transport: Callable[[int, str, Dict], None]):
+        """transport(session_id, tipo, envelope) entrega el delta a la sala de la sesión"""
+        self._transport = transport
+
+    @property
+    def enabled(self) -> bool:
+        """Hay transporte: merece la pena construir deltas de alta frecuencia (marks)"""
+        return self._transport is not None
+
+    def seq(self, session_id: int) -> int:
+        with self._lock:
+            return self._seq.get(session_id, 0)
+
+    def publish(self, session_id: Optional[int], kind: str, data: Any):
+        transport = self._transport
+        if transport is None or session_id is None:
+            return
+        # Numerar y emitir bajo el mismo lock: los deltas salen en orden de seq
+        with self._lock:
+            seq = self._seq[session_id] = self._seq.get(session_id, 0) + 1
+            envelope = {
+                'session_id': session_id,
+                'epoch': self.epoch,
+                'seq': seq,
+                'type': kind,
+                'data': data,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            }
+            try:
+                transport(session_id, kind, envelope)
+                self.published += 1
+            except Exception as e:
+                logger.error(f"❌ Error enviando delta {kind} de la sesión {session_id}: {e}")
+
+    def snapshot(self, session_id: int, build: Callable[[], Dict]) -> Dict:
+        """Snapshot completo con el seq a partir del cual aplicar deltas"""
+        seq = self.seq(session_id)
+        return {'session_id': session_id, 'epoch': self.epoch, 'seq': seq, 'data': build()}
+
+
+_stream: Optional[DashboardStream] = None
+_stream_lock = threading.Lock()
+
+
+def get_dashboard_stream() -> DashboardStream:
+    """Stream compartido por los bots y el gestor de conexiones del proceso"""
+    global _stream
+    with _stream_lock:
+        if _stream is None:
+            _stream = DashboardStream()
+        return _stream
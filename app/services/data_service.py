@@ -1,18 +1,29 @@
 # app/services/data_service.py
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, List, Optional
 from sqlalchemy import func, and_
 
 from app.core.database import db
 from app.models.bot_sessions import BotSession
 from app.models.trades import Trade
-from app.models.positions import Position
-from app.models.balance_history import BalanceHistory
-from app.models.risk_metrics import RiskMetric
+from app.services.balance_service import get_balance_service, bucket_start, format_points, format_latest
+from app.services.performance_service import format_performance
+from app.services.risk_engine import group_metrics
+from app.services.mark_to_market import get_mark_to_market
+from app.services.dashboard_query import fetch_dashboard, resolve_session
+from app.services.dashboard_cache import get_dashboard_cache
+from app.core.pagination import InvalidCursor, keyset, keyset_page
 
 logger = logging.getLogger(__name__)
 
+# Clave de paginación del historial (índice idx_trades_status_exit_time_id)
+TRADE_HISTORY_KEY = (Trade.exit_time, Trade.id)
+# Columnas de la exportación NDJSON/CSV del historial
+TRADE_EXPORT_COLUMNS = ('id', 'session_id', 'symbol', 'entry_price', 'exit_price', 'quantity', 'pnl',
+                        'pnl_percent', 'status', 'close_reason', 'entry_time', 'exit_time', 'real_trade')
+
+
 class DataService:
     """Servicio para proporcionar datos al dashboard"""
     
@@ -22,56 +33,111 @@ class DataService:
         Obtiene todos los datos necesarios para el dashboard
         """
         try:
-            # Obtener sesión activa o la más reciente
-            session = DataService._get_user_session(user_id, session_id)
-            if not session:
+            session_id = DataService.resolve_dashboard_session(user_id, session_id)
+            if not session_id:
                 return DataService._get_empty_dashboard()
-            
-            # Obtener datos en paralelo (en una app real podrían ser llamadas async)
-            balance_data = DataService._get_balance_data(session.id)
-            trading_data = DataService._get_trading_data(session.id)
-            positions_data = DataService._get_positions_data(session.id)
-            risk_data = DataService._get_risk_data(session.id)
-            performance_data = DataService._get_performance_data(session.id)
-            
-            return {
-                'success': True,
-                'session': session.to_dict(),
-                'balance': balance_data,
-                'trading': trading_data,
-                'positions': positions_data,
-                'risk': risk_data,
-                'performance': performance_data,
-                'timestamp': datetime.utcnow().isoformat()
-            }
+            return DataService.get_session_dashboard(session_id)
             
         except Exception as e:
             logger.error(f"❌ Error obteniendo datos del dashboard: {e}")
             return DataService._get_empty_dashboard()
     
+    @staticmethod
+    def resolve_dashboard_session(user_id: int, session_id: Optional[int] = None) -> Optional[int]:
+        """Sesión del dashboard del usuario (resuelta en BD sólo tras un inicio/parada de bot)"""
+        return get_dashboard_cache().session_id(user_id, str(session_id or 'current'),
+                                                lambda: resolve_session(user_id, session_id))
+    
+    @staticmethod
+    def get_session_dashboard(session_id: int) -> Dict[str, Any]:
+        """
+        Dashboard completo de una sesión ya resuelta; también es el snapshot
+        inicial del push por Socket.IO
+        """
+        # Snapshot por sesión invalidado por eventos: un sondeo sin cambios no toca la BD.
+        # Las posiciones se leen de memoria en cada llamada: un snapshot nunca queda por
+        # detrás de los deltas de marks que el cliente descarta por seq
+        version, sections = get_dashboard_cache().get(
+            'api', session_id, lambda stale: DataService._build_sections(session_id, stale),
+            volatile=('positions',)
+        )
+        if sections.get('session') is None:
+            return DataService._get_empty_dashboard()
+
+        return {
+            'success': True,
+            **sections,
+            'version': version,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    
+    @staticmethod
+    def _build_sections(session_id: int, sections) -> Dict[str, Any]:
+        """Recalcula sólo las secciones indicadas; las persistidas en un solo viaje a la BD"""
+        # Serie de las últimas 24 horas: la resolución sólo depende del rango
+        until = datetime.now(timezone.utc)
+        since = until - timedelta(hours=24)
+        resolution = get_balance_service().choose_resolution(since, until)
+        rows = fetch_dashboard(session_id, sections, resolution, bucket_start(since, resolution), until)
+
+        builders = {
+            'session': lambda: rows['session'].to_dict() if rows['session'] else None,
+            'balance': lambda: DataService._get_balance_data(rows, resolution),
+            'trading': lambda: DataService._get_trading_data(rows),
+            'positions': lambda: DataService._get_positions_data(session_id),
+            'risk': lambda: DataService._get_risk_data(rows),
+            'performance': lambda: DataService._get_performance_data(rows),
+        }
+        return {section: builders[section]() for section in sections}
+    
     @staticmethod
     def get_trading_history(user_id: int, days: int = 7, limit: int = 100) -> List[Dict[str, Any]]:
         """
-        Obtiene el historial de trading
+        Obtiene el historial de trading (primera página)
+        """
+        return DataService.get_trading_history_page(user_id, days, limit)['history']
+    
+    @staticmethod
+    def _trading_history_query(user_id: int, days: int):
+        """Trades cerrados del usuario en los últimos `days` días"""
+        since_date = datetime.utcnow() - timedelta(days=days)
+        return Trade.query.join(BotSession)\
+            .filter(
+                BotSession.user_id == user_id,
+                Trade.status == 'closed',
+                Trade.exit_time >= since_date
+            )
+    
+    @staticmethod
+    def get_trading_history_page(user_id: int, days: int = 7, limit: int = 100,
+                                 cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Página del historial de trading paginada por (exit_time, id): next_cursor
+        continúa donde acabó esta página (None si no hay más). Un cursor mal
+        formado lanza InvalidCursor.
         """
         try:
-            since_date = datetime.utcnow() - timedelta(days=days)
-            
-            trades = Trade.query.join(BotSession)\
-                .filter(
-                    BotSession.user_id == user_id,
-                    Trade.status == 'closed',
-                    Trade.exit_time >= since_date
-                )\
-                .order_by(Trade.exit_time.desc())\
-                .limit(limit)\
-                .all()
-            
-            return [trade.to_dict() for trade in trades]
+            trades, next_cursor = keyset_page(
+                DataService._trading_history_query(user_id, days), TRADE_HISTORY_KEY, cursor, limit
+            )
+            return {'history': [trade.to_dict() for trade in trades], 'next_cursor': next_cursor}
             
+        except InvalidCursor:
+            raise
         except Exception as e:
             logger.error(f"❌ Error obteniendo historial de trading: {e}")
-            return []
+            return {'history': [], 'next_cursor': None}
+    
+    @staticmethod
+    def trading_history_export(user_id: int, days: int = 7, cursor: Optional[str] = None):
+        """
+        Consulta de exportación del historial: columnas de TRADE_EXPORT_COLUMNS
+        en el mismo orden que las páginas (desde `cursor` si se indica), para
+        recorrerla con un cursor de servidor
+        """
+        query = DataService._trading_history_query(user_id, days)\
+            .with_entities(*(getattr(Trade, column) for column in TRADE_EXPORT_COLUMNS))
+        return keyset(query, TRADE_HISTORY_KEY, cursor)
     
     @staticmethod
     def get_performance_metrics(user_id: int, days: int = 30) -> Dict[str, Any]:
@@ -126,56 +192,20 @@ class DataService:
             return {}
     
     @staticmethod
-    def _get_user_session(user_id: int, session_id: Optional[int] = None) -> Optional[BotSession]:
-        """
-        Obtiene la sesión del usuario
-        """
-        try:
-            if session_id:
-                # Sesión específica
-                return BotSession.query.filter_by(id=session_id, user_id=user_id).first()
-            else:
-                # Sesión activa o la más reciente
-                session = BotSession.query.filter_by(user_id=user_id, status='running').first()
-                if not session:
-                    session = BotSession.query.filter_by(user_id=user_id)\
-                        .order_by(BotSession.created_at.desc())\
-                        .first()
-                return session
-        except Exception as e:
-            logger.error(f"❌ Error obteniendo sesión: {e}")
-            return None
-    
-    @staticmethod
-    def _get_balance_data(session_id: int) -> Dict[str, Any]:
+    def _get_balance_data(rows: Dict[str, Any], resolution: str) -> Dict[str, Any]:
         """
         Obtiene datos de balance
         """
         try:
-            # Balance actual
-            current_balance = BalanceHistory.query.filter_by(session_id=session_id)\
-                .order_by(BalanceHistory.timestamp.desc())\
-                .first()
-            
-            # Historial de balance (últimas 24 horas)
-            since_time = datetime.utcnow() - timedelta(hours=24)
-            balance_history = BalanceHistory.query.filter(
-                BalanceHistory.session_id == session_id,
-                BalanceHistory.timestamp >= since_time
-            ).order_by(BalanceHistory.timestamp.asc()).all()
-            
+            # Último snapshot y serie agregada de las últimas 24 horas (rollups, no filas sueltas)
+            current_balance = format_latest(rows['latest_balance'])
+
             balance_data = {
-                'current_balance': float(current_balance.balance) if current_balance else 0,
-                'total_pnl': float(current_balance.pnl) if current_balance else 0,
-                'daily_pnl': float(current_balance.pnl_daily) if current_balance else 0,
-                'history': [
-                    {
-                        'time': bh.timestamp.strftime('%H:%M'),
-                        'balance': float(bh.balance),
-                        'pnl': float(bh.pnl)
-                    }
-                    for bh in balance_history
-                ]
+                'current_balance': current_balance['balance'] if current_balance else 0,
+                'total_pnl': current_balance['pnl'] if current_balance else 0,
+                'daily_pnl': current_balance['pnl_daily'] if current_balance else 0,
+                'resolution': resolution,
+                'history': format_points(rows['balance_points'], resolution)
             }
             
             return balance_data
@@ -185,36 +215,22 @@ class DataService:
             return {'current_balance': 0, 'total_pnl': 0, 'daily_pnl': 0, 'history': []}
     
     @staticmethod
-    def _get_trading_data(session_id: int) -> Dict[str, Any]:
+    def _get_trading_data(rows: Dict[str, Any]) -> Dict[str, Any]:
         """
         Obtiene datos de trading
         """
         try:
-            # Estadísticas de trades
-            trades_stats = db.session.query(
-                func.count(Trade.id).label('total_trades'),
-                func.count(Trade.id).filter(Trade.pnl > 0).label('winning_trades'),
-                func.count(Trade.id).filter(Trade.real_trade == True).label('real_trades'),
-                func.sum(Trade.pnl).label('total_pnl')
-            ).filter(
-                Trade.session_id == session_id,
-                Trade.status == 'closed'
-            ).first()
+            # Estadísticas de trades (agregados con FILTER en la consulta del dashboard)
+            trades_stats = rows['trade_stats']
             
-            total_trades = trades_stats.total_trades or 0
-            winning_trades = trades_stats.winning_trades or 0
-            real_trades = trades_stats.real_trades or 0
+            total_trades = trades_stats['total_trades'] or 0
+            winning_trades = trades_stats['winning_trades'] or 0
+            real_trades = trades_stats['real_trades'] or 0
             simulated_trades = total_trades - real_trades
-            total_pnl = float(trades_stats.total_pnl or 0)
+            total_pnl = float(trades_stats['total_pnl'] or 0)
             
             win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
             
-            # Trades recientes
-            recent_trades = Trade.query.filter_by(session_id=session_id, status='closed')\
-                .order_by(Trade.exit_time.desc())\
-                .limit(10)\
-                .all()
-            
             return {
                 'total_trades': total_trades,
                 'winning_trades': winning_trades,
@@ -223,7 +239,7 @@ class DataService:
                 'simulated_trades': simulated_trades,
                 'win_rate': round(win_rate, 1),
                 'total_pnl': round(total_pnl, 2),
-                'recent_trades': [trade.to_dict() for trade in recent_trades]
+                'recent_trades': [trade.to_dict() for trade in rows['recent_trades']]
             }
             
         except Exception as e:
@@ -245,11 +261,12 @@ class DataService:
         Obtiene datos de posiciones activas
         """
         try:
-            positions = Position.query.filter_by(session_id=session_id).all()
+            # Valoración en memoria: siempre al último precio recibido
+            positions = get_mark_to_market().positions(session_id)
             
             return {
                 'active_positions': len(positions),
-                'positions': [position.to_dict() for position in positions]
+                'positions': positions
             }
             
         except Exception as e:
@@ -257,62 +274,48 @@ class DataService:
             return {'active_positions': 0, 'positions': []}
     
     @staticmethod
-    def _get_risk_data(session_id: int) -> Dict[str, Any]:
+    def _get_risk_data(rows: Dict[str, Any]) -> Dict[str, Any]:
         """
         Obtiene datos de riesgo
         """
         try:
-            # Métricas de riesgo recientes
-            risk_metrics = RiskMetric.query.filter_by(session_id=session_id)\
-                .order_by(RiskMetric.timestamp.desc())\
-                .limit(10)\
-                .all()
-            
-            current_metrics = {}
-            for metric in risk_metrics:
-                if metric.metric_name not in current_metrics:
-                    current_metrics[metric.metric_name] = {
-                        'value': float(metric.metric_value),
-                        'timestamp': metric.timestamp.isoformat()
-                    }
+            # Último valor de cada métrica por horizonte (escritas por RiskMetricsEngine)
+            by_period = group_metrics(rows['latest_risk'])
             
             return {
-                'metrics': current_metrics,
-                'history': [metric.to_dict() for metric in risk_metrics]
+                'metrics': by_period.get('session', {}),
+                'by_period': by_period,
+                'history': [metric.to_dict() for metric in rows['risk_history']]
             }
             
         except Exception as e:
             logger.error(f"❌ Error obteniendo datos de riesgo: {e}")
-            return {'metrics': {}, 'history': []}
+            return {'metrics': {}, 'by_period': {}, 'history': []}
     
     @staticmethod
-    def _get_performance_data(session_id: int) -> Dict[str, Any]:
+    def _get_performance_data(rows: Dict[str, Any]) -> Dict[str, Any]:
         """
         Obtiene datos de performance avanzados
         """
         try:
-            # Calcular drawdown máximo
-            balance_history = BalanceHistory.query.filter_by(session_id=session_id)\
-                .order_by(BalanceHistory.timestamp.asc())\
-                .all()
-            
-            max_drawdown = 0
-            peak = 0
-            
-            for bh in balance_history:
-                balance = float(bh.balance)
-                if balance > peak:
-                    peak = balance
-                drawdown = (peak - balance) / peak * 100 if peak > 0 else 0
-                max_drawdown = max(max_drawdown, drawdown)
+            # Drawdown mantenido incrementalmente con cada snapshot (una fila por sesión)
+            drawdown = format_performance(rows['performance']) if rows['performance'] else {}
+            max_drawdown = drawdown.get('max_drawdown', 0)
             
-            # Sharpe ratio (simulado)
-            sharpe_ratio = 1.2  # En producción se calcularía con volatilidad real
+            # Ratios del horizonte de sesión (retornos por snapshot, anualizados)
+            ratios = group_metrics(rows['latest_risk']).get('session', {})
+            sharpe_ratio = ratios.get('sharpe_ratio', {}).get('value', 0)
             
             return {
                 'max_drawdown': round(max_drawdown, 2),
+                'current_drawdown': round(drawdown.get('current_drawdown', 0), 2),
+                'peak_equity': drawdown.get('peak_equity', 0),
+                'drawdown_duration': drawdown.get('drawdown_duration', 0),
+                'max_drawdown_duration': drawdown.get('max_drawdown_duration', 0),
                 'sharpe_ratio': round(sharpe_ratio, 2),
-                'calmar_ratio': round(sharpe_ratio / max_drawdown, 2) if max_drawdown > 0 else 0
+                'sortino_ratio': round(ratios.get('sortino_ratio', {}).get('value', 0), 2),
+                'volatility': round(ratios.get('volatility', {}).get('value', 0), 4),
+                'calmar_ratio': round(ratios.get('calmar_ratio', {}).get('value', 0), 2)
             }
             
         except Exception as e:
@@ -0,0 +1,233 @@
+# app/services/exit_engine.py
+import logging
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.services.trigger_index import STOP_LOSS, TriggerIndex
+
+logger = logging.getLogger(__name__)
+
+TRAILING_STOP = 'trailing_stop'
+PARTIAL_TAKE_PROFIT = 'partial_take_profit'
+
+
+class ExitSignal(NamedTuple):
+    position_id: int
+    symbol: str
+    reason: str          # PARTIAL_TAKE_PROFIT
+    level: str           # Nombre del último nivel alcanzado (TP1, TP2...)
+    quantity: float      # Cantidad a vender (siempre positiva)
+    price: float
+    final: bool          # True si cierra lo que queda de la posición
+
+
+class ExitRules:
+    """
+    Reglas de salida de risk_management: trailing stop (activation/distance en
+    % sobre la entrada) y niveles de toma parcial de beneficios
+    ({percent, sell_percent, name}, sell_percent sobre la cantidad inicial).
+    """
+
+    def __init__(self, trailing_enabled: bool = False, activation: float = 1.5, distance: float = 0.8,
+                 partial_enabled: bool = False, levels: Optional[List[Dict]] = None):
+        self.trailing_enabled = trailing_enabled
+        self.activation = activation / 100
+        self.distance = distance / 100
+        self.partial_enabled = partial_enabled and bool(levels)
+        levels = sorted(levels or [], key=lambda level: level['percent'])
+        self.level_names = [level.get('name', f"TP{i + 1}") for i, level in enumerate(levels)]
+        self.level_percents = np.array([level['percent'] / 100 for level in levels], dtype=float)
+        # Fracción acumulada vendida al alcanzar cada nivel; el último cierra el resto
+        cumulative = np.cumsum([level['sell_percent'] / 100 for level in levels]) if levels else np.empty(0)
+        self.level_cumulative = np.minimum(cumulative, 1.0)
+        if len(self.level_cumulative):
+            self.level_cumulative[-1] = 1.0
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> 'ExitRules':
+        trailing = cfg.get('trailing_stop', {})
+        partial = cfg.get('partial_take_profit', {})
+        return cls(
+            trailing_enabled=trailing.get('enabled', False),
+            activation=trailing.get('activation', 1.5),
+            distance=trailing.get('distance', 0.8),
+            partial_enabled=partial.get('enabled', False),
+            levels=partial.get('levels', [])
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.trailing_enabled or self.partial_enabled
+
+
+class ExitBook:
+    """
+    Estado de salida de las posiciones de un símbolo en arrays columnares:
+    máximo favorable (high-water mark), stop vigente y siguiente nivel de
+    toma parcial. Cada tick lo actualiza con operaciones numpy.
+    """
+
+    __slots__ = ('ids', 'direction', 'entry_price', 'initial_quantity', 'sold', 'high_water',
+                 'activation_price', 'stop', 'trailing', 'next_level', 'next_price', '_row')
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.direction = np.empty(0)         # +1 largo, -1 corto
+        self.entry_price = np.empty(0)
+        self.initial_quantity = np.empty(0)  # Valor absoluto
+        self.sold = np.empty(0)              # Fracción de la cantidad inicial ya vendida
+        self.high_water = np.empty(0)        # Mejor precio desde la entrada (mínimo en cortos)
+        self.activation_price = np.empty(0)
+        self.stop = np.empty(0)              # Stop vigente en el índice de disparos
+        self.trailing = np.empty(0, dtype=bool)
+        self.next_level = np.empty(0, dtype=np.int64)
+        self.next_price = np.empty(0)        # inf si no quedan niveles
+        self._row: Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, position_id: int, quantity: float, entry_price: float, stop_loss: float, rules: ExitRules,
+            initial_quantity: Optional[float] = None):
+        direction = 1.0 if quantity >= 0 else -1.0
+        # Posición retomada tras reducciones parciales: niveles ya vendidos
+        initial_quantity = abs(initial_quantity or quantity)
+        sold = 1.0 - abs(quantity) / initial_quantity if initial_quantity else 0.0
+        next_level = int(np.searchsorted(rules.level_cumulative, sold + 1e-9)) if rules.partial_enabled else 0
+        if rules.partial_enabled and next_level < len(rules.level_percents):
+            next_price = entry_price * (1 + direction * rules.level_percents[next_level])
+        else:
+            next_price = np.inf * direction
+        values = {
+            'ids': position_id, 'direction': direction, 'entry_price': entry_price,
+            'initial_quantity': initial_quantity, 'sold': sold, 'high_water': entry_price,
+            'activation_price': entry_price * (1 + direction * rules.activation),
+            'stop': stop_loss if stop_loss else np.nan,
+            # Un stop ya por encima de la entrada sólo puede venir del trailing
+            'trailing': bool(stop_loss) and direction * (stop_loss - entry_price) > 0,
+            'next_level': next_level, 'next_price': next_price
+        }
+        for name, value in values.items():
+            setattr(self, name, np.append(getattr(self, name), value))
+        self._reindex()
+
+    def remove(self, position_id: int) -> bool:
+        row = self._row.get(position_id)
+        if row is None:
+            return False
+        for name in self.__slots__[:-1]:
+            setattr(self, name, np.delete(getattr(self, name), row))
+        self._reindex()
+        return True
+
+    def _reindex(self):
+        self._row = {int(position_id): row for row, position_id in enumerate(self.ids)}
+
+
+class ExitEngine:
+    """
+    Trailing stop y toma parcial de beneficios evaluados en cada tick del
+    stream, de modo que el tiempo de reacción es la latencia del tick y no el
+    intervalo del loop de trading.
+
+    - Trailing: al superar activation sobre la entrada el stop pasa a
+      high_water * (1 - distance) y sólo se mueve a favor. El nuevo nivel se
+      sube al TriggerIndex (update_level), que es quien dispara la salida, y
+      se notifica a on_stop (p.ej. para reflejarlo en el libro de posiciones).
+    - Toma parcial: al cruzar cada nivel on_price() devuelve un ExitSignal con
+      la cantidad a vender; el último nivel cierra lo que quede.
+    """
+
+    def __init__(self, rules: ExitRules, trigger_index: TriggerIndex,
+                 on_stop: Optional[Callable[[int, str, float], None]] = None):
+        self.rules = rules
+        self.trigger_index = trigger_index
+        self.on_stop = on_stop
+        self._books: Dict[str, ExitBook] = {}
+        self._symbols: Dict[int, str] = {}
+        self._last_price: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, position_id: int, symbol: str, quantity: float, entry_price: float, stop_loss: Optional[float],
+            initial_quantity: Optional[float] = None):
+        """initial_quantity (si difiere de quantity) rehidrata las tomas parciales ya hechas"""
+        if not self.rules.enabled:
+            return
+        with self._lock:
+            book = self._books.get(symbol)
+            if book is None:
+                book = self._books[symbol] = ExitBook()
+            book.add(position_id, quantity, entry_price, stop_loss, self.rules, initial_quantity)
+            self._symbols[position_id] = symbol
+
+    def remove(self, position_id: int) -> bool:
+        with self._lock:
+            symbol = self._symbols.pop(position_id, None)
+            return self._books[symbol].remove(position_id) if symbol else False
+
+    def is_trailing(self, position_id: int) -> bool:
+        with self._lock:
+            symbol = self._symbols.get(position_id)
+            if symbol is None:
+                return False
+            book = self._books[symbol]
+            return bool(book.trailing[book._row[position_id]])
+
+    def on_price(self, symbol: str, price: float) -> List[ExitSignal]:
+        book = self._books.get(symbol)
+        if book is None or not len(book) or self._last_price.get(symbol) == price:
+            return []
+        self._last_price[symbol] = price
+
+        with self._lock:
+            if self.rules.trailing_enabled:
+                self._ratchet(book, symbol, price)
+            if self.rules.partial_enabled:
+                return self._partials(book, symbol, price)
+            return []
+
+    def _ratchet(self, book: ExitBook, symbol: str, price: float):
+        direction = book.direction
+        # Máximo favorable: max en largos, min en cortos (comparando precio * dirección)
+        np.copyto(book.high_water, price, where=direction * (price - book.high_water) > 0)
+        book.trailing |= direction * (book.high_water - book.activation_price) >= 0
+        if not book.trailing.any():
+            return
+
+        candidate = book.high_water * (1 - direction * self.rules.distance)
+        tighter = book.trailing & (np.isnan(book.stop) | (direction * (candidate - book.stop) > 0))
+        for row in np.flatnonzero(tighter):
+            position_id, stop = int(book.ids[row]), float(candidate[row])
+            book.stop[row] = stop
+            self.trigger_index.update_level(position_id, STOP_LOSS, stop)
+            if self.on_stop:
+                self.on_stop(position_id, symbol, stop)
+
+    def _partials(self, book: ExitBook, symbol: str, price: float) -> List[ExitSignal]:
+        crossed = np.flatnonzero(book.direction * (price - book.next_price) >= 0)
+        if not len(crossed):
+            return []
+
+        rules = self.rules
+        signals = []
+        for row in crossed:
+            level = int(book.next_level[row])
+            direction = book.direction[row]
+            # Un salto de precio puede cruzar varios niveles en el mismo tick
+            while level < len(rules.level_percents) and \
+                    direction * (price - book.entry_price[row] * (1 + direction * rules.level_percents[level])) >= 0:
+                level += 1
+            target = rules.level_cumulative[level - 1]
+            quantity = (target - book.sold[row]) * book.initial_quantity[row]
+            final = level >= len(rules.level_percents)
+
+            book.sold[row] = target
+            book.next_level[row] = level
+            book.next_price[row] = (np.inf * direction if final else
+                                    book.entry_price[row] * (1 + direction * rules.level_percents[level]))
+            if quantity > 0:
+                signals.append(ExitSignal(int(book.ids[row]), symbol, PARTIAL_TAKE_PROFIT,
+                                          rules.level_names[level - 1], float(quantity), price, final))
+        return signals
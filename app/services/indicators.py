@@ -0,0 +1,264 @@
+# app/services/indicators.py
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SMA:
+    """Media móvil simple con suma acumulada: push/replace en O(1)"""
+
+    __slots__ = ('period', '_window', '_sum')
+
+    def __init__(self, period: int):
+        self.period = period
+        self._window = deque(maxlen=period)
+        self._sum = 0.0
+
+    def push(self, x: float):
+        """Agrega el valor de una vela nueva"""
+        if len(self._window) == self.period:
+            self._sum -= self._window[0]
+        self._window.append(x)
+        self._sum += x
+
+    def replace(self, x: float):
+        """Corrige el valor de la vela en curso"""
+        if not self._window:
+            self.push(x)
+            return
+        self._sum += x - self._window[-1]
+        self._window[-1] = x
+
+    @property
+    def value(self) -> Optional[float]:
+        if len(self._window) < self.period:
+            return None
+        return self._sum / self.period
+
+
+class EMA:
+    """Media móvil exponencial; guarda el valor confirmado de la vela anterior"""
+
+    __slots__ = ('period', 'alpha', '_prev', '_value')
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self._prev = None    # EMA al cierre de la vela anterior
+        self._value = None   # EMA incluyendo la vela en curso
+
+    def push(self, x: float):
+        self._prev = self._value
+        self.replace(x)
+
+    def replace(self, x: float):
+        if self._prev is None:
+            self._value = x
+        else:
+            self._value = self.alpha * x + (1 - self.alpha) * self._prev
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._value
+
+
+class RSI:
+    """
+    RSI con suavizado de Wilder. El estado confirmado sólo avanza cuando llega
+    una vela nueva; la vela en curso se evalúa sobre ese estado.
+    """
+
+    __slots__ = ('period', '_prev_close', '_avg_gain', '_avg_loss', '_n', '_current')
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._prev_close = None
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._n = 0
+        self._current = None
+
+    def _apply(self, close: float) -> Tuple[float, float, int]:
+        if self._prev_close is None:
+            return 0.0, 0.0, 0
+        change = close - self._prev_close
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        n = self._n
+        if n < self.period:
+            return (self._avg_gain * n + gain) / (n + 1), (self._avg_loss * n + loss) / (n + 1), n + 1
+        p = self.period
+        return (self._avg_gain * (p - 1) + gain) / p, (self._avg_loss * (p - 1) + loss) / p, n + 1
+
+    def push(self, close: float):
+        if self._current is not None:
+            self._avg_gain, self._avg_loss, self._n = self._apply(self._current)
+            self._prev_close = self._current
+        self._current = close
+
+    def replace(self, close: float):
+        self._current = close
+
+    @property
+    def value(self) -> Optional[float]:
+        if self._current is None:
+            return None
+        avg_gain, avg_loss, n = self._apply(self._current)
+        if n < self.period:
+            return None
+        if avg_loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+class ATR:
+    """Average True Range con suavizado de Wilder"""
+
+    __slots__ = ('period', '_prev_close', '_atr', '_n', '_current')
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._prev_close = None
+        self._atr = 0.0
+        self._n = 0
+        self._current = None   # (high, low, close) de la vela en curso
+
+    def _apply(self, high: float, low: float) -> Tuple[float, int]:
+        if self._prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self._prev_close), abs(low - self._prev_close))
+        n = self._n
+        if n < self.period:
+            return (self._atr * n + tr) / (n + 1), n + 1
+        return (self._atr * (self.period - 1) + tr) / self.period, n + 1
+
+    def push(self, high: float, low: float, close: float):
+        if self._current is not None:
+            self._atr, self._n = self._apply(self._current[0], self._current[1])
+            self._prev_close = self._current[2]
+        self._current = (high, low, close)
+
+    def replace(self, high: float, low: float, close: float):
+        self._current = (high, low, close)
+
+    @property
+    def value(self) -> Optional[float]:
+        if self._current is None:
+            return None
+        atr, n = self._apply(self._current[0], self._current[1])
+        return atr if n >= self.period else None
+
+
+class IndicatorSet:
+    """
+    Indicadores de un símbolo/timeframe. Cada vela nueva (open_time distinto)
+    avanza el estado; la misma vela corrige el valor en curso.
+    """
+
+    def __init__(self, indicators_cfg: Dict):
+        fast = indicators_cfg.get('sma_fast', 5)
+        slow = indicators_cfg.get('sma_slow', 20)
+        rsi_period = indicators_cfg.get('rsi_period', 14)
+
+        self.volume_threshold = indicators_cfg.get('volume_threshold', 1.5)
+        self.sma_fast = SMA(fast)
+        self.sma_slow = SMA(slow)
+        self.ema_fast = EMA(fast)
+        self.ema_slow = EMA(slow)
+        self.rsi = RSI(rsi_period)
+        self.atr = ATR(indicators_cfg.get('atr_period', rsi_period))
+        self.volume_mean = SMA(indicators_cfg.get('volume_period', slow))
+
+        self.last_open_time = None
+        self.last_close = None
+        self.last_volume = None
+
+    def update(self, open_time: int, high: float, low: float, close: float, volume: float):
+        if open_time != self.last_open_time:
+            self.sma_fast.push(close)
+            self.sma_slow.push(close)
+            self.ema_fast.push(close)
+            self.ema_slow.push(close)
+            self.rsi.push(close)
+            self.atr.push(high, low, close)
+            self.volume_mean.push(volume)
+            self.last_open_time = open_time
+        else:
+            self.sma_fast.replace(close)
+            self.sma_slow.replace(close)
+            self.ema_fast.replace(close)
+            self.ema_slow.replace(close)
+            self.rsi.replace(close)
+            self.atr.replace(high, low, close)
+            self.volume_mean.replace(volume)
+        self.last_close = close
+        self.last_volume = volume
+
+    @property
+    def volume_ratio(self) -> Optional[float]:
+        mean = self.volume_mean.value
+        if not mean:
+            return None
+        return self.last_volume / mean
+
+    @property
+    def volume_spike(self) -> bool:
+        ratio = self.volume_ratio
+        return ratio is not None and ratio >= self.volume_threshold
+
+    def snapshot(self) -> Dict:
+        return {
+            'close': self.last_close,
+            'sma_fast': self.sma_fast.value,
+            'sma_slow': self.sma_slow.value,
+            'ema_fast': self.ema_fast.value,
+            'ema_slow': self.ema_slow.value,
+            'rsi': self.rsi.value,
+            'atr': self.atr.value,
+            'volume_mean': self.volume_mean.value,
+            'volume_ratio': self.volume_ratio
+        }
+
+
+class IndicatorEngine:
+    """Indicadores incrementales por símbolo/timeframe alimentados desde MarketDataBuffer"""
+
+    def __init__(self, indicators_cfg: Dict):
+        self.indicators_cfg = indicators_cfg or {}
+        self._sets: Dict[Tuple[str, str], IndicatorSet] = {}
+        self._by_symbol: Dict[str, List[Tuple[str, IndicatorSet]]] = {}
+
+    def get(self, symbol: str, timeframe: str) -> Optional[IndicatorSet]:
+        return self._sets.get((symbol, timeframe))
+
+    def seed(self, market_buffer, symbols, timeframes):
+        """Calcula el estado inicial recorriendo una única vez el histórico del buffer"""
+        for symbol in symbols:
+            for timeframe in timeframes:
+                buffer = market_buffer.get(symbol, timeframe)
+                if not buffer:
+                    continue
+                indicator_set = self._sets[(symbol, timeframe)] = IndicatorSet(self.indicators_cfg)
+                for kline in buffer.to_klines():
+                    indicator_set.update(kline['open_time'], kline['high'], kline['low'],
+                                         kline['close'], kline['volume'])
+
+        # Índice por símbolo para que refresh no recorra los sets de otros pares
+        self._by_symbol = {}
+        for (symbol, timeframe), indicator_set in self._sets.items():
+            self._by_symbol.setdefault(symbol, []).append((timeframe, indicator_set))
+
+    def refresh(self, market_buffer, symbol: str):
+        """Aplica la última vela de cada buffer del símbolo: O(1) por timeframe"""
+        for timeframe, indicator_set in self._by_symbol.get(symbol, ()):
+            buffer = market_buffer.get(symbol, timeframe)
+            if not buffer:
+                continue
+            open_time, _, high, low, close, volume = buffer.last_bar()
+            indicator_set.update(open_time, high, low, close, volume)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {f"{symbol}_{timeframe}": s.snapshot() for (symbol, timeframe), s in self._sets.items()}
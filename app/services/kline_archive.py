@@ -0,0 +1,203 @@
+# app/services/kline_archive.py
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Columnas de ancho fijo: un archivo binario por columna
+COLUMNS = (
+    ('open_time', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+)
+
+DEFAULT_ARCHIVE_PATH = os.path.join(os.path.dirname(__file__), '../../data/klines')
+
+
+class KlineSeries:
+    """
+    Vista de sólo lectura sobre las columnas de un símbolo/intervalo abiertas
+    con numpy.memmap. La columna open_time está ordenada y sirve de índice:
+    la búsqueda tiempo→offset es una búsqueda binaria O(log n).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._sizes: Dict[str, int] = {}
+        self.columns: Dict[str, np.ndarray] = {}
+        self.refresh()
+
+    def refresh(self):
+        """Reabre los memmaps si los archivos crecieron desde la última lectura"""
+        sizes = {}
+        for name, dtype in COLUMNS:
+            file_path = os.path.join(self.path, f"{name}.bin")
+            size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            sizes[name] = size // np.dtype(dtype).itemsize
+        if sizes == self._sizes:
+            return
+
+        # Un append en curso (una columna cada vez) se ve desparejo: usar el mínimo
+        length = min(sizes.values())
+        columns = {}
+        for name, dtype in COLUMNS:
+            if length == 0:
+                columns[name] = np.empty(0, dtype=dtype)
+            else:
+                columns[name] = np.memmap(os.path.join(self.path, f"{name}.bin"),
+                                          dtype=dtype, mode='r', shape=(length,))
+        self.columns = columns
+        self._sizes = sizes
+
+    def __len__(self) -> int:
+        return len(self.columns['open_time'])
+
+    @property
+    def open_time(self) -> np.ndarray:
+        return self.columns['open_time']
+
+    def offset(self, timestamp_ms: int, side: str = 'left') -> int:
+        """Posición de la primera vela con open_time >= timestamp_ms"""
+        return int(np.searchsorted(self.columns['open_time'], timestamp_ms, side=side))
+
+    def range(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Velas con start_ms <= open_time < end_ms. Devuelve vistas sobre los
+        memmaps (sin copia).
+        """
+        lo = 0 if start_ms is None else self.offset(start_ms)
+        hi = len(self) if end_ms is None else self.offset(end_ms)
+        return {name: column[lo:hi] for name, column in self.columns.items()}
+
+
+class KlineArchive:
+    """
+    Almacén columnar en disco de velas: {root}/{SYMBOL}/{interval}/{columna}.bin
+
+    Sólo admite appends en orden de open_time; las velas repetidas o más
+    antiguas que la última guardada se ignoran.
+
+    Todas las columnas de una serie tienen siempre el mismo número de filas:
+    al abrir una serie se recortan a la longitud común (restos de una
+    escritura interrumpida por un crash) y si un append falla a medias se
+    deshace en todas. Escribe desde un único hilo (el del
+    MarketDataIngestor), nunca desde el del stream.
+    """
+
+    def __init__(self, root: str = DEFAULT_ARCHIVE_PATH):
+        self.root = os.path.abspath(root)
+        # (symbol, interval) -> (filas confirmadas, último open_time o None)
+        self._state: Dict[Tuple[str, str], Tuple[int, Optional[int]]] = {}
+        self._lock = threading.Lock()
+
+    def _series_path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol.upper(), interval)
+
+    @staticmethod
+    def _truncate(path: str, length: int):
+        """Deja todas las columnas existentes en `length` filas"""
+        for name, dtype in COLUMNS:
+            file_path = os.path.join(path, f"{name}.bin")
+            size = length * np.dtype(dtype).itemsize
+            if os.path.exists(file_path) and os.path.getsize(file_path) != size:
+                with open(file_path, 'r+b') as f:
+                    f.truncate(size)
+
+    def _series_state(self, symbol: str, interval: str) -> Tuple[int, Optional[int]]:
+        key = (symbol, interval)
+        if key not in self._state:
+            path = self._series_path(symbol, interval)
+            lengths = []
+            for name, dtype in COLUMNS:
+                file_path = os.path.join(path, f"{name}.bin")
+                size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+                lengths.append(size // np.dtype(dtype).itemsize)
+            length = min(lengths)
+            if max(lengths) != length:
+                logger.warning(f"⚠️ Archivo de velas {symbol} {interval} con columnas desparejas "
+                               f"{lengths}: recortado a {length} filas")
+            self._truncate(path, length)
+
+            last = None
+            if length:
+                last = int(np.memmap(os.path.join(path, "open_time.bin"), dtype=np.int64,
+                                     mode='r', shape=(length,))[-1])
+            self._state[key] = (length, last)
+        return self._state[key]
+
+    # ==================== ESCRITURA ====================
+
+    def append_many(self, symbol: str, interval: str, rows: Iterable[Tuple]) -> int:
+        """
+        Agrega velas (open_time, open, high, low, close, volume) ordenadas por
+        open_time. Devuelve la cantidad de velas escritas.
+        """
+        with self._lock:
+            length, last = self._series_state(symbol, interval)
+            fresh: List[Tuple] = []
+            for row in rows:
+                if last is None or row[0] > last:
+                    fresh.append(row)
+                    last = row[0]
+            if not fresh:
+                return 0
+
+            path = self._series_path(symbol, interval)
+            os.makedirs(path, exist_ok=True)
+            try:
+                for index, (name, dtype) in enumerate(COLUMNS):
+                    values = np.fromiter((row[index] for row in fresh), dtype=dtype, count=len(fresh))
+                    with open(os.path.join(path, f"{name}.bin"), 'ab') as f:
+                        f.write(values.tobytes())
+            except Exception:
+                # Sin filas a medias: todas las columnas vuelven a la longitud confirmada
+                self._truncate(path, length)
+                raise
+
+            self._state[(symbol, interval)] = (length + len(fresh), last)
+            return len(fresh)
+
+    def append(self, symbol: str, interval: str, open_time: int, open_: float, high: float,
+               low: float, close: float, volume: float) -> bool:
+        return self.append_many(symbol, interval, [(open_time, open_, high, low, close, volume)]) == 1
+
+    # ==================== LECTURA ====================
+
+    def open(self, symbol: str, interval: str) -> KlineSeries:
+        return KlineSeries(self._series_path(symbol, interval))
+
+    def read_range(self, symbol: str, interval: str, start_ms: Optional[int] = None,
+                   end_ms: Optional[int] = None) -> Dict[str, np.ndarray]:
+        return self.open(symbol, interval).range(start_ms, end_ms)
+
+    def symbols(self, interval: str) -> List[str]:
+        """Símbolos con datos archivados para un intervalo"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name, interval))
+        )
+
+
+_archive: Optional[KlineArchive] = None
+_archive_lock = threading.Lock()
+
+
+def get_archive(config: Optional[Dict] = None) -> KlineArchive:
+    """Archivo compartido por todos los bots y herramientas de análisis del proceso"""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            path = (config or {}).get('path') or DEFAULT_ARCHIVE_PATH
+            if not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(__file__), '../..', path)
+            _archive = KlineArchive(path)
+        return _archive
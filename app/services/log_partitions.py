@@ -0,0 +1,245 @@
+# app/services/log_partitions.py
+import logging
+import re
+import threading
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from psycopg2 import sql
+
+from app.models.base import engine
+
+logger = logging.getLogger(__name__)
+
+PARTITION_INTERVALS = ('day', 'week')
+EXPIRED_ACTIONS = ('drop', 'archive')
+
+
+class LogPartitionManager:
+    """
+    Mantiene las particiones por rango de timestamp de system_logs:
+
+    - Crea por adelantado las particiones de los próximos `premake` periodos
+      (día o semana ISO) para que los escritores nunca dependan de ellas.
+    - Las filas que cayeron en la partición DEFAULT se mueven a la partición
+      nueva al crearla, dentro de la misma transacción.
+    - Las particiones más antiguas que `keep_days` se eliminan con DROP o se
+      desenganchan y mueven a `archive_schema`, en lugar de un DELETE masivo.
+    """
+
+    def __init__(self, table: str = 'system_logs', interval: str = 'day', premake: int = 7,
+                 keep_days: int = 30, expired_action: str = 'drop', archive_schema: str = 'archive',
+                 check_interval: float = 3600.0):
+        if interval not in PARTITION_INTERVALS:
+            raise ValueError(f"Intervalo de partición inválido: {interval}")
+        if expired_action not in EXPIRED_ACTIONS:
+            raise ValueError(f"Acción de expiración inválida: {expired_action}")
+        self.table = table
+        self.interval = interval
+        self.premake = premake
+        self.keep_days = keep_days
+        self.expired_action = expired_action
+        self.archive_schema = archive_schema
+        self.check_interval = check_interval
+        self._name_re = re.compile(rf"^{re.escape(table)}_p(\d{{8}})$")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ==================== RANGOS ====================
+
+    def period_start(self, day: date) -> date:
+        return day - timedelta(days=day.weekday()) if self.interval == 'week' else day
+
+    def next_period(self, start: date) -> date:
+        return start + timedelta(days=7 if self.interval == 'week' else 1)
+
+    def partition_name(self, start: date) -> str:
+        return f"{self.table}_p{start:%Y%m%d}"
+
+    @staticmethod
+    def _utc(day: date) -> datetime:
+        return datetime.combine(day, dt_time.min, tzinfo=timezone.utc)
+
+    def cutoff(self, today: date) -> date:
+        """Inicio del periodo más antiguo que se conserva"""
+        return self.period_start(today - timedelta(days=self.keep_days))
+
+    # ==================== CATÁLOGO ====================
+
+    def is_partitioned(self, cursor) -> bool:
+        cursor.execute("""
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+        """, (self.table,))
+        return cursor.fetchone() is not None
+
+    def existing_partitions(self, cursor) -> Dict[date, str]:
+        cursor.execute("""
+            SELECT child.relname FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)
+        """, (self.table,))
+        partitions = {}
+        for (name,) in cursor.fetchall():
+            match = self._name_re.match(name)
+            if match:
+                partitions[datetime.strptime(match.group(1), '%Y%m%d').date()] = name
+        return partitions
+
+    # ==================== MANTENIMIENTO ====================
+
+    def _create_partition(self, cursor, start: date):
+        end = self.next_period(start)
+        table = sql.Identifier(self.table)
+        partition = sql.Identifier(self.partition_name(start))
+        default = sql.Identifier(f"{self.table}_default")
+        lower, upper = self._utc(start), self._utc(end)
+
+        cursor.execute(sql.SQL(
+            "CREATE TABLE IF NOT EXISTS {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ).format(partition, table))
+        # Filas que llegaron antes de existir la partición: se mueven desde DEFAULT
+        cursor.execute(sql.SQL("""
+            WITH moved AS (
+                DELETE FROM {} WHERE timestamp >= %s AND timestamp < %s RETURNING *
+            )
+            INSERT INTO {} SELECT * FROM moved
+        """).format(default, partition), (lower, upper))
+        cursor.execute(sql.SQL(
+            "ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)"
+        ).format(table, partition), (lower, upper))
+
+    def ensure_partitions(self, today: Optional[date] = None) -> List[str]:
+        """Crea la partición DEFAULT y las particiones desde el corte de retención hasta hoy + premake"""
+        today = today or datetime.now(timezone.utc).date()
+        created = []
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            if not self.is_partitioned(cursor):
+                logger.warning(f"⚠️ {self.table} no está particionada: ejecutar "
+                               f"database/migrations/001_partition_system_logs.sql")
+                return created
+
+            cursor.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} DEFAULT").format(
+                sql.Identifier(f"{self.table}_default"), sql.Identifier(self.table)
+            ))
+            conn.commit()
+
+            existing = self.existing_partitions(cursor)
+            start = self.cutoff(today)
+            last = self.period_start(today)
+            for _ in range(self.premake):
+                last = self.next_period(last)
+
+            while start <= last:
+                if start not in existing:
+                    try:
+                        self._create_partition(cursor, start)
+                        conn.commit()
+                        created.append(self.partition_name(start))
+                    except Exception as e:
+                        conn.rollback()
+                        logger.error(f"❌ Error creando partición {self.partition_name(start)}: {e}")
+                start = self.next_period(start)
+        finally:
+            conn.close()
+
+        if created:
+            logger.info(f"🗂️ Particiones de {self.table} creadas: {', '.join(created)}")
+        return created
+
+    def expire_partitions(self, today: Optional[date] = None) -> List[str]:
+        """Elimina o archiva las particiones cuyo rango termina antes del corte de retención"""
+        today = today or datetime.now(timezone.utc).date()
+        cutoff = self.cutoff(today)
+        expired = []
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            if not self.is_partitioned(cursor):
+                return expired
+
+            for start, name in sorted(self.existing_partitions(cursor).items()):
+                if self.next_period(start) > cutoff:
+                    continue
+                try:
+                    if self.expired_action == 'archive':
+                        cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(
+                            sql.Identifier(self.archive_schema)))
+                        cursor.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                            sql.Identifier(self.table), sql.Identifier(name)))
+                        cursor.execute(sql.SQL("ALTER TABLE {} SET SCHEMA {}").format(
+                            sql.Identifier(name), sql.Identifier(self.archive_schema)))
+                    else:
+                        cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                    conn.commit()
+                    expired.append(name)
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"❌ Error expirando partición {name}: {e}")
+
+            # Restos antiguos en DEFAULT (p.ej. datos migrados fuera de la ventana)
+            cursor.execute(sql.SQL("DELETE FROM {} WHERE timestamp < %s").format(
+                sql.Identifier(f"{self.table}_default")), (self._utc(cutoff),))
+            conn.commit()
+        finally:
+            conn.close()
+
+        if expired:
+            action = 'archivadas' if self.expired_action == 'archive' else 'eliminadas'
+            logger.info(f"🧹 Particiones de {self.table} {action}: {', '.join(expired)}")
+        return expired
+
+    def run_maintenance(self) -> Tuple[List[str], List[str]]:
+        created = self.ensure_partitions()
+        expired = self.expire_partitions()
+        return created, expired
+
+    # ==================== HILO ====================
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="log-partitions", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_maintenance()
+            except Exception as e:
+                logger.error(f"❌ Error en mantenimiento de particiones de {self.table}: {e}")
+            self._stop.wait(self.check_interval)
+
+
+_manager: Optional[LogPartitionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_partition_manager(config: Optional[Dict] = None, start: bool = True) -> LogPartitionManager:
+    """Gestor compartido del proceso; su hilo revisa las particiones cada check_interval"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            config = config or {}
+            _manager = LogPartitionManager(
+                interval=config.get('partition_interval', 'day'),
+                premake=config.get('premake', 7),
+                keep_days=config.get('keep_days', 30),
+                expired_action=config.get('expired_action', 'drop'),
+                archive_schema=config.get('archive_schema', 'archive'),
+                check_interval=config.get('check_interval', 3600)
+            )
+            if start:
+                _manager.start()
+        return _manager
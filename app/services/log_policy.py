@@ -0,0 +1,173 @@
+# app/services/log_policy.py
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+WILDCARD = '*'
+COLLAPSE_MODES = ('off', 'exact', 'template')
+
+# Números (enteros o decimales) que se ignoran al comparar mensajes en modo 'template'
+_NUMBER_RE = re.compile(r'-?\d+(?:\.\d+)?')
+
+# (level, message) listo para enviar a los sinks
+LogLine = Tuple[str, str]
+
+
+class TokenBucket:
+    """Límite de tasa: `rate` mensajes por segundo con ráfagas de hasta `burst`"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated: Optional[float] = None
+
+    def allow(self, now: float) -> bool:
+        if self.updated is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class LogPolicy:
+    """
+    Política de un par (fuente, nivel). Se aplica en este orden:
+
+    1. collapse: los mensajes iguales al anterior (texto exacto o, en modo
+       'template', ignorando los números) dentro de collapse_window segundos se
+       suprimen y se resumen como "repetido xN" cuando llega otro mensaje.
+    2. sample_every: sólo pasa 1 de cada N mensajes.
+    3. rate/burst: token bucket; lo descartado se informa en el siguiente
+       mensaje que pase.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None,
+                 sample_every: int = 1, collapse: str = 'off', collapse_window: float = 60.0):
+        if collapse not in COLLAPSE_MODES:
+            raise ValueError(f"Modo de collapse inválido: {collapse}")
+        self.bucket = TokenBucket(rate, burst or max(1.0, rate)) if rate else None
+        self.sample_every = max(1, int(sample_every))
+        self.collapse = collapse
+        self.collapse_window = collapse_window
+
+        self._seen = 0
+        self._rate_dropped = 0
+        self._last_key: Optional[str] = None
+        self._last_message: Optional[str] = None
+        self._last_at = 0.0
+        self._repeats = 0
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> 'LogPolicy':
+        return cls(
+            rate=cfg.get('rate'),
+            burst=cfg.get('burst'),
+            sample_every=cfg.get('sample_every', 1),
+            collapse=cfg.get('collapse', 'off'),
+            collapse_window=cfg.get('collapse_window', 60.0)
+        )
+
+    def _collapse_key(self, message: str) -> str:
+        return _NUMBER_RE.sub('#', message) if self.collapse == 'template' else message
+
+    def _repeat_summary(self) -> Optional[str]:
+        if not self._repeats:
+            return None
+        summary = f"↻ Mensaje repetido suprimido x{self._repeats}: {self._last_message}"
+        self._repeats = 0
+        return summary
+
+    def apply(self, level: str, message: str, now: float) -> List[LogLine]:
+        out: List[LogLine] = []
+
+        if self.collapse != 'off':
+            key = self._collapse_key(message)
+            if key == self._last_key and now - self._last_at < self.collapse_window:
+                self._repeats += 1
+                self._last_message = message
+                return out
+            summary = self._repeat_summary()
+            if summary:
+                out.append((level, summary))
+            self._last_key = key
+            self._last_message = message
+            self._last_at = now
+
+        self._seen += 1
+        if (self._seen - 1) % self.sample_every:
+            return out
+
+        if self.bucket is not None and not self.bucket.allow(now):
+            self._rate_dropped += 1
+            return out
+
+        if self._rate_dropped:
+            out.append((level, f"⏱️ {self._rate_dropped} mensajes omitidos por límite de tasa"))
+            self._rate_dropped = 0
+        out.append((level, message))
+        return out
+
+    def flush(self, level: str) -> List[LogLine]:
+        """Resúmenes pendientes (al detener el bot)"""
+        out: List[LogLine] = []
+        summary = self._repeat_summary()
+        if summary:
+            out.append((level, summary))
+        if self._rate_dropped:
+            out.append((level, f"⏱️ {self._rate_dropped} mensajes omitidos por límite de tasa"))
+            self._rate_dropped = 0
+        return out
+
+
+class LogPolicyEngine:
+    """
+    Resuelve la política de cada (fuente, nivel) a partir de logging.policies:
+
+        policies:
+          "*":            # fuente ('*' = cualquiera)
+            DEBUG: {rate: 1, burst: 5}
+          strategy:
+            INFO: {sample_every: 10, collapse: "template"}
+
+    Prioridad: fuente+nivel, fuente+'*', '*'+nivel, '*'+'*'. Sin política el
+    mensaje pasa tal cual. El estado es por instancia (una por bot).
+    """
+
+    def __init__(self, policies_cfg: Optional[Dict] = None):
+        self.policies_cfg = policies_cfg or {}
+        self._policies: Dict[Tuple[str, str], Optional[LogPolicy]] = {}
+        self._lock = threading.Lock()  # El loop de trading y las requests HTTP loguean en paralelo
+
+    def _resolve(self, source: str, level: str) -> Optional[LogPolicy]:
+        key = (source, level)
+        if key not in self._policies:
+            cfg = None
+            for src, lvl in ((source, level), (source, WILDCARD), (WILDCARD, level), (WILDCARD, WILDCARD)):
+                cfg = (self.policies_cfg.get(src) or {}).get(lvl)
+                if cfg is not None:
+                    break
+            self._policies[key] = LogPolicy.from_config(cfg) if cfg else None
+        return self._policies[key]
+
+    def filter(self, source: str, level: str, message: str, now: Optional[float] = None) -> List[LogLine]:
+        """Líneas a enviar a los sinks (BD y Socket.IO) para este mensaje"""
+        with self._lock:
+            policy = self._resolve(source, level)
+            if policy is None:
+                return [(level, message)]
+            return policy.apply(level, message, time.monotonic() if now is None else now)
+
+    def flush(self) -> List[Tuple[str, str, str]]:
+        """(source, level, message) pendientes de todas las políticas"""
+        with self._lock:
+            return [
+                (source, line_level, message)
+                for (source, level), policy in self._policies.items() if policy is not None
+                for line_level, message in policy.flush(level)
+            ]
@@ -0,0 +1,173 @@
+# app/services/log_sink.py
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from app.models.base import engine
+
+logger = logging.getLogger(__name__)
+
+# (session_id, timestamp, level, source, message, details)
+LogRecord = Tuple[int, datetime, str, str, str, Optional[Dict]]
+
+OVERFLOW_POLICIES = ('drop', 'aggregate')
+# Niveles cuyo resumen de descarte se escribe como ERROR en lugar de WARNING
+PRIORITY_LEVELS = ('ERROR', 'CRITICAL')
+
+
+class SystemLogSink:
+    """
+    Persiste logs de los bots en system_logs desde un hilo en segundo plano.
+
+    _emit_log sólo encola el registro (nunca espera a la BD); el hilo escritor
+    inserta en bloque con execute_values cuando se junta batch_size registros
+    o pasa flush_interval desde el último volcado.
+
+    Si la cola se llena se aplica overflow_policy:
+      - 'drop': el registro se descarta y sólo se cuenta.
+      - 'aggregate': se acumula por (sesión, nivel, fuente) y en el siguiente
+        volcado se escribe una fila resumen "N logs descartados" por grupo.
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 1.0,
+                 max_queue: int = 10_000, overflow_policy: str = 'aggregate'):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy inválida: {overflow_policy}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self._queue: "queue.Queue[Optional[LogRecord]]" = queue.Queue(maxsize=max_queue)
+        self._overflow: Dict[Tuple[int, str, str], int] = {}
+        self._overflow_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.dropped = 0
+        self.written = 0
+
+    # ==================== API ====================
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="system-log-sink", daemon=True)
+        self._thread.start()
+        logger.info(f"📝 Sink de system_logs iniciado (batch={self.batch_size}, "
+                    f"intervalo={self.flush_interval}s, overflow={self.overflow_policy})")
+
+    def stop(self, timeout: float = 10.0):
+        self._running = False
+        if self._thread:
+            # Despierta al writer si está esperando en la cola
+            self._queue.put(None, timeout=timeout)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, session_id: Optional[int], level: str, source: str, message: str,
+               details: Optional[Dict] = None):
+        """Encola un log; nunca bloquea al llamador"""
+        if session_id is None:
+            return  # system_logs.session_id es NOT NULL: sin sesión sólo queda el log local
+        record = (session_id, datetime.now(timezone.utc), level, source, message, details)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.overflow_policy == 'aggregate':
+                key = (session_id, level, source)
+                with self._overflow_lock:
+                    self._overflow[key] = self._overflow.get(key, 0) + 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"⚠️ Cola de system_logs llena, {self.dropped} logs descartados")
+
+    # ==================== WRITER ====================
+
+    def _run(self):
+        batch: List[LogRecord] = []
+        last_flush = time.monotonic()
+
+        while self._running or not self._queue.empty():
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                record = self._queue.get(timeout=timeout)
+                if record is not None:
+                    batch.append(record)
+            except queue.Empty:
+                pass
+
+            due = time.monotonic() - last_flush >= self.flush_interval
+            # Al parar se vacía antes la cola: el último lote sale entero
+            draining = not self._running and self._queue.empty()
+            if len(batch) >= self.batch_size or due or draining:
+                batch.extend(self._drain_overflow())
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                last_flush = time.monotonic()
+
+        batch.extend(self._drain_overflow())
+        if batch:
+            self._flush(batch)
+
+    def _drain_overflow(self) -> List[LogRecord]:
+        """Convierte los logs descartados por saturación en filas resumen"""
+        with self._overflow_lock:
+            overflow, self._overflow = self._overflow, {}
+        now = datetime.now(timezone.utc)
+        return [
+            (session_id, now, 'ERROR' if level in PRIORITY_LEVELS else 'WARNING', source,
+             f"{count} logs {level} descartados por saturación de la cola",
+             {'dropped': count, 'level': level})
+            for (session_id, level, source), count in overflow.items()
+        ]
+
+    def _flush(self, records: List[LogRecord]):
+        rows = [
+            (session_id, timestamp, level, source, message,
+             json.dumps(details) if details is not None else None)
+            for session_id, timestamp, level, source, message, details in records
+        ]
+
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            execute_values(
+                cursor,
+                "INSERT INTO system_logs (session_id, timestamp, level, source, message, details) VALUES %s",
+                rows,
+                template="(%s, %s, %s, %s, %s, %s::jsonb)",
+                page_size=self.batch_size
+            )
+            conn.commit()
+            self.written += len(rows)
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error persistiendo system_logs ({len(rows)} registros): {e}")
+        finally:
+            conn.close()
+
+
+_sink: Optional[SystemLogSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_log_sink(config: Optional[Dict] = None) -> SystemLogSink:
+    """Sink compartido por todos los bots del proceso"""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            config = config or {}
+            _sink = SystemLogSink(
+                batch_size=config.get('batch_size', 200),
+                flush_interval=config.get('flush_interval', 1.0),
+                max_queue=config.get('max_queue', 10_000),
+                overflow_policy=config.get('overflow_policy', 'aggregate')
+            )
+            _sink.start()
+        return _sink
@@ -0,0 +1,590 @@
+# app/services/mark_to_market.py
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from app.models.base import engine
+from app.services.trade_writer import TradeWriter, get_trade_writer
+from app.services.dashboard_cache import get_dashboard_cache
+from app.services.dashboard_stream import get_dashboard_stream, MARKS
+
+logger = logging.getLogger(__name__)
+
+_UPDATE_SQL = """
+    UPDATE positions AS p
+    SET current_price = v.current_price,
+        unrealized_pnl = v.unrealized_pnl,
+        unrealized_pnl_percent = v.unrealized_pnl_percent,
+        quantity = v.quantity,
+        stop_loss = v.stop_loss
+    FROM (VALUES %s) AS v(id, current_price, unrealized_pnl, unrealized_pnl_percent, quantity, stop_loss)
+    WHERE p.id = v.id
+    RETURNING p.id
+"""
+_UPDATE_TEMPLATE = "(%s, %s::numeric, %s::numeric, %s::numeric, %s::numeric, %s::numeric)"
+
+# Sesiones sin bot vivo: detenidas, o 'running' sin latido reciente (su
+# proceso terminó sin detenerlas). Sólo éstas se pueden adoptar.
+_DEAD_SESSION = """
+    (s.status <> 'running' OR s.heartbeat_at IS NULL
+     OR s.heartbeat_at < NOW() - make_interval(secs => %(stale_after)s))
+"""
+
+# Posiciones cuyo trade ya se cerró (el DELETE no llegó a la BD)
+_DROP_CLOSED_SQL = """
+    DELETE FROM positions p
+    USING trades t
+    WHERE t.id = p.trade_id AND t.status <> 'open'
+    RETURNING p.id, p.session_id
+"""
+
+# Trades reales con posición abierta que nadie vigila: nunca se cierran desde
+# aquí (la posición sigue en el exchange), sólo se marcan para conciliarlos
+_FLAG_UNWATCHED_SQL = f"""
+    UPDATE trades t
+    SET needs_reconciliation = TRUE
+    FROM positions p
+    JOIN bot_sessions s ON s.id = p.session_id
+    WHERE t.id = p.trade_id AND t.status = 'open' AND t.real_trade
+      AND NOT t.needs_reconciliation AND {_DEAD_SESSION}
+    RETURNING t.id, t.session_id
+"""
+
+# Todas las posiciones abiertas: también las de sesiones sin bot, que siguen
+# valorándose hasta que otro bot del usuario las adopte
+_LOAD_SQL = """
+    SELECT p.id, p.session_id, p.trade_id, p.symbol, p.quantity, p.entry_price, p.current_price,
+           p.stop_loss, p.take_profit, p.created_at, COALESCE(t.real_trade, FALSE) AS real_trade
+    FROM positions p
+    LEFT JOIN trades t ON t.id = p.trade_id
+"""
+
+_STOP_DEAD_SQL = """
+    UPDATE bot_sessions SET status = 'stopped', end_time = NOW()
+    WHERE user_id = %(user_id)s AND id <> %(session_id)s AND status = 'running'
+      AND (heartbeat_at IS NULL OR heartbeat_at < NOW() - make_interval(secs => %(stale_after)s))
+    RETURNING id
+"""
+
+_ADOPT_TRADES_SQL = """
+    UPDATE trades t
+    SET session_id = %(session_id)s,
+        needs_reconciliation = t.needs_reconciliation OR t.real_trade
+    FROM positions p
+    JOIN bot_sessions s ON s.id = p.session_id
+    WHERE p.trade_id = t.id AND t.status = 'open'
+      AND s.user_id = %(user_id)s AND s.id <> %(session_id)s AND s.status <> 'running'
+    RETURNING t.id, t.session_id, p.session_id AS previous_session_id, t.symbol, t.entry_order_id, t.entry_price,
+              t.quantity, t.real_trade, t.status, t.entry_time
+"""
+
+_ADOPT_POSITIONS_SQL = """
+    UPDATE positions SET session_id = %(session_id)s
+    WHERE trade_id = ANY(%(trade_ids)s)
+    RETURNING id, session_id, trade_id, symbol, quantity, entry_price, current_price,
+              stop_loss, take_profit, created_at
+"""
+
+_HEARTBEAT_SQL = "UPDATE bot_sessions SET heartbeat_at = NOW() WHERE id = ANY(%s)"
+
+# (id, current_price, unrealized_pnl, unrealized_pnl_percent, quantity, stop_loss)
+MarkRow = Tuple[int, float, float, float, float, float]
+
+
+class SymbolBook:
+    """
+    Posiciones abiertas de un símbolo en arrays columnares. Un tick recalcula
+    el P&L de todas con unas pocas operaciones numpy sobre buffers ya
+    reservados; altas y bajas (raras) reconstruyen los arrays.
+    """
+
+    __slots__ = ('symbol', 'ids', 'session_ids', 'trade_ids', 'quantity', 'entry_price', 'stop_loss',
+                 'take_profit', 'current_price', 'unrealized_pnl', 'unrealized_pnl_percent', 'direction',
+                 'real_trade', 'created_at', 'updated_at', 'price', 'dirty', '_row')
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.ids = np.empty(0, dtype=np.int64)
+        self.session_ids = np.empty(0, dtype=np.int64)
+        self.trade_ids = np.empty(0, dtype=np.int64)
+        self.quantity = np.empty(0)
+        self.entry_price = np.empty(0)
+        self.stop_loss = np.empty(0)
+        self.take_profit = np.empty(0)
+        self.current_price = np.empty(0)
+        self.unrealized_pnl = np.empty(0)
+        self.unrealized_pnl_percent = np.empty(0)
+        self.direction = np.empty(0)  # +1 largo, -1 corto (signo de quantity)
+        self.real_trade: List[bool] = []
+        self.created_at: List[Optional[datetime]] = []
+        self.updated_at: Optional[datetime] = None
+        self.price: Optional[float] = None
+        self.dirty = False
+        self._row: Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, position: Dict):
+        price = position.get('current_price') or position['entry_price']
+        self.ids = np.append(self.ids, position['id'])
+        self.session_ids = np.append(self.session_ids, position['session_id'])
+        self.trade_ids = np.append(self.trade_ids, position['trade_id'])
+        self.quantity = np.append(self.quantity, float(position['quantity']))
+        self.entry_price = np.append(self.entry_price, float(position['entry_price']))
+        self.stop_loss = np.append(self.stop_loss, float(position['stop_loss']))
+        self.take_profit = np.append(self.take_profit, float(position['take_profit']))
+        self.current_price = np.append(self.current_price, float(price))
+        self.unrealized_pnl = np.append(self.unrealized_pnl, 0.0)
+        self.unrealized_pnl_percent = np.append(self.unrealized_pnl_percent, 0.0)
+        self.direction = np.sign(self.quantity)
+        self.real_trade.append(bool(position.get('real_trade')))
+        self.created_at.append(position.get('created_at'))
+        self._reindex()
+        self.mark(self.price if self.price is not None else float(price))
+
+    def remove(self, position_id: int) -> Optional[Dict]:
+        row = self._row.get(position_id)
+        if row is None:
+            return None
+        state = self.as_dict(row)
+        for name in ('ids', 'session_ids', 'trade_ids', 'quantity', 'entry_price', 'stop_loss', 'take_profit',
+                     'current_price', 'unrealized_pnl', 'unrealized_pnl_percent', 'direction'):
+            setattr(self, name, np.delete(getattr(self, name), row))
+        del self.real_trade[row]
+        del self.created_at[row]
+        self._reindex()
+        return state
+
+    def _reindex(self):
+        self._row = {int(position_id): row for row, position_id in enumerate(self.ids)}
+
+    def update(self, position_id: int, quantity: Optional[float] = None, stop_loss: Optional[float] = None) -> bool:
+        """Cambia cantidad (salida parcial) o stop (trailing) y revalúa"""
+        row = self._row.get(position_id)
+        if row is None:
+            return False
+        if quantity is not None:
+            self.quantity[row] = quantity
+        if stop_loss is not None:
+            self.stop_loss[row] = stop_loss
+        self.mark(self.price if self.price is not None else float(self.current_price[row]))
+        return True
+
+    def mark(self, price: float):
+        """Valora todas las posiciones del símbolo a `price` en un solo paso vectorizado"""
+        self.price = price
+        self.updated_at = datetime.now(timezone.utc)
+        if not len(self.ids):
+            return
+        self.current_price.fill(price)
+        np.subtract(price, self.entry_price, out=self.unrealized_pnl)
+        np.divide(self.unrealized_pnl, self.entry_price, out=self.unrealized_pnl_percent,
+                  where=self.entry_price > 0)
+        self.unrealized_pnl_percent *= self.direction * 100
+        self.unrealized_pnl *= self.quantity
+        self.dirty = True
+
+    def marks(self) -> Dict[int, List[Dict]]:
+        """Valoración actual agrupada por sesión, en el formato de los deltas del dashboard"""
+        marks: Dict[int, List[Dict]] = {}
+        for position_id, session_id, current_price, pnl, pnl_percent in zip(
+                self.ids.tolist(), self.session_ids.tolist(), self.current_price.tolist(),
+                self.unrealized_pnl.tolist(), self.unrealized_pnl_percent.tolist()):
+            marks.setdefault(session_id, []).append({
+                'id': position_id,
+                'current_price': current_price,
+                'unrealized_pnl': round(pnl, 2),
+                'unrealized_pnl_percent': round(pnl_percent, 4)
+            })
+        return marks
+
+    def mark_rows(self) -> List[MarkRow]:
+        return list(zip(self.ids.tolist(), self.current_price.tolist(),
+                        np.round(self.unrealized_pnl, 2).tolist(),
+                        np.round(self.unrealized_pnl_percent, 4).tolist(),
+                        self.quantity.tolist(), self.stop_loss.tolist()))
+
+    def as_dict(self, row: int) -> Dict:
+        quantity = float(self.quantity[row])
+        entry_price = float(self.entry_price[row])
+        current_price = float(self.current_price[row])
+        stop_loss = float(self.stop_loss[row])
+        take_profit = float(self.take_profit[row])
+        risk = abs(entry_price - stop_loss)
+        created_at = self.created_at[row]
+        return {
+            'id': int(self.ids[row]),
+            'session_id': int(self.session_ids[row]),
+            'trade_id': int(self.trade_ids[row]),
+            'symbol': self.symbol,
+            'quantity': quantity,
+            'entry_price': entry_price,
+            'current_price': current_price,
+            'unrealized_pnl': round(float(self.unrealized_pnl[row]), 2),
+            'unrealized_pnl_percent': round(float(self.unrealized_pnl_percent[row]), 4),
+            'stop_loss': stop_loss,
+            'take_profit': take_profit,
+            'real_trade': self.real_trade[row],
+            'created_at': created_at.isoformat() if created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'position_value': current_price * abs(quantity),
+            'risk_reward_ratio': abs(take_profit - entry_price) / risk if risk > 0 else 0.0,
+            'is_profitable': float(self.unrealized_pnl[row]) > 0
+        }
+
+
+class MarkToMarketService:
+    """
+    Valoración a mercado de las posiciones abiertas de todas las sesiones.
+
+    Las posiciones viven en memoria agrupadas por símbolo (SymbolBook); cada
+    precio recibido revalúa todas las del símbolo de una vez. Un hilo vuelca
+    cada flush_interval los símbolos modificados con un único
+    UPDATE ... FROM (VALUES ...), en lugar de un UPDATE por posición y tick.
+    El dashboard lee de memoria, así que siempre ve el último precio.
+
+    Altas y bajas se persisten por la cola del TradeWriter para que queden
+    ordenadas detrás del trade al que referencian. Un símbolo sigue marcado
+    como pendiente hasta que el UPDATE confirma todas sus filas, así que una
+    valoración que llega antes que el INSERT de la posición se reintenta.
+
+    Detener un bot no cierra sus posiciones: quedan abiertas en BD y el
+    siguiente bot del usuario las adopta con adopt(). Al arrancar se cargan
+    todas las abiertas. Cada proceso late (bot_sessions.heartbeat_at) por las
+    sesiones que ejecuta (attach/detach); sólo se adoptan las de sesiones
+    detenidas o sin latido en stale_after segundos, nunca las de un bot vivo
+    en otro proceso. Nada se cierra automáticamente: los trades reales sin
+    bot se marcan con needs_reconciliation para revisarlos en el exchange.
+    """
+
+    def __init__(self, writer: TradeWriter, flush_interval: float = 2.0, heartbeat_interval: float = 15.0,
+                 stale_after: float = 60.0):
+        self.writer = writer
+        self.flush_interval = flush_interval
+        if stale_after <= heartbeat_interval:
+            raise ValueError("stale_after debe superar heartbeat_interval")
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self._books: Dict[str, SymbolBook] = {}
+        self._live_sessions: Set[int] = set()
+        self._last_heartbeat = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushed = 0
+
+    # ==================== CICLO DE VIDA ====================
+
+    def start(self):
+        if self._thread:
+            return
+        try:
+            self.load()
+        except Exception as e:
+            logger.error(f"❌ Error cargando posiciones abiertas: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mark-to-market", daemon=True)
+        self._thread.start()
+        logger.info(f"💹 Mark-to-market iniciado (intervalo={self.flush_interval}s)")
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def load(self) -> int:
+        """Carga en memoria las posiciones abiertas y marca los trades reales que nadie vigila"""
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(_DROP_CLOSED_SQL)
+            dropped = cursor.fetchall()
+            cursor.execute(_FLAG_UNWATCHED_SQL, {'stale_after': self.stale_after})
+            flagged = cursor.fetchall()
+            cursor.execute(_LOAD_SQL)
+            columns = [c[0] for c in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        if dropped:
+            logger.info(f"💹 {len(dropped)} posiciones de trades ya cerrados eliminadas")
+        if flagged:
+            logger.warning(f"⚠️ Trades reales {[trade_id for trade_id, _ in flagged]} abiertos sin bot: "
+                           f"quedan abiertos y pendientes de conciliar en el exchange")
+        cache = get_dashboard_cache()
+        for session_id in {session_id for _, session_id in dropped}:
+            cache.invalidate(session_id, 'position')
+
+        with self._lock:
+            self._books = {}
+            for position in rows:
+                self._book(position['symbol']).add(position)
+        if rows:
+            logger.info(f"💹 {len(rows)} posiciones abiertas cargadas")
+        return len(rows)
+
+    def adopt(self, user_id: int, session_id: int) -> List[Dict]:
+        """
+        Traspasa a `session_id` las posiciones abiertas de las sesiones del
+        usuario sin bot vivo (detenidas, o 'running' sin latido en
+        stale_after segundos, que quedan 'stopped'), junto con sus trades.
+        Los trades reales adoptados quedan marcados para conciliar: estuvieron
+        sin vigilancia. Devuelve el estado valorado de cada posición con su
+        trade en 'trade'.
+        """
+        params = {'user_id': user_id, 'session_id': session_id, 'stale_after': self.stale_after}
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(_STOP_DEAD_SQL, params)
+            stopped = [row[0] for row in cursor.fetchall()]
+            cursor.execute(_ADOPT_TRADES_SQL, params)
+            columns = [c[0] for c in cursor.description]
+            trades = {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+            positions = []
+            if trades:
+                cursor.execute(_ADOPT_POSITIONS_SQL, {**params, 'trade_ids': list(trades)})
+                columns = [c[0] for c in cursor.description]
+                positions = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if stopped:
+            logger.info(f"💹 Sesiones {stopped} sin latido detenidas")
+        if not positions:
+            return []
+
+        previous = {trade.pop('previous_session_id') for trade in trades.values()}
+        adopted = []
+        with self._lock:
+            for position in positions:
+                trade = {k: float(v) if isinstance(v, Decimal) else v
+                         for k, v in trades[position['trade_id']].items()}
+                book = self._book(position['symbol'])
+                row = book._row.get(position['id'])
+                if row is None:
+                    # Abierta por otro proceso después de load()
+                    book.add({**position, 'real_trade': trade['real_trade']})
+                    row = book._row[position['id']]
+                book.session_ids[row] = session_id
+                adopted.append({**book.as_dict(row), 'trade': trade})
+        cache = get_dashboard_cache()
+        for changed_id in previous | {session_id}:
+            cache.invalidate(changed_id, 'trade')
+        logger.info(f"💹 {len(adopted)} posiciones de las sesiones {sorted(previous)} pasan a la sesión {session_id}")
+        return adopted
+
+    # ==================== LATIDO ====================
+
+    def attach(self, session_id: int):
+        """La sesión corre en este proceso: late desde ya y en cada heartbeat_interval"""
+        with self._lock:
+            self._live_sessions.add(session_id)
+        self.heartbeat([session_id])
+
+    def detach(self, session_id: int):
+        with self._lock:
+            self._live_sessions.discard(session_id)
+
+    def heartbeat(self, session_ids: Optional[List[int]] = None) -> bool:
+        if session_ids is None:
+            with self._lock:
+                session_ids = list(self._live_sessions)
+        if not session_ids:
+            return True
+        # Un fallo no puede tumbar el hilo: sin latido otro proceso adoptaría sus posiciones
+        conn = None
+        try:
+            conn = engine.raw_connection()
+            conn.cursor().execute(_HEARTBEAT_SQL, (session_ids,))
+            conn.commit()
+            return True
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+            logger.error(f"❌ Error actualizando el latido de las sesiones {session_ids}: {e}")
+            return False
+        finally:
+            if conn is not None:
+                conn.close()
+
+    # ==================== POSICIONES ====================
+
+    def _book(self, symbol: str) -> SymbolBook:
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = SymbolBook(symbol)
+        return book
+
+    def open_position(self, session_id: int, trade_id: int, symbol: str, quantity: float, entry_price: float,
+                      stop_loss: float, take_profit: float, real_trade: bool = False) -> Dict:
+        """Alta en memoria y persistencia write-behind; quantity < 0 para cortos"""
+        position = {
+            'id': self.writer.next_id('positions'),
+            'session_id': session_id,
+            'trade_id': trade_id,
+            'symbol': symbol,
+            'quantity': quantity,
+            'entry_price': entry_price,
+            'current_price': entry_price,
+            'stop_loss': stop_loss,
+            'take_profit': take_profit,
+            'created_at': datetime.now(timezone.utc)
+        }
+        with self._lock:
+            book = self._book(symbol)
+            # real_trade vive en trades: sólo en memoria, para no consultarlo al servir posiciones
+            book.add({**position, 'real_trade': real_trade})
+            state = book.as_dict(book._row[position['id']])
+        self.writer.submit('positions', {
+            **position,
+            'current_price': state['current_price'],
+            'unrealized_pnl': state['unrealized_pnl'],
+            'unrealized_pnl_percent': state['unrealized_pnl_percent']
+        })
+        get_dashboard_cache().invalidate(session_id, 'position')
+        return state
+
+    def close_position(self, position_id: int, symbol: str) -> Optional[Dict]:
+        """Baja en memoria y en BD; devuelve el último estado valorado"""
+        with self._lock:
+            book = self._books.get(symbol)
+            state = book.remove(position_id) if book else None
+        if state is not None:
+            self.writer.submit_delete('positions', position_id)
+            get_dashboard_cache().invalidate(state['session_id'], 'position')
+        return state
+
+    def update_position(self, position_id: int, symbol: str, quantity: Optional[float] = None,
+                        stop_loss: Optional[float] = None) -> bool:
+        """Reducción parcial o stop movido; se persiste en el siguiente volcado"""
+        with self._lock:
+            book = self._books.get(symbol)
+            row = book._row.get(position_id) if book else None
+            if row is None:
+                return False
+            session_id = int(book.session_ids[row])
+            book.update(position_id, quantity, stop_loss)
+        get_dashboard_cache().invalidate(session_id, 'position')
+        return True
+
+    # ==================== PRECIOS ====================
+
+    def on_price(self, symbol: str, price: float):
+        book = self._books.get(symbol)
+        if book is None or book.price == price:
+            return
+        stream = get_dashboard_stream()
+        with self._lock:
+            book.mark(price)
+            marks = book.marks() if stream.enabled else {}
+        # Un delta por sesión con las posiciones del símbolo recién valoradas
+        for session_id, positions in marks.items():
+            stream.publish(session_id, MARKS, {'symbol': symbol, 'price': price, 'positions': positions})
+
+    # ==================== LECTURA ====================
+
+    def positions(self, session_id: int) -> List[Dict]:
+        with self._lock:
+            return [
+                book.as_dict(int(row))
+                for book in self._books.values()
+                for row in np.flatnonzero(book.session_ids == session_id)
+            ]
+
+    def unrealized_pnl(self, session_id: int) -> float:
+        with self._lock:
+            return float(sum(book.unrealized_pnl[book.session_ids == session_id].sum()
+                             for book in self._books.values()))
+
+    # ==================== VOLCADO ====================
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            now = time.monotonic()
+            if now - self._last_heartbeat >= self.heartbeat_interval:
+                self._last_heartbeat = now
+                self.heartbeat()
+
+    def flush(self) -> int:
+        with self._lock:
+            dirty = [book for book in self._books.values() if book.dirty]
+            rows: List[MarkRow] = []
+            sessions = set()
+            for book in dirty:
+                rows.extend(book.mark_rows())
+                sessions.update(book.session_ids.tolist())
+                book.dirty = False
+        if not rows:
+            return 0
+
+        # El dashboard lee las posiciones de memoria: sus precios se refrescan
+        # como mucho una vez por volcado aunque la escritura falle
+        cache = get_dashboard_cache()
+        for session_id in sessions:
+            cache.invalidate(session_id, 'position')
+
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            updated = execute_values(cursor, _UPDATE_SQL, rows, template=_UPDATE_TEMPLATE,
+                                     page_size=len(rows), fetch=True)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            with self._lock:
+                for book in dirty:
+                    book.dirty = True  # Se reintenta en el siguiente volcado
+            logger.error(f"❌ Error valorando {len(rows)} posiciones: {e}")
+            return 0
+        finally:
+            conn.close()
+
+        # Posiciones cuyo INSERT sigue en la cola del TradeWriter: el UPDATE no
+        # las encontró, su símbolo sigue pendiente (las ya cerradas no cuentan)
+        missing = {row[0] for row in rows} - {row[0] for row in updated}
+        if missing:
+            with self._lock:
+                for book in dirty:
+                    if any(position_id in book._row for position_id in missing):
+                        book.dirty = True
+        self.flushed += len(rows) - len(missing)
+        return len(rows) - len(missing)
+
+
+_service: Optional[MarkToMarketService] = None
+_service_lock = threading.Lock()
+
+
+def get_mark_to_market(config: Optional[Dict] = None, writer: Optional[TradeWriter] = None) -> MarkToMarketService:
+    """Libro de posiciones compartido por los bots y los endpoints del proceso"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            config = config or {}
+            _service = MarkToMarketService(
+                writer or get_trade_writer(),
+                flush_interval=config.get('flush_interval', 2.0),
+                heartbeat_interval=config.get('heartbeat_interval', 15.0),
+                stale_after=config.get('stale_after', 60.0)
+            )
+            _service.start()
+        return _service
@@ -0,0 +1,210 @@
+# app/services/market_buffer.py
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.resampler import INTERVAL_MS, KlineResampler
+
+logger = logging.getLogger(__name__)
+
+
+class KlineRingBuffer:
+    """
+    Buffer circular de velas OHLCV de capacidad fija respaldado por arrays numpy.
+
+    Las escrituras son O(1): una vela nueva sobrescribe la más antigua y la vela
+    en curso se corrige en su lugar.
+    """
+
+    __slots__ = ('capacity', 'open_time', 'open', 'high', 'low', 'close', 'volume',
+                 '_head', '_size', '_last', '_last_open_time')
+
+    def __init__(self, capacity: int = 500):
+        self.capacity = capacity
+        self.open_time = np.zeros(capacity, dtype=np.int64)
+        self.open = np.zeros(capacity, dtype=np.float64)
+        self.high = np.zeros(capacity, dtype=np.float64)
+        self.low = np.zeros(capacity, dtype=np.float64)
+        self.close = np.zeros(capacity, dtype=np.float64)
+        self.volume = np.zeros(capacity, dtype=np.float64)
+        self._head = 0   # Próxima posición a escribir
+        self._size = 0
+        self._last = capacity - 1  # Posición de la última vela escrita
+        self._last_open_time: Optional[int] = None  # Copia Python para evitar leer numpy en cada upsert
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        return self._last_open_time
+
+    @property
+    def last_close(self) -> Optional[float]:
+        return float(self.close[self._last]) if self._size else None
+
+    def last_bar(self) -> Optional[Tuple[int, float, float, float, float, float]]:
+        """Última vela como tupla (open_time, open, high, low, close, volume)"""
+        if not self._size:
+            return None
+        i = self._last
+        return (int(self.open_time[i]), float(self.open[i]), float(self.high[i]),
+                float(self.low[i]), float(self.close[i]), float(self.volume[i]))
+
+    def append(self, open_time: int, open_: float, high: float, low: float, close: float, volume: float):
+        """Agrega una vela nueva, descartando la más antigua si el buffer está lleno"""
+        i = self._head
+        self.open_time[i] = open_time
+        self.open[i] = open_
+        self.high[i] = high
+        self.low[i] = low
+        self.close[i] = close
+        self.volume[i] = volume
+        self._last_open_time = open_time
+        self._last = i
+        self._head = (i + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def update_last(self, high: float, low: float, close: float, volume: float):
+        """Corrige en su lugar la última vela (vela todavía abierta)"""
+        i = self._last
+        self.high[i] = high
+        self.low[i] = low
+        self.close[i] = close
+        self.volume[i] = volume
+
+    def upsert(self, open_time: int, open_: float, high: float, low: float, close: float, volume: float):
+        """
+        Actualiza la última vela si tiene el mismo open_time o agrega una nueva.
+        Velas más antiguas que la última se ignoran.
+        """
+        last = self._last_open_time
+        if last is not None and open_time == last:
+            self.update_last(high, low, close, volume)
+        elif last is None or open_time > last:
+            self.append(open_time, open_, high, low, close, volume)
+
+    def _ordered(self, column: np.ndarray, n: Optional[int] = None) -> np.ndarray:
+        """Devuelve las últimas n posiciones de una columna en orden cronológico"""
+        size = self._size if n is None else min(n, self._size)
+        if size == 0:
+            return column[:0].copy()
+        start = (self._head - size) % self.capacity
+        if start + size <= self.capacity:
+            return column[start:start + size]
+        return np.concatenate((column[start:], column[:self._head]))
+
+    def closes(self, n: Optional[int] = None) -> np.ndarray:
+        return self._ordered(self.close, n)
+
+    def volumes(self, n: Optional[int] = None) -> np.ndarray:
+        return self._ordered(self.volume, n)
+
+    def open_times(self, n: Optional[int] = None) -> np.ndarray:
+        return self._ordered(self.open_time, n)
+
+    def to_klines(self, n: Optional[int] = None) -> List[Dict]:
+        """Formato de lista de dicts compatible con el resto del código"""
+        return [
+            {
+                'open_time': int(t), 'open': float(o), 'high': float(h),
+                'low': float(l), 'close': float(c), 'volume': float(v)
+            }
+            for t, o, h, l, c, v in zip(
+                self._ordered(self.open_time, n), self._ordered(self.open, n),
+                self._ordered(self.high, n), self._ordered(self.low, n),
+                self._ordered(self.close, n), self._ordered(self.volume, n)
+            )
+        ]
+
+
+class MarketDataBuffer:
+    """
+    Conjunto de buffers circulares por símbolo/timeframe.
+
+    Se precarga una sola vez vía REST al iniciar el bot y luego se mantiene
+    actualizado con el stream de klines de 1m; los timeframes mayores se
+    construyen con KlineResampler.
+    """
+
+    def __init__(self, capacity: int = 500):
+        self.capacity = capacity
+        self._buffers: Dict[Tuple[str, str], KlineRingBuffer] = {}
+        self._lock = threading.Lock()
+        self.resampler = KlineResampler([])
+
+    def get(self, symbol: str, timeframe: str) -> Optional[KlineRingBuffer]:
+        return self._buffers.get((symbol, timeframe))
+
+    def _get_or_create(self, symbol: str, timeframe: str) -> KlineRingBuffer:
+        key = (symbol, timeframe)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = KlineRingBuffer(self.capacity)
+        return buffer
+
+    @staticmethod
+    def _parse_kline(kline) -> Tuple[int, float, float, float, float, float]:
+        """Acepta tanto listas de la API REST de Binance como dicts"""
+        if isinstance(kline, dict):
+            return (int(kline['open_time']), float(kline['open']), float(kline['high']),
+                    float(kline['low']), float(kline['close']), float(kline['volume']))
+        return (int(kline[0]), float(kline[1]), float(kline[2]),
+                float(kline[3]), float(kline[4]), float(kline[5]))
+
+    def load(self, symbol: str, timeframe: str, klines: Iterable):
+        """Carga velas históricas (ordenadas por open_time) en el buffer"""
+        with self._lock:
+            buffer = self._get_or_create(symbol, timeframe)
+            for kline in klines:
+                buffer.upsert(*self._parse_kline(kline))
+
+    def seed(self, exchange, symbols: Iterable[str], timeframes: Iterable[str]):
+        """
+        Warm-up: una única llamada REST por símbolo/timeframe. A partir de ahí
+        todos los timeframes se construyen desde el stream de 1m.
+        """
+        timeframes = list(dict.fromkeys(['1m', *timeframes]))
+        self.resampler = KlineResampler(timeframes)
+        for symbol in symbols:
+            for timeframe in timeframes:
+                try:
+                    klines = exchange.get_klines(symbol=symbol, interval=timeframe, limit=self.capacity)
+                    self.load(symbol, timeframe, klines)
+                    logger.info(f"📦 Buffer {symbol} {timeframe}: {len(klines)} velas precargadas")
+                except Exception as e:
+                    logger.error(f"❌ Error precargando {symbol} {timeframe}: {e}")
+
+            minute = self.get(symbol, '1m')
+            minute_bar = minute.last_bar() if minute else None
+            for timeframe in timeframes:
+                buffer = self.get(symbol, timeframe)
+                if buffer and timeframe != '1m':
+                    self.resampler.seed(symbol, timeframe, buffer.last_bar(), minute_bar)
+
+    def on_kline(self, symbol: str, open_time: int, open_: float, high: float, low: float,
+                 close: float, volume: float, is_closed: bool) -> List[Tuple]:
+        """
+        Aplica una vela de 1m del stream al buffer de 1m y, vía el resampler,
+        a los timeframes mayores del símbolo.
+
+        Devuelve las velas que se cerraron con este mensaje como tuplas
+        (timeframe, open_time, open, high, low, close, volume).
+        """
+        closed = []
+        with self._lock:
+            minute = self._buffers.get((symbol, '1m'))
+            if minute is not None:
+                minute.upsert(open_time, open_, high, low, close, volume)
+
+            for timeframe, bar_time, o, h, l, c, v, bar_closed in self.resampler.on_minute(
+                    symbol, open_time, open_, high, low, close, volume, is_closed):
+                buffer = self._buffers.get((symbol, timeframe))
+                if buffer is not None:
+                    buffer.upsert(bar_time, o, h, l, c, v)
+                if bar_closed:
+                    closed.append((timeframe, bar_time, o, h, l, c, v))
+        return closed
@@ -0,0 +1,172 @@
+# app/services/market_data_ingestor.py
+import io
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from app.models.base import engine
+from app.services.kline_archive import KlineArchive
+
+logger = logging.getLogger(__name__)
+
+KlineRow = Tuple[str, str, int, float, float, float, float, float]
+
+
+class MarketDataIngestor:
+    """
+    Persiste velas cerradas en market_data desde un hilo en segundo plano.
+
+    El callback del websocket sólo encola la vela (sin tocar la BD); el hilo
+    escritor agrupa las velas y las vuelca con COPY a una tabla temporal
+    seguida de un INSERT ... ON CONFLICT DO NOTHING sobre
+    (symbol, interval, timestamp).
+
+    Con `archive`, el mismo hilo agrega cada lote al KlineArchive, así que
+    la E/S de disco tampoco pasa por el hilo del stream. persist=False deja
+    sólo el archivo.
+    """
+
+    def __init__(self, batch_size: int = 500, flush_interval: float = 5.0, max_queue: int = 100_000,
+                 persist: bool = True, archive: Optional[KlineArchive] = None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.persist = persist
+        self.archive = archive
+        self._queue: "queue.Queue[Optional[KlineRow]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.dropped = 0
+        self.written = 0
+
+    # ==================== API ====================
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="market-data-ingestor", daemon=True)
+        self._thread.start()
+        logger.info(f"📥 Ingesta de market_data iniciada (batch={self.batch_size}, intervalo={self.flush_interval}s)")
+
+    def stop(self, timeout: float = 10.0):
+        self._running = False
+        if self._thread:
+            # Despierta al writer si está esperando en la cola
+            self._queue.put(None, timeout=timeout)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, symbol: str, interval: str, open_time: int, open_: float, high: float,
+               low: float, close: float, volume: float):
+        """Encola una vela cerrada; nunca bloquea al llamador"""
+        try:
+            self._queue.put_nowait((symbol, interval, open_time, open_, high, low, close, volume))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"⚠️ Cola de market_data llena, {self.dropped} velas descartadas")
+
+    # ==================== WRITER ====================
+
+    def _run(self):
+        pending: Dict[Tuple[str, str, int], KlineRow] = {}
+        last_flush = time.monotonic()
+
+        while self._running or not self._queue.empty():
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                row = self._queue.get(timeout=timeout)
+                if row is not None:
+                    # Deduplicar dentro del lote: la última versión de la vela gana
+                    pending[(row[0], row[1], row[2])] = row
+            except queue.Empty:
+                pass
+
+            due = time.monotonic() - last_flush >= self.flush_interval
+            # Al parar se vacía antes la cola: el último lote sale entero y deduplicado
+            draining = not self._running and self._queue.empty()
+            if pending and (len(pending) >= self.batch_size or due or draining):
+                self._flush(list(pending.values()))
+                pending.clear()
+            if due or not pending:
+                last_flush = time.monotonic()
+
+        if pending:
+            self._flush(list(pending.values()))
+
+    def _flush(self, rows: List[KlineRow]):
+        if self.archive:
+            self._archive(rows)
+        if self.persist:
+            self._persist(rows)
+
+    def _archive(self, rows: List[KlineRow]):
+        series: Dict[Tuple[str, str], List[Tuple]] = defaultdict(list)
+        for symbol, interval, *bar in rows:
+            series[(symbol, interval)].append(tuple(bar))
+        for (symbol, interval), bars in series.items():
+            bars.sort(key=lambda bar: bar[0])
+            try:
+                self.archive.append_many(symbol, interval, bars)
+            except Exception as e:
+                logger.error(f"❌ Error archivando velas {symbol} {interval} ({len(bars)}): {e}")
+
+    def _persist(self, rows: List[KlineRow]):
+        buf = io.StringIO()
+        for symbol, interval, open_time, o, h, l, c, v in rows:
+            buf.write(f"{symbol}\t{interval}\t{open_time}\t{o!r}\t{h!r}\t{l!r}\t{c!r}\t{v!r}\n")
+        buf.seek(0)
+
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SET LOCAL TIME ZONE 'UTC'")
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS market_data_stage (
+                    symbol VARCHAR(20), interval VARCHAR(10), open_time BIGINT,
+                    open DOUBLE PRECISION, high DOUBLE PRECISION, low DOUBLE PRECISION,
+                    close DOUBLE PRECISION, volume DOUBLE PRECISION
+                ) ON COMMIT DELETE ROWS
+            """)
+            cursor.copy_expert(
+                "COPY market_data_stage (symbol, interval, open_time, open, high, low, close, volume) FROM STDIN",
+                buf
+            )
+            cursor.execute("""
+                INSERT INTO market_data (symbol, interval, timestamp, open, high, low, close, volume)
+                SELECT symbol, interval, to_timestamp(open_time / 1000.0), open, high, low, close, volume
+                FROM market_data_stage
+                ON CONFLICT (symbol, interval, timestamp) DO NOTHING
+            """)
+            conn.commit()
+            self.written += len(rows)
+            logger.debug(f"📥 {len(rows)} velas persistidas en market_data")
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error persistiendo market_data ({len(rows)} velas): {e}")
+        finally:
+            conn.close()
+
+
+_ingestor: Optional[MarketDataIngestor] = None
+_ingestor_lock = threading.Lock()
+
+
+def get_ingestor(config: Optional[Dict] = None, archive: Optional[KlineArchive] = None) -> MarketDataIngestor:
+    """Ingestor compartido por todos los bots del proceso (market_data y/o KlineArchive)"""
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            config = config or {}
+            _ingestor = MarketDataIngestor(
+                batch_size=config.get('batch_size', 500),
+                flush_interval=config.get('flush_interval', 5.0),
+                max_queue=config.get('max_queue', 100_000),
+                persist=config.get('enabled', True),
+                archive=archive
+            )
+            _ingestor.start()
+        return _ingestor
@@ -0,0 +1,235 @@
+# app/services/market_stream.py
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+MAINNET_STREAM_URL = 'wss://stream.binance.com:9443/stream'
+TESTNET_STREAM_URL = 'wss://testnet.binance.vision/stream'
+
+# Límites de Binance: 1024 streams por conexión y 5 mensajes de control por segundo
+MAX_STREAMS_PER_CONNECTION = 1024
+CONTROL_INTERVAL = 0.25
+MAX_PARAMS_PER_REQUEST = 200
+# Streams incluidos en la URL al conectar; el resto se agrega con SUBSCRIBE
+MAX_URL_STREAMS = 100
+
+StreamCallback = Callable[[Dict], None]
+
+
+def kline_stream(symbol: str, interval: str = '1m') -> str:
+    return f"{symbol.lower()}@kline_{interval}"
+
+
+class MarketStream:
+    """
+    Conexión única al endpoint de streams combinados de Binance
+    (/stream?streams=a@kline_1m/b@kline_1m/...) sobre asyncio, compartida por
+    todos los bots del proceso.
+
+    Las suscripciones se agregan y quitan en caliente con SUBSCRIBE/UNSUBSCRIBE
+    sobre la misma conexión. Cada stream mantiene su lista de callbacks; el
+    stream se da de baja en Binance cuando no le queda ningún callback.
+    """
+
+    def __init__(self, url: str = TESTNET_STREAM_URL, reconnect_delay: float = 1.0,
+                 max_reconnect_delay: float = 60.0):
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._callbacks: Dict[str, Tuple[StreamCallback, ...]] = {}
+        self._active: Set[str] = set()  # Streams suscritos en la conexión actual
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._ws = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.messages = 0
+        self.reconnects = 0
+
+    # ==================== API ====================
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="market-stream", daemon=True)
+        self._thread.start()
+        logger.info(f"🔌 Stream de mercado iniciado ({self.url})")
+
+    def stop(self, timeout: float = 5.0):
+        if not self._running:
+            return
+        self._running = False
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def subscribe(self, streams: Iterable[str], callback: StreamCallback):
+        """Registra el callback para los streams; los nuevos se suscriben sin reconectar"""
+        with self._lock:
+            for stream in streams:
+                callbacks = self._callbacks.get(stream, ())
+                if callback not in callbacks:
+                    # Copy-on-write: _dispatch lee las tuplas sin tomar el lock
+                    self._callbacks[stream] = (*callbacks, callback)
+            total = len(self._callbacks)
+        if total > MAX_STREAMS_PER_CONNECTION:
+            logger.warning(f"⚠️ {total} streams superan el límite de {MAX_STREAMS_PER_CONNECTION} por conexión")
+        self._notify()
+
+    def unsubscribe(self, streams: Iterable[str], callback: StreamCallback):
+        with self._lock:
+            for stream in streams:
+                callbacks = self._callbacks.get(stream, ())
+                if callback in callbacks:
+                    remaining = tuple(c for c in callbacks if c != callback)
+                    if remaining:
+                        self._callbacks[stream] = remaining
+                    else:
+                        del self._callbacks[stream]
+        self._notify()
+
+    def unsubscribe_all(self, callback: StreamCallback):
+        with self._lock:
+            streams = [s for s, callbacks in self._callbacks.items() if callback in callbacks]
+        self.unsubscribe(streams, callback)
+
+    @property
+    def streams(self) -> List[str]:
+        with self._lock:
+            return sorted(self._callbacks)
+
+    # ==================== LOOP ====================
+
+    def _notify(self):
+        """Despierta al sincronizador de suscripciones desde cualquier hilo"""
+        if self._loop is not None and self._wakeup is not None and self._running:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main())
+        finally:
+            self._loop.close()
+
+    async def _shutdown(self):
+        if self._ws is not None:
+            await self._ws.close()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _main(self):
+        self._wakeup = asyncio.Event()
+        delay = self.reconnect_delay
+
+        while self._running:
+            streams = self.streams
+            if not streams:
+                # Sin suscripciones no se mantiene conexión abierta
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            initial = streams[:MAX_URL_STREAMS]
+            url = f"{self.url}?streams={'/'.join(initial)}"
+            try:
+                async with websockets.connect(url, max_size=2 ** 22) as ws:
+                    self._ws = ws
+                    self._active = set(initial)
+                    delay = self.reconnect_delay
+                    logger.info(f"✅ Stream combinado conectado con {len(initial)} streams")
+
+                    self._wakeup.set()  # Suscribir el resto y los cambios ocurridos al conectar
+                    sync = asyncio.ensure_future(self._sync_subscriptions(ws))
+                    try:
+                        async for raw in ws:
+                            self._dispatch(raw)
+                    finally:
+                        sync.cancel()
+            except Exception as e:
+                if self._running:
+                    logger.error(f"❌ Stream combinado desconectado: {e}")
+            finally:
+                self._ws = None
+                self._active = set()
+
+            if self._running:
+                self.reconnects += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+        logger.info("🔌 Stream de mercado detenido")
+
+    async def _sync_subscriptions(self, ws):
+        """Lleva los streams activos de la conexión al conjunto deseado"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            while True:
+                with self._lock:
+                    desired = set(self._callbacks)
+                to_remove = sorted(self._active - desired)[:MAX_PARAMS_PER_REQUEST]
+                to_add = sorted(desired - self._active)[:MAX_PARAMS_PER_REQUEST]
+                if not to_remove and not to_add:
+                    break
+
+                if to_remove:
+                    await self._send(ws, 'UNSUBSCRIBE', to_remove)
+                    self._active.difference_update(to_remove)
+                if to_add:
+                    await self._send(ws, 'SUBSCRIBE', to_add)
+                    self._active.update(to_add)
+
+    async def _send(self, ws, method: str, params: List[str]):
+        await ws.send(json.dumps({'method': method, 'params': params, 'id': next(self._ids)}))
+        logger.debug(f"🔌 {method} {len(params)} streams")
+        await asyncio.sleep(CONTROL_INTERVAL)
+
+    def _dispatch(self, raw):
+        message = json.loads(raw)
+        stream = message.get('stream')
+        if stream is None:
+            # Respuestas a SUBSCRIBE/UNSUBSCRIBE: {"result": null, "id": n}
+            if message.get('error'):
+                logger.error(f"❌ Error de suscripción: {message['error']}")
+            return
+
+        self.messages += 1
+        for callback in self._callbacks.get(stream, ()):
+            try:
+                callback(message['data'])
+            except Exception as e:
+                logger.error(f"❌ Error en callback de {stream}: {e}")
+
+
+_streams: Dict[str, MarketStream] = {}
+_streams_lock = threading.Lock()
+
+
+def get_market_stream(config: Optional[Dict] = None, testnet: bool = True) -> MarketStream:
+    """Conexión compartida por todos los bots del proceso (una por endpoint)"""
+    config = config or {}
+    url = config.get('testnet_url', TESTNET_STREAM_URL) if testnet else config.get('url', MAINNET_STREAM_URL)
+    with _streams_lock:
+        stream = _streams.get(url)
+        if stream is None:
+            stream = _streams[url] = MarketStream(
+                url,
+                reconnect_delay=config.get('reconnect_delay', 1.0),
+                max_reconnect_delay=config.get('max_reconnect_delay', 60.0)
+            )
+            stream.start()
+        return stream
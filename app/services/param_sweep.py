@@ -0,0 +1,166 @@
+# app/services/param_sweep.py
+import argparse
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import yaml
+
+from app.services.backtest_service import ENGINE_PARAMS, BacktestEngine
+from app.services.kline_archive import KlineArchive, get_archive
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '../../config.yaml')
+
+# Criterios de ranking: (clave del resumen, mayor es mejor)
+RANK_KEYS = {
+    'total_pnl': True,
+    'sharpe_ratio': True,
+    'max_drawdown': False,
+}
+
+# Estado por proceso worker: las series son vistas memmap del KlineArchive,
+# por lo que todos los workers comparten las páginas del page cache del SO
+_worker_state: Dict = {}
+
+
+def expand_grid(grid: Dict[str, Sequence]) -> List[Dict]:
+    """
+    Producto cartesiano de la grilla, descartando combinaciones sin sentido.
+    Sólo admite parámetros que el motor usa (ENGINE_PARAMS): con cualquier
+    otro todas las combinaciones serían el mismo backtest.
+    """
+    unknown = sorted(set(grid) - set(ENGINE_PARAMS))
+    if unknown:
+        raise ValueError(f"Parámetros no soportados por el backtest: {', '.join(unknown)} "
+                         f"(admitidos: {', '.join(ENGINE_PARAMS)})")
+    keys = list(grid.keys())
+    combos = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        params = dict(zip(keys, values))
+        if 'sma_fast' in params and 'sma_slow' in params and params['sma_fast'] >= params['sma_slow']:
+            continue
+        combos.append(params)
+    return combos
+
+
+def _init_worker(archive_root: str, config_yaml: Dict, strategy_name: str, symbols: List[str],
+                 interval: str, start_ms: Optional[int], end_ms: Optional[int]):
+    archive = KlineArchive(archive_root)
+    _worker_state['series'] = BacktestEngine.load_archive(archive, symbols, interval, start_ms, end_ms)
+    _worker_state['config_yaml'] = config_yaml
+    _worker_state['strategy_name'] = strategy_name
+
+
+def _evaluate(params: Dict) -> Dict:
+    engine = BacktestEngine.from_config(_worker_state['config_yaml'], _worker_state['strategy_name'], params)
+    summary = engine.run(_worker_state['series'], include_details=False)['summary']
+    return {'params': params, **summary}
+
+
+def rank_results(results: List[Dict], sort_by: Sequence[str] = ('total_pnl', 'max_drawdown', 'sharpe_ratio')) -> List[Dict]:
+    """
+    Ordena los resultados por los criterios indicados (en orden de prioridad)
+    y agrega la posición de cada combinación en cada criterio individual.
+    """
+    for key, higher_is_better in RANK_KEYS.items():
+        ordered = sorted(results, key=lambda r: r[key], reverse=higher_is_better)
+        for position, result in enumerate(ordered, start=1):
+            result[f'rank_{key}'] = position
+
+    def sort_key(result):
+        return tuple(-result[k] if RANK_KEYS[k] else result[k] for k in sort_by)
+
+    return sorted(results, key=sort_key)
+
+
+def run_sweep(grid: Dict[str, Sequence], symbols: Optional[List[str]] = None, interval: str = '1m',
+              start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+              strategy_name: Optional[str] = None, max_workers: Optional[int] = None,
+              config_yaml: Optional[Dict] = None, archive_root: Optional[str] = None) -> List[Dict]:
+    """
+    Ejecuta un backtest por combinación de la grilla repartiendo el trabajo en
+    todos los núcleos con un ProcessPoolExecutor.
+
+    Cada worker abre el KlineArchive una sola vez en su inicializador; a las
+    tareas sólo se les envían los parámetros, nunca el historial de precios.
+    """
+    if config_yaml is None:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            config_yaml = yaml.safe_load(f)
+
+    strategies = config_yaml.get('strategies', {})
+    strategy_name = strategy_name or strategies.get('default', 'quantum_v1')
+    if strategy_name not in strategies.get('available', {}):
+        raise ValueError(f"Estrategia desconocida: {strategy_name}")
+
+    archive = KlineArchive(archive_root) if archive_root else get_archive(
+        config_yaml.get('market_data', {}).get('archive', {})
+    )
+    symbols = symbols or config_yaml.get('trading', {}).get('available_pairs', [])
+
+    combos = expand_grid(grid)
+    if not combos:
+        return []
+
+    max_workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(combos) // (max_workers * 8))
+    logger.info(f"🧪 Barrido {strategy_name}: {len(combos)} combinaciones en {max_workers} procesos")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(archive.root, config_yaml, strategy_name, symbols, interval, start_ms, end_ms)
+    ) as executor:
+        results = list(executor.map(_evaluate, combos, chunksize=chunksize))
+
+    logger.info(f"✅ Barrido completado en {time.perf_counter() - started:.1f}s")
+    return rank_results(results)
+
+
+def _parse_grid(items: List[str]) -> Dict[str, List]:
+    """Convierte ['sma_fast=5,8,12', ...] en {'sma_fast': [5, 8, 12], ...}"""
+    grid = {}
+    for item in items:
+        name, _, values = item.partition('=')
+        grid[name.strip()] = [yaml.safe_load(v) for v in values.split(',') if v.strip()]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de parámetros de estrategia")
+    parser.add_argument('--grid', action='append', required=True,
+                        help=f"param=v1,v2,... (repetible; param en {', '.join(ENGINE_PARAMS)})")
+    parser.add_argument('--strategy', default=None)
+    parser.add_argument('--symbols', default=None, help="Lista separada por comas")
+    parser.add_argument('--interval', default='1m')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    grid = _parse_grid(args.grid)
+    try:
+        expand_grid(grid)
+    except ValueError as e:
+        parser.error(str(e))
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = run_sweep(
+        grid,
+        symbols=args.symbols.split(',') if args.symbols else None,
+        interval=args.interval,
+        strategy_name=args.strategy,
+        max_workers=args.workers
+    )
+    for result in results[:args.top]:
+        print(f"{result['params']} | PnL {result['total_pnl']:.2f} | DD {result['max_drawdown']:.2f}% "
+              f"| Sharpe {result['sharpe_ratio']:.2f} | trades {result['total_trades']}")
+
+
+if __name__ == '__main__':
+    main()
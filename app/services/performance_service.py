@@ -0,0 +1,163 @@
+# app/services/performance_service.py
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.models.base import engine
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ('session_id', 'last_timestamp', 'current_equity', 'peak_equity', 'peak_time',
+            'current_drawdown', 'max_drawdown', 'max_drawdown_time', 'max_drawdown_duration', 'samples')
+
+# Drawdown del snapshot entrante frente al pico previo (0 si marca un pico nuevo)
+_DRAWDOWN = ("CASE WHEN EXCLUDED.current_equity >= p.peak_equity OR p.peak_equity <= 0 THEN 0 "
+             "ELSE (p.peak_equity - EXCLUDED.current_equity) / p.peak_equity * 100 END")
+_UNDERWATER = ("CASE WHEN EXCLUDED.current_equity >= p.peak_equity THEN 0 "
+               "ELSE extract(epoch FROM EXCLUDED.last_timestamp - p.peak_time)::bigint END")
+
+# Mismas reglas que DrawdownTracker.update(), aplicadas en la BD dentro de la
+# transacción del snapshot. Los snapshots anteriores al último aplicado se ignoran.
+_UPDATE_SQL = f"""
+    INSERT INTO session_performance AS p ({', '.join(_COLUMNS)})
+    VALUES (%(session_id)s, %(timestamp)s, %(equity)s, %(equity)s, %(timestamp)s, 0, 0, NULL, 0, 1)
+    ON CONFLICT (session_id) DO UPDATE SET
+        last_timestamp = EXCLUDED.last_timestamp,
+        current_equity = EXCLUDED.current_equity,
+        peak_equity = GREATEST(p.peak_equity, EXCLUDED.current_equity),
+        peak_time = CASE WHEN EXCLUDED.current_equity >= p.peak_equity
+                         THEN EXCLUDED.last_timestamp ELSE p.peak_time END,
+        current_drawdown = {_DRAWDOWN},
+        max_drawdown = GREATEST(p.max_drawdown, {_DRAWDOWN}),
+        max_drawdown_time = CASE WHEN {_DRAWDOWN} > p.max_drawdown
+                                 THEN EXCLUDED.last_timestamp ELSE p.max_drawdown_time END,
+        max_drawdown_duration = GREATEST(p.max_drawdown_duration, {_UNDERWATER}),
+        samples = p.samples + 1
+    WHERE EXCLUDED.last_timestamp >= p.last_timestamp
+"""
+
+# Backfill: el estado recalculado reemplaza al existente
+_REPLACE_SQL = f"""
+    INSERT INTO session_performance ({', '.join(_COLUMNS)})
+    VALUES ({', '.join(f'%({c})s' for c in _COLUMNS)})
+    ON CONFLICT (session_id) DO UPDATE SET
+        {', '.join(f'{c} = EXCLUDED.{c}' for c in _COLUMNS[1:])}
+"""
+
+
+class DrawdownTracker:
+    """
+    Pico, drawdown actual, drawdown máximo y duración bajo el pico de una
+    serie de equity, actualizados en O(1) por snapshot. Se usa para el
+    backfill desde balance_history; en vivo las mismas reglas corren en SQL.
+    """
+
+    __slots__ = ('session_id', 'last_timestamp', 'current_equity', 'peak_equity', 'peak_time',
+                 'current_drawdown', 'max_drawdown', 'max_drawdown_time', 'max_drawdown_duration', 'samples')
+
+    def __init__(self, session_id: int):
+        self.session_id = session_id
+        self.last_timestamp: Optional[datetime] = None
+        self.current_equity = 0.0
+        self.peak_equity = 0.0
+        self.peak_time: Optional[datetime] = None
+        self.current_drawdown = 0.0
+        self.max_drawdown = 0.0
+        self.max_drawdown_time: Optional[datetime] = None
+        self.max_drawdown_duration = 0
+        self.samples = 0
+
+    def update(self, equity: float, timestamp: datetime):
+        if self.samples and timestamp < self.last_timestamp:
+            return
+        self.samples += 1
+        self.last_timestamp = timestamp
+        self.current_equity = equity
+
+        if self.samples == 1 or equity >= self.peak_equity:
+            self.peak_equity = equity
+            self.peak_time = timestamp
+            self.current_drawdown = 0.0
+            return
+
+        self.current_drawdown = (self.peak_equity - equity) / self.peak_equity * 100 if self.peak_equity > 0 else 0.0
+        if self.current_drawdown > self.max_drawdown:
+            self.max_drawdown = self.current_drawdown
+            self.max_drawdown_time = timestamp
+        self.max_drawdown_duration = max(self.max_drawdown_duration,
+                                         int((timestamp - self.peak_time).total_seconds()))
+
+    def as_row(self) -> Dict:
+        return {column: getattr(self, column) for column in _COLUMNS}
+
+
+def update_drawdown(cursor, session_id: int, equity: float, timestamp: datetime):
+    """Aplica un snapshot al estado de la sesión; se ejecuta en la transacción del llamador"""
+    cursor.execute(_UPDATE_SQL, {'session_id': session_id, 'equity': equity, 'timestamp': timestamp})
+
+
+def get_performance(session_id: int) -> Optional[Dict]:
+    """Estado de drawdown de la sesión (una fila por clave primaria)"""
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(_COLUMNS)} FROM session_performance WHERE session_id = %s",
+                       (session_id,))
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+
+    return format_performance(dict(zip(_COLUMNS, row))) if row else None
+
+
+def format_performance(state: Dict) -> Dict:
+    """Fila de session_performance (dict por columna) -> datos de drawdown del dashboard"""
+    in_drawdown = state['current_equity'] < state['peak_equity']
+    return {
+        'current_equity': float(state['current_equity']),
+        'peak_equity': float(state['peak_equity']),
+        'current_drawdown': float(state['current_drawdown']),
+        'max_drawdown': float(state['max_drawdown']),
+        'max_drawdown_time': state['max_drawdown_time'].isoformat() if state['max_drawdown_time'] else None,
+        'drawdown_duration': int((state['last_timestamp'] - state['peak_time']).total_seconds()) if in_drawdown else 0,
+        'max_drawdown_duration': state['max_drawdown_duration'],
+        'updated_at': state['last_timestamp'].isoformat()
+    }
+
+
+def backfill(session_id: Optional[int] = None, itersize: int = 10_000) -> int:
+    """
+    Recalcula session_performance desde balance_history recorriendo cada
+    sesión en orden con un cursor de servidor (memoria constante). Devuelve
+    el número de sesiones actualizadas.
+    """
+    trackers: Dict[int, DrawdownTracker] = {}
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor(name='performance_backfill')
+        cursor.itersize = itersize
+        # Instantes en UTC explícito: no dependen del TimeZone de la conexión
+        cursor.execute("""
+            SELECT session_id, timestamp AT TIME ZONE 'UTC', equity FROM balance_history
+            WHERE (%(session_id)s IS NULL OR session_id = %(session_id)s)
+            ORDER BY session_id, timestamp
+        """, {'session_id': session_id})
+        for sid, timestamp, equity in cursor:
+            tracker = trackers.get(sid)
+            if tracker is None:
+                tracker = trackers[sid] = DrawdownTracker(sid)
+            tracker.update(float(equity), timestamp.replace(tzinfo=timezone.utc))
+        cursor.close()
+
+        writer = conn.cursor()
+        for tracker in trackers.values():
+            writer.execute(_REPLACE_SQL, tracker.as_row())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    logger.info(f"📉 Drawdown recalculado para {len(trackers)} sesiones")
+    return len(trackers)
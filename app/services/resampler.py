@@ -0,0 +1,151 @@
+# app/services/resampler.py
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Duración de cada intervalo de Binance en milisegundos
+INTERVAL_MS = {
+    '1m': 60_000,
+    '3m': 3 * 60_000,
+    '5m': 5 * 60_000,
+    '15m': 15 * 60_000,
+    '30m': 30 * 60_000,
+    '1h': 60 * 60_000,
+    '2h': 2 * 60 * 60_000,
+    '4h': 4 * 60 * 60_000,
+    '6h': 6 * 60 * 60_000,
+    '12h': 12 * 60 * 60_000,
+    '1d': 24 * 60 * 60_000,
+}
+
+MINUTE_MS = INTERVAL_MS['1m']
+
+# (timeframe, open_time, open, high, low, close, volume, is_closed)
+BarUpdate = Tuple[str, int, float, float, float, float, float, bool]
+
+
+class _BarState:
+    """
+    Vela de timeframe mayor en construcción. Separa el agregado de las velas
+    de 1m ya cerradas del aporte de la vela de 1m en curso, que Binance
+    reenvía con valores acumulados hasta su cierre.
+    """
+
+    __slots__ = ('open_time', 'open', 'high', 'low', 'close', 'volume',
+                 'minute', 'minute_high', 'minute_low', 'minute_volume', 'last_minute')
+
+    def __init__(self, open_time: int, open_: float):
+        self.open_time = open_time
+        self.open = open_
+        self.high = float('-inf')
+        self.low = float('inf')
+        self.close = open_
+        self.volume = 0.0
+        self.minute = None          # open_time de la vela de 1m en curso
+        self.minute_high = 0.0
+        self.minute_low = 0.0
+        self.minute_volume = 0.0
+        self.last_minute = None     # open_time de la última vela de 1m aplicada
+
+    def fold_minute(self):
+        """Incorpora la vela de 1m en curso al agregado cerrado"""
+        if self.minute is None:
+            return
+        self.high = max(self.high, self.minute_high)
+        self.low = min(self.low, self.minute_low)
+        self.volume += self.minute_volume
+        self.minute = None
+
+
+class KlineResampler:
+    """
+    Construye velas de 5m/15m/1h/4h/1d a partir del stream de 1m con límites
+    alineados a UTC (open_time múltiplo del intervalo) y una vela en curso
+    que se actualiza con cada mensaje.
+    """
+
+    def __init__(self, timeframes: Iterable[str]):
+        self.timeframes = [tf for tf in timeframes if tf != '1m' and tf in INTERVAL_MS]
+        self._intervals = [(tf, INTERVAL_MS[tf]) for tf in self.timeframes]
+        # Por símbolo: timeframe -> vela en curso / open_time de la última vela cerrada
+        self._state: Dict[str, Dict[str, _BarState]] = {}
+        self._last_closed: Dict[str, Dict[str, int]] = {}
+
+    def seed(self, symbol: str, timeframe: str, bar: Optional[Tuple], minute_bar: Optional[Tuple] = None):
+        """
+        Inicializa la vela en curso desde la API REST durante el warm-up.
+        bar/minute_bar: (open_time, open, high, low, close, volume). El volumen
+        de la vela de 1m en curso se descuenta porque el stream lo volverá a aportar.
+        """
+        if bar is None or timeframe not in self.timeframes:
+            return
+        open_time, open_, high, low, close, volume = bar
+        state = _BarState(open_time, open_)
+        state.high, state.low, state.close = high, low, close
+        state.volume = volume
+        if minute_bar is not None and open_time <= minute_bar[0] < open_time + INTERVAL_MS[timeframe]:
+            state.volume = max(0.0, volume - minute_bar[5])
+        self._state.setdefault(symbol, {})[timeframe] = state
+
+    def on_minute(self, symbol: str, open_time: int, open_: float, high: float, low: float,
+                  close: float, volume: float, is_closed: bool) -> List[BarUpdate]:
+        """
+        Aplica un mensaje de kline de 1m y devuelve las velas afectadas: la
+        vela cerrada del bucket anterior (si cambió de bucket) y la vela en curso.
+        """
+        states = self._state.get(symbol)
+        if states is None:
+            states = self._state[symbol] = {}
+        last_closed = self._last_closed.get(symbol)
+        if last_closed is None:
+            last_closed = self._last_closed[symbol] = {}
+
+        updates: List[BarUpdate] = []
+        for timeframe, interval_ms in self._intervals:
+            bucket = open_time - open_time % interval_ms
+            state = states.get(timeframe)
+
+            if state is None or bucket != state.open_time:
+                if (state is not None and bucket < state.open_time) or bucket <= last_closed.get(timeframe, -1):
+                    continue  # Mensaje atrasado de un bucket ya cerrado
+
+                if state is not None:
+                    state.fold_minute()
+                    updates.append((timeframe, state.open_time, state.open, state.high, state.low,
+                                    state.close, state.volume, True))
+                    last_closed[timeframe] = state.open_time
+
+                state = states[timeframe] = _BarState(bucket, open_)
+
+            if state.last_minute is not None and open_time < state.last_minute:
+                # Mensaje atrasado de un minuto ya superado: solo aporta sus extremos,
+                # el cierre y el volumen ya los fijó el minuto posterior
+                state.high = max(state.high, high)
+                state.low = min(state.low, low)
+                continue
+
+            if state.minute is not None and state.minute != open_time:
+                # No llegó el cierre de la vela de 1m anterior: se toma como final
+                state.fold_minute()
+            state.minute = state.last_minute = open_time
+            state.minute_high = high
+            state.minute_low = low
+            state.minute_volume = volume
+            state.close = close
+
+            if is_closed:
+                state.fold_minute()
+                bar_closed = open_time + MINUTE_MS >= bucket + interval_ms
+                updates.append((timeframe, bucket, state.open, state.high, state.low,
+                                close, state.volume, bar_closed))
+                if bar_closed:
+                    last_closed[timeframe] = bucket
+                    del states[timeframe]
+            else:
+                updates.append((timeframe, bucket, state.open,
+                                high if high > state.high else state.high,
+                                low if low < state.low else state.low,
+                                close, state.volume + volume, False))
+
+        return updates
@@ -0,0 +1,216 @@
+# app/services/risk_engine.py
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from app.models.base import engine
+from app.services.performance_service import DrawdownTracker
+from app.services.dashboard_cache import get_dashboard_cache
+from app.services.dashboard_stream import get_dashboard_stream, METRICS
+
+logger = logging.getLogger(__name__)
+
+YEAR_SECONDS = 365 * 24 * 3600
+# Horizonte -> segundos entre retornos (None = un retorno por snapshot)
+HORIZONS: Dict[str, Optional[int]] = {'session': None, 'hourly': 3600, 'daily': 86400}
+# risk_metrics.metric_value es DECIMAL(15, 6)
+MAX_METRIC_VALUE = 1e9
+
+# (session_id, timestamp, metric_name, metric_value, time_period)
+MetricRow = Tuple[int, datetime, str, float, str]
+
+
+class OnlineMoments:
+    """Media y varianza de Welford más la semidesviación bajo cero, en O(1) por muestra"""
+
+    __slots__ = ('count', 'mean', 'm2', 'downside_sq')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside_sq = 0.0
+
+    def add(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < 0:
+            self.downside_sq += x * x
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    @property
+    def downside_deviation(self) -> float:
+        return math.sqrt(self.downside_sq / self.count) if self.count else 0.0
+
+
+class HorizonReturns:
+    """
+    Retornos simples de equity muestreados en el primer snapshot de cada
+    periodo del horizonte. La anualización usa el intervalo medio observado,
+    así los huecos (bot detenido, snapshots perdidos) no la sesgan.
+    """
+
+    __slots__ = ('seconds', 'moments', 'last_equity', 'last_bucket', 'last_time', 'elapsed')
+
+    def __init__(self, seconds: Optional[int]):
+        self.seconds = seconds
+        self.moments = OnlineMoments()
+        self.last_equity: Optional[float] = None
+        self.last_bucket: Optional[int] = None
+        self.last_time = 0.0
+        self.elapsed = 0.0
+
+    def observe(self, equity: float, ts: float):
+        bucket = int(ts // self.seconds) if self.seconds else None
+        if self.last_equity is not None:
+            if ts <= self.last_time or (self.seconds and bucket == self.last_bucket):
+                return
+            if self.last_equity > 0:
+                self.moments.add(equity / self.last_equity - 1.0)
+                self.elapsed += ts - self.last_time
+        self.last_equity = equity
+        self.last_bucket = bucket
+        self.last_time = ts
+
+    def metrics(self, risk_free_rate: float, max_drawdown_pct: float, min_samples: int) -> Dict[str, float]:
+        m = self.moments
+        if m.count < max(min_samples, 2) or self.elapsed <= 0:
+            return {}
+        period = self.elapsed / m.count
+        periods_per_year = YEAR_SECONDS / period
+        scale = math.sqrt(periods_per_year)
+        excess = m.mean - risk_free_rate * period / YEAR_SECONDS
+
+        out = {
+            'volatility': m.std * scale,
+            'annual_return': m.mean * periods_per_year
+        }
+        if m.std > 0:
+            out['sharpe_ratio'] = excess / m.std * scale
+        if m.downside_deviation > 0:
+            out['sortino_ratio'] = excess / m.downside_deviation * scale
+        if max_drawdown_pct > 0:
+            out['calmar_ratio'] = out['annual_return'] / (max_drawdown_pct / 100)
+        return out
+
+
+class RiskMetricsEngine:
+    """
+    Métricas de riesgo de una sesión calculadas en streaming a partir de los
+    snapshots de equity: Sharpe, Sortino, volatilidad realizada y Calmar por
+    horizonte (retornos por snapshot, horarios y diarios).
+
+    observe() es O(1) por snapshot y no toca la BD; maybe_write() inserta las
+    métricas en risk_metrics como mucho una vez cada write_interval segundos.
+    """
+
+    def __init__(self, session_id: int, horizons: Iterable[str] = tuple(HORIZONS),
+                 risk_free_rate: float = 0.0, write_interval: float = 300.0, min_samples: int = 2):
+        unknown = [h for h in horizons if h not in HORIZONS]
+        if unknown:
+            raise ValueError(f"Horizontes no soportados: {', '.join(unknown)}")
+        self.session_id = session_id
+        self.risk_free_rate = risk_free_rate
+        self.write_interval = write_interval
+        self.min_samples = min_samples
+        self.horizons = {name: HorizonReturns(HORIZONS[name]) for name in horizons}
+        self.drawdown = DrawdownTracker(session_id)
+        self._last_write = time.monotonic()
+
+    @classmethod
+    def from_config(cls, session_id: int, cfg: Dict) -> 'RiskMetricsEngine':
+        return cls(
+            session_id,
+            horizons=cfg.get('horizons', tuple(HORIZONS)),
+            risk_free_rate=cfg.get('risk_free_rate', 0.0),
+            write_interval=cfg.get('write_interval', 300),
+            min_samples=cfg.get('min_samples', 2)
+        )
+
+    def observe(self, equity: float, timestamp: Optional[datetime] = None):
+        timestamp = timestamp or datetime.now(timezone.utc)
+        ts = timestamp.timestamp()
+        for horizon in self.horizons.values():
+            horizon.observe(equity, ts)
+        self.drawdown.update(equity, timestamp)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """{horizonte: {métrica: valor}} con las métricas que ya tienen muestras suficientes"""
+        return {
+            name: horizon.metrics(self.risk_free_rate, self.drawdown.max_drawdown, self.min_samples)
+            for name, horizon in self.horizons.items()
+        }
+
+    def maybe_write(self, force: bool = False) -> int:
+        now = time.monotonic()
+        if not force and now - self._last_write < self.write_interval:
+            return 0
+        self._last_write = now
+
+        timestamp = datetime.now(timezone.utc)
+        rows: List[MetricRow] = [
+            (self.session_id, timestamp, name, round(value, 6), period)
+            for period, metrics in self.snapshot().items()
+            for name, value in metrics.items() if math.isfinite(value) and abs(value) < MAX_METRIC_VALUE
+        ]
+        if not rows:
+            return 0
+
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            execute_values(
+                cursor,
+                "INSERT INTO risk_metrics (session_id, timestamp, metric_name, metric_value, time_period) VALUES %s",
+                rows
+            )
+            conn.commit()
+            get_dashboard_cache().invalidate(self.session_id, 'risk')
+            get_dashboard_stream().publish(self.session_id, METRICS, group_metrics(
+                (period, name, value, ts) for _, ts, name, value, period in rows
+            ))
+            return len(rows)
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error guardando métricas de riesgo de la sesión {self.session_id}: {e}")
+            return 0
+        finally:
+            conn.close()
+
+
+def latest_metrics(session_id: int) -> Dict[str, Dict[str, Dict]]:
+    """Último valor de cada (horizonte, métrica) de la sesión: {horizonte: {métrica: {value, timestamp}}}"""
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT ON (time_period, metric_name) time_period, metric_name, metric_value, timestamp
+            FROM risk_metrics
+            WHERE session_id = %s
+            ORDER BY time_period, metric_name, timestamp DESC
+        """, (session_id,))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    return group_metrics(rows)
+
+
+def group_metrics(rows) -> Dict[str, Dict[str, Dict]]:
+    """Filas (time_period, metric_name, metric_value, timestamp) -> {horizonte: {métrica: {value, timestamp}}}"""
+    metrics: Dict[str, Dict[str, Dict]] = {}
+    for period, name, value, timestamp in rows:
+        metrics.setdefault(period, {})[name] = {
+            'value': float(value),
+            'timestamp': timestamp.isoformat() if timestamp else None
+        }
+    return metrics
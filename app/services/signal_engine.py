@@ -0,0 +1,127 @@
+# app/services/signal_engine.py
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Códigos de decisión usados en los arrays vectorizados
+HOLD = 0
+BUY = 1
+SELL = -1
+DECISION_NAMES = {BUY: 'BUY', SELL: 'SELL', HOLD: 'HOLD'}
+
+
+def stack_series(market_buffer, symbols: List[str], timeframe: str,
+                 window: int) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Apila las últimas `window` velas de cada símbolo en arrays 2-D (símbolo x tiempo).
+    Los símbolos sin historial suficiente se omiten.
+    """
+    ready = []
+    for symbol in symbols:
+        buffer = market_buffer.get(symbol, timeframe)
+        if buffer is not None and len(buffer) >= window:
+            ready.append((symbol, buffer))
+
+    closes = np.empty((len(ready), window), dtype=np.float64)
+    volumes = np.empty((len(ready), window), dtype=np.float64)
+    for row, (_, buffer) in enumerate(ready):
+        closes[row] = buffer.closes(window)
+        volumes[row] = buffer.volumes(window)
+
+    return [symbol for symbol, _ in ready], closes, volumes
+
+
+def rsi_last(closes: np.ndarray, period: int) -> np.ndarray:
+    """RSI de Wilder de la última columna para todas las filas a la vez"""
+    n_rows, n_cols = closes.shape
+    if n_cols <= period:
+        return np.full(n_rows, np.nan)
+
+    deltas = np.diff(closes, axis=1)
+    gains = np.clip(deltas, 0, None)
+    losses = np.clip(-deltas, 0, None)
+
+    avg_gain = gains[:, :period].mean(axis=1)
+    avg_loss = losses[:, :period].mean(axis=1)
+    for col in range(period, deltas.shape[1]):
+        avg_gain = (avg_gain * (period - 1) + gains[:, col]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[:, col]) / period
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        rsi = 100.0 - 100.0 / (1.0 + rs)
+    return np.where(avg_loss == 0, 100.0, rsi)
+
+
+def rolling_mean(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Media móvil sobre el último eje en O(n) con sumas acumuladas.
+    Las primeras period-1 posiciones quedan en NaN.
+    """
+    out = np.full(values.shape, np.nan, dtype=np.float64)
+    if values.shape[-1] < period:
+        return out
+    csum = np.cumsum(values, axis=-1, dtype=np.float64)
+    out[..., period - 1] = csum[..., period - 1]
+    out[..., period:] = csum[..., period:] - csum[..., :-period]
+    out[..., period - 1:] /= period
+    return out
+
+
+def sma_cross_decision(fast_ma: float, slow_ma: float, gate: bool) -> str:
+    """Versión escalar de la regla de cruce de medias usada por el loop en vivo"""
+    if gate and fast_ma > slow_ma:
+        return 'BUY'
+    if gate and fast_ma < slow_ma:
+        return 'SELL'
+    return 'HOLD'
+
+
+def sma_cross_decisions(fast_ma: np.ndarray, slow_ma: np.ndarray, gate) -> np.ndarray:
+    """
+    Regla de cruce de medias de quantum_v1 aplicada elemento a elemento.
+    `gate` habilita la operación (escalar o array broadcastable).
+    """
+    decisions = np.where(fast_ma > slow_ma, BUY, np.where(fast_ma < slow_ma, SELL, HOLD))
+    return np.where(gate, decisions, HOLD).astype(np.int8)
+
+
+def evaluate_batch(closes: np.ndarray, volumes: np.ndarray, indicators_cfg: Dict,
+                   iteration: int) -> Dict[str, np.ndarray]:
+    """
+    Calcula indicadores y decisiones para todos los símbolos en una sola pasada
+    """
+    fast = indicators_cfg.get('sma_fast', 5)
+    slow = indicators_cfg.get('sma_slow', 20)
+    rsi_period = indicators_cfg.get('rsi_period', 14)
+    volume_period = indicators_cfg.get('volume_period', slow)
+
+    fast_ma = closes[:, -fast:].mean(axis=1)
+    slow_ma = closes[:, -slow:].mean(axis=1)
+    volume_mean = volumes[:, -volume_period:].mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume_ratio = volumes[:, -1] / volume_mean
+
+    return {
+        'close': closes[:, -1],
+        'sma_fast': fast_ma,
+        'sma_slow': slow_ma,
+        'rsi': rsi_last(closes, rsi_period),
+        'volume_ratio': volume_ratio,
+        'decision': sma_cross_decisions(fast_ma, slow_ma, iteration % 3 == 0)
+    }
+
+
+def batch_window(indicators_cfg: Dict, max_window: Optional[int] = None) -> int:
+    """Cantidad de velas necesarias para evaluar todos los indicadores"""
+    slow = indicators_cfg.get('sma_slow', 20)
+    window = max(
+        slow,
+        indicators_cfg.get('sma_fast', 5),
+        indicators_cfg.get('volume_period', slow),
+        indicators_cfg.get('rsi_period', 14) * 3 + 1  # Margen para el suavizado de Wilder
+    )
+    return min(window, max_window) if max_window else window
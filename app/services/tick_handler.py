@@ -0,0 +1,103 @@
+# app/services/tick_handler.py
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class KlineTick:
+    """
+    Último estado de la vela de un símbolo. Se crea una vez por símbolo y se
+    actualiza en el lugar con cada mensaje del stream.
+    """
+
+    __slots__ = ('symbol', 'interval', 'event_time', 'open_time', 'open', 'high',
+                 'low', 'close', 'volume', 'is_closed')
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.interval = '1m'
+        self.event_time = 0
+        self.open_time = 0
+        self.open = 0.0
+        self.high = 0.0
+        self.low = 0.0
+        self.close = 0.0
+        self.volume = 0.0
+        self.is_closed = False
+
+    def as_bar(self):
+        """(open_time, open, high, low, close, volume)"""
+        return self.open_time, self.open, self.high, self.low, self.close, self.volume
+
+    def as_dict(self) -> Dict:
+        """Representación para el dashboard / API (sólo bajo demanda)"""
+        return {
+            'symbol': self.symbol,
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'volume': self.volume,
+            'timestamp': self.open_time,
+            'is_closed': self.is_closed
+        }
+
+
+TickConsumer = Callable[[KlineTick], None]
+
+
+class KlineTickHandler:
+    """
+    Camino rápido para los mensajes de kline: parsea el payload una sola vez
+    sobre el KlineTick del símbolo y se lo pasa a los consumidores, sin crear
+    diccionarios ni formatear logs por mensaje.
+    """
+
+    def __init__(self, consumers: Optional[List[TickConsumer]] = None):
+        self.ticks: Dict[str, KlineTick] = {}
+        self.consumers: List[TickConsumer] = list(consumers or [])
+        self.messages = 0
+        self.errors = 0
+
+    def add_consumer(self, consumer: TickConsumer):
+        self.consumers.append(consumer)
+
+    def __call__(self, msg: Dict):
+        try:
+            if msg['e'] != 'kline':
+                if msg['e'] == 'error':
+                    logger.error(f"❌ Error WebSocket: {msg.get('m')}")
+                return
+
+            symbol = msg['s']
+            tick = self.ticks.get(symbol)
+            if tick is None:
+                tick = self.ticks[symbol] = KlineTick(symbol)
+
+            k = msg['k']
+            tick.event_time = msg['E']
+            tick.interval = k['i']
+            tick.open_time = k['t']
+            tick.open = float(k['o'])
+            tick.high = float(k['h'])
+            tick.low = float(k['l'])
+            tick.close = float(k['c'])
+            tick.volume = float(k['v'])
+            tick.is_closed = k['x']
+            self.messages += 1
+        except Exception as e:
+            self._error('parseando kline', e)
+            return
+
+        # Cada consumidor se aísla: un fallo en uno no salta a los siguientes (p.ej. las salidas)
+        for consumer in self.consumers:
+            try:
+                consumer(tick)
+            except Exception as e:
+                self._error(f"en {getattr(consumer, '__name__', consumer)}", e)
+
+    def _error(self, where: str, error: Exception):
+        self.errors += 1
+        if self.errors % 1000 == 1:
+            logger.error(f"❌ Error {where} ({self.errors} errores): {error}")
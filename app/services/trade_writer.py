@@ -0,0 +1,424 @@
+# app/services/trade_writer.py
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Deque, Dict, List, Optional, Tuple
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+from sqlalchemy import exc as sa_exc
+
+from app.models.base import engine
+from app.services.dashboard_cache import get_dashboard_cache
+from app.services.dashboard_stream import get_dashboard_stream, format_trade, TRADE
+
+logger = logging.getLogger(__name__)
+
+# Columnas persistidas por tabla. Las órdenes van antes que los trades dentro
+# de cada transacción porque trades.entry_order_id las referencia.
+TABLE_COLUMNS = {
+    'orders': ('id', 'session_id', 'symbol', 'order_id', 'client_order_id', 'side', 'type', 'status',
+               'quantity', 'price', 'executed_quantity', 'executed_price', 'created_time',
+               'updated_time', 'real_trade'),
+    'trades': ('id', 'session_id', 'symbol', 'entry_order_id', 'exit_order_id', 'entry_price',
+               'exit_price', 'quantity', 'pnl', 'pnl_percent', 'status', 'close_reason',
+               'entry_time', 'exit_time', 'real_trade'),
+    'positions': ('id', 'session_id', 'trade_id', 'symbol', 'quantity', 'entry_price', 'current_price',
+                  'unrealized_pnl', 'unrealized_pnl_percent', 'stop_loss', 'take_profit', 'created_at'),
+}
+# Tablas cuyas filas se reescriben al reenviarlas con el mismo ID (cierre de un trade abierto)
+UPSERT_TABLES = ('trades',)
+# Tablas cuyas filas se pueden borrar por la misma cola (posiciones cerradas).
+# Los borrados de un lote se aplican después de sus INSERT.
+DELETABLE_TABLES = ('positions',)
+DELETE_SUFFIX = ':delete'
+
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.dirname(__file__), '../../data/journal/trades.jsonl')
+
+# BD caída o conexión perdida: el lote se reintenta entero sin límite. Cualquier
+# otro error se atribuye a los datos del lote (ver TradeWriter._write_batch).
+TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError,
+                    sa_exc.OperationalError, sa_exc.InterfaceError)
+
+# (seq, table, row)
+WriteEvent = Tuple[int, str, Dict]
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+class IdBlockAllocator:
+    """
+    Reserva bloques de IDs de la secuencia SERIAL de una tabla para asignarlos
+    en el cliente. El hilo de trading sólo va a la BD si el bloque se agota;
+    el escritor lo rellena por adelantado al bajar de la mitad.
+    """
+
+    def __init__(self, table: str, block_size: int = 100):
+        self.table = table
+        self.block_size = block_size
+        self._ids: Deque[int] = deque()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                (self.table, self.block_size)
+            )
+            self._ids.extend(row[0] for row in cursor.fetchall())
+            conn.commit()
+        finally:
+            conn.close()
+
+    def next_id(self) -> int:
+        with self._lock:
+            if not self._ids:
+                self._refill()
+            return self._ids.popleft()
+
+    def prefetch(self):
+        with self._lock:
+            if len(self._ids) < self.block_size // 2:
+                self._refill()
+
+
+class WriteJournal:
+    """
+    Journal local JSONL: cada evento se escribe antes de encolarse y cada
+    commit deja una marca {"committed": seq}. Al arrancar se reenvían los
+    eventos posteriores a la última marca (los INSERT son idempotentes por ID).
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH, fsync: bool = False, max_bytes: int = 16 * 1024 * 1024):
+        self.path = os.path.abspath(path)
+        self.fsync = fsync
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._last_seq = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _write(self, entry: Dict):
+        self._file.write(json.dumps(entry, default=_json_default, separators=(',', ':')) + '\n')
+        # flush: sobrevive a la muerte del proceso; fsync además a un corte de energía
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def append(self, seq: int, table: str, row: Dict):
+        with self._lock:
+            self._write({'seq': seq, 'table': table, 'row': row})
+            self._last_seq = seq
+
+    def mark_committed(self, seq: int):
+        with self._lock:
+            self._write({'committed': seq})
+            # Si el último evento escrito ya está confirmado el journal se puede truncar
+            if seq >= self._last_seq and self._file.tell() > self.max_bytes:
+                self._file.close()
+                self._file = open(self.path, 'w', encoding='utf-8')
+                self._write({'committed': seq})
+
+    def recover(self) -> Tuple[List[WriteEvent], int]:
+        """Eventos sin marca de commit y último seq usado"""
+        committed, last_seq = 0, 0
+        events: Dict[int, WriteEvent] = {}
+        with self._lock, open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Línea cortada por una caída a mitad de escritura
+                if 'committed' in entry:
+                    committed = max(committed, entry['committed'])
+                else:
+                    events[entry['seq']] = (entry['seq'], entry['table'], entry['row'])
+                    last_seq = max(last_seq, entry['seq'])
+        pending = [events[seq] for seq in sorted(events) if seq > committed]
+        self._last_seq = max(last_seq, committed)
+        return pending, self._last_seq
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class DeadLetterFile:
+    """JSONL con los eventos que la BD rechaza por sus datos, para revisarlos a mano"""
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def append(self, event: WriteEvent, error: Optional[str]):
+        seq, table, row = event
+        entry = {'seq': seq, 'table': table, 'row': row, 'error': error,
+                 'failed_at': datetime.utcnow().isoformat()}
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, default=_json_default, separators=(',', ':')) + '\n')
+
+    def read(self) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        with self._lock, open(self.path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+class TradeWriter:
+    """
+    Persistencia write-behind de órdenes, trades y posiciones.
+
+    submit() asigna la secuencia, escribe en el journal y encola; nunca espera
+    a la BD. Un único hilo escritor agrupa los eventos en una transacción por
+    lote (group commit) respetando el orden de llegada, por lo que el orden por
+    sesión se conserva. Los IDs se asignan en el cliente (IdBlockAllocator)
+    para poder enlazar trade -> orden sin esperar al INSERT.
+
+    Un lote que falla max_retries veces por sus datos (no por la conexión) se
+    parte en mitades hasta aislar los eventos que la BD rechaza; esos van al
+    dead-letter y el resto se confirma, así una fila envenenada no detiene la cola.
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 0.5, id_block_size: int = 100,
+                 journal_path: str = DEFAULT_JOURNAL_PATH, fsync: bool = False, max_retries: int = 3,
+                 dead_letter_path: Optional[str] = None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max(1, max_retries)
+        self.allocators = {table: IdBlockAllocator(table, id_block_size) for table in TABLE_COLUMNS}
+        self.journal = WriteJournal(journal_path, fsync=fsync)
+        self.dead_letter = DeadLetterFile(dead_letter_path or os.path.splitext(journal_path)[0] + '.dead.jsonl')
+        self._failures = 0
+        self.last_error: Optional[str] = None
+        self.dead_lettered = 0
+        self._queue: "queue.Queue[WriteEvent]" = queue.Queue()
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.written = 0
+
+    # ==================== API ====================
+
+    def start(self):
+        if self._running:
+            return
+        pending, last_seq = self.journal.recover()
+        self._seq = last_seq
+        for event in pending:
+            self._queue.put(event)
+        if pending:
+            logger.warning(f"♻️ Reenviando {len(pending)} eventos de trading pendientes del journal")
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="trade-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"💾 Write-behind de órdenes/trades iniciado (batch={self.batch_size}, "
+                    f"intervalo={self.flush_interval}s)")
+
+    def stop(self, timeout: float = 30.0):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def next_id(self, table: str) -> int:
+        return self.allocators[table].next_id()
+
+    def submit(self, table: str, row: Dict) -> int:
+        """Registra el evento en el journal y lo encola; devuelve su número de secuencia"""
+        if table not in TABLE_COLUMNS:
+            raise ValueError(f"Tabla no soportada: {table}")
+        return self._enqueue(table, row)
+
+    def submit_delete(self, table: str, row_id: int) -> int:
+        """Borrado por ID, ordenado respecto a los INSERT de la misma cola"""
+        if table not in DELETABLE_TABLES:
+            raise ValueError(f"Tabla no soportada para borrado: {table}")
+        return self._enqueue(table + DELETE_SUFFIX, {'id': row_id})
+
+    def _enqueue(self, table: str, row: Dict) -> int:
+        with self._seq_lock:
+            self._seq += 1
+            seq = self._seq
+            self.journal.append(seq, table, row)
+            self._queue.put((seq, table, row))
+        return seq
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    # ==================== WRITER ====================
+
+    def _run(self):
+        batch: List[WriteEvent] = []
+        last_flush = time.monotonic()
+
+        while self._running or not self._queue.empty() or batch:
+            if len(batch) < self.batch_size:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                    # Vaciar lo que ya esté en cola sin volver a esperar
+                    while len(batch) < self.batch_size:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+            due = time.monotonic() - last_flush >= self.flush_interval
+            if batch and (len(batch) >= self.batch_size or due or not self._running):
+                if self._write_batch(batch):
+                    self.journal.mark_committed(batch[-1][0])
+                    batch = []
+                elif self._running:
+                    time.sleep(min(self.flush_interval * 4, 5.0))  # Reintento: nunca se descartan eventos
+                else:
+                    break  # Al detener, lo no escrito queda en el journal
+                last_flush = time.monotonic()
+
+            for allocator in self.allocators.values():
+                try:
+                    allocator.prefetch()
+                except Exception as e:
+                    logger.error(f"❌ Error reservando IDs de {allocator.table}: {e}")
+
+    def _write_batch(self, batch: List[WriteEvent]) -> bool:
+        """
+        True si el lote quedó escrito, con los eventos rechazados en el
+        dead-letter. False si hay que reintentarlo entero más tarde.
+        """
+        try:
+            if self._flush(batch):
+                self._failures = 0
+                return True
+        except TRANSIENT_ERRORS as e:
+            logger.error(f"❌ BD no disponible, se reintentan {len(batch)} eventos de trading: {e}")
+            return False
+
+        self._failures += 1
+        if self._failures < self.max_retries:
+            return False
+        self._failures = 0
+        logger.warning(f"⚠️ Lote de {len(batch)} eventos rechazado {self.max_retries} veces, aislando eventos")
+        return self._isolate(batch)
+
+    def _isolate(self, batch: List[WriteEvent]) -> bool:
+        """Bisección en orden de llegada: cada mitad se confirma o se vuelve a partir"""
+        if len(batch) == 1:
+            self.dead_letter.append(batch[0], self.last_error)
+            self.dead_lettered += 1
+            seq, table, row = batch[0]
+            logger.error(f"☠️ Evento {seq} ({table} id={row.get('id')}) enviado al dead-letter: {self.last_error}")
+            return True
+
+        middle = len(batch) // 2
+        for half in (batch[:middle], batch[middle:]):
+            try:
+                if not self._flush(half) and not self._isolate(half):
+                    return False
+            except TRANSIENT_ERRORS as e:
+                # Lo ya confirmado se reenvía sin efecto: los INSERT son idempotentes por ID
+                logger.error(f"❌ BD no disponible aislando eventos de trading: {e}")
+                return False
+        return True
+
+    def _flush(self, batch: List[WriteEvent]) -> bool:
+        """Escribe el lote en una transacción; False si la BD lo rechazó (los errores de conexión se propagan)"""
+        by_table: Dict[str, List[Dict]] = {table: [] for table in TABLE_COLUMNS}
+        deletes: Dict[str, List[int]] = {table: [] for table in DELETABLE_TABLES}
+        for _, table, row in batch:
+            if table.endswith(DELETE_SUFFIX):
+                deletes[table[:-len(DELETE_SUFFIX)]].append(row['id'])
+            else:
+                by_table[table].append(row)
+        # Un mismo INSERT ... DO UPDATE no puede tocar dos veces la misma fila:
+        # de cada ID sólo se envía su última versión del lote
+        for table in UPSERT_TABLES:
+            by_table[table] = list({row['id']: row for row in by_table[table]}.values())
+
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            for table, columns in TABLE_COLUMNS.items():
+                rows = by_table[table]
+                if not rows:
+                    continue
+                if table in UPSERT_TABLES:
+                    conflict = sql.SQL("DO UPDATE SET {}").format(sql.SQL(', ').join(
+                        sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c)) for c in columns[1:]
+                    ))
+                else:
+                    conflict = sql.SQL("DO NOTHING")
+                statement = sql.SQL("INSERT INTO {} ({}) VALUES %s ON CONFLICT (id) {}").format(
+                    sql.Identifier(table), sql.SQL(', ').join(map(sql.Identifier, columns)), conflict
+                )
+                execute_values(cursor, statement,
+                               [tuple(row.get(c) for c in columns) for row in rows],
+                               page_size=self.batch_size)
+            for table, ids in deletes.items():
+                if ids:
+                    cursor.execute(sql.SQL("DELETE FROM {} WHERE id = ANY(%s)").format(sql.Identifier(table)),
+                                   (ids,))
+            conn.commit()
+            self.written += len(batch)
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            conn.rollback()
+            self.last_error = str(e).strip()
+            logger.error(f"❌ Error persistiendo {len(batch)} eventos de trading: {e}")
+            return False
+        finally:
+            conn.close()
+
+        # Los dashboards de las sesiones afectadas sólo se invalidan con los datos ya confirmados
+        cache = get_dashboard_cache()
+        for session_id in {row['session_id'] for table in ('orders', 'trades') for row in by_table[table]}:
+            cache.invalidate(session_id, 'trade')
+        stream = get_dashboard_stream()
+        for row in by_table['trades']:
+            if row.get('status') == 'closed':
+                stream.publish(row['session_id'], TRADE, format_trade(row))
+        return True
+
+
+_writer: Optional[TradeWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_trade_writer(config: Optional[Dict] = None) -> TradeWriter:
+    """Escritor compartido por todos los bots del proceso"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            config = config or {}
+            path = config.get('journal_path') or DEFAULT_JOURNAL_PATH
+            if not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(__file__), '../..', path)
+            _writer = TradeWriter(
+                batch_size=config.get('batch_size', 200),
+                flush_interval=config.get('flush_interval', 0.5),
+                id_block_size=config.get('id_block_size', 100),
+                journal_path=path,
+                fsync=config.get('fsync', False),
+                max_retries=config.get('max_retries', 3)
+            )
+            _writer.start()
+        return _writer
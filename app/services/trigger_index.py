@@ -0,0 +1,153 @@
+# app/services/trigger_index.py
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+STOP_LOSS = 'stop_loss'
+TAKE_PROFIT = 'take_profit'
+
+
+class Trigger(NamedTuple):
+    position_id: int
+    symbol: str
+    reason: str  # STOP_LOSS | TAKE_PROFIT
+    level: float
+    price: float
+
+
+class _LevelList:
+    """
+    Niveles ordenados que se disparan cuando el precio los cruza en un
+    sentido. Los disparados siempre forman un sufijo de la lista, así que
+    consultarlos y quitarlos cuesta O(log n + k):
+
+    - falling: se dispara con price <= level (stop de largos, objetivo de
+      cortos); orden ascendente, sufijo = niveles >= price.
+    - rising: se dispara con price >= level (objetivo de largos, stop de
+      cortos); se guarda -level ascendente, sufijo = niveles <= price.
+    """
+
+    __slots__ = ('sign', 'keys', 'entries')
+
+    def __init__(self, rising: bool):
+        self.sign = -1.0 if rising else 1.0
+        self.keys: List[float] = []
+        self.entries: List[Tuple[float, int, str]] = []  # (key, position_id, reason)
+
+    def add(self, level: float, position_id: int, reason: str):
+        key = self.sign * level
+        entry = (key, position_id, reason)
+        index = bisect_right(self.entries, entry)
+        self.entries.insert(index, entry)
+        self.keys.insert(index, key)
+
+    def remove(self, level: float, position_id: int, reason: str) -> bool:
+        entry = (self.sign * level, position_id, reason)
+        index = bisect_left(self.entries, entry)
+        if index < len(self.entries) and self.entries[index] == entry:
+            del self.entries[index]
+            del self.keys[index]
+            return True
+        return False
+
+    def pop_crossed(self, price: float) -> List[Tuple[float, int, str]]:
+        index = bisect_left(self.keys, self.sign * price)
+        if index == len(self.keys):
+            return []
+        crossed = self.entries[index:]
+        del self.entries[index:]
+        del self.keys[index:]
+        return crossed
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class _SymbolTriggers:
+    __slots__ = ('falling', 'rising')
+
+    def __init__(self):
+        self.falling = _LevelList(rising=False)
+        self.rising = _LevelList(rising=True)
+
+
+class TriggerIndex:
+    """
+    Índice por símbolo de los niveles de stop-loss y take-profit de las
+    posiciones abiertas. on_price() devuelve exactamente las posiciones cuyos
+    niveles cruzó el precio en O(log n + k) y las quita del índice (cada
+    posición se dispara una sola vez, por el primero de sus niveles).
+    """
+
+    def __init__(self):
+        self._symbols: Dict[str, _SymbolTriggers] = {}
+        # position_id -> (symbol, [(lista, level, reason), ...])
+        self._positions: Dict[int, Tuple[str, List[Tuple[_LevelList, float, str]]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, position_id: int, symbol: str, quantity: float,
+            stop_loss: Optional[float], take_profit: Optional[float]):
+        """Registra los niveles de la posición; quantity < 0 indica un corto"""
+        with self._lock:
+            self._remove(position_id)
+            book = self._symbols.get(symbol)
+            if book is None:
+                book = self._symbols[symbol] = _SymbolTriggers()
+
+            long = quantity >= 0
+            levels = []
+            if stop_loss:
+                levels.append((book.falling if long else book.rising, float(stop_loss), STOP_LOSS))
+            if take_profit:
+                levels.append((book.rising if long else book.falling, float(take_profit), TAKE_PROFIT))
+            for level_list, level, reason in levels:
+                level_list.add(level, position_id, reason)
+            self._positions[position_id] = (symbol, levels)
+
+    def update_level(self, position_id: int, reason: str, level: float) -> bool:
+        """Mueve un nivel (p.ej. trailing stop) sin tocar el otro"""
+        with self._lock:
+            registered = self._positions.get(position_id)
+            if registered is None:
+                return False
+            symbol, levels = registered
+            for i, (level_list, old_level, old_reason) in enumerate(levels):
+                if old_reason == reason:
+                    level_list.remove(old_level, position_id, reason)
+                    level_list.add(float(level), position_id, reason)
+                    levels[i] = (level_list, float(level), reason)
+                    return True
+            return False
+
+    def remove(self, position_id: int) -> bool:
+        with self._lock:
+            return self._remove(position_id)
+
+    def _remove(self, position_id: int) -> bool:
+        registered = self._positions.pop(position_id, None)
+        if registered is None:
+            return False
+        for level_list, level, reason in registered[1]:
+            level_list.remove(level, position_id, reason)
+        return True
+
+    def on_price(self, symbol: str, price: float) -> List[Trigger]:
+        book = self._symbols.get(symbol)
+        if book is None or not (book.falling.keys or book.rising.keys):
+            return []
+
+        with self._lock:
+            crossed = book.falling.pop_crossed(price) + book.rising.pop_crossed(price)
+            if not crossed:
+                return []
+
+            triggers = []
+            for key, position_id, reason in crossed:
+                if position_id not in self._positions:
+                    continue  # Ya disparada por su otro nivel en este mismo tick
+                self._remove(position_id)
+                triggers.append(Trigger(position_id, symbol, reason, abs(key), price))
+            return triggers
+
+    def __len__(self):
+        return len(self._positions)
@@ -3,15 +3,221 @@ class DashboardManager {
     constructor() {
         this.charts = {};
         this.data = null;
+        this.version = null;
         this.updateInterval = null;
+        this.refreshInterval = 10000;
+        // Push por Socket.IO: snapshot al unirse y deltas numerados (epoch, seq) por sesión
+        this.socket = null;
+        this.sessionId = null;
+        this.epoch = null;
+        this.seq = 0;
+        this.pending = null;  // Deltas recibidos mientras se espera un snapshot
+        this.streaming = false;
+    }
+
+    connectStream() {
+        if (typeof io === 'undefined') return false;
+
+        this.socket = (window.wsManager && window.wsManager.socket) || io();
+        // Cada (re)conexión vuelve a unirse a la sesión y recibe un snapshot nuevo
+        this.socket.on('connect', () => this.joinSession());
+        this.socket.on('disconnect', () => {
+            this.streaming = false;
+            this.startAutoRefresh(this.refreshInterval);
+        });
+        this.socket.on('dashboard_snapshot', snapshot => this.applySnapshot(snapshot));
+        ['trade_update', 'position_update', 'balance_update', 'metrics_update', 'session_update']
+            .forEach(event => this.socket.on(event, delta => this.receiveDelta(delta)));
+
+        if (this.socket.connected) this.joinSession();
+        return true;
+    }
+
+    joinSession() {
+        this.pending = [];
+        this.socket.emit('join_session', { session_id: this.sessionId });
+    }
+
+    resync() {
+        if (this.pending) return;  // Ya hay un snapshot en camino
+        this.pending = [];
+        this.socket.emit('dashboard_resync', { session_id: this.sessionId });
+    }
+
+    applySnapshot(snapshot) {
+        const pending = this.pending || [];
+        this.pending = null;
+        this.sessionId = snapshot.session_id;
+        this.epoch = snapshot.epoch;
+        this.seq = snapshot.seq;
+
+        const data = snapshot.data;
+        if (data && data.success !== false) {
+            this.data = data;
+            this.version = data.version ?? null;
+            this.updateDashboard();
+            this.updateCharts();
+            this.updateLastUpdate();
+        }
+
+        // Con el push activo el sondeo HTTP sobra
+        this.streaming = true;
+        this.stopAutoRefresh();
+        pending.forEach(delta => this.receiveDelta(delta));
+    }
+
+    receiveDelta(delta) {
+        if (this.pending) {
+            this.pending.push(delta);
+            return;
+        }
+        if (!this.data || delta.session_id !== this.sessionId) return;
+        if (delta.epoch !== this.epoch || delta.seq > this.seq + 1) {
+            // Se perdió algún delta (o el servidor se reinició): snapshot nuevo
+            this.resync();
+            return;
+        }
+        if (delta.seq <= this.seq) return;  // Ya incluido en el snapshot
+
+        this.seq = delta.seq;
+        this.data.timestamp = delta.timestamp;
+        this.applyDelta(delta.type, delta.data);
+        this.updateLastUpdate();
+    }
+
+    applyDelta(type, data) {
+        switch (type) {
+            case 'trade':
+                this.applyTrade(data);
+                break;
+            case 'position':
+                this.applyPosition(data);
+                break;
+            case 'marks':
+                data.positions.forEach(mark => this.applyPosition(mark, false));
+                this.updatePositions(this.data.positions);
+                break;
+            case 'balance':
+                this.applyBalance(data);
+                break;
+            case 'metrics':
+                this.applyMetrics(data);
+                break;
+            case 'session':
+                this.data.session = { ...(this.data.session || {}), ...data };
+                this.updateSessionInfo(this.data.session);
+                break;
+        }
+    }
+
+    applyTrade(trade) {
+        const trading = this.data.trading;
+        if (!trading || !trading.recent_trades) return;
+        if (trading.recent_trades.some(t => t.id === trade.id)) return;
+
+        trading.recent_trades.unshift(trade);
+        trading.recent_trades.length = Math.min(trading.recent_trades.length, 10);
+        trading.total_trades += 1;
+        if (trade.pnl > 0) {
+            trading.winning_trades += 1;
+        } else {
+            trading.losing_trades += 1;
+        }
+        if (trade.real_trade) {
+            trading.real_trades += 1;
+        } else {
+            trading.simulated_trades += 1;
+        }
+        trading.win_rate = (trading.winning_trades / trading.total_trades) * 100;
+
+        this.updateTradingMetrics(trading);
+        this.updateRecentTrades(trading.recent_trades);
+    }
+
+    applyPosition(change, render = true) {
+        const positions = this.data.positions;
+        if (!positions || !positions.positions) return;
+
+        const index = positions.positions.findIndex(p => p.id === change.id);
+        if (change.removed) {
+            if (index >= 0) positions.positions.splice(index, 1);
+        } else if (index >= 0) {
+            Object.assign(positions.positions[index], change);
+        } else if (change.symbol && change.entry_price !== undefined) {
+            // Sólo un alta completa crea la posición; un cambio suelto de otra desconocida se ignora
+            positions.positions.push(change);
+        }
+        positions.active_positions = positions.positions.length;
+
+        if (render) this.updatePositions(positions);
+    }
+
+    applyBalance(point) {
+        const balance = this.data.balance;
+        if (!balance) return;
+
+        balance.current_balance = point.current_balance;
+        balance.total_pnl = point.total_pnl;
+        balance.total_pnl_percent = point.total_pnl_percent;
+
+        // El snapshot reemplaza el bucket al que pertenece, o abre uno nuevo
+        const bucket = balance.history && point.buckets[balance.resolution];
+        if (bucket) {
+            const last = balance.history[balance.history.length - 1];
+            if (last && last.timestamp === bucket.timestamp) {
+                Object.assign(last, {
+                    balance: point.balance,
+                    balance_high: Math.max(last.balance_high ?? point.balance, point.balance),
+                    balance_low: Math.min(last.balance_low ?? point.balance, point.balance),
+                    equity: point.equity,
+                    equity_high: Math.max(last.equity_high ?? point.equity, point.equity),
+                    equity_low: Math.min(last.equity_low ?? point.equity, point.equity),
+                    pnl: point.pnl,
+                    pnl_daily: point.pnl_daily,
+                    samples: (last.samples || 0) + 1
+                });
+            } else if (!last || last.timestamp < bucket.timestamp) {
+                balance.history.push({
+                    timestamp: bucket.timestamp,
+                    time: bucket.time,
+                    balance: point.balance,
+                    balance_high: point.balance,
+                    balance_low: point.balance,
+                    equity: point.equity,
+                    equity_high: point.equity,
+                    equity_low: point.equity,
+                    pnl: point.pnl,
+                    pnl_daily: point.pnl_daily,
+                    samples: 1
+                });
+            }
+        }
+
+        this.updateBalanceMetrics(balance);
+        this.updateCharts();
+    }
+
+    applyMetrics(byPeriod) {
+        const risk = this.data.risk = this.data.risk || { metrics: {}, by_period: {}, history: [] };
+        Object.entries(byPeriod).forEach(([period, metrics]) => {
+            risk.by_period[period] = { ...(risk.by_period[period] || {}), ...metrics };
+        });
+        risk.metrics = risk.by_period.session || risk.metrics;
     }
 
     async loadDashboardData() {
         try {
-            const response = await apiCall('/dashboard/data');
+            // Con la versión que ya tenemos el servidor responde "unchanged" si nada cambió
+            const query = this.version !== null ? `?version=${encodeURIComponent(this.version)}` : '';
+            const response = await apiCall(`/dashboard/data${query}`);
             
+            if (response.success && response.unchanged) {
+                return;
+            }
+
             if (response.success) {
                 this.data = response;
+                this.version = response.version ?? null;
                 this.updateDashboard();
                 this.updateCharts();
                 this.updateLastUpdate();
@@ -326,6 +532,13 @@ class DashboardManager {
     }
 
     startAutoRefresh(interval = 10000) {
+        this.refreshInterval = interval;
+        if (this.socket === null) {
+            this.connectStream();
+        }
+        // Con el push activo no hace falta sondear; el sondeo vuelve si el socket se cae
+        if (this.streaming) return;
+
         this.stopAutoRefresh();
         this.updateInterval = setInterval(() => {
             this.loadDashboardData();
@@ -1,18 +1,47 @@
 # app/websocket/connection_manager.py
 import logging
-from typing import Dict, Set
+from typing import Callable, Dict, Optional, Set
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_login import current_user
 
+from app.services.dashboard_stream import (
+    get_dashboard_stream, TRADE, POSITION, MARKS, BALANCE, METRICS, SESSION
+)
+
 logger = logging.getLogger(__name__)
 
 class ConnectionManager:
-    """Gestor de conexiones WebSocket"""
+    """
+    Gestor de conexiones WebSocket.
+
+    Con resolve_session/snapshot configurados, join_session entrega un
+    snapshot completo del dashboard y a partir de ahí la sala de la sesión
+    recibe los deltas de DashboardStream (trade_update, position_update,
+    balance_update, metrics_update, session_update). dashboard_resync vuelve
+    a enviar el snapshot cuando el cliente detecta un salto de versión.
+
+    - current_user_id(): usuario de la conexión (por defecto Flask-Login).
+    - resolve_session(user_id, session_id): sesión del usuario a la que unirse
+      (session_id None = la actual); None si no tiene o no es suya.
+    - snapshot(session_id): payload completo del dashboard de la sesión.
+    """
     
-    def __init__(self, socketio: SocketIO):
+    def __init__(self, socketio: SocketIO,
+                 current_user_id: Optional[Callable[[], Optional[int]]] = None,
+                 resolve_session: Optional[Callable[[int, Optional[int]], Optional[int]]] = None,
+                 snapshot: Optional[Callable[[int], Dict]] = None):
         self.socketio = socketio
         self.user_rooms: Dict[int, Set[str]] = {}  # user_id -> set of rooms
+        self.current_user_id = current_user_id or self._login_user_id
+        self.resolve_session = resolve_session
+        self.snapshot = snapshot
+        self.stream = get_dashboard_stream()
         self.setup_handlers()
+        self.stream.attach(self.publish_delta)
+    
+    @staticmethod
+    def _login_user_id() -> Optional[int]:
+        return current_user.id if current_user.is_authenticated else None
     
     def setup_handlers(self):
         """Configura los handlers de WebSocket"""
@@ -20,10 +49,10 @@ class ConnectionManager:
         @self.socketio.on('connect')
         def handle_connect():
             """Maneja conexión de cliente"""
-            if not current_user.is_authenticated:
+            user_id = self.current_user_id()
+            if user_id is None:
                 return False
             
-            user_id = current_user.id
             user_room = f"user_{user_id}"
             
             join_room(user_room)
@@ -33,15 +62,15 @@ class ConnectionManager:
                 self.user_rooms[user_id] = set()
             self.user_rooms[user_id].add(user_room)
             
-            logger.info(f"🔗 Cliente WebSocket conectado - Usuario: {current_user.username}")
+            logger.info(f"🔗 Cliente WebSocket conectado - Usuario: {user_id}")
             emit('connection_status', {'status': 'connected', 'user_id': user_id})
         
         @self.socketio.on('disconnect')
         def handle_disconnect():
             """Maneja desconexión de cliente"""
-            if current_user.is_authenticated:
-                user_id = current_user.id
-                logger.info(f"🔌 Cliente WebSocket desconectado - Usuario: {current_user.username}")
+            user_id = self.current_user_id()
+            if user_id is not None:
+                logger.info(f"🔌 Cliente WebSocket desconectado - Usuario: {user_id}")
                 
                 # Limpiar salas
                 if user_id in self.user_rooms:
@@ -52,21 +81,47 @@ class ConnectionManager:
         @self.socketio.on('join_session')
         def handle_join_session(data):
             """Une al cliente a una sala de sesión específica"""
-            if not current_user.is_authenticated:
+            user_id = self.current_user_id()
+            if user_id is None:
                 return
             
-            session_id = data.get('session_id')
+            session_id = (data or {}).get('session_id')
+            if self.resolve_session:
+                session_id = self.resolve_session(user_id, session_id)
             if session_id:
                 room_name = f"session_{session_id}"
                 join_room(room_name)
                 
-                user_id = current_user.id
                 if user_id not in self.user_rooms:
                     self.user_rooms[user_id] = set()
                 self.user_rooms[user_id].add(room_name)
                 
                 logger.info(f"📊 Usuario {user_id} unido a sesión: {session_id}")
                 emit('session_joined', {'session_id': session_id})
+                # Ya en la sala: los deltas que lleguen mientras se construye el snapshot no se pierden
+                self.send_snapshot(session_id)
+        
+        @self.socketio.on('dashboard_resync')
+        def handle_dashboard_resync(data):
+            """Reenvía el snapshot a un cliente que perdió deltas"""
+            user_id = self.current_user_id()
+            if user_id is None or not self.resolve_session:
+                return
+            
+            session_id = self.resolve_session(user_id, (data or {}).get('session_id'))
+            if session_id:
+                join_room(f"session_{session_id}")
+                logger.info(f"🔄 Resync del dashboard - Usuario {user_id}, sesión {session_id}")
+                self.send_snapshot(session_id)
+    
+    def send_snapshot(self, session_id: int):
+        """Snapshot completo al cliente actual, con el (epoch, seq) desde el que aplicar deltas"""
+        if not self.snapshot:
+            return
+        try:
+            emit('dashboard_snapshot', self.stream.snapshot(session_id, lambda: self.snapshot(session_id)))
+        except Exception as e:
+            logger.error(f"❌ Error enviando snapshot del dashboard de la sesión {session_id}: {e}")
     
     def send_to_user(self, user_id: int, event: str, data: dict):
         """Envía un evento a un usuario específico"""
@@ -88,4 +143,25 @@ class ConnectionManager:
     
     def broadcast_balance(self, session_id: int, balance_data: dict):
         """Transmite actualización de balance"""
-        self.send_to_session(session_id, 'balance_update', balance_data)
\ No newline at end of file
+        self.send_to_session(session_id, 'balance_update', balance_data)
+    
+    def broadcast_position(self, session_id: int, position_data: dict):
+        """Transmite altas, cambios, cierres y valoraciones de posiciones"""
+        self.send_to_session(session_id, 'position_update', position_data)
+    
+    def broadcast_metrics(self, session_id: int, metrics_data: dict):
+        """Transmite métricas de riesgo"""
+        self.send_to_session(session_id, 'metrics_update', metrics_data)
+    
+    def publish_delta(self, session_id: int, kind: str, envelope: dict):
+        """Transporte de DashboardStream: cada tipo de delta a su evento"""
+        if kind == TRADE:
+            self.broadcast_trade(session_id, envelope)
+        elif kind == BALANCE:
+            self.broadcast_balance(session_id, envelope)
+        elif kind in (POSITION, MARKS):
+            self.broadcast_position(session_id, envelope)
+        elif kind == METRICS:
+            self.broadcast_metrics(session_id, envelope)
+        elif kind == SESSION:
+            self.send_to_session(session_id, 'session_update', envelope)
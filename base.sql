@@ -50,6 +50,7 @@ CREATE TABLE bot_sessions (
     final_balance DECIMAL(15, 2) NULL,
     status VARCHAR(20) DEFAULT 'running', -- 'running', 'stopped', 'paused', 'error'
     trading_mode VARCHAR(20) DEFAULT 'simulation', -- 'simulation', 'demo', 'real'
+    heartbeat_at TIMESTAMPTZ NULL, -- Último latido del proceso que ejecuta el bot
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -57,13 +58,51 @@ CREATE TABLE bot_sessions (
 CREATE TABLE balance_history (
     id SERIAL PRIMARY KEY,
     session_id INTEGER REFERENCES bot_sessions(id) ON DELETE CASCADE,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
     balance DECIMAL(15, 2) NOT NULL,
     pnl DECIMAL(15, 2) NOT NULL, -- P&L acumulado
     pnl_daily DECIMAL(15, 2) DEFAULT 0, -- P&L del día
     equity DECIMAL(15, 2) NOT NULL
 );
 
+-- 📊 TABLA: Rollups OHLC del historial de balances (1m / 1h / 1d)
+CREATE TABLE balance_rollups (
+    id BIGSERIAL PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES bot_sessions(id) ON DELETE CASCADE,
+    resolution VARCHAR(4) NOT NULL, -- '1m', '1h', '1d'
+    bucket_start TIMESTAMPTZ NOT NULL,
+    last_timestamp TIMESTAMPTZ NOT NULL, -- Último snapshot agregado al bucket
+    balance_open DECIMAL(15, 2) NOT NULL,
+    balance_high DECIMAL(15, 2) NOT NULL,
+    balance_low DECIMAL(15, 2) NOT NULL,
+    balance_close DECIMAL(15, 2) NOT NULL,
+    equity_open DECIMAL(15, 2) NOT NULL,
+    equity_high DECIMAL(15, 2) NOT NULL,
+    equity_low DECIMAL(15, 2) NOT NULL,
+    equity_close DECIMAL(15, 2) NOT NULL,
+    pnl_open DECIMAL(15, 2) NOT NULL,
+    pnl_high DECIMAL(15, 2) NOT NULL,
+    pnl_low DECIMAL(15, 2) NOT NULL,
+    pnl_close DECIMAL(15, 2) NOT NULL,
+    pnl_daily_close DECIMAL(15, 2) DEFAULT 0,
+    samples INTEGER NOT NULL DEFAULT 1,
+    CONSTRAINT uq_balance_rollups_bucket UNIQUE (session_id, resolution, bucket_start)
+);
+
+-- 📉 TABLA: Drawdown incremental por sesión (se actualiza con cada snapshot de balance)
+CREATE TABLE session_performance (
+    session_id INTEGER PRIMARY KEY REFERENCES bot_sessions(id) ON DELETE CASCADE,
+    last_timestamp TIMESTAMPTZ NOT NULL, -- Último snapshot aplicado
+    current_equity DECIMAL(15, 2) NOT NULL,
+    peak_equity DECIMAL(15, 2) NOT NULL,
+    peak_time TIMESTAMPTZ NOT NULL, -- Inicio del drawdown en curso
+    current_drawdown DECIMAL(10, 4) NOT NULL DEFAULT 0, -- % bajo el pico
+    max_drawdown DECIMAL(10, 4) NOT NULL DEFAULT 0,
+    max_drawdown_time TIMESTAMPTZ NULL,
+    max_drawdown_duration BIGINT NOT NULL DEFAULT 0, -- Segundos bajo el pico
+    samples INTEGER NOT NULL DEFAULT 1
+);
+
 -- 📈 TABLA: Órdenes de trading
 CREATE TABLE orders (
     id SERIAL PRIMARY KEY,
@@ -104,6 +143,7 @@ CREATE TABLE trades (
     take_profit DECIMAL(15, 6),
     signal_strength VARCHAR(100),
     real_trade BOOLEAN DEFAULT false,
+    needs_reconciliation BOOLEAN NOT NULL DEFAULT false, -- Trade real que quedó sin bot: revisar en el exchange
     risk_metrics JSONB NULL -- Métricas de riesgo específicas del trade
 );
 
@@ -128,7 +168,7 @@ CREATE TABLE positions (
 CREATE TABLE market_data (
     id SERIAL PRIMARY KEY,
     symbol VARCHAR(20) NOT NULL,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP, -- Apertura de la vela (UTC)
     open DECIMAL(15, 6) NOT NULL,
     high DECIMAL(15, 6) NOT NULL,
     low DECIMAL(15, 6) NOT NULL,
@@ -139,14 +179,18 @@ CREATE TABLE market_data (
 
 -- 📝 TABLA: Logs del sistema
 CREATE TABLE system_logs (
-    id SERIAL PRIMARY KEY,
-    session_id INTEGER REFERENCES bot_sessions(id) ON DELETE CASCADE,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    id BIGSERIAL,
+    session_id INTEGER NOT NULL REFERENCES bot_sessions(id) ON DELETE CASCADE,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     level VARCHAR(10) NOT NULL, -- 'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'
     source VARCHAR(50) NOT NULL, -- 'trading', 'system', 'risk_management', 'strategy'
     message TEXT NOT NULL,
-    details JSONB NULL -- Datos adicionales estructurados
-);
+    details JSONB NULL, -- Datos adicionales estructurados
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Red de seguridad para filas fuera de las particiones creadas por LogPartitionManager
+CREATE TABLE system_logs_default PARTITION OF system_logs DEFAULT;
 
 -- 🛡️ TABLA: Métricas de riesgo
 CREATE TABLE risk_metrics (
@@ -192,6 +236,8 @@ CREATE INDEX idx_trades_status ON trades(status);
 CREATE INDEX idx_trades_entry_time ON trades(entry_time);
 CREATE INDEX idx_trades_exit_time ON trades(exit_time);
 CREATE INDEX idx_trades_real_trade ON trades(real_trade);
+CREATE INDEX idx_trades_session_status_exit_time ON trades(session_id, status, exit_time);
+CREATE INDEX idx_trades_status_exit_time_id ON trades(status, exit_time, id);
 
 -- Índices para órdenes
 CREATE INDEX idx_orders_session_id ON orders(session_id);
@@ -202,16 +248,20 @@ CREATE INDEX idx_orders_created_time ON orders(created_time);
 -- Índices para balance history
 CREATE INDEX idx_balance_history_session_id ON balance_history(session_id);
 CREATE INDEX idx_balance_history_timestamp ON balance_history(timestamp);
+CREATE INDEX idx_balance_rollups_resolution_time ON balance_rollups(resolution, bucket_start);
+
+-- Índices para datos de mercado (clave única para ingesta idempotente)
+CREATE UNIQUE INDEX uq_market_data_symbol_interval_time ON market_data(symbol, interval, timestamp);
 
 -- Índices para logs
-CREATE INDEX idx_logs_session_id ON system_logs(session_id);
+CREATE INDEX idx_logs_session_time ON system_logs(session_id, timestamp);
+CREATE INDEX idx_logs_session_level_time ON system_logs(session_id, level, timestamp);
 CREATE INDEX idx_logs_timestamp ON system_logs(timestamp);
-CREATE INDEX idx_logs_level ON system_logs(level);
-CREATE INDEX idx_logs_source ON system_logs(source);
 
 -- Índices para métricas de riesgo
 CREATE INDEX idx_risk_metrics_session_id ON risk_metrics(session_id);
 CREATE INDEX idx_risk_metrics_timestamp ON risk_metrics(timestamp);
+CREATE INDEX idx_risk_metrics_session_period_name_time ON risk_metrics(session_id, time_period, metric_name, timestamp);
 
 -- Índices para auditoría
 CREATE INDEX idx_audit_user_id ON audit_sessions(user_id);
@@ -0,0 +1,79 @@
+# benchmark_ticks.py
+import json
+import os
+import sys
+import time
+
+
+def build_messages(symbols, minutes):
+    """Mensajes de kline de 1m como los entrega el stream combinado (4 updates por vela)"""
+    start = 1_700_000_000_000 - 1_700_000_000_000 % 86_400_000
+    messages = []
+    for minute in range(minutes):
+        open_time = start + minute * 60_000
+        for step in range(4):
+            for index, symbol in enumerate(symbols):
+                price = 100.0 + index + (minute % 50) * 0.1 + step * 0.01
+                messages.append({
+                    'e': 'kline', 'E': open_time + step * 15_000, 's': symbol,
+                    'k': {
+                        't': open_time, 'T': open_time + 59_999, 's': symbol, 'i': '1m',
+                        'o': f"{price:.2f}", 'h': f"{price + 0.5:.2f}", 'l': f"{price - 0.5:.2f}",
+                        'c': f"{price + 0.1:.2f}", 'v': f"{10 + step:.3f}", 'x': step == 3
+                    }
+                })
+    return messages
+
+
+def run(label, handler, messages, decode=False):
+    payloads = [json.dumps(m) for m in messages] if decode else messages
+    started = time.perf_counter()
+    if decode:
+        for raw in payloads:
+            handler(json.loads(raw))
+    else:
+        for message in payloads:
+            handler(message)
+    elapsed = time.perf_counter() - started
+    rate = len(messages) / elapsed
+    status = "✅" if rate >= 50_000 else "⚠️"
+    print(f"{status} {label:<42} {rate:>12,.0f} msg/s  ({elapsed * 1e6 / len(messages):.2f} µs/msg)")
+
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app.services.tick_handler import KlineTickHandler
+    from app.services.market_buffer import MarketDataBuffer
+    from app.services.indicators import IndicatorEngine
+    from app.services.resampler import INTERVAL_MS, KlineResampler
+
+    symbols = [f"SYM{i}USDT" for i in range(200)]
+    messages = build_messages(symbols, minutes=150)
+    print(f"🔍 {len(messages):,} mensajes, {len(symbols)} símbolos")
+
+    run("parseo (sin consumidores)", KlineTickHandler(), messages)
+
+    timeframes = ['1m', '5m', '15m', '1h', '4h', '1d']
+    market_buffer = MarketDataBuffer(capacity=500)
+    market_buffer.resampler = KlineResampler(timeframes)
+    history_start = messages[0]['k']['t'] - 30 * 86_400_000
+    for symbol in symbols:
+        for timeframe in timeframes:
+            step = INTERVAL_MS[timeframe]
+            market_buffer.load(symbol, timeframe, [
+                [history_start + i * step, 100.0, 100.5, 99.5, 100.1, 10.0] for i in range(30)
+            ])
+    indicators = IndicatorEngine({'sma_fast': 5, 'sma_slow': 20, 'rsi_period': 14})
+    indicators.seed(market_buffer, symbols, ['1h'])
+
+    def on_tick(tick):
+        market_buffer.on_kline(tick.symbol, tick.open_time, tick.open, tick.high, tick.low,
+                               tick.close, tick.volume, tick.is_closed)
+        indicators.refresh(market_buffer, tick.symbol)
+
+    run("parseo + buffers + resampler + indicadores", KlineTickHandler([on_tick]), messages)
+    run("json.loads + parseo", KlineTickHandler(), messages, decode=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+-- =============================================================================
+-- 📝 MIGRACIÓN: system_logs particionada por rango de timestamp
+-- =============================================================================
+-- Convierte la tabla existente en una tabla particionada (PostgreSQL 12+).
+-- Todas las filas históricas pasan a system_logs_default; LogPartitionManager
+-- las mueve a particiones diarias/semanales dentro de la ventana de retención
+-- y elimina las más antiguas en su primera ejecución.
+--
+-- Uso: psql -d <db> -f database/migrations/001_partition_system_logs.sql
+-- Es idempotente: no hace nada si system_logs ya está particionada.
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = 'system_logs'
+    ) THEN
+        RAISE NOTICE 'system_logs ya está particionada';
+        RETURN;
+    END IF;
+
+    ALTER TABLE system_logs RENAME TO system_logs_legacy;
+    DROP INDEX IF EXISTS idx_logs_session_id;
+    DROP INDEX IF EXISTS idx_logs_timestamp;
+    DROP INDEX IF EXISTS idx_logs_level;
+    DROP INDEX IF EXISTS idx_logs_source;
+    DROP INDEX IF EXISTS ix_system_logs_id;
+
+    CREATE TABLE system_logs (
+        id BIGSERIAL,
+        session_id INTEGER NOT NULL REFERENCES bot_sessions(id) ON DELETE CASCADE,
+        timestamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        level VARCHAR(10) NOT NULL,
+        source VARCHAR(50) NOT NULL,
+        message TEXT NOT NULL,
+        details JSONB NULL,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+
+    CREATE TABLE system_logs_default PARTITION OF system_logs DEFAULT;
+
+    CREATE INDEX idx_logs_session_time ON system_logs(session_id, timestamp);
+    CREATE INDEX idx_logs_session_level_time ON system_logs(session_id, level, timestamp);
+    CREATE INDEX idx_logs_timestamp ON system_logs(timestamp);
+
+    INSERT INTO system_logs (id, session_id, timestamp, level, source, message, details)
+    SELECT id, session_id, COALESCE(timestamp, CURRENT_TIMESTAMP), level, source, message, details
+    FROM system_logs_legacy
+    WHERE session_id IS NOT NULL;
+
+    PERFORM setval(pg_get_serial_sequence('system_logs', 'id'),
+                   COALESCE((SELECT MAX(id) FROM system_logs), 0) + 1, false);
+
+    DROP TABLE system_logs_legacy;
+END $$;
+
+COMMIT;
@@ -0,0 +1,28 @@
+-- =============================================================================
+-- 📈 MIGRACIÓN: market_data.timestamp pasa a TIMESTAMPTZ
+-- =============================================================================
+-- El modelo MarketData declara DateTime(timezone=True) y el ingestor escribe
+-- to_timestamp(open_time / 1000.0), que ya es TIMESTAMPTZ. Con la columna sin
+-- zona horaria Postgres convertía esos instantes con el TimeZone del
+-- servidor. Los valores existentes se interpretan como UTC.
+--
+-- Uso: psql -d <db> -f database/migrations/002_market_data_timestamptz.sql
+-- Es idempotente: no hace nada si la columna ya es TIMESTAMPTZ.
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'market_data' AND column_name = 'timestamp'
+          AND data_type = 'timestamp without time zone'
+    ) THEN
+        ALTER TABLE market_data
+            ALTER COLUMN timestamp TYPE TIMESTAMPTZ USING timestamp AT TIME ZONE 'UTC';
+    ELSE
+        RAISE NOTICE 'market_data.timestamp ya es TIMESTAMPTZ';
+    END IF;
+END $$;
+
+COMMIT;
@@ -0,0 +1,63 @@
+-- =============================================================================
+-- 💰 MIGRACIÓN: balance_history.timestamp pasa a TIMESTAMPTZ
+-- =============================================================================
+-- El modelo BalanceHistory declara DateTime(timezone=True) y BalanceService
+-- escribe datetimes con zona. Con la columna sin zona horaria Postgres
+-- guardaba la hora local del TimeZone de la conexión, y la reconstrucción de
+-- rollups (extract(epoch)) la leía como UTC: buckets desplazados en
+-- servidores fuera de UTC.
+--
+-- Los valores existentes son hora local del TimeZone con el que escribe la
+-- aplicación (el del servidor salvo configuración propia) y se interpretan en
+-- el TimeZone de esta sesión: ejecutar con ese mismo TimeZone, sin PGTZ.
+-- Después conviene regenerar rollups y drawdown: flask balance-rollups y
+-- flask performance-backfill
+--
+-- La vista dashboard_stats depende de la columna: se elimina y se recrea.
+--
+-- Uso: psql -d <db> -f database/migrations/003_balance_history_timestamptz.sql
+-- Es idempotente: no hace nada si la columna ya es TIMESTAMPTZ.
+
+BEGIN;
+
+DO $$
+DECLARE
+    had_view BOOLEAN;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'balance_history' AND column_name = 'timestamp'
+          AND data_type = 'timestamp without time zone'
+    ) THEN
+        had_view := EXISTS (SELECT 1 FROM information_schema.views WHERE table_name = 'dashboard_stats');
+        DROP VIEW IF EXISTS dashboard_stats;
+
+        ALTER TABLE balance_history
+            ALTER COLUMN timestamp TYPE TIMESTAMPTZ USING timestamp::timestamptz;
+
+        IF had_view THEN
+            CREATE VIEW dashboard_stats AS
+            SELECT
+                bs.id as session_id,
+                bs.session_name,
+                bs.status,
+                bs.trading_mode,
+                bs.start_time,
+                bs.initial_balance,
+                bh.balance as current_balance,
+                bh.pnl as total_pnl,
+                (bh.pnl / bs.initial_balance * 100) as total_pnl_percent,
+                (SELECT COUNT(*) FROM trades t WHERE t.session_id = bs.id AND t.status = 'closed') as total_trades,
+                (SELECT COUNT(*) FROM trades t WHERE t.session_id = bs.id AND t.status = 'closed' AND t.pnl > 0) as winning_trades,
+                (SELECT COUNT(*) FROM trades t WHERE t.session_id = bs.id AND t.status = 'open') as active_positions
+            FROM bot_sessions bs
+            LEFT JOIN balance_history bh ON bh.session_id = bs.id
+            WHERE bh.timestamp = (SELECT MAX(timestamp) FROM balance_history WHERE session_id = bs.id)
+            AND bs.status = 'running';
+        END IF;
+    ELSE
+        RAISE NOTICE 'balance_history.timestamp ya es TIMESTAMPTZ';
+    END IF;
+END $$;
+
+COMMIT;
@@ -0,0 +1,39 @@
+-- =============================================================================
+-- 💓 MIGRACIÓN: latido de sesiones y trades pendientes de conciliar
+-- =============================================================================
+-- Detener el bot ya no liquida sus posiciones: quedan abiertas en BD y el
+-- siguiente bot del usuario las adopta. Para no adoptar las de un bot que
+-- sigue vivo en otro proceso, cada proceso actualiza bot_sessions.heartbeat_at
+-- de sus sesiones; sólo se adoptan las de sesiones detenidas o sin latido
+-- reciente.
+--
+-- Los trades reales que quedan sin bot nunca se cierran automáticamente: se
+-- marcan con trades.needs_reconciliation para revisarlos en el exchange.
+--
+-- Uso: psql -d <db> -f database/migrations/004_session_heartbeat_reconciliation.sql
+-- Es idempotente: no hace nada si las columnas ya existen.
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'bot_sessions' AND column_name = 'heartbeat_at'
+    ) THEN
+        ALTER TABLE bot_sessions ADD COLUMN heartbeat_at TIMESTAMPTZ NULL;
+    ELSE
+        RAISE NOTICE 'bot_sessions.heartbeat_at ya existe';
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'trades' AND column_name = 'needs_reconciliation'
+    ) THEN
+        ALTER TABLE trades ADD COLUMN needs_reconciliation BOOLEAN NOT NULL DEFAULT false;
+    ELSE
+        RAISE NOTICE 'trades.needs_reconciliation ya existe';
+    END IF;
+END $$;
+
+COMMIT;
@@ -52,6 +52,7 @@ CREATE TABLE IF NOT EXISTS bot_sessions (
     final_balance DECIMAL(15, 2) NULL,
     status VARCHAR(20) DEFAULT 'running',
     trading_mode VARCHAR(20) DEFAULT 'simulation',
+    heartbeat_at TIMESTAMPTZ NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_bot_sessions_user FOREIGN KEY (user_id) REFERENCES users(id)
 );
@@ -60,7 +61,7 @@ CREATE TABLE IF NOT EXISTS bot_sessions (
 CREATE TABLE IF NOT EXISTS balance_history (
     id SERIAL PRIMARY KEY,
     session_id INTEGER NOT NULL REFERENCES bot_sessions(id) ON DELETE CASCADE,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
     balance DECIMAL(15, 2) NOT NULL,
     pnl DECIMAL(15, 2) NOT NULL,
     pnl_daily DECIMAL(15, 2) DEFAULT 0,
@@ -68,6 +69,44 @@ CREATE TABLE IF NOT EXISTS balance_history (
     CONSTRAINT fk_balance_history_session FOREIGN KEY (session_id) REFERENCES bot_sessions(id)
 );
 
+-- 📊 TABLA: Rollups OHLC del historial de balances (1m / 1h / 1d)
+CREATE TABLE IF NOT EXISTS balance_rollups (
+    id BIGSERIAL PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES bot_sessions(id) ON DELETE CASCADE,
+    resolution VARCHAR(4) NOT NULL, -- '1m', '1h', '1d'
+    bucket_start TIMESTAMPTZ NOT NULL,
+    last_timestamp TIMESTAMPTZ NOT NULL, -- Último snapshot agregado al bucket
+    balance_open DECIMAL(15, 2) NOT NULL,
+    balance_high DECIMAL(15, 2) NOT NULL,
+    balance_low DECIMAL(15, 2) NOT NULL,
+    balance_close DECIMAL(15, 2) NOT NULL,
+    equity_open DECIMAL(15, 2) NOT NULL,
+    equity_high DECIMAL(15, 2) NOT NULL,
+    equity_low DECIMAL(15, 2) NOT NULL,
+    equity_close DECIMAL(15, 2) NOT NULL,
+    pnl_open DECIMAL(15, 2) NOT NULL,
+    pnl_high DECIMAL(15, 2) NOT NULL,
+    pnl_low DECIMAL(15, 2) NOT NULL,
+    pnl_close DECIMAL(15, 2) NOT NULL,
+    pnl_daily_close DECIMAL(15, 2) DEFAULT 0,
+    samples INTEGER NOT NULL DEFAULT 1,
+    CONSTRAINT uq_balance_rollups_bucket UNIQUE (session_id, resolution, bucket_start)
+);
+
+-- 📉 TABLA: Drawdown incremental por sesión (se actualiza con cada snapshot de balance)
+CREATE TABLE IF NOT EXISTS session_performance (
+    session_id INTEGER PRIMARY KEY REFERENCES bot_sessions(id) ON DELETE CASCADE,
+    last_timestamp TIMESTAMPTZ NOT NULL, -- Último snapshot aplicado
+    current_equity DECIMAL(15, 2) NOT NULL,
+    peak_equity DECIMAL(15, 2) NOT NULL,
+    peak_time TIMESTAMPTZ NOT NULL, -- Inicio del drawdown en curso
+    current_drawdown DECIMAL(10, 4) NOT NULL DEFAULT 0, -- % bajo el pico
+    max_drawdown DECIMAL(10, 4) NOT NULL DEFAULT 0,
+    max_drawdown_time TIMESTAMPTZ NULL,
+    max_drawdown_duration BIGINT NOT NULL DEFAULT 0, -- Segundos bajo el pico
+    samples INTEGER NOT NULL DEFAULT 1
+);
+
 -- 📈 TABLA: Órdenes de trading
 CREATE TABLE IF NOT EXISTS orders (
     id SERIAL PRIMARY KEY,
@@ -109,6 +148,7 @@ CREATE TABLE IF NOT EXISTS trades (
     take_profit DECIMAL(15, 6),
     signal_strength VARCHAR(100),
     real_trade BOOLEAN DEFAULT false,
+    needs_reconciliation BOOLEAN NOT NULL DEFAULT false,
     risk_metrics JSONB NULL,
     CONSTRAINT fk_trades_session FOREIGN KEY (session_id) REFERENCES bot_sessions(id),
     CONSTRAINT fk_trades_entry_order FOREIGN KEY (entry_order_id) REFERENCES orders(id),
@@ -134,17 +174,34 @@ CREATE TABLE IF NOT EXISTS positions (
     CONSTRAINT fk_positions_trade FOREIGN KEY (trade_id) REFERENCES trades(id)
 );
 
+-- 📉 TABLA: Datos de mercado (velas cerradas del stream)
+CREATE TABLE IF NOT EXISTS market_data (
+    id SERIAL PRIMARY KEY,
+    symbol VARCHAR(20) NOT NULL,
+    timestamp TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP, -- Apertura de la vela (UTC)
+    open DECIMAL(15, 6) NOT NULL,
+    high DECIMAL(15, 6) NOT NULL,
+    low DECIMAL(15, 6) NOT NULL,
+    close DECIMAL(15, 6) NOT NULL,
+    volume DECIMAL(20, 8) NOT NULL,
+    interval VARCHAR(10) NOT NULL,
+    CONSTRAINT uq_market_data_symbol_interval_time UNIQUE (symbol, interval, timestamp)
+);
+
 -- 📝 TABLA: Logs del sistema
 CREATE TABLE IF NOT EXISTS system_logs (
-    id SERIAL PRIMARY KEY,
+    id BIGSERIAL,
     session_id INTEGER NOT NULL REFERENCES bot_sessions(id) ON DELETE CASCADE,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    level VARCHAR(10) NOT NULL,
-    source VARCHAR(50) NOT NULL,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    level VARCHAR(10) NOT NULL, -- 'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'
+    source VARCHAR(50) NOT NULL, -- 'trading', 'system', 'risk_management', 'strategy'
     message TEXT NOT NULL,
-    details JSONB NULL,
-    CONSTRAINT fk_system_logs_session FOREIGN KEY (session_id) REFERENCES bot_sessions(id)
-);
+    details JSONB NULL, -- Datos adicionales estructurados
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Red de seguridad para filas fuera de las particiones creadas por LogPartitionManager
+CREATE TABLE IF NOT EXISTS system_logs_default PARTITION OF system_logs DEFAULT;
 
 -- 🛡️ TABLA: Métricas de riesgo
 CREATE TABLE IF NOT EXISTS risk_metrics (
@@ -201,6 +258,8 @@ CREATE INDEX IF NOT EXISTS idx_trades_status ON trades(status);
 CREATE INDEX IF NOT EXISTS idx_trades_entry_time ON trades(entry_time);
 CREATE INDEX IF NOT EXISTS idx_trades_exit_time ON trades(exit_time);
 CREATE INDEX IF NOT EXISTS idx_trades_real_trade ON trades(real_trade);
+CREATE INDEX IF NOT EXISTS idx_trades_session_status_exit_time ON trades(session_id, status, exit_time);
+CREATE INDEX IF NOT EXISTS idx_trades_status_exit_time_id ON trades(status, exit_time, id);
 CREATE INDEX IF NOT EXISTS idx_trades_pnl ON trades(pnl);
 
 -- Orders
@@ -213,6 +272,7 @@ CREATE INDEX IF NOT EXISTS idx_orders_created_time ON orders(created_time);
 -- Balance History
 CREATE INDEX IF NOT EXISTS idx_balance_history_session_id ON balance_history(session_id);
 CREATE INDEX IF NOT EXISTS idx_balance_history_timestamp ON balance_history(timestamp);
+CREATE INDEX IF NOT EXISTS idx_balance_rollups_resolution_time ON balance_rollups(resolution, bucket_start);
 
 -- Positions
 CREATE INDEX IF NOT EXISTS idx_positions_session_id ON positions(session_id);
@@ -220,14 +280,14 @@ CREATE INDEX IF NOT EXISTS idx_positions_symbol ON positions(symbol);
 CREATE INDEX IF NOT EXISTS idx_positions_trade_id ON positions(trade_id);
 
 -- Logs
-CREATE INDEX IF NOT EXISTS idx_logs_session_id ON system_logs(session_id);
+CREATE INDEX IF NOT EXISTS idx_logs_session_time ON system_logs(session_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_logs_session_level_time ON system_logs(session_id, level, timestamp);
 CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON system_logs(timestamp);
-CREATE INDEX IF NOT EXISTS idx_logs_level ON system_logs(level);
-CREATE INDEX IF NOT EXISTS idx_logs_source ON system_logs(source);
 
 -- Risk Metrics
 CREATE INDEX IF NOT EXISTS idx_risk_metrics_session_id ON risk_metrics(session_id);
 CREATE INDEX IF NOT EXISTS idx_risk_metrics_timestamp ON risk_metrics(timestamp);
+CREATE INDEX IF NOT EXISTS idx_risk_metrics_session_period_name_time ON risk_metrics(session_id, time_period, metric_name, timestamp);
 CREATE INDEX IF NOT EXISTS idx_risk_metrics_name ON risk_metrics(metric_name);
 
 -- Audit
@@ -205,88 +205,139 @@ def dashboard_data():
     if not user_id:
         return jsonify({"success": False, "message": "No autenticado"}), 401
 
+    # Buscar la última sesión del usuario (resuelta en BD sólo tras un inicio/parada de bot)
+    session_id = _dashboard_session_id(user_id)
+    if not session_id:
+        return jsonify({"success": True, "message": "No hay sesión de bot activa", "balance": {}, "trading": {}, "positions": {}, "session": {}})
+
+    payload = _dashboard_payload(session_id, request.args.get('max_points', type=int))
+
+    # El cliente ya tiene esta versión: nada que enviar
+    if request.args.get('version') == payload["version"]:
+        return jsonify({"success": True, "unchanged": True, "version": payload["version"]})
+
+    return jsonify(payload)
+
+
+def _dashboard_session_id(user_id, session_id=None):
+    """Sesión del dashboard: la pedida si es del usuario, si no la última que arrancó"""
     from app.models.bot_sessions import BotSession
-    from app.models.trades import Trade
-    from app.models.positions import Position
-    from app.models.balance_history import BalanceHistory
-    from app.models.users import User
-    from app.models.orders import Order
     from app.models.base import session_scope
+    from app.services.dashboard_cache import get_dashboard_cache
+    from app.services.dashboard_query import resolve_session
+
+    def latest_session_id():
+        with session_scope() as db:
+            row = db.query(BotSession.id).filter(BotSession.user_id == user_id)\
+                .order_by(BotSession.start_time.desc()).first()
+            return row[0] if row else None
+
+    cache = get_dashboard_cache()
+    if session_id is None:
+        return cache.session_id(user_id, 'latest', latest_session_id)
+    return cache.session_id(user_id, str(session_id), lambda: resolve_session(user_id, session_id))
+
+
+def _dashboard_payload(session_id, max_points=None):
+    """Payload completo de /dashboard/data; el mismo sirve de snapshot inicial del socket"""
+    from app.services.dashboard_cache import get_dashboard_cache
+
+    # Snapshot versionado: sólo se recalculan las secciones invalidadas por eventos del bot;
+    # las posiciones (en memoria, al último precio) se construyen siempre
+    version, sections = get_dashboard_cache().get(
+        f"legacy:{max_points or ''}", session_id,
+        lambda stale: _dashboard_sections(session_id, stale, max_points),
+        sections=('session', 'balance', 'trading', 'positions'),
+        volatile=('positions',)
+    )
+    return {
+        "success": True,
+        **sections,
+        "version": version,
+        "timestamp": datetime.now().isoformat()
+    }
 
-    with session_scope() as db:
-        # Buscar la última sesión activa del usuario
-        bot_session = db.query(BotSession).filter(BotSession.user_id == user_id).order_by(BotSession.start_time.desc()).first()
-        if not bot_session:
-            return jsonify({"success": True, "message": "No hay sesión de bot activa", "balance": {}, "trading": {}, "positions": {}, "session": {}})
-
-        # Balance
-        balance_history = db.query(BalanceHistory).filter(BalanceHistory.session_id == bot_session.id).order_by(BalanceHistory.timestamp.asc()).all()
-        balance_list = [bh.to_dict() for bh in balance_history]
-        current_balance = float(bot_session.final_balance) if bot_session.final_balance else float(bot_session.initial_balance)
-        total_pnl = current_balance - float(bot_session.initial_balance)
-        total_pnl_percent = (total_pnl / float(bot_session.initial_balance)) * 100 if bot_session.initial_balance else 0.0
-
-        # Trades
-        trades = db.query(Trade).filter(Trade.session_id == bot_session.id).order_by(Trade.entry_time.desc()).limit(10).all()
-        recent_trades = []
-        winning_trades = 0
-        losing_trades = 0
-        real_trades = 0
-        simulated_trades = 0
-        for t in trades:
-            if t.pnl and t.pnl > 0:
-                winning_trades += 1
-            elif t.pnl and t.pnl < 0:
-                losing_trades += 1
-            if t.real_trade:
-                real_trades += 1
-            else:
-                simulated_trades += 1
-            recent_trades.append({
-                "symbol": t.symbol,
-                "entry_price": float(t.entry_price),
-                "exit_price": float(t.exit_price) if t.exit_price else None,
-                "pnl": float(t.pnl) if t.pnl else 0.0,
-                "status": "WIN" if t.pnl and t.pnl > 0 else "LOSS",
-                "real_trade": t.real_trade,
-                "exit_time": t.exit_time.isoformat() if t.exit_time else None,
-                "close_reason": t.close_reason
-            })
-        total_trades = len(trades)
-        win_rate = (winning_trades / total_trades) * 100 if total_trades > 0 else 0.0
-
-        # Posiciones
-        positions = db.query(Position).filter(Position.session_id == bot_session.id).all()
-        active_positions = len(positions)
-        positions_list = []
-        for p in positions:
-            positions_list.append({
-                "symbol": p.symbol,
-                "entry_price": float(p.entry_price),
-                "current_price": float(p.current_price),
-                "quantity": float(p.quantity),
-                "unrealized_pnl": float(p.unrealized_pnl),
-                "unrealized_pnl_percent": float(p.unrealized_pnl_percent),
-                "stop_loss": float(p.stop_loss),
-                "take_profit": float(p.take_profit),
-                "real_trade": db.query(Trade).filter(Trade.id == p.trade_id).first().real_trade if p.trade_id else False
-            })
-
-        # Sesión
-        session_info = {
-            "status": bot_session.status,
-            "trading_mode": bot_session.trading_mode
+
+def _dashboard_sections(session_id, stale, max_points=None):
+    """Secciones de /dashboard/data pedidas en `stale`"""
+    from app.models.bot_sessions import BotSession
+    from app.models.base import session_scope
+    from app.services.balance_service import get_balance_service
+    from app.services.mark_to_market import get_mark_to_market
+    from app.services.dashboard_query import fetch_dashboard
+
+    sections = {}
+    if 'positions' in stale:
+        # Posiciones (valoradas en memoria al último precio, con su flag real/simulado)
+        positions = get_mark_to_market().positions(session_id)
+        sections['positions'] = {
+            "active_positions": len(positions),
+            "positions": [{
+                "id": p["id"],
+                "symbol": p["symbol"],
+                "entry_price": p["entry_price"],
+                "current_price": p["current_price"],
+                "quantity": p["quantity"],
+                "unrealized_pnl": p["unrealized_pnl"],
+                "unrealized_pnl_percent": p["unrealized_pnl_percent"],
+                "stop_loss": p["stop_loss"],
+                "take_profit": p["take_profit"],
+                "real_trade": p["real_trade"]
+            } for p in positions]
         }
+        if not stale - {'positions'}:
+            return sections
 
-        return jsonify({
-            "success": True,
-            "balance": {
+    with session_scope() as db:
+        bot_session = db.query(BotSession).filter(BotSession.id == session_id).first()
+
+        if 'session' in stale:
+            # Sesión
+            sections['session'] = {
+                "status": bot_session.status,
+                "trading_mode": bot_session.trading_mode
+            }
+
+        if 'balance' in stale:
+            # Balance
+            # Serie de toda la sesión desde los rollups, acotada a max_points puntos
+            balance_history = get_balance_service().get_history(bot_session.id, max_points=max_points)
+            current_balance = float(bot_session.final_balance) if bot_session.final_balance else float(bot_session.initial_balance)
+            total_pnl = current_balance - float(bot_session.initial_balance)
+            total_pnl_percent = (total_pnl / float(bot_session.initial_balance)) * 100 if bot_session.initial_balance else 0.0
+            sections['balance'] = {
                 "current_balance": current_balance,
                 "total_pnl": total_pnl,
                 "total_pnl_percent": total_pnl_percent,
-                "history": balance_list
-            },
-            "trading": {
+                "resolution": balance_history['resolution'],
+                "history": balance_history['points']
+            }
+
+        if 'trading' in stale:
+            # Trades cerrados: contadores de toda la sesión (los mismos que suman los deltas
+            # trade_update) y los últimos por exit_time, en un solo viaje a la BD
+            rows = fetch_dashboard(bot_session.id, ('trading',), None, None, None)
+            stats = rows['trade_stats']
+            total_trades = stats['total_trades'] or 0
+            winning_trades = stats['winning_trades'] or 0
+            losing_trades = total_trades - winning_trades
+            real_trades = stats['real_trades'] or 0
+            simulated_trades = total_trades - real_trades
+            recent_trades = []
+            for t in rows['recent_trades']:
+                recent_trades.append({
+                    "id": t.id,
+                    "symbol": t.symbol,
+                    "entry_price": float(t.entry_price),
+                    "exit_price": float(t.exit_price) if t.exit_price else None,
+                    "pnl": float(t.pnl) if t.pnl else 0.0,
+                    "status": "WIN" if t.pnl and t.pnl > 0 else "LOSS",
+                    "real_trade": t.real_trade,
+                    "exit_time": t.exit_time.isoformat() if t.exit_time else None,
+                    "close_reason": t.close_reason
+                })
+            win_rate = (winning_trades / total_trades) * 100 if total_trades > 0 else 0.0
+            sections['trading'] = {
                 "total_trades": total_trades,
                 "real_trades": real_trades,
                 "simulated_trades": simulated_trades,
@@ -294,27 +345,19 @@ def dashboard_data():
                 "losing_trades": losing_trades,
                 "win_rate": win_rate,
                 "recent_trades": recent_trades
-            },
-            "positions": {
-                "active_positions": active_positions,
-                "positions": positions_list
-            },
-            "session": session_info,
-            "timestamp": datetime.now().isoformat()
-        })
+            }
+
+    return sections
 
 # WebSocket events (simplificados)
-@socketio.on('connect')
-def handle_connect():
-    """Manejador de conexión de clientes WebSocket"""
-    logger.info('✅ Cliente conectado via WebSocket')
-    socketio.emit('connection_status', {'status': 'connected'})
-    return True
-
-@socketio.on('disconnect')
-def handle_disconnect(reason):
-    """Manejador de desconexión de clientes WebSocket"""
-    logger.info(f'🔌 Cliente desconectado: {reason}')
+# connect/disconnect/join_session/dashboard_resync: snapshot al unirse y luego deltas del bot
+from app.websocket.connection_manager import ConnectionManager
+connection_manager = ConnectionManager(
+    socketio,
+    current_user_id=lambda: session.get('user_id'),
+    resolve_session=_dashboard_session_id,
+    snapshot=_dashboard_payload
+)
 
 @socketio.event
 def market_data_request(data):
@@ -0,0 +1,315 @@
+# tests/conftest.py
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
+
+from app.models import base
+from app.models.base import Base, SessionLocal
+from app.models.bot_sessions import BotSession
+from app.models.trades import Trade
+from app.models.balance_rollup import BalanceRollup
+from app.services import balance_service, dashboard_cache, dashboard_query, mark_to_market
+from app.services.dashboard_cache import DashboardCache, MemoryCacheBackend
+from app.services.mark_to_market import MarkToMarketService
+
+
+@compiles(JSONB, 'sqlite')
+def _jsonb_sqlite(type_, compiler, **kw):
+    return 'JSON'
+
+
+# ==================== BD DE PRUEBAS ====================
+
+def _sqlite_params(sql, params):
+    """Paramstyle de psycopg2 (%s, %(name)s) -> sqlite3 (?, :name)"""
+    if isinstance(params, dict):
+        return re.sub(r'%\((\w+)\)s', r':\1', sql), params
+    return sql.replace('%s', '?'), tuple(params)
+
+
+def _dicts(raw, sql, *params):
+    cursor = raw.execute(sql, params)
+    names = [c[0] for c in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def postgres_responder(raw, sql, params):
+    """
+    Responde desde sqlite las sentencias del dashboard que sólo entiende
+    Postgres (SESSION_SQL y la consulta única de fetch_dashboard), con el
+    mismo formato de filas. None para las demás.
+    """
+    if sql == dashboard_query.SESSION_SQL:
+        rows = _dicts(raw, """
+            SELECT id FROM bot_sessions
+            WHERE user_id = ? AND (? IS NULL OR id = ?)
+            ORDER BY (status = 'running') DESC, created_at DESC LIMIT 1
+        """, params['user_id'], params['session_id'], params['session_id'])
+        return ['id'], [(row['id'],) for row in rows]
+
+    if not sql.startswith(dashboard_query._CTES):
+        return None
+    session_id = params['session_id']
+    closed = _dicts(raw, "SELECT * FROM trades WHERE session_id = ? AND status = 'closed' "
+                         "ORDER BY exit_time DESC", session_id)
+    values = {
+        'session': next(iter(_dicts(raw, "SELECT * FROM bot_sessions WHERE id = ?", session_id)), None),
+        'trade_stats': {
+            'total_trades': len(closed),
+            'winning_trades': sum(1 for t in closed if (t['pnl'] or 0) > 0),
+            'real_trades': sum(1 for t in closed if t['real_trade']),
+            'total_pnl': sum(t['pnl'] or 0 for t in closed)
+        },
+        'recent_trades': closed[:dashboard_query.RECENT_TRADES],
+        'latest_balance': None,
+        'balance_points': [],
+        'latest_risk': [],
+        'risk_history': [],
+        'performance': None,
+    }
+    columns = [name for _, name in sorted(
+        (sql.index(expression), name) for name, expression in dashboard_query._COLUMNS.items() if expression in sql
+    )]
+    return columns, [tuple(values[name] for name in columns)]
+
+
+class RecordingCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection.raw.cursor()
+        self._rows = None
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self.arraysize = 1
+
+    def execute(self, sql, params=None):
+        self.connection.statements.append(sql)
+        answer = postgres_responder(self.connection.raw, sql, params)
+        if answer is not None:
+            columns, self._rows = answer
+            self.description = [(name, None, None, None, None, None, None) for name in columns]
+            self.rowcount = len(self._rows)
+            return
+        self._rows = None
+        if params is not None and ('%s' in sql or '%(' in sql):
+            sql, params = _sqlite_params(sql, params)
+        self._cursor.execute(sql, params if params is not None else ())
+        self.description = self._cursor.description
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+
+    def executemany(self, sql, seq):
+        self.connection.statements.append(sql)
+        self._rows = None
+        self._cursor.executemany(sql, seq)
+        self.rowcount = self._cursor.rowcount
+
+    def fetchone(self):
+        if self._rows is None:
+            return self._cursor.fetchone()
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=None):
+        if self._rows is None:
+            return self._cursor.fetchmany(size or self.arraysize)
+        rows, self._rows = self._rows[:size or self.arraysize], self._rows[size or self.arraysize:]
+        return rows
+
+    def fetchall(self):
+        if self._rows is None:
+            return self._cursor.fetchall()
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        self._cursor.close()
+
+
+class RecordingConnection:
+    """
+    Conexión DBAPI sobre un sqlite3 en memoria que anota cada sentencia,
+    tanto las del ORM como las de engine.raw_connection() (que no pasan por
+    los eventos de ejecución de SQLAlchemy).
+    """
+
+    def __init__(self, raw, statements):
+        self.raw = raw
+        self.statements = statements
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class RecordingDatabase:
+    def __init__(self):
+        self.statements = []
+        self.raw = sqlite3.connect(':memory:', check_same_thread=False)
+        self.engine = create_engine(
+            'sqlite://', creator=lambda: RecordingConnection(self.raw, self.statements), poolclass=StaticPool
+        )
+        Base.metadata.create_all(self.engine, tables=[
+            BotSession.__table__, Trade.__table__, BalanceRollup.__table__
+        ])
+        self.Session = sessionmaker(bind=self.engine)
+
+    def add_session(self, user_id, n_trades, status='running', started=None):
+        """Sesión con n_trades trades cerrados; devuelve (session_id, ids de los trades)"""
+        started = started or datetime.utcnow() - timedelta(hours=1)
+        with self.Session() as db:
+            bot_session = BotSession(user_id=user_id, initial_balance=1000, status=status,
+                                     trading_mode='simulation', start_time=started, created_at=started)
+            db.add(bot_session)
+            db.flush()
+            trades = [
+                Trade(session_id=bot_session.id, symbol='BTCUSDT', entry_price=100.0, exit_price=101.0 + i % 3 - 1,
+                      quantity=0.001, pnl=(i % 3 - 1) * 0.001, status='closed', close_reason='signal',
+                      entry_time=started, exit_time=started + timedelta(minutes=i + 1), real_trade=i % 2 == 0)
+                for i in range(n_trades)
+            ]
+            db.add_all(trades)
+            db.commit()
+            return bot_session.id, [t.id for t in trades]
+
+    @staticmethod
+    def open_positions(session_id, trade_ids):
+        """Una posición abierta en el libro en memoria por trade"""
+        book = mark_to_market.get_mark_to_market()
+        for i, trade_id in enumerate(trade_ids):
+            book.open_position(session_id, trade_id, 'BTCUSDT', 0.001, 100.0, 98.5, 103.0, real_trade=i % 2 == 0)
+        book.on_price('BTCUSDT', 100.5)
+
+
+class FakeTradeWriter:
+    """Ids consecutivos y cola descartada: las posiciones sólo viven en memoria"""
+
+    def __init__(self):
+        self._ids = {}
+
+    def next_id(self, table):
+        self._ids[table] = self._ids.get(table, 0) + 1
+        return self._ids[table]
+
+    def submit(self, table, row):
+        pass
+
+    def submit_delete(self, table, row_id):
+        pass
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """
+    BD en memoria en lugar de Postgres para todos los servicios del
+    dashboard, con caché y libro de posiciones nuevos
+    """
+    test_db = RecordingDatabase()
+    for module in (base, balance_service, dashboard_query, mark_to_market):
+        monkeypatch.setattr(module, 'engine', test_db.engine)
+    monkeypatch.setitem(SessionLocal.kw, 'bind', test_db.engine)
+    monkeypatch.setattr(dashboard_cache, '_cache', DashboardCache(MemoryCacheBackend()))
+    monkeypatch.setattr(mark_to_market, '_service', MarkToMarketService(FakeTradeWriter()))
+    yield test_db
+    test_db.engine.dispose()
+    test_db.raw.close()
+
+
+# ==================== POSTGRES REAL ====================
+
+# BD desechable para el SQL que sólo entiende Postgres; sin ella esas pruebas se omiten
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+# Zona horaria de las conexiones de prueba: distinta de UTC a propósito
+TEST_TIMEZONE = 'America/New_York'
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'database', 'schema.sql')
+
+
+@pytest.fixture(scope='session')
+def postgres_engine():
+    """Engine sobre TEST_DATABASE_URL con el esquema recreado desde database/schema.sql"""
+    if not TEST_DATABASE_URL:
+        pytest.skip('TEST_DATABASE_URL no definida')
+    # Sin pool: main.py aplica eventlet.monkey_patch al importarse y un pool creado antes queda con locks mezclados
+    pg_engine = create_engine(TEST_DATABASE_URL, poolclass=NullPool,
+                              connect_args={'options': f'-c timezone={TEST_TIMEZONE}'})
+    conn = pg_engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('DROP SCHEMA public CASCADE; CREATE SCHEMA public;')
+        with open(SCHEMA_PATH, encoding='utf-8') as f:
+            cursor.execute(f.read())
+        conn.commit()
+    finally:
+        conn.close()
+    yield pg_engine
+    pg_engine.dispose()
+
+
+@pytest.fixture
+def postgres(postgres_engine, monkeypatch):
+    """
+    Tablas vacías y todos los módulos de app que usan el engine de
+    app.models.base apuntando a la BD de pruebas
+    """
+    conn = postgres_engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public'")
+        tables = ', '.join(f'"{name}"' for name, in cursor.fetchall())
+        cursor.execute(f'TRUNCATE {tables} RESTART IDENTITY CASCADE')
+        conn.commit()
+    finally:
+        conn.close()
+
+    original = base.engine
+    for name, module in list(sys.modules.items()):
+        if name.startswith('app.') and getattr(module, 'engine', None) is original:
+            monkeypatch.setattr(module, 'engine', postgres_engine)
+    monkeypatch.setitem(SessionLocal.kw, 'bind', postgres_engine)
+    monkeypatch.setattr(dashboard_cache, '_cache', DashboardCache(MemoryCacheBackend()))
+    yield postgres_engine
+
+
+def pg_rows(pg_engine, sql, params=None):
+    """Filas de una consulta de verificación"""
+    conn = pg_engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def pg_session(pg_engine, user_id=1, status='running', trading_mode='simulation'):
+    """Usuario (si falta) y sesión de bot; devuelve el id de la sesión"""
+    conn = pg_engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO users (id, username, password_hash) VALUES (%s, %s, 'x')
+            ON CONFLICT (id) DO NOTHING
+        """, (user_id, f'user{user_id}'))
+        cursor.execute("""
+            INSERT INTO bot_sessions (user_id, initial_balance, status, trading_mode)
+            VALUES (%s, 1000, %s, %s) RETURNING id
+        """, (user_id, status, trading_mode))
+        session_id = cursor.fetchone()[0]
+        conn.commit()
+        return session_id
+    finally:
+        conn.close()
@@ -0,0 +1,144 @@
+# tests/test_backtest_service.py
+import numpy as np
+import pytest
+
+from app.services import signal_engine
+from app.services.backtest_service import BacktestEngine, FillModel
+from app.services.exit_engine import TRAILING_STOP, ExitRules
+from app.services.trigger_index import STOP_LOSS, TAKE_PROFIT
+
+PARAMS = {'indicators': {'sma_fast': 2, 'sma_slow': 3}}
+
+
+def _engine(**kwargs):
+    return BacktestEngine(PARAMS, quantity=1.0, fill_model=FillModel(0.0, 0.0), **kwargs)
+
+
+def _bars(*bars):
+    """(open, high, low, close) por vela; la vela 0 es la de entrada"""
+    opens, highs, lows, closes = (np.array(column, dtype=float) for column in zip(*bars))
+    return closes, highs, lows, opens
+
+
+ENTRY = (100, 100, 100, 100)
+
+
+# ==================== SALIDAS DE UNA POSICIÓN ====================
+
+def test_fixed_stop_fills_at_level():
+    closes, highs, lows, opens = _bars(ENTRY, (100, 101, 99, 100), (99, 99.5, 97.5, 98), (98, 99, 97, 98))
+    bar, reason, price, partials = _engine(stop_loss_percent=2)._exit_path(0, 3, closes, highs, lows, opens)
+
+    assert (bar, reason, partials) == (2, STOP_LOSS, [])
+    assert price == pytest.approx(98.0)
+
+
+def test_stop_gap_fills_at_open():
+    closes, highs, lows, opens = _bars(ENTRY, (96, 96.5, 95, 96))
+    bar, reason, price, _ = _engine(stop_loss_percent=2)._exit_path(0, 1, closes, highs, lows, opens)
+
+    assert (bar, reason, price) == (1, STOP_LOSS, 96.0)
+
+
+def test_take_profit_and_stop_wins_same_bar():
+    closes, highs, lows, opens = _bars(ENTRY, (100, 101, 99.5, 100), (100, 103.5, 100, 103))
+    engine = _engine(stop_loss_percent=2, take_profit_percent=3)
+    bar, reason, price, _ = engine._exit_path(0, 2, closes, highs, lows, opens)
+    assert (bar, reason) == (2, TAKE_PROFIT) and price == pytest.approx(103.0)
+
+    # Sin ticks no se sabe el orden dentro de la vela: el stop llega primero
+    closes, highs, lows, opens = _bars(ENTRY, (100, 104, 97, 100))
+    bar, reason, price, _ = engine._exit_path(0, 1, closes, highs, lows, opens)
+    assert (bar, reason) == (1, STOP_LOSS) and price == pytest.approx(98.0)
+
+
+def test_no_exit_returns_last_bar():
+    closes, highs, lows, opens = _bars(ENTRY, (100, 101, 99, 100.5), (100.5, 101, 99, 100.8))
+    engine = _engine(stop_loss_percent=2, take_profit_percent=3)
+
+    assert engine._exit_path(0, 2, closes, highs, lows, opens) == (2, None, 100.8, [])
+    # Posición abierta en la última vela de la serie
+    assert engine._exit_path(2, 2, closes, highs, lows, opens) == (2, None, 100.8, [])
+
+
+def test_trailing_stop_follows_previous_bars_high():
+    rules = ExitRules(trailing_enabled=True, activation=1, distance=0.5)
+    # La vela 1 activa el trailing con su máximo pero no mueve su propio stop (su mínimo no lo toca)
+    closes, highs, lows, opens = _bars(ENTRY, (100, 102, 100.5, 101.8), (101.8, 101.9, 101.4, 101.5))
+    bar, reason, price, _ = _engine(stop_loss_percent=2, exit_rules=rules)._exit_path(
+        0, 2, closes, highs, lows, opens)
+
+    assert (bar, reason) == (2, TRAILING_STOP)
+    assert price == pytest.approx(102 * 0.995)
+
+
+def test_partial_levels_then_final_target():
+    rules = ExitRules(partial_enabled=True, levels=[{'percent': 1, 'sell_percent': 50},
+                                                    {'percent': 2, 'sell_percent': 50}])
+    closes, highs, lows, opens = _bars(ENTRY, (100, 101.2, 99.5, 101), (101, 102.5, 100.5, 102))
+    bar, reason, price, partials = _engine(stop_loss_percent=2, take_profit_percent=10, exit_rules=rules)._exit_path(
+        0, 2, closes, highs, lows, opens)
+
+    # Los niveles sustituyen al take-profit fijo
+    assert (bar, reason) == (2, TAKE_PROFIT) and price == pytest.approx(102.0)
+    assert [(b, f) for b, f, _ in partials] == [(1, 0.5)]
+    assert partials[0][2] == pytest.approx(101.0)
+
+
+def test_partial_then_stop_keeps_filled_levels():
+    rules = ExitRules(partial_enabled=True, levels=[{'percent': 1, 'sell_percent': 50},
+                                                    {'percent': 2, 'sell_percent': 50}])
+    closes, highs, lows, opens = _bars(ENTRY, (100, 101.5, 99.5, 101), (101, 101, 97, 97.5))
+    bar, reason, price, partials = _engine(stop_loss_percent=2, exit_rules=rules)._exit_path(
+        0, 2, closes, highs, lows, opens)
+
+    assert (bar, reason) == (2, STOP_LOSS) and price == pytest.approx(98.0)
+    assert [(b, f) for b, f, _ in partials] == [(1, 0.5)]
+
+
+# ==================== SIMULACIÓN DE UN SÍMBOLO ====================
+
+def _simulate(monkeypatch, engine, decisions, bars):
+    monkeypatch.setattr(engine, 'signals', lambda closes: np.array(decisions, dtype=np.int8))
+    return engine._simulate_symbol(*_bars(*bars))
+
+
+def test_simulate_reasons_and_reentry(monkeypatch):
+    B, S, H = signal_engine.BUY, signal_engine.SELL, signal_engine.HOLD
+    bars = [ENTRY, (100, 100.5, 97, 97.5), (97.5, 98, 97, 98), (98, 99, 97.5, 99),
+            (99, 100, 98.5, 100), (100, 100.5, 99.5, 100)]
+    sim = _simulate(monkeypatch, _engine(stop_loss_percent=2), [B, B, H, S, B, H], bars)
+
+    # Stop intravela en la vela 1 y un BUY en esa misma vela reabre; SELL en la 3; la última llega al final
+    assert sim['reasons'] == [STOP_LOSS, 'signal', 'end_of_data']
+    assert sim['entries'].tolist() == [0, 1, 4]
+    assert sim['exits'].tolist() == [1, 3, 5]
+    np.testing.assert_allclose(sim['pnl'], [-2.0, 1.5, 0.0])
+    assert sim['realized'][-1] == pytest.approx(sim['pnl'].sum())
+    assert sim['curve'][-1] == pytest.approx(sim['realized'][-1])
+
+
+def test_simulate_partial_marks_remaining_quantity(monkeypatch):
+    rules = ExitRules(partial_enabled=True, levels=[{'percent': 1, 'sell_percent': 50},
+                                                    {'percent': 5, 'sell_percent': 50}])
+    B, S, H = signal_engine.BUY, signal_engine.SELL, signal_engine.HOLD
+    bars = [ENTRY, (100, 101.5, 99.5, 101.2), (101.2, 102, 101, 102), (102, 102, 101, 101)]
+    sim = _simulate(monkeypatch, _engine(stop_loss_percent=5, exit_rules=rules), [B, H, H, S], bars)
+
+    assert sim['reasons'] == ['signal']
+    # Media posición vendida a 101 en la vela 1; el resto se valora y se cierra a 101
+    assert sim['curve'].tolist() == pytest.approx([0.0, 0.5 + 0.6, 0.5 + 1.0, 1.0])
+    assert sim['pnl'].tolist() == pytest.approx([1.0])
+
+
+def test_run_without_exit_rules_only_closes_on_signals():
+    rng = np.random.default_rng(3)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, 500)))
+    series = {'BTCUSDT': {'open_time': np.arange(500) * 60_000, 'close': closes,
+                          'high': closes * 1.01, 'low': closes * 0.99, 'open': closes}}
+    result = BacktestEngine(PARAMS, fill_model=FillModel(0.0, 0.0)).run(series)
+
+    assert result['summary']['total_trades'] > 0
+    assert {t['close_reason'] for t in result['trades']} <= {'signal', 'end_of_data'}
+    assert result['summary']['final_balance'] == pytest.approx(
+        1000 + sum(t['pnl'] for t in result['trades']), abs=0.05)
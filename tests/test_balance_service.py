@@ -0,0 +1,86 @@
+# tests/test_balance_service.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import pg_rows, pg_session
+from app.services.balance_service import BalanceService, bucket_start, format_delta
+
+T0 = datetime(2024, 3, 9, 23, 58, 30, tzinfo=timezone.utc)
+ROLLUPS_SQL = "SELECT * FROM balance_rollups ORDER BY resolution, bucket_start"
+
+
+def _snapshots(service, session_id):
+    # Cruzan límites de minuto, hora y día UTC (en Nueva York sigue siendo el 9)
+    for i, equity in enumerate([1000, 1010, 990, 1005, 1020, 1001]):
+        service.record_snapshot(session_id, balance=1000 + i, equity=equity, pnl=equity - 1000,
+                                pnl_daily=i, timestamp=T0 + timedelta(seconds=45 * i))
+
+
+def test_bucket_start_is_utc_aligned():
+    local = datetime(2024, 3, 9, 19, 30, tzinfo=timezone(timedelta(hours=-5)))
+
+    assert bucket_start(local, '1d') == datetime(2024, 3, 10, tzinfo=timezone.utc)
+    assert bucket_start(local, '1h') == datetime(2024, 3, 10, 0, tzinfo=timezone.utc)
+    assert bucket_start(datetime(2024, 3, 9, 23, 59, 59), '1m') == datetime(2024, 3, 9, 23, 59, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize('span, max_points, expected', [
+    (timedelta(hours=2), 500, '1m'),
+    (timedelta(hours=10), 500, '1h'),      # 600 minutos no caben
+    (timedelta(days=20), 500, '1h'),
+    (timedelta(days=30), 500, '1d'),       # 720 horas no caben
+    (timedelta(days=2000), 100, '1d'),     # Ninguna cabe: la más gruesa
+])
+def test_choose_resolution_within_point_budget(span, max_points, expected):
+    now = datetime(2024, 3, 10, tzinfo=timezone.utc)
+    service = BalanceService(retention_days={'1m': 7, '1h': 180, '1d': None})
+
+    assert service.choose_resolution(now - span, now, max_points, now=now) == expected
+
+
+def test_choose_resolution_skips_expired_resolutions():
+    now = datetime(2024, 3, 10, tzinfo=timezone.utc)
+    service = BalanceService(retention_days={'1m': 1})
+
+    # Dos horas de hace una semana: los buckets de 1m ya no existen
+    since = now - timedelta(days=7)
+    assert service.choose_resolution(since, since + timedelta(hours=2), 500, now=now) == '1h'
+
+
+def test_format_delta_reports_each_bucket():
+    delta = format_delta(T0, 1010.0, 1020.0, 10.0, 2.0)
+
+    assert delta['total_pnl_percent'] == pytest.approx(1.0)
+    assert delta['buckets']['1h'] == {'timestamp': '2024-03-09T23:00:00+00:00', 'time': '09/03 23:00'}
+
+
+def test_rebuild_matches_live_rollups(postgres):
+    session_id = pg_session(postgres)
+    service = BalanceService(retention_days={'1m': None, '1h': None, '1d': None})
+    _snapshots(service, session_id)
+
+    # La conexión de pruebas no está en UTC: el instante guardado es el del snapshot
+    stored = pg_rows(postgres, "SELECT timestamp FROM balance_history ORDER BY id")
+    assert [ts.astimezone(timezone.utc) for ts, in stored] == [T0 + timedelta(seconds=45 * i) for i in range(6)]
+
+    live = pg_rows(postgres, ROLLUPS_SQL)
+    assert service.rebuild(session_id) == len(live) == 5 + 2 + 2
+    rebuilt = pg_rows(postgres, ROLLUPS_SQL)
+
+    assert [row[1:] for row in rebuilt] == [row[1:] for row in live]  # Sin el id
+    days = [row for row in live if row[2] == '1d']
+    assert [(row[3].astimezone(timezone.utc).day, row[-1]) for row in days] == [(9, 2), (10, 4)]
+
+
+def test_history_reads_rollups_at_chosen_resolution(postgres):
+    session_id = pg_session(postgres)
+    service = BalanceService(retention_days={'1m': None, '1h': None})
+    _snapshots(service, session_id)
+
+    history = service.get_history(session_id, since=T0 - timedelta(minutes=1), until=T0 + timedelta(minutes=10))
+
+    assert history['resolution'] == '1m'
+    assert [p['timestamp'] for p in history['points']][:2] == ['2024-03-09T23:58:00+00:00',
+                                                             '2024-03-09T23:59:00+00:00']
+    assert len(history['points']) == 5 and history['points'][2]['samples'] == 2
@@ -0,0 +1,111 @@
+# tests/test_dashboard_cache.py
+from app.services.dashboard_cache import DashboardCache, MemoryCacheBackend, SECTIONS
+
+
+class Recorder:
+    """compute() que anota qué secciones se le piden y numera cada cálculo"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, stale):
+        self.calls.append(set(stale))
+        return {section: f"{section}#{len(self.calls)}" for section in stale}
+
+
+def _cache(**kwargs):
+    return DashboardCache(MemoryCacheBackend(**kwargs))
+
+
+def test_events_only_recompute_their_sections():
+    cache, compute = _cache(), Recorder()
+    first, data = cache.get('api', 1, compute)
+    assert compute.calls == [set(SECTIONS)] and data['balance'] == 'balance#1'
+
+    cache.invalidate(1, 'balance')
+    second, data = cache.get('api', 1, compute)
+
+    assert compute.calls[-1] == {'balance', 'performance'}
+    assert data['balance'] == 'balance#2' and data['trading'] == 'trading#1'
+    assert second != first
+    # Sin eventos: mismo token y ningún cálculo
+    assert cache.get('api', 1, compute)[0] == second and len(compute.calls) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_sessions_and_views_are_versioned_independently():
+    cache, compute = _cache(), Recorder()
+    cache.get('api', 1, compute)
+    cache.get('api', 2, compute)
+    cache.get('socket', 1, compute, sections=('balance',))
+
+    cache.invalidate(2, 'trade')
+
+    assert cache.get('api', 1, compute)[1]['trading'] == 'trading#1'
+    assert cache.get('api', 2, compute)[1]['trading'] == 'trading#4'
+    assert len(compute.calls) == 4
+
+
+def test_volatile_sections_are_computed_every_call_but_never_stored():
+    cache, compute = _cache(), Recorder()
+    first, data = cache.get('api', 1, compute, volatile=('positions',))
+    again, data = cache.get('api', 1, compute, volatile=('positions',))
+
+    assert compute.calls[1] == {'positions'} and data['positions'] == 'positions#2'
+    assert again == first  # Un precio nuevo no cambia la versión
+    assert 'positions' not in cache.backend.get_sections('api', 1)
+
+    cache.invalidate(1, 'position')
+    third, _ = cache.get('api', 1, compute, volatile=('positions',))
+    assert third != first and compute.calls[2] == {'positions'}
+
+
+def test_event_during_compute_is_not_lost():
+    cache = _cache()
+    calls = []
+
+    def compute(stale):
+        calls.append(set(stale))
+        if len(calls) == 1:
+            cache.invalidate(1, 'risk')  # Llega mientras se calcula con datos ya leídos
+        return {section: len(calls) for section in stale}
+
+    cache.get('api', 1, compute)
+    _, data = cache.get('api', 1, compute)
+
+    assert calls[1] == {'risk', 'performance'} and data['risk'] == 2
+
+
+def test_evicted_versions_never_reuse_a_token():
+    cache, compute = _cache(max_sessions=1), Recorder()
+    before, _ = cache.get('api', 1, compute)
+    cache.get('api', 2, compute)  # Expulsa la sesión 1 con sus versiones y vistas
+
+    after, data = cache.get('api', 1, compute)
+
+    assert after != before and data['session'] == 'session#3'
+
+
+def test_session_alias_resolved_once_until_user_changes():
+    cache = _cache()
+    resolved = []
+
+    def resolve():
+        resolved.append(1)
+        return 7
+
+    assert cache.session_id(1, 'current', resolve) == cache.session_id(1, 'current', resolve) == 7
+    cache.invalidate_user(1)
+    assert cache.session_id(1, 'current', resolve) == 7 and len(resolved) == 2
+    assert cache.session_id(2, 'current', lambda: None) is None
+
+
+def test_invalidate_survives_backend_errors():
+    class BrokenBackend(MemoryCacheBackend):
+        def bump(self, session_id, sections):
+            raise ConnectionError('redis caído')
+
+    cache = DashboardCache(BrokenBackend())
+
+    cache.invalidate(1, 'trade')
+    cache.invalidate(None, 'trade')
@@ -0,0 +1,246 @@
+# tests/test_dashboard_queries.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import FakeTradeWriter, pg_session
+from app.core.query_counter import assert_max_queries, count_queries
+from app.models.bot_sessions import BotSession
+from app.models.risk_metrics import RiskMetric
+from app.models.trades import Trade
+from app.services import mark_to_market
+from app.services.balance_service import BalanceService
+from app.services.dashboard_query import SECTION_COLUMNS, _hydrate, _timestamps, fetch_dashboard
+from app.services.data_service import DataService
+from app.services.mark_to_market import MarkToMarketService
+
+MANY = 25
+
+
+def _seed(database, user_id, n):
+    """Sesión con n trades cerrados y n posiciones abiertas"""
+    session_id, trade_ids = database.add_session(user_id, n)
+    database.open_positions(session_id, trade_ids)
+    return session_id
+
+
+def _measure(database, call):
+    """(resultado, sentencias ejecutadas en la BD, contador de SQLAlchemy)"""
+    database.statements.clear()
+    with count_queries(database.engine) as counter:
+        result = call()
+    return result, list(database.statements), counter
+
+
+@pytest.fixture
+def client(database):
+    import main
+    main.app.config['TESTING'] = True
+    with main.app.test_client() as client:
+        client.get('/api/health')  # Hooks de la primera petición fuera de la medida
+        yield client
+
+
+def _get_dashboard(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    response = client.get('/dashboard/data')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_get_dashboard_data_statements_do_not_grow(database):
+    one = _seed(database, user_id=1, n=1)
+    many = _seed(database, user_id=2, n=MANY)
+
+    data_one, statements_one, counter_one = _measure(database, lambda: DataService.get_dashboard_data(1, one))
+    data_many, statements_many, counter_many = _measure(database, lambda: DataService.get_dashboard_data(2, many))
+
+    assert data_one['success'] and data_many['success']
+    assert data_one['positions']['active_positions'] == 1
+    assert data_many['positions']['active_positions'] == MANY
+    assert data_many['session']['id'] == many
+    # Resolución de la sesión + una sola sentencia para todas las secciones persistidas
+    assert len(statements_one) == len(statements_many) == 2
+    assert counter_one.checkouts == counter_many.checkouts == 2
+
+
+def test_get_dashboard_data_within_budget(database):
+    session_id = _seed(database, user_id=1, n=MANY)
+    with assert_max_queries(0, database.engine, max_checkouts=2):
+        DataService.get_dashboard_data(1, session_id)
+
+
+def test_get_dashboard_data_cached_poll_skips_database(database):
+    session_id = _seed(database, user_id=1, n=MANY)
+    first = DataService.get_dashboard_data(1, session_id)
+
+    again, statements, counter = _measure(database, lambda: DataService.get_dashboard_data(1, session_id))
+
+    assert statements == [] and counter.checkouts == 0
+    assert again['version'] == first['version']
+
+
+def test_get_dashboard_data_cached_poll_has_latest_marks(database):
+    session_id = _seed(database, user_id=1, n=MANY)
+    DataService.get_dashboard_data(1, session_id)
+
+    # Un tick no invalida la caché (sólo el volcado de marks), pero las posiciones salen al último precio
+    mark_to_market.get_mark_to_market().on_price('BTCUSDT', 102.0)
+    again, statements, _ = _measure(database, lambda: DataService.get_dashboard_data(1, session_id))
+
+    assert statements == []
+    assert {p['current_price'] for p in again['positions']['positions']} == {102.0}
+
+
+def test_dashboard_route_statements_do_not_grow(database, client):
+    _seed(database, user_id=1, n=1)
+    _seed(database, user_id=2, n=MANY)
+
+    data_one, statements_one, counter_one = _measure(database, lambda: _get_dashboard(client, 1))
+    data_many, statements_many, counter_many = _measure(database, lambda: _get_dashboard(client, 2))
+
+    assert data_one['positions']['active_positions'] == 1
+    assert data_many['positions']['active_positions'] == MANY
+    assert data_many['trading']['total_trades'] == MANY
+    assert len(data_many['trading']['recent_trades']) == 10
+    assert len(statements_one) == len(statements_many)
+    assert counter_one.count == counter_many.count
+    assert counter_one.checkouts == counter_many.checkouts
+
+
+def test_dashboard_route_within_budget(database, client):
+    _seed(database, user_id=1, n=MANY)
+    # Sesión más reciente y sesión (ORM); las posiciones y su flag real/simulado salen de memoria
+    with assert_max_queries(2, database.engine, max_checkouts=4):
+        data = _get_dashboard(client, 1)
+    assert sum(p['real_trade'] for p in data['positions']['positions']) == (MANY + 1) // 2
+
+
+def test_dashboard_route_cached_poll_has_latest_marks(database, client):
+    _seed(database, user_id=1, n=MANY)
+    _get_dashboard(client, 1)
+
+    mark_to_market.get_mark_to_market().on_price('BTCUSDT', 102.0)
+    data, statements, _ = _measure(database, lambda: _get_dashboard(client, 1))
+
+    assert statements == []
+    assert {p['current_price'] for p in data['positions']['positions']} == {102.0}
+
+
+# ==================== FILAS JSON ====================
+
+def test_hydrate_reads_to_jsonb_rows():
+    # Tal cual las devuelve to_jsonb: TIMESTAMP sin zona, TIMESTAMPTZ con el offset de la conexión
+    session = _hydrate(BotSession, {
+        'id': 3, 'user_id': 1, 'initial_balance': 1000.00, 'status': 'running', 'trading_mode': 'real',
+        'start_time': '2024-03-09T23:58:30.1', 'end_time': None,
+        'heartbeat_at': '2024-03-09T18:58:30.123456-05:00', 'columna_nueva': 'se ignora'
+    })
+    trade = _hydrate(Trade, {
+        'id': 7, 'session_id': 3, 'symbol': 'BTCUSDT', 'entry_price': 100.5, 'exit_price': 99.25,
+        'quantity': 0.001, 'pnl': -1.25, 'status': 'closed', 'entry_time': '2024-03-09T23:00:00',
+        'exit_time': '2024-03-09T23:05:00.5', 'real_trade': True, 'risk_metrics': {'r_multiple': -0.4}
+    })
+
+    assert session.start_time == datetime(2024, 3, 9, 23, 58, 30, 100000)
+    assert session.heartbeat_at == datetime(2024, 3, 9, 23, 58, 30, 123456, tzinfo=timezone.utc)
+    assert session.to_dict()['initial_balance'] == 1000.0
+    assert trade.to_dict()['exit_time'] == '2024-03-09T23:05:00.500000'
+    assert trade.to_dict()['pnl'] == -1.25 and trade.is_winning_trade() is False
+
+
+def test_timestamps_parse_offsets_in_place():
+    rows = [['2024-03-09T18:58:30.12-05:00', 1000.5], ['2024-03-10T05:28:30+05:30', 1001]]
+
+    assert _timestamps(rows, 0) == [
+        [datetime(2024, 3, 9, 23, 58, 30, 120000, tzinfo=timezone.utc), 1000.5],
+        [datetime(2024, 3, 9, 23, 58, 30, tzinfo=timezone.utc), 1001]
+    ]
+    assert _timestamps([['daily', 'var_95', 0.02, None]], 3) == [['daily', 'var_95', 0.02, None]]
+
+
+# ==================== CONSULTA ÚNICA EN POSTGRES ====================
+
+def _seed_postgres(pg_engine, now):
+    """Sesión con trades cerrados y uno abierto, métricas de riesgo y tres snapshots de balance"""
+    session_id = pg_session(pg_engine)
+    naive = now.replace(tzinfo=None)
+    conn = pg_engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        for pnl, minutes, real_trade, status in [(2.5, 30, True, 'closed'), (-1.0, 20, False, 'closed'),
+                                                 (0.75, 10, False, 'closed'), (None, 5, False, 'open')]:
+            cursor.execute("""
+                INSERT INTO trades (session_id, symbol, entry_price, quantity, pnl, status, exit_time, real_trade)
+                VALUES (%s, 'BTCUSDT', 100, 0.5, %s, %s, %s, %s)
+            """, (session_id, pnl, status, naive - timedelta(minutes=minutes) if pnl is not None else None,
+                  real_trade))
+        for period, name, value, minutes in [('session', 'sharpe_ratio', 1.2, 10), ('session', 'sharpe_ratio', 1.8, 5),
+                                             ('session', 'volatility', 0.0125, 5), ('daily', 'var_95', 0.02, 5)]:
+            cursor.execute("""
+                INSERT INTO risk_metrics (session_id, timestamp, metric_name, metric_value, time_period)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (session_id, naive - timedelta(minutes=minutes), name, value, period))
+        conn.commit()
+    finally:
+        conn.close()
+
+    service = BalanceService(retention_days={'1m': None, '1h': None, '1d': None})
+    snapshots = [now - timedelta(minutes=3 - i) for i in range(3)]
+    for timestamp, equity in zip(snapshots, [1000.0, 1012.5, 1005.25]):
+        service.record_snapshot(session_id, balance=1000.0, equity=equity, pnl=equity - 1000, pnl_daily=1.5,
+                                timestamp=timestamp)
+    return session_id, snapshots
+
+
+def test_fetch_dashboard_single_query_returns_typed_rows(postgres):
+    now = datetime.now(timezone.utc).replace(second=30, microsecond=250000)
+    session_id, snapshots = _seed_postgres(postgres, now)
+
+    rows = fetch_dashboard(session_id, SECTION_COLUMNS, '1m', now - timedelta(hours=1), now + timedelta(minutes=1))
+
+    assert isinstance(rows['session'], BotSession) and rows['session'].id == session_id
+    assert rows['trade_stats'] == {'total_trades': 3, 'winning_trades': 2, 'real_trades': 1, 'total_pnl': 2.25}
+    assert [t.pnl for t in rows['recent_trades']] == [0.75, -1.0, 2.5]
+    assert rows['recent_trades'][0].exit_time == now.replace(tzinfo=None) - timedelta(minutes=10)
+    # La conexión de pruebas está en Nueva York: los instantes vuelven con su offset y son los mismos
+    assert rows['latest_balance'] == [snapshots[-1], 1000, 1005.25, 5.25, 1.5]
+    assert [point[0] for point in rows['balance_points']] == [s.replace(second=0, microsecond=0) for s in snapshots]
+    assert rows['balance_points'][1][4:7] == [1012.5, 1012.5, 1012.5]
+    assert sorted(row[:3] for row in rows['latest_risk']) == [
+        ['daily', 'var_95', 0.02], ['session', 'sharpe_ratio', 1.8], ['session', 'volatility', 0.0125]
+    ]
+    assert all(isinstance(metric, RiskMetric) for metric in rows['risk_history'])
+    assert [m.metric_value for m in rows['risk_history']][-1] == 1.2
+    assert rows['performance']['last_timestamp'] == snapshots[-1]
+    assert rows['performance']['peak_time'] == snapshots[1]
+
+
+def test_fetch_dashboard_only_reads_requested_sections(postgres):
+    session_id, _ = _seed_postgres(postgres, datetime.now(timezone.utc))
+
+    rows = fetch_dashboard(session_id, ['trading'], '1m', datetime.now(timezone.utc), datetime.now(timezone.utc))
+
+    assert set(rows) == {'trade_stats', 'recent_trades'}
+    assert fetch_dashboard(session_id, ['positions'], '1m', None, None) == {}
+
+
+def test_session_dashboard_sections_from_postgres(postgres, monkeypatch):
+    monkeypatch.setattr(mark_to_market, '_service', MarkToMarketService(FakeTradeWriter()))
+    now = datetime.now(timezone.utc)
+    session_id, _ = _seed_postgres(postgres, now)
+
+    data = DataService.get_session_dashboard(session_id)
+
+    # Las secciones se degradan a valores vacíos ante un error: se comprueban los valores reales
+    assert data['session']['id'] == session_id
+    assert data['balance']['current_balance'] == 1000.0 and data['balance']['total_pnl'] == 5.25
+    # 24 horas no caben en 500 puntos de 1m: buckets horarios
+    assert data['balance']['resolution'] == '1h'
+    assert sum(point['samples'] for point in data['balance']['history']) == 3
+    assert data['trading']['total_trades'] == 3 and data['trading']['recent_trades'][0]['pnl'] == 0.75
+    assert data['risk']['metrics']['sharpe_ratio']['value'] == 1.8
+    assert data['risk']['by_period']['daily']['var_95']['value'] == 0.02
+    assert data['performance']['sharpe_ratio'] == 1.8
+    assert data['performance']['max_drawdown'] == pytest.approx((1012.5 - 1005.25) / 1012.5 * 100, abs=0.01)
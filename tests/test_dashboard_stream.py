@@ -0,0 +1,112 @@
+# tests/test_dashboard_stream.py
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+from conftest import FakeTradeWriter
+from app.services import dashboard_cache, dashboard_stream
+from app.services.dashboard_cache import DashboardCache, MemoryCacheBackend
+from app.services.dashboard_stream import MARKS, POSITION, TRADE, DashboardStream, format_trade
+from app.services.mark_to_market import MarkToMarketService
+
+
+def _stream():
+    stream, sent = DashboardStream(), []
+    stream.attach(lambda session_id, kind, envelope: sent.append(envelope))
+    return stream, sent
+
+
+def test_publish_without_transport_does_nothing():
+    stream = DashboardStream()
+    stream.publish(1, TRADE, {'id': 1})
+
+    assert not stream.enabled and stream.seq(1) == 0 and stream.published == 0
+
+
+def test_seq_grows_by_one_per_session():
+    stream, sent = _stream()
+    stream.publish(1, TRADE, {'id': 1})
+    stream.publish(2, TRADE, {'id': 2})
+    stream.publish(1, POSITION, {'id': 3})
+    stream.publish(None, TRADE, {'id': 4})  # Sin sesión no se numera
+
+    assert [(e['session_id'], e['seq'], e['type']) for e in sent] == [(1, 1, TRADE), (2, 1, TRADE), (1, 2, POSITION)]
+    assert {e['epoch'] for e in sent} == {stream.epoch}
+    assert stream.seq(1) == 2 and stream.published == 3
+
+
+def test_snapshot_seq_is_read_before_building():
+    stream, sent = _stream()
+    stream.publish(1, TRADE, {'id': 1})
+
+    def build():
+        stream.publish(1, POSITION, {'id': 9})  # Llega mientras se construye
+        return {'positions': [9]}
+
+    snapshot = stream.snapshot(1, build)
+
+    # El delta queda por encima del seq del snapshot: el cliente lo reaplica (idempotente)
+    assert snapshot['seq'] == 1 and sent[-1]['seq'] == 2
+    assert snapshot['epoch'] == stream.epoch and snapshot['data'] == {'positions': [9]}
+
+
+def test_failed_delivery_leaves_a_gap_for_resync():
+    stream, sent = DashboardStream(), []
+
+    def transport(session_id, kind, envelope):
+        if envelope['seq'] == 2:
+            raise ConnectionError('socket cerrado')
+        sent.append(envelope['seq'])
+
+    stream.attach(transport)
+    for _ in range(3):
+        stream.publish(1, TRADE, {})
+
+    assert sent == [1, 3] and stream.published == 2
+
+
+def test_each_process_numbers_with_its_own_epoch():
+    assert DashboardStream().epoch != DashboardStream().epoch
+
+
+def test_concurrent_publishers_get_unique_ordered_seqs():
+    stream, sent = _stream()
+
+    def publish():
+        for _ in range(200):
+            stream.publish(1, MARKS, {})
+
+    threads = [threading.Thread(target=publish) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [e['seq'] for e in sent] == list(range(1, 801))
+
+
+def test_marks_are_published_per_session(monkeypatch):
+    stream, sent = _stream()
+    monkeypatch.setattr(dashboard_stream, '_stream', stream)
+    monkeypatch.setattr(dashboard_cache, '_cache', DashboardCache(MemoryCacheBackend()))
+    book = MarkToMarketService(FakeTradeWriter())
+    book.open_position(1, 1, 'BTCUSDT', 0.5, 100.0, 95.0, 110.0)
+    book.open_position(2, 2, 'BTCUSDT', 1.0, 100.0, 95.0, 110.0)
+
+    book.on_price('BTCUSDT', 102.0)
+    book.on_price('BTCUSDT', 102.0)  # Mismo precio: sin delta
+
+    assert [(e['session_id'], e['type']) for e in sent] == [(1, MARKS), (2, MARKS)]
+    assert sent[1]['data']['positions'] == [{'id': 2, 'current_price': 102.0, 'unrealized_pnl': 2.0,
+                                             'unrealized_pnl_percent': 2.0}]
+
+
+def test_format_trade_from_writer_row():
+    row = {'id': 5, 'symbol': 'ETHUSDT', 'entry_price': Decimal('2000.5'), 'exit_price': Decimal('1990'),
+           'pnl': Decimal('-5.25'), 'real_trade': None, 'exit_time': datetime(2024, 3, 9, 23, 5),
+           'close_reason': 'stop_loss'}
+
+    assert format_trade(row) == {
+        'id': 5, 'symbol': 'ETHUSDT', 'entry_price': 2000.5, 'exit_price': 1990.0, 'pnl': -5.25, 'status': 'LOSS',
+        'real_trade': False, 'exit_time': '2024-03-09T23:05:00', 'close_reason': 'stop_loss'
+    }
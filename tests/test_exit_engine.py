@@ -0,0 +1,117 @@
+# tests/test_exit_engine.py
+import pytest
+
+from app.services.exit_engine import PARTIAL_TAKE_PROFIT, ExitEngine, ExitRules, ExitSignal
+from app.services.trigger_index import STOP_LOSS, TriggerIndex
+
+LEVELS = [{'percent': 1, 'sell_percent': 30}, {'percent': 2, 'sell_percent': 30}, {'percent': 3, 'sell_percent': 40}]
+
+
+def _engine(rules, *positions):
+    """positions: (id, quantity, entry, stop); devuelve (engine, índice, stops notificados)"""
+    index = TriggerIndex()
+    stops = []
+    engine = ExitEngine(rules, index, on_stop=lambda position_id, symbol, stop: stops.append((position_id, stop)))
+    for position_id, quantity, entry, stop in positions:
+        index.add(position_id, 'BTCUSDT', quantity, stop, None)
+        engine.add(position_id, 'BTCUSDT', quantity, entry, stop)
+    return engine, index, stops
+
+
+# ==================== TRAILING STOP ====================
+
+def test_trailing_activates_and_only_ratchets_up():
+    rules = ExitRules(trailing_enabled=True, activation=1, distance=0.5)
+    engine, index, stops = _engine(rules, (1, 1.0, 100.0, 98.0))
+
+    engine.on_price('BTCUSDT', 100.9)
+    assert not engine.is_trailing(1) and stops == []
+
+    engine.on_price('BTCUSDT', 101.0)
+    assert engine.is_trailing(1)
+    assert stops[-1] == (1, pytest.approx(101.0 * 0.995))
+
+    engine.on_price('BTCUSDT', 102.0)
+    engine.on_price('BTCUSDT', 101.6)  # Retroceso: el stop no baja
+    assert [stop for _, stop in stops] == pytest.approx([101.0 * 0.995, 102.0 * 0.995])
+
+    # El nivel nuevo está en el índice de disparos, que es quien cierra la posición
+    assert index.on_price('BTCUSDT', 101.5) == []
+    assert [(t.position_id, t.reason) for t in index.on_price('BTCUSDT', 101.4)] == [(1, STOP_LOSS)]
+
+
+def test_trailing_short_is_mirrored():
+    rules = ExitRules(trailing_enabled=True, activation=1, distance=0.5)
+    engine, index, stops = _engine(rules, (1, -1.0, 100.0, 102.0))
+
+    engine.on_price('BTCUSDT', 98.0)
+    engine.on_price('BTCUSDT', 98.5)
+
+    assert engine.is_trailing(1)
+    assert [stop for _, stop in stops] == pytest.approx([98.0 * 1.005])
+    assert [t.position_id for t in index.on_price('BTCUSDT', 98.5)] == [1]
+
+
+def test_trailing_never_loosens_a_tighter_fixed_stop():
+    rules = ExitRules(trailing_enabled=True, activation=1, distance=5)
+    engine, _, stops = _engine(rules, (1, 1.0, 100.0, 99.0))
+
+    engine.on_price('BTCUSDT', 102.0)  # 102 * 0.95 queda por debajo del stop fijo
+
+    assert engine.is_trailing(1) and stops == []
+
+
+# ==================== TOMA PARCIAL ====================
+
+def test_partial_levels_in_order():
+    rules = ExitRules(partial_enabled=True, levels=LEVELS)
+    engine, _, _ = _engine(rules, (1, 2.0, 100.0, 95.0))
+
+    assert engine.on_price('BTCUSDT', 100.5) == []
+    first = engine.on_price('BTCUSDT', 101.0)
+    assert first == [ExitSignal(1, 'BTCUSDT', PARTIAL_TAKE_PROFIT, 'TP1', pytest.approx(0.6), 101.0, False)]
+    assert engine.on_price('BTCUSDT', 101.5) == []
+    assert engine.on_price('BTCUSDT', 101.0) == []  # Un nivel ya vendido no se repite
+
+    # Un salto cruza TP2 y TP3: una sola señal final por el resto
+    last = engine.on_price('BTCUSDT', 104.0)
+    assert last == [ExitSignal(1, 'BTCUSDT', PARTIAL_TAKE_PROFIT, 'TP3', pytest.approx(1.4), 104.0, True)]
+    assert engine.on_price('BTCUSDT', 110.0) == []
+
+
+def test_partial_short_and_repeated_price():
+    rules = ExitRules(partial_enabled=True, levels=LEVELS)
+    engine, _, _ = _engine(rules, (1, -1.0, 100.0, 105.0))
+
+    signals = engine.on_price('BTCUSDT', 97.9)
+    assert [(s.level, s.final) for s in signals] == [('TP2', False)]
+    assert signals[0].quantity == pytest.approx(0.6)
+    assert engine.on_price('BTCUSDT', 97.9) == []
+
+
+def test_rehydrated_position_resumes_at_next_level():
+    rules = ExitRules(partial_enabled=True, levels=LEVELS)
+    engine = ExitEngine(rules, TriggerIndex())
+    # Retomada tras vender TP1 (30 % de 1.0)
+    engine.add(1, 'BTCUSDT', 0.7, 100.0, 95.0, initial_quantity=1.0)
+
+    assert engine.on_price('BTCUSDT', 101.5) == []
+    signals = engine.on_price('BTCUSDT', 102.0)
+    assert [(s.level, s.final) for s in signals] == [('TP2', False)]
+    assert signals[0].quantity == pytest.approx(0.3)
+
+
+def test_rehydrated_trailing_stop_above_entry():
+    rules = ExitRules(trailing_enabled=True, activation=1, distance=0.5)
+    engine, _, _ = _engine(rules, (1, 1.0, 100.0, 101.5))
+
+    assert engine.is_trailing(1)
+
+
+def test_disabled_rules_and_remove():
+    engine, _, _ = _engine(ExitRules(), (1, 1.0, 100.0, 95.0))
+    assert not engine.is_trailing(1) and engine.on_price('BTCUSDT', 200.0) == []
+
+    engine, _, _ = _engine(ExitRules(partial_enabled=True, levels=LEVELS), (1, 1.0, 100.0, 95.0), (2, 1.0, 100.0, 95.0))
+    assert engine.remove(1) and not engine.remove(1)
+    assert [s.position_id for s in engine.on_price('BTCUSDT', 101.0)] == [2]
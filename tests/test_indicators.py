@@ -0,0 +1,130 @@
+# tests/test_indicators.py
+import numpy as np
+import pytest
+
+from app.services.indicators import ATR, EMA, RSI, SMA, IndicatorSet
+
+N = 120
+rng = np.random.default_rng(7)
+CLOSES = 100 + np.cumsum(rng.normal(0, 1, N))
+HIGHS = CLOSES + rng.uniform(0.1, 2.0, N)
+LOWS = CLOSES - rng.uniform(0.1, 2.0, N)
+
+
+# ==================== FÓRMULAS BATCH DE REFERENCIA ====================
+
+def batch_sma(x, period):
+    out = np.full(len(x), np.nan)
+    out[period - 1:] = np.convolve(x, np.ones(period) / period, mode='valid')
+    return out
+
+
+def batch_ema(x, period):
+    alpha = 2.0 / (period + 1)
+    out = np.empty(len(x))
+    out[0] = x[0]
+    for i in range(1, len(x)):
+        out[i] = alpha * x[i] + (1 - alpha) * out[i - 1]
+    return out
+
+
+def _wilder(values, period):
+    """Media simple de los primeros `period` valores y suavizado de Wilder después"""
+    out = np.empty(len(values))
+    for i, value in enumerate(values):
+        if i < period:
+            out[i] = values[:i + 1].mean()
+        else:
+            out[i] = (out[i - 1] * (period - 1) + value) / period
+    return out
+
+
+def batch_rsi(closes, period):
+    change = np.diff(closes)
+    avg_gain = _wilder(np.clip(change, 0, None), period)
+    avg_loss = _wilder(np.clip(-change, 0, None), period)
+    with np.errstate(divide='ignore'):
+        rsi = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    out = np.full(len(closes), np.nan)
+    out[period:] = rsi[period - 1:]
+    return out
+
+
+def batch_atr(highs, lows, closes, period):
+    prev = np.concatenate(([np.nan], closes[:-1]))
+    tr = np.fmax(highs - lows, np.fmax(np.abs(highs - prev), np.abs(lows - prev)))
+    atr = _wilder(tr, period)
+    atr[:period - 1] = np.nan
+    return atr
+
+
+def _values(indicator, *series):
+    out = []
+    for args in zip(*series):
+        indicator.push(*args)
+        out.append(np.nan if indicator.value is None else indicator.value)
+    return np.array(out)
+
+
+# ==================== INCREMENTAL vs BATCH ====================
+
+@pytest.mark.parametrize('period', [1, 5, 20])
+def test_sma_matches_batch(period):
+    np.testing.assert_allclose(_values(SMA(period), CLOSES), batch_sma(CLOSES, period), rtol=1e-10)
+
+
+@pytest.mark.parametrize('period', [5, 20])
+def test_ema_matches_batch(period):
+    np.testing.assert_allclose(_values(EMA(period), CLOSES), batch_ema(CLOSES, period), rtol=1e-12)
+
+
+@pytest.mark.parametrize('period', [3, 14])
+def test_rsi_matches_batch(period):
+    np.testing.assert_allclose(_values(RSI(period), CLOSES), batch_rsi(CLOSES, period), rtol=1e-10)
+
+
+def test_rsi_without_losses_is_100():
+    assert _values(RSI(3), np.arange(1.0, 8.0))[-1] == 100.0
+
+
+@pytest.mark.parametrize('period', [3, 14])
+def test_atr_matches_batch(period):
+    np.testing.assert_allclose(_values(ATR(period), HIGHS, LOWS, CLOSES),
+                               batch_atr(HIGHS, LOWS, CLOSES, period), rtol=1e-10)
+
+
+# ==================== VELA EN CURSO ====================
+
+@pytest.mark.parametrize('make', [lambda: SMA(5), lambda: EMA(5), lambda: RSI(5)])
+def test_replace_only_affects_open_bar(make):
+    live, reference = make(), make()
+    for i, close in enumerate(CLOSES[:40]):
+        live.push(close + 3.0)
+        live.replace(close - 1.0)
+        live.replace(close)  # Último tick de la vela = cierre
+        reference.push(close)
+        assert live.value == pytest.approx(reference.value)
+
+
+def test_atr_replace_only_affects_open_bar():
+    live, reference = ATR(5), ATR(5)
+    for high, low, close in zip(HIGHS[:40], LOWS[:40], CLOSES[:40]):
+        live.push(close, close, close)
+        live.replace(high, low, close)
+        reference.push(high, low, close)
+        assert live.value == pytest.approx(reference.value)
+
+
+def test_indicator_set_updates_by_open_time():
+    cfg = {'sma_fast': 3, 'sma_slow': 5, 'rsi_period': 3, 'volume_period': 3}
+    ticks = IndicatorSet(cfg)
+    bars = IndicatorSet(cfg)
+    for i in range(30):
+        # Dos ticks de la misma vela: sólo cuenta el último
+        ticks.update(i, HIGHS[i], LOWS[i], CLOSES[i] + 5, 1.0)
+        ticks.update(i, HIGHS[i], LOWS[i], CLOSES[i], 2.0 + i)
+        bars.update(i, HIGHS[i], LOWS[i], CLOSES[i], 2.0 + i)
+
+    assert ticks.snapshot() == pytest.approx(bars.snapshot())
+    assert bars.snapshot()['sma_slow'] == pytest.approx(CLOSES[25:30].mean())
+    assert bars.volume_ratio == pytest.approx(31.0 / np.mean([29.0, 30.0, 31.0]))
@@ -0,0 +1,76 @@
+# tests/test_kline_archive.py
+import os
+
+import numpy as np
+import pytest
+
+from app.services.kline_archive import COLUMNS, KlineArchive
+
+
+def _rows(start, n):
+    return [(t * 60_000, 100.0 + t, 101.0 + t, 99.0 + t, 100.5 + t, 1.0 + t) for t in range(start, start + n)]
+
+
+def _lengths(archive, symbol='BTCUSDT', interval='1m'):
+    path = archive._series_path(symbol, interval)
+    return [os.path.getsize(os.path.join(path, f"{name}.bin")) // np.dtype(dtype).itemsize
+            for name, dtype in COLUMNS]
+
+
+def test_append_and_read_range(tmp_path):
+    archive = KlineArchive(str(tmp_path))
+    assert archive.append_many('BTCUSDT', '1m', _rows(0, 10)) == 10
+    # Repetidas o más antiguas que la última se ignoran
+    assert archive.append_many('BTCUSDT', '1m', _rows(5, 8)) == 3
+    assert not archive.append('BTCUSDT', '1m', *_rows(2, 1)[0])
+
+    series = archive.open('BTCUSDT', '1m')
+    assert len(series) == 13
+    window = archive.read_range('BTCUSDT', '1m', 3 * 60_000, 6 * 60_000)
+    assert window['open_time'].tolist() == [180_000, 240_000, 300_000]
+    assert window['close'].tolist() == [103.5, 104.5, 105.5]
+    assert archive.symbols('1m') == ['BTCUSDT']
+
+
+def test_reopen_truncates_misaligned_columns(tmp_path):
+    KlineArchive(str(tmp_path)).append_many('BTCUSDT', '1m', _rows(0, 5))
+    # Crash a mitad de un append: sólo las dos primeras columnas llegaron a escribirse
+    path = os.path.join(str(tmp_path), 'BTCUSDT', '1m')
+    for name, dtype in COLUMNS[:2]:
+        with open(os.path.join(path, f"{name}.bin"), 'ab') as f:
+            f.write(np.zeros(2, dtype=dtype).tobytes())
+
+    archive = KlineArchive(str(tmp_path))
+    assert archive.append_many('BTCUSDT', '1m', _rows(5, 2)) == 2
+
+    assert _lengths(archive) == [7] * len(COLUMNS)
+    series = archive.open('BTCUSDT', '1m')
+    assert series.open_time.tolist() == [t * 60_000 for t in range(7)]
+    assert series.columns['volume'].tolist() == [1.0 + t for t in range(7)]
+
+
+def test_failed_append_rolls_back_all_columns(tmp_path, monkeypatch):
+    archive = KlineArchive(str(tmp_path))
+    archive.append_many('BTCUSDT', '1m', _rows(0, 4))
+
+    # Falla al convertir la columna 'low' de la segunda tanda
+    rows = _rows(4, 3)
+    rows[1] = rows[1][:3] + ('no es un número',) + rows[1][4:]
+    with pytest.raises(ValueError):
+        archive.append_many('BTCUSDT', '1m', rows)
+
+    assert _lengths(archive) == [4] * len(COLUMNS)
+    assert archive.append_many('BTCUSDT', '1m', _rows(4, 3)) == 3
+    assert archive.open('BTCUSDT', '1m').open_time.tolist() == [t * 60_000 for t in range(7)]
+
+
+def test_series_refresh_sees_new_rows(tmp_path):
+    archive = KlineArchive(str(tmp_path))
+    archive.append_many('ETHUSDT', '1m', _rows(0, 3))
+    series = archive.open('ETHUSDT', '1m')
+
+    archive.append_many('ETHUSDT', '1m', _rows(3, 2))
+    assert len(series) == 3
+    series.refresh()
+    assert len(series) == 5
+    assert series.offset(3 * 60_000) == 3
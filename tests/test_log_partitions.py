@@ -0,0 +1,90 @@
+# tests/test_log_partitions.py
+from datetime import date, datetime, timezone
+
+import pytest
+
+from conftest import pg_rows, pg_session
+from app.services.log_partitions import LogPartitionManager
+
+TODAY = date(2024, 3, 10)  # Domingo
+
+
+@pytest.fixture
+def logs_db(postgres):
+    """system_logs sin particiones de pruebas anteriores (TRUNCATE no las elimina)"""
+    conn = postgres.raw_connection()
+    try:
+        cursor = conn.cursor()
+        for name, in pg_rows(postgres, "SELECT tablename FROM pg_tables "
+                                          "WHERE schemaname = 'public' AND tablename LIKE 'system_logs_p%'"):
+            cursor.execute(f'DROP TABLE "{name}"')
+        cursor.execute('DROP SCHEMA IF EXISTS archive CASCADE')
+        conn.commit()
+    finally:
+        conn.close()
+    return postgres
+
+
+def _log(pg_engine, session_id, timestamp):
+    conn = pg_engine.raw_connection()
+    try:
+        conn.cursor().execute(
+            "INSERT INTO system_logs (session_id, timestamp, level, source, message) "
+            "VALUES (%s, %s, 'INFO', 'system', 'log')", (session_id, timestamp))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _partition_of(pg_engine):
+    return [name for name, in pg_rows(pg_engine, "SELECT tableoid::regclass::text FROM system_logs ORDER BY timestamp")]
+
+
+def test_periods_and_names():
+    weekly = LogPartitionManager(interval='week', keep_days=10)
+
+    assert weekly.period_start(TODAY) == date(2024, 3, 4)
+    assert weekly.next_period(date(2024, 3, 4)) == date(2024, 3, 11)
+    assert weekly.cutoff(TODAY) == date(2024, 2, 26)
+    assert weekly.partition_name(date(2024, 3, 4)) == 'system_logs_p20240304'
+    with pytest.raises(ValueError):
+        LogPartitionManager(interval='month')
+
+
+def test_ensure_creates_window_and_moves_default_rows(logs_db):
+    session_id = pg_session(logs_db)
+    # Llegó antes de existir su partición: cae en DEFAULT
+    _log(logs_db, session_id, datetime(2024, 3, 9, 23, 30, tzinfo=timezone.utc))
+    assert _partition_of(logs_db) == ['system_logs_default']
+
+    manager = LogPartitionManager(premake=2, keep_days=3)
+    created = manager.ensure_partitions(TODAY)
+
+    assert created == [f'system_logs_p202403{day:02d}' for day in range(7, 13)]
+    # Límites en UTC aunque la conexión esté en otra zona horaria
+    assert _partition_of(logs_db) == ['system_logs_p20240309']
+    assert manager.ensure_partitions(TODAY) == []
+
+
+def test_expire_drops_partitions_past_retention(logs_db):
+    session_id = pg_session(logs_db)
+    manager = LogPartitionManager(premake=0, keep_days=3)
+    manager.ensure_partitions(TODAY)
+    _log(logs_db, session_id, datetime(2024, 3, 7, 12, tzinfo=timezone.utc))
+    _log(logs_db, session_id, datetime(2024, 3, 9, 12, tzinfo=timezone.utc))
+
+    expired = manager.expire_partitions(date(2024, 3, 12))
+
+    assert expired == ['system_logs_p20240307', 'system_logs_p20240308']
+    assert _partition_of(logs_db) == ['system_logs_p20240309']
+
+
+def test_expire_archives_detached_partitions(logs_db):
+    session_id = pg_session(logs_db)
+    manager = LogPartitionManager(premake=0, keep_days=1, expired_action='archive')
+    manager.ensure_partitions(TODAY)
+    _log(logs_db, session_id, datetime(2024, 3, 9, 12, tzinfo=timezone.utc))
+
+    assert manager.expire_partitions(date(2024, 3, 12)) == ['system_logs_p20240309', 'system_logs_p20240310']
+    assert _partition_of(logs_db) == []
+    assert pg_rows(logs_db, "SELECT count(*) FROM archive.system_logs_p20240309") == [(1,)]
@@ -0,0 +1,84 @@
+# tests/test_log_policy.py
+import pytest
+
+from app.services.log_policy import LogPolicy, LogPolicyEngine, TokenBucket
+
+
+def _messages(lines):
+    return [message for _, message in lines]
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=2, burst=2)
+
+    assert [bucket.allow(0.0) for _ in range(3)] == [True, True, False]
+    assert bucket.allow(0.5) and not bucket.allow(0.5)
+    assert [bucket.allow(10.0) for _ in range(3)] == [True, True, False]  # Nunca supera burst
+
+
+def test_rate_limit_reports_skipped_on_next_message():
+    policy = LogPolicy(rate=1, burst=1)
+
+    assert _messages(policy.apply('DEBUG', 'a', 0.0)) == ['a']
+    assert policy.apply('DEBUG', 'b', 0.1) == [] and policy.apply('DEBUG', 'c', 0.2) == []
+    assert _messages(policy.apply('DEBUG', 'd', 1.5)) == ['⏱️ 2 mensajes omitidos por límite de tasa', 'd']
+
+
+def test_sampling_passes_one_in_n():
+    policy = LogPolicy(sample_every=3)
+    passed = [m for i in range(7) for m in _messages(policy.apply('INFO', f"Iteración #{i}", float(i)))]
+
+    assert passed == ['Iteración #0', 'Iteración #3', 'Iteración #6']
+
+
+def test_template_collapse_ignores_numbers_within_window():
+    policy = LogPolicy(collapse='template', collapse_window=10)
+
+    assert _messages(policy.apply('INFO', 'HOLD BTCUSDT rsi=51.2', 0.0)) == ['HOLD BTCUSDT rsi=51.2']
+    assert policy.apply('INFO', 'HOLD BTCUSDT rsi=50.9', 1.0) == []
+    assert policy.apply('INFO', 'HOLD BTCUSDT rsi=49.0', 2.0) == []
+    assert _messages(policy.apply('INFO', 'BUY BTCUSDT', 3.0)) == [
+        '↻ Mensaje repetido suprimido x2: HOLD BTCUSDT rsi=49.0', 'BUY BTCUSDT'
+    ]
+    # Fuera de la ventana el mismo mensaje vuelve a salir
+    assert _messages(policy.apply('INFO', 'BUY BTCUSDT', 20.0)) == ['BUY BTCUSDT']
+
+
+def test_exact_collapse_and_flush_of_pending_summaries():
+    policy = LogPolicy(collapse='exact', rate=1, burst=1)
+    policy.apply('INFO', 'precio 1', 0.0)
+    policy.apply('INFO', 'precio 2', 0.1)  # Otro texto: pasa el collapse, lo frena la tasa
+    policy.apply('INFO', 'precio 2', 0.2)
+
+    assert _messages(policy.flush('INFO')) == [
+        '↻ Mensaje repetido suprimido x1: precio 2', '⏱️ 1 mensajes omitidos por límite de tasa'
+    ]
+    assert policy.flush('INFO') == []
+
+
+def test_invalid_collapse_mode():
+    with pytest.raises(ValueError):
+        LogPolicy(collapse='fuzzy')
+
+
+def test_engine_resolution_order():
+    engine = LogPolicyEngine({
+        '*': {'*': {'sample_every': 2}, 'DEBUG': {'rate': 1, 'burst': 1}},
+        'strategy': {'INFO': {'collapse': 'exact'}},
+        'trading': {'*': None},
+    })
+
+    assert engine._resolve('strategy', 'INFO').collapse == 'exact'
+    assert engine._resolve('loop', 'DEBUG').bucket is not None
+    assert engine._resolve('loop', 'INFO').sample_every == 2
+    assert engine._resolve('trading', 'ERROR').sample_every == 2  # Sin política propia: cae al comodín
+
+
+def test_engine_passes_through_without_policy_and_flushes_per_source():
+    engine = LogPolicyEngine({'strategy': {'INFO': {'collapse': 'exact'}}})
+
+    assert engine.filter('trading', 'ERROR', 'orden rechazada') == [('ERROR', 'orden rechazada')]
+    engine.filter('strategy', 'INFO', 'HOLD', now=0.0)
+    engine.filter('strategy', 'INFO', 'HOLD', now=1.0)
+
+    assert engine.flush() == [('strategy', 'INFO', '↻ Mensaje repetido suprimido x1: HOLD')]
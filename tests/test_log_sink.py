@@ -0,0 +1,78 @@
+# tests/test_log_sink.py
+import pytest
+
+from conftest import pg_rows, pg_session
+from app.services.log_sink import SystemLogSink
+
+
+def _capturing(monkeypatch, **kwargs):
+    sink = SystemLogSink(flush_interval=60, **kwargs)
+    batches = []
+    monkeypatch.setattr(sink, '_flush', lambda records: batches.append(list(records)))
+    return sink, batches
+
+
+def test_records_without_session_are_not_queued(monkeypatch):
+    sink, batches = _capturing(monkeypatch)
+    sink.submit(None, 'INFO', 'system', 'sin sesión')
+    sink.start()
+    sink.stop()
+
+    assert batches == [] and sink.dropped == 0
+
+
+def test_batches_by_size_and_flushes_rest_on_stop(monkeypatch):
+    sink, batches = _capturing(monkeypatch, batch_size=3)
+    sink.start()
+    for i in range(7):
+        sink.submit(1, 'INFO', 'loop', f"Iteración #{i}")
+    sink.stop()
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [record[4] for batch in batches for record in batch] == [f"Iteración #{i}" for i in range(7)]
+
+
+def test_overflow_aggregate_writes_one_summary_per_group(monkeypatch):
+    sink, batches = _capturing(monkeypatch, max_queue=1)
+    sink.submit(1, 'DEBUG', 'loop', 'entra')
+    for _ in range(3):
+        sink.submit(1, 'DEBUG', 'loop', 'se descarta')
+    sink.submit(1, 'ERROR', 'trading', 'se descarta')
+    sink.start()
+    sink.stop()
+
+    summaries = {(r[2], r[3]): r for r in batches[0][1:]}
+    assert sink.dropped == 4 and batches[0][0][4] == 'entra'
+    assert summaries[('WARNING', 'loop')][5] == {'dropped': 3, 'level': 'DEBUG'}
+    assert summaries[('ERROR', 'trading')][5] == {'dropped': 1, 'level': 'ERROR'}
+
+
+def test_overflow_drop_only_counts(monkeypatch):
+    sink, batches = _capturing(monkeypatch, max_queue=1, overflow_policy='drop')
+    sink.submit(1, 'INFO', 'loop', 'entra')
+    sink.submit(1, 'INFO', 'loop', 'se descarta')
+    sink.start()
+    sink.stop()
+
+    assert [[r[4] for r in batch] for batch in batches] == [['entra']] and sink.dropped == 1
+
+
+def test_invalid_overflow_policy():
+    with pytest.raises(ValueError):
+        SystemLogSink(overflow_policy='block')
+
+
+def test_flush_inserts_into_partitioned_system_logs(postgres):
+    session_id = pg_session(postgres)
+    sink = SystemLogSink(flush_interval=60)
+    sink.start()
+    sink.submit(session_id, 'INFO', 'trading', 'Orden ejecutada', {'symbol': 'BTCUSDT', 'qty': 0.5})
+    sink.submit(session_id, 'DEBUG', 'loop', 'Iteración #1')
+    sink.stop()
+
+    rows = pg_rows(postgres, "SELECT level, source, message, details FROM system_logs ORDER BY id")
+    assert rows == [
+        ('INFO', 'trading', 'Orden ejecutada', {'symbol': 'BTCUSDT', 'qty': 0.5}),
+        ('DEBUG', 'loop', 'Iteración #1', None),
+    ]
+    assert sink.written == 2
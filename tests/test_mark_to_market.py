@@ -0,0 +1,186 @@
+# tests/test_mark_to_market.py
+import pytest
+
+from conftest import FakeTradeWriter, pg_rows, pg_session
+from app.services.mark_to_market import MarkToMarketService, SymbolBook
+
+TRADE_SQL = "SELECT id, session_id, status, needs_reconciliation FROM trades ORDER BY id"
+
+
+def _position(session_id, trade_id, symbol='BTCUSDT', quantity=0.5, entry_price=100.0):
+    return {'session_id': session_id, 'trade_id': trade_id, 'symbol': symbol, 'quantity': quantity,
+            'entry_price': entry_price, 'current_price': entry_price, 'stop_loss': 95.0, 'take_profit': 110.0}
+
+
+def _open(pg_engine, session_id, real_trade=False, trade_status='open', quantity=0.5):
+    """Trade y su posición en BD; devuelve (trade_id, position_id)"""
+    conn = pg_engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO trades (session_id, symbol, entry_price, quantity, status, real_trade)
+            VALUES (%s, 'BTCUSDT', 100, %s, %s, %s) RETURNING id
+        """, (session_id, quantity, trade_status, real_trade))
+        trade_id = cursor.fetchone()[0]
+        cursor.execute("""
+            INSERT INTO positions (session_id, trade_id, symbol, quantity, entry_price, current_price,
+                                   unrealized_pnl, unrealized_pnl_percent, stop_loss, take_profit)
+            VALUES (%s, %s, 'BTCUSDT', %s, 100, 100, 0, 0, 95, 110) RETURNING id
+        """, (session_id, trade_id, quantity))
+        position_id = cursor.fetchone()[0]
+        conn.commit()
+        return trade_id, position_id
+    finally:
+        conn.close()
+
+
+def _beat(pg_engine, session_id, age_seconds):
+    conn = pg_engine.raw_connection()
+    try:
+        conn.cursor().execute("UPDATE bot_sessions SET heartbeat_at = NOW() - make_interval(secs => %s) "
+                              "WHERE id = %s", (age_seconds, session_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _service():
+    return MarkToMarketService(FakeTradeWriter(), heartbeat_interval=15, stale_after=60)
+
+
+# ==================== LIBRO ====================
+
+def test_book_marks_longs_and_shorts_in_one_pass():
+    book = SymbolBook('BTCUSDT')
+    book.add({'id': 1, **_position(1, 1)})
+    book.add({'id': 2, **_position(2, 2, quantity=-0.5)})
+
+    book.mark(110.0)
+
+    assert book.unrealized_pnl.tolist() == pytest.approx([5.0, -5.0])
+    assert book.unrealized_pnl_percent.tolist() == pytest.approx([10.0, -10.0])
+    assert book.remove(1)['unrealized_pnl'] == 5.0 and book.ids.tolist() == [2]
+    assert book.marks() == {2: [{'id': 2, 'current_price': 110.0, 'unrealized_pnl': -5.0,
+                                 'unrealized_pnl_percent': -10.0}]}
+
+
+def test_invalid_heartbeat_window():
+    with pytest.raises(ValueError):
+        MarkToMarketService(FakeTradeWriter(), heartbeat_interval=30, stale_after=30)
+
+
+# ==================== CARGA ====================
+
+def test_load_never_closes_and_flags_unwatched_real_trades(postgres):
+    live = pg_session(postgres)
+    stopped = pg_session(postgres, status='stopped')
+    _beat(postgres, live, 0)
+    live_real, _ = _open(postgres, live, real_trade=True)
+    stopped_real, _ = _open(postgres, stopped, real_trade=True)
+    stopped_sim, _ = _open(postgres, stopped)
+    _open(postgres, stopped, trade_status='closed')  # Su DELETE no llegó a la BD
+
+    service = _service()
+
+    assert service.load() == 3
+    # Nada se cierra: sólo se marca el trade real que nadie vigila
+    assert pg_rows(postgres, TRADE_SQL)[:3] == [
+        (live_real, live, 'open', False), (stopped_real, stopped, 'open', True), (stopped_sim, stopped, 'open', False)
+    ]
+    assert pg_rows(postgres, "SELECT count(*) FROM positions") == [(3,)]
+    assert len(service.positions(stopped)) == 2
+
+
+def test_load_flags_running_sessions_without_heartbeat(postgres):
+    crashed = pg_session(postgres)
+    _beat(postgres, crashed, 300)
+    trade_id, _ = _open(postgres, crashed, real_trade=True)
+
+    _service().load()
+
+    assert pg_rows(postgres, TRADE_SQL) == [(trade_id, crashed, 'open', True)]
+
+
+# ==================== ADOPCIÓN ====================
+
+def test_adopt_only_takes_positions_of_dead_sessions(postgres):
+    live = pg_session(postgres)                       # Bot vivo en otro proceso
+    crashed = pg_session(postgres)                    # 'running' sin latido reciente
+    stopped = pg_session(postgres, status='stopped')  # Detenido sin cerrar posiciones
+    other_user = pg_session(postgres, user_id=2, status='stopped')
+    _beat(postgres, live, 5)
+    _beat(postgres, crashed, 300)
+    _open(postgres, live)
+    crashed_trade, crashed_position = _open(postgres, crashed, real_trade=True)
+    stopped_trade, stopped_position = _open(postgres, stopped)
+    _open(postgres, other_user)
+    service = _service()
+    service.load()
+    current = pg_session(postgres)
+
+    adopted = service.adopt(1, current)
+
+    assert sorted((p['id'], p['trade']['id']) for p in adopted) == [(crashed_position, crashed_trade),
+                                                                    (stopped_position, stopped_trade)]
+    assert all(p['session_id'] == current and p['trade']['session_id'] == current for p in adopted)
+    assert 'previous_session_id' not in adopted[0]['trade']
+    assert pg_rows(postgres, "SELECT id, status FROM bot_sessions ORDER BY id") == [
+        (live, 'running'), (crashed, 'stopped'), (stopped, 'stopped'), (other_user, 'stopped'), (current, 'running')
+    ]
+    # El trade real estuvo sin vigilancia: sigue abierto y pendiente de conciliar
+    assert pg_rows(postgres, "SELECT session_id, status, needs_reconciliation FROM trades WHERE id = %s",
+                   (crashed_trade,)) == [(current, 'open', True)]
+    assert pg_rows(postgres, "SELECT session_id, count(*) FROM positions GROUP BY session_id ORDER BY session_id") == [
+        (live, 1), (other_user, 1), (current, 2)
+    ]
+    assert len(service.positions(current)) == 2 and len(service.positions(live)) == 1
+    assert service.adopt(1, current) == []
+
+
+def test_adopt_loads_positions_opened_after_load(postgres):
+    stopped = pg_session(postgres, status='stopped')
+    service = _service()
+    service.load()
+    _, position_id = _open(postgres, stopped)  # Otro proceso la abrió después
+    current = pg_session(postgres)
+
+    assert [p['id'] for p in service.adopt(1, current)] == [position_id]
+    assert [p['id'] for p in service.positions(current)] == [position_id]
+
+
+# ==================== LATIDO Y VOLCADO ====================
+
+def test_heartbeat_covers_attached_sessions_only(postgres):
+    attached, detached = pg_session(postgres), pg_session(postgres)
+    service = _service()
+
+    service.attach(attached)
+    service.attach(detached)
+    service.detach(detached)
+    _beat(postgres, attached, 300)
+    assert service.heartbeat()
+
+    fresh = pg_rows(postgres, "SELECT id, heartbeat_at > NOW() - interval '5 seconds' FROM bot_sessions ORDER BY id")
+    assert fresh == [(attached, True), (detached, True)]  # attach late en el acto
+    _beat(postgres, detached, 300)
+    service.heartbeat()
+    assert pg_rows(postgres, "SELECT heartbeat_at > NOW() - interval '5 seconds' FROM bot_sessions "
+                             "WHERE id = %s", (detached,)) == [(False,)]
+
+
+def test_flush_retries_positions_not_yet_inserted(postgres):
+    session_id = pg_session(postgres)
+    trade_id, _ = _open(postgres, session_id)
+    service = _service()
+    service.writer._ids['positions'] = 100  # Ids que no choquen con los de la BD
+    service.load()
+    # El INSERT de la nueva posición sigue en la cola del TradeWriter (aquí descartada)
+    pending = service.open_position(session_id, trade_id, 'BTCUSDT', 0.5, 100.0, 95.0, 110.0)
+    service.on_price('BTCUSDT', 104.0)
+
+    assert service.flush() == 1
+    assert service._books['BTCUSDT'].dirty  # Sigue pendiente hasta que el UPDATE la encuentre
+
+    service.close_position(pending['id'], 'BTCUSDT')
+    assert service.flush() == 1 and not service._books['BTCUSDT'].dirty
+    assert pg_rows(postgres, "SELECT current_price, unrealized_pnl FROM positions") == [(104, 2)]
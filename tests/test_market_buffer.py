@@ -0,0 +1,74 @@
+# tests/test_market_buffer.py
+import numpy as np
+
+from app.services.market_buffer import KlineRingBuffer
+
+
+def _bar(i):
+    return (i * 60_000, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 10.0 + i)
+
+
+def _filled(capacity, n):
+    buffer = KlineRingBuffer(capacity)
+    for i in range(n):
+        buffer.append(*_bar(i))
+    return buffer
+
+
+def test_partial_fill_keeps_insertion_order():
+    buffer = _filled(5, 3)
+
+    assert len(buffer) == 3
+    assert buffer.closes().tolist() == [100.5, 101.5, 102.5]
+    assert buffer.closes(2).tolist() == [101.5, 102.5]
+    assert buffer.closes(10).tolist() == [100.5, 101.5, 102.5]
+
+
+def test_wraparound_drops_oldest_and_stays_chronological():
+    buffer = _filled(4, 11)
+
+    assert len(buffer) == 4
+    assert buffer.open_times().tolist() == [7 * 60_000, 8 * 60_000, 9 * 60_000, 10 * 60_000]
+    assert buffer.closes().tolist() == [107.5, 108.5, 109.5, 110.5]
+    # Ventana que cruza el final del array
+    assert buffer.closes(3).tolist() == [108.5, 109.5, 110.5]
+    assert buffer.last_close == 110.5
+    assert buffer.last_bar() == _bar(10)
+
+
+def test_wraparound_at_exact_capacity_multiple():
+    buffer = _filled(4, 8)
+
+    assert buffer.open_times().tolist() == [4 * 60_000, 5 * 60_000, 6 * 60_000, 7 * 60_000]
+    assert buffer.last_bar() == _bar(7)
+
+
+def test_upsert_updates_open_bar_and_ignores_older():
+    buffer = _filled(3, 5)
+
+    buffer.upsert(4 * 60_000, 104.0, 120.0, 90.0, 115.0, 99.0)
+    assert len(buffer) == 3
+    assert buffer.last_bar() == (4 * 60_000, 104.0, 120.0, 90.0, 115.0, 99.0)
+
+    buffer.upsert(2 * 60_000, 1.0, 1.0, 1.0, 1.0, 1.0)
+    assert buffer.closes().tolist() == [102.5, 103.5, 115.0]
+
+    buffer.upsert(5 * 60_000, 105.0, 106.0, 104.0, 105.5, 15.0)
+    assert buffer.open_times().tolist() == [3 * 60_000, 4 * 60_000, 5 * 60_000]
+
+
+def test_empty_buffer():
+    buffer = KlineRingBuffer(3)
+
+    assert len(buffer) == 0
+    assert buffer.last_close is None and buffer.last_bar() is None
+    assert buffer.closes().size == 0 and buffer.to_klines() == []
+
+
+def test_to_klines_matches_columns_after_wraparound():
+    buffer = _filled(4, 6)
+    klines = buffer.to_klines()
+
+    assert [k['open_time'] for k in klines] == buffer.open_times().tolist()
+    np.testing.assert_array_equal([k['close'] for k in klines], buffer.closes())
+    assert klines[-1] == dict(zip(('open_time', 'open', 'high', 'low', 'close', 'volume'), _bar(5)))
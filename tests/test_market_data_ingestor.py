@@ -0,0 +1,79 @@
+# tests/test_market_data_ingestor.py
+from datetime import datetime, timezone
+
+from conftest import pg_rows
+from app.services.kline_archive import KlineArchive
+from app.services.market_data_ingestor import MarketDataIngestor
+
+T0 = 1_700_000_040_000  # 2023-11-14 22:14 UTC, múltiplo de 1m
+
+
+def _bar(i, close=100.0):
+    return ('BTCUSDT', '1m', T0 + i * 60_000, close, close + 1, close - 1, close, 2.5)
+
+
+def _capturing(monkeypatch, **kwargs):
+    ingestor = MarketDataIngestor(flush_interval=60, **kwargs)
+    batches = []
+    monkeypatch.setattr(ingestor, '_persist', lambda rows: batches.append(sorted(rows)))
+    return ingestor, batches
+
+
+def test_stop_flushes_pending_and_dedupes_within_batch(monkeypatch):
+    ingestor, batches = _capturing(monkeypatch)
+    ingestor.start()
+    ingestor.submit(*_bar(0, 100.0))
+    ingestor.submit(*_bar(1))
+    ingestor.submit(*_bar(0, 101.0))  # Misma vela: gana la última versión
+    ingestor.stop()
+
+    assert batches == [[_bar(0, 101.0), _bar(1)]]
+
+
+def test_batch_size_triggers_flush(monkeypatch):
+    ingestor, batches = _capturing(monkeypatch, batch_size=2)
+    ingestor.start()
+    for i in range(5):
+        ingestor.submit(*_bar(i))
+    ingestor.stop()
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_full_queue_drops_without_blocking(monkeypatch):
+    ingestor, batches = _capturing(monkeypatch, max_queue=2)
+    for i in range(5):
+        ingestor.submit(*_bar(i))
+
+    assert ingestor.dropped == 3
+    ingestor.start()
+    ingestor.stop()
+    assert batches == [[_bar(0), _bar(1)]]
+
+
+def test_archive_only_writes_sorted_series(tmp_path):
+    archive = KlineArchive(str(tmp_path))
+    ingestor = MarketDataIngestor(flush_interval=60, persist=False, archive=archive)
+    ingestor.start()
+    for i in (2, 0, 1):
+        ingestor.submit(*_bar(i, 100.0 + i))
+    ingestor.stop()
+
+    series = archive.open('BTCUSDT', '1m')
+    assert series.open_time.tolist() == [T0, T0 + 60_000, T0 + 120_000]
+    assert series.columns['close'].tolist() == [100.0, 101.0, 102.0]
+
+
+def test_copy_persists_utc_candles_and_ignores_duplicates(postgres):
+    ingestor = MarketDataIngestor()
+    ingestor._persist([_bar(0, 100.0), _bar(1, 100.5)])
+    ingestor._persist([_bar(1, 999.0), _bar(2, 101.0)])  # La vela 1 ya existe: no se toca
+
+    rows = pg_rows(postgres, "SELECT timestamp, close FROM market_data ORDER BY timestamp")
+
+    # La conexión de pruebas no está en UTC: el instante guardado es el de open_time
+    assert [ts.astimezone(timezone.utc) for ts, _ in rows] == [
+        datetime.fromtimestamp((T0 + i * 60_000) / 1000, tz=timezone.utc) for i in range(3)
+    ]
+    assert [float(close) for _, close in rows] == [100.0, 100.5, 101.0]
+    assert ingestor.written == 4
@@ -0,0 +1,129 @@
+# tests/test_market_stream.py
+import asyncio
+import json
+import threading
+
+import websockets
+
+from app.services import market_stream
+from app.services.market_stream import MarketStream, kline_stream
+
+
+class FakeWs:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, raw):
+        self.sent.append(json.loads(raw))
+
+
+def _message(stream, **data):
+    return json.dumps({'stream': stream, 'data': data})
+
+
+def test_callbacks_are_shared_per_stream():
+    stream = MarketStream()
+    first, second = [], []
+    stream.subscribe([kline_stream('BTCUSDT'), kline_stream('ETHUSDT')], first.append)
+    stream.subscribe([kline_stream('BTCUSDT')], second.append)
+    stream.subscribe([kline_stream('BTCUSDT')], second.append)  # Repetido: no se duplica
+
+    stream._dispatch(_message('btcusdt@kline_1m', k=1))
+    assert first == second == [{'k': 1}]
+
+    # El stream sigue mientras quede algún callback
+    stream.unsubscribe_all(first.append)
+    assert stream.streams == ['btcusdt@kline_1m']
+    stream.unsubscribe(['btcusdt@kline_1m'], second.append)
+    assert stream.streams == []
+
+
+def test_dispatch_isolates_callback_errors_and_ignores_control_replies():
+    stream = MarketStream()
+    received = []
+
+    def broken(data):
+        raise ValueError('boom')
+
+    stream.subscribe(['btcusdt@kline_1m'], broken)
+    stream.subscribe(['btcusdt@kline_1m'], received.append)
+
+    stream._dispatch(_message('btcusdt@kline_1m', k=1))
+    stream._dispatch(json.dumps({'result': None, 'id': 1}))
+    stream._dispatch(_message('solusdt@kline_1m', k=2))  # Sin suscriptores
+
+    assert received == [{'k': 1}]
+    assert stream.messages == 2
+
+
+def test_sync_batches_control_messages(monkeypatch):
+    monkeypatch.setattr(market_stream, 'CONTROL_INTERVAL', 0)
+    monkeypatch.setattr(market_stream, 'MAX_PARAMS_PER_REQUEST', 2)
+    stream = MarketStream()
+    stream.subscribe(['a', 'b', 'c', 'd', 'e'], print)
+    stream._active = {'a', 'x', 'y', 'z'}
+    ws = FakeWs()
+
+    async def run():
+        stream._wakeup = asyncio.Event()
+        stream._wakeup.set()
+        task = asyncio.ensure_future(stream._sync_subscriptions(ws))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(run())
+
+    assert [(m['method'], m['params']) for m in ws.sent] == [
+        ('UNSUBSCRIBE', ['x', 'y']), ('SUBSCRIBE', ['b', 'c']),
+        ('UNSUBSCRIBE', ['z']), ('SUBSCRIBE', ['d', 'e']),
+    ]
+    assert stream._active == {'a', 'b', 'c', 'd', 'e'}
+    assert len({m['id'] for m in ws.sent}) == 4
+
+
+def test_live_connection_subscribes_in_place(monkeypatch):
+    monkeypatch.setattr(market_stream, 'CONTROL_INTERVAL', 0)
+    paths, controls, received = [], [], []
+    got = threading.Event()
+
+    async def handler(ws, path=None):
+        paths.append(path or ws.path)
+        await ws.send(_message('btcusdt@kline_1m', k=1))
+        async for raw in ws:
+            message = json.loads(raw)
+            controls.append((message['method'], message['params']))
+            await ws.send(json.dumps({'result': None, 'id': message['id']}))
+            for name in message['params']:
+                await ws.send(_message(name, k=2))
+
+    def on_data(data):
+        received.append(data)
+        if len(received) == 1:
+            # Ya conectado: la nueva suscripción viaja por la misma conexión
+            stream.subscribe(['ethusdt@kline_1m'], on_data)
+        else:
+            got.set()
+
+    async def serve():
+        return await websockets.serve(handler, '127.0.0.1', 0)
+
+    async def close(server):
+        server.close()
+        await server.wait_closed()
+
+    # El servidor corre en el mismo loop del stream (un solo loop aunque eventlet esté parcheado)
+    stream = MarketStream(reconnect_delay=0.01)
+    stream.start()
+    try:
+        server = asyncio.run_coroutine_threadsafe(serve(), stream._loop).result(5)
+        stream.url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}/stream"
+        stream.subscribe(['btcusdt@kline_1m'], on_data)
+        assert got.wait(5)
+        assert stream.reconnects == 0
+        asyncio.run_coroutine_threadsafe(close(server), stream._loop).result(5)
+    finally:
+        stream.stop()
+
+    assert paths == ['/stream?streams=btcusdt@kline_1m']
+    assert controls == [('SUBSCRIBE', ['ethusdt@kline_1m'])]
+    assert received == [{'k': 1}, {'k': 2}]
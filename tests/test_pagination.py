@@ -0,0 +1,91 @@
+# tests/test_pagination.py
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.core.pagination import (MAX_PAGE_SIZE, InvalidCursor, csv_lines, decode_cursor, encode_cursor,
+                                 keyset_page, ndjson_lines, page_size)
+from app.models.system_logs import SystemLog
+from app.models.trades import Trade
+from app.services.data_service import TRADE_HISTORY_KEY
+
+
+@pytest.mark.parametrize('values', [
+    (datetime(2024, 5, 1, 12, 30, 15, 123456), 42),
+    (datetime(2024, 5, 1), 2 ** 40),
+])
+def test_cursor_round_trip(values):
+    token = encode_cursor(values)
+
+    assert '=' not in token and '/' not in token and '+' not in token
+    assert decode_cursor(token, TRADE_HISTORY_KEY) == values
+
+
+def test_cursor_round_trip_system_logs_key():
+    values = (datetime(2024, 1, 2, 3, 4, 5), 7)
+    assert decode_cursor(encode_cursor(values), (SystemLog.timestamp, SystemLog.id)) == values
+
+
+@pytest.mark.parametrize('token', [
+    'no-es-base64!',
+    base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+    encode_cursor([datetime(2024, 1, 1)]),                       # Falta el id
+    encode_cursor([datetime(2024, 1, 1), 1, 2]),                 # Sobra un valor
+    encode_cursor(['ayer', 1]),                                  # Fecha mal formada
+    encode_cursor([datetime(2024, 1, 1), 'uno']),                # id no numérico
+])
+def test_tampered_cursor_is_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, TRADE_HISTORY_KEY)
+
+
+def test_page_size_bounds():
+    assert page_size(None) == 100
+    assert page_size(0) == 100
+    assert page_size(-5) == 1
+    assert page_size(10 ** 6) == MAX_PAGE_SIZE
+
+
+def test_export_lines():
+    rows = [(1, Decimal('1.50'), datetime(2024, 1, 1), {'k': 'v'}), (2, None, None, [1, 2])]
+    fields = ('id', 'pnl', 'exit_time', 'extra')
+
+    ndjson = [json.loads(line) for line in ndjson_lines(rows, fields)]
+    assert ndjson[0] == {'id': 1, 'pnl': 1.5, 'exit_time': '2024-01-01T00:00:00', 'extra': {'k': 'v'}}
+    assert ''.join(csv_lines(rows, fields)).splitlines() == [
+        'id,pnl,exit_time,extra', '1,1.5,2024-01-01T00:00:00,"{""k"": ""v""}"', '2,,,"[1, 2]"'
+    ]
+    assert list(csv_lines([], fields)) == ['id,pnl,exit_time,extra\r\n']
+
+
+def test_keyset_pages_cover_every_trade_once(database):
+    _, trade_ids = database.add_session(user_id=1, n_trades=23)
+
+    seen, cursor, pages = [], None, 0
+    with database.Session() as db:
+        while True:
+            trades, cursor = keyset_page(db.query(Trade), TRADE_HISTORY_KEY, cursor, 10)
+            seen += [trade.id for trade in trades]
+            pages += 1
+            if cursor is None:
+                break
+
+    assert pages == 3
+    # Orden (exit_time, id) descendente: en estos datos, el trade más nuevo es el último creado
+    assert seen == sorted(trade_ids, reverse=True)
+
+
+def test_keyset_breaks_exit_time_ties_by_id(database):
+    _, trade_ids = database.add_session(user_id=1, n_trades=6)
+    with database.Session() as db:
+        db.query(Trade).update({Trade.exit_time: datetime(2024, 1, 1)})
+        db.commit()
+
+        first, cursor = keyset_page(db.query(Trade), TRADE_HISTORY_KEY, None, 4)
+        rest, last = keyset_page(db.query(Trade), TRADE_HISTORY_KEY, cursor, 4)
+
+    assert [t.id for t in first + rest] == sorted(trade_ids, reverse=True)
+    assert last is None
@@ -0,0 +1,55 @@
+# tests/test_param_sweep.py
+import pytest
+
+from app.services.param_sweep import _parse_grid, expand_grid, rank_results
+
+
+def test_expand_grid_product_skips_fast_not_below_slow():
+    combos = expand_grid({'sma_fast': [5, 10, 20], 'sma_slow': [10, 20]})
+
+    assert combos == [
+        {'sma_fast': 5, 'sma_slow': 10},
+        {'sma_fast': 5, 'sma_slow': 20},
+        {'sma_fast': 10, 'sma_slow': 20},
+    ]
+
+
+def test_expand_grid_single_param_and_empty_values():
+    assert expand_grid({'sma_fast': [3, 4]}) == [{'sma_fast': 3}, {'sma_fast': 4}]
+    assert expand_grid({'sma_fast': [], 'sma_slow': [10]}) == []
+
+
+def test_expand_grid_rejects_params_the_engine_ignores():
+    with pytest.raises(ValueError, match='rsi_period'):
+        expand_grid({'sma_fast': [5], 'rsi_period': [7, 14]})
+
+
+def test_parse_grid():
+    assert _parse_grid(['sma_fast=5,8, 12', 'sma_slow=20,']) == {'sma_fast': [5, 8, 12], 'sma_slow': [20]}
+
+
+def test_rank_results_orders_by_priority_and_ranks_each_key():
+    results = [
+        {'params': 'a', 'total_pnl': 10.0, 'max_drawdown': 5.0, 'sharpe_ratio': 1.0},
+        {'params': 'b', 'total_pnl': 20.0, 'max_drawdown': 9.0, 'sharpe_ratio': 0.5},
+        {'params': 'c', 'total_pnl': 10.0, 'max_drawdown': 2.0, 'sharpe_ratio': 2.0},
+    ]
+
+    ranked = rank_results(results)
+
+    # P&L descendente y, a igual P&L, menor drawdown primero
+    assert [r['params'] for r in ranked] == ['b', 'c', 'a']
+    by_name = {r['params']: r for r in ranked}
+    assert [by_name[p]['rank_total_pnl'] for p in 'abc'] == [2, 1, 3]
+    assert [by_name[p]['rank_max_drawdown'] for p in 'abc'] == [2, 3, 1]
+    assert [by_name[p]['rank_sharpe_ratio'] for p in 'abc'] == [2, 3, 1]
+
+
+def test_rank_results_custom_priority():
+    results = [
+        {'params': 'a', 'total_pnl': 10.0, 'max_drawdown': 5.0, 'sharpe_ratio': 1.0},
+        {'params': 'b', 'total_pnl': 20.0, 'max_drawdown': 9.0, 'sharpe_ratio': 0.5},
+    ]
+
+    assert [r['params'] for r in rank_results(results, sort_by=('max_drawdown',))] == ['a', 'b']
+    assert [r['params'] for r in rank_results(results, sort_by=('sharpe_ratio',))] == ['a', 'b']
@@ -0,0 +1,65 @@
+# tests/test_performance_service.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import pg_rows, pg_session
+from app.services.balance_service import BalanceService
+from app.services.performance_service import DrawdownTracker, backfill, get_performance
+
+T0 = datetime(2024, 3, 9, 23, 0, tzinfo=timezone.utc)
+EQUITY = [1000, 1100, 990, 1045, 880, 1150, 1120]
+
+
+def _at(i):
+    return T0 + timedelta(minutes=10 * i)
+
+
+def test_tracker_peak_drawdown_and_duration():
+    tracker = DrawdownTracker(1)
+    for i, equity in enumerate(EQUITY):
+        tracker.update(equity, _at(i))
+
+    assert tracker.peak_equity == 1150 and tracker.peak_time == _at(5)
+    assert tracker.max_drawdown == pytest.approx(20.0) and tracker.max_drawdown_time == _at(4)
+    assert tracker.max_drawdown_duration == 30 * 60  # De 1100 (t1) hasta el último punto bajo el pico (t4)
+    assert tracker.current_drawdown == pytest.approx((1150 - 1120) / 1150 * 100)
+
+
+def test_tracker_ignores_older_snapshots():
+    tracker = DrawdownTracker(1)
+    tracker.update(1000, _at(2))
+    tracker.update(500, _at(1))
+
+    assert tracker.samples == 1 and tracker.current_equity == 1000
+
+
+def test_live_upsert_matches_backfill(postgres):
+    session_id = pg_session(postgres)
+    service = BalanceService()
+    for i, equity in enumerate(EQUITY):
+        service.record_snapshot(session_id, balance=1000, equity=equity, pnl=equity - 1000, timestamp=_at(i))
+    live = get_performance(session_id)
+
+    assert backfill(session_id) == 1
+    rebuilt = get_performance(session_id)
+
+    for key in ('current_equity', 'peak_equity', 'current_drawdown', 'max_drawdown',
+                'drawdown_duration', 'max_drawdown_duration'):
+        assert rebuilt[key] == pytest.approx(live[key])
+    # La conexión de pruebas no está en UTC: los instantes deben coincidir igual
+    for key in ('max_drawdown_time', 'updated_at'):
+        assert datetime.fromisoformat(rebuilt[key]) == datetime.fromisoformat(live[key])
+    assert datetime.fromisoformat(rebuilt['max_drawdown_time']) == _at(4)
+    assert live['max_drawdown'] == pytest.approx(20.0)
+
+
+def test_live_upsert_ignores_late_snapshots(postgres):
+    session_id = pg_session(postgres)
+    service = BalanceService()
+    service.record_snapshot(session_id, balance=1000, equity=1000, pnl=0, timestamp=_at(2))
+    service.record_snapshot(session_id, balance=1000, equity=500, pnl=-500, timestamp=_at(1))
+
+    assert pg_rows(postgres, "SELECT current_equity, max_drawdown, samples FROM session_performance") == [
+        (1000, 0, 1)
+    ]
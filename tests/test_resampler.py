@@ -0,0 +1,104 @@
+# tests/test_resampler.py
+import pytest
+
+from app.services.resampler import MINUTE_MS, KlineResampler
+
+FIVE = 5 * MINUTE_MS
+
+
+def _minute(i, close=None, volume=1.0):
+    close = 100.0 + i if close is None else close
+    return (i * MINUTE_MS, close - 0.5, close + 1.0, close - 1.0, close, volume)
+
+
+def _feed(resampler, minutes, symbol='BTCUSDT', ticks=False):
+    updates = []
+    for bar in minutes:
+        if ticks:
+            # Mensaje intermedio con valores parciales de la misma vela de 1m
+            open_time, open_, high, low, close, volume = bar
+            updates += resampler.on_minute(symbol, open_time, open_, open_, open_, open_, volume / 2, False)
+        updates += resampler.on_minute(symbol, *bar, True)
+    return updates
+
+
+def _closed(updates, timeframe='5m'):
+    return [u for u in updates if u[0] == timeframe and u[7]]
+
+
+def test_bucket_closes_on_its_last_minute():
+    resampler = KlineResampler(['1m', '5m'])
+    updates = _feed(resampler, [_minute(i) for i in range(5)])
+
+    assert resampler.timeframes == ['5m']
+    assert [u[7] for u in updates] == [False, False, False, False, True]
+    assert _closed(updates) == [('5m', 0, 99.5, 105.0, 99.0, 104.0, 5.0, True)]
+
+
+def test_intermediate_ticks_do_not_double_count():
+    updates = _feed(KlineResampler(['5m']), [_minute(i) for i in range(5)], ticks=True)
+
+    assert _closed(updates) == [('5m', 0, 99.5, 105.0, 99.0, 104.0, 5.0, True)]
+    # La vela en curso suma el volumen parcial de la vela de 1m abierta
+    assert updates[2] == ('5m', 0, 99.5, 101.0, 99.0, 100.5, 1.0 + 0.5, False)
+
+
+def test_missing_minute_close_is_taken_as_final():
+    resampler = KlineResampler(['5m'])
+    resampler.on_minute('BTCUSDT', *_minute(0), False)  # Nunca llega su cierre
+    updates = _feed(resampler, [_minute(i) for i in range(1, 5)])
+
+    assert _closed(updates) == [('5m', 0, 99.5, 105.0, 99.0, 104.0, 5.0, True)]
+
+
+def test_gap_closes_previous_bucket_when_next_one_starts():
+    resampler = KlineResampler(['5m'])
+    updates = _feed(resampler, [_minute(0), _minute(1), _minute(7)])
+
+    assert _closed(updates) == [('5m', 0, 99.5, 102.0, 99.0, 101.0, 2.0, True)]
+    assert updates[-1] == ('5m', FIVE, 106.5, 108.0, 106.0, 107.0, 1.0, False)
+
+
+def test_late_message_for_closed_bucket_is_ignored():
+    resampler = KlineResampler(['5m'])
+    _feed(resampler, [_minute(i) for i in range(6)])
+
+    assert resampler.on_minute('BTCUSDT', *_minute(3, close=1.0), True) == []
+
+
+
+def test_late_minute_inside_open_bucket_keeps_latest_close():
+    resampler = KlineResampler(['5m'])
+    _feed(resampler, [_minute(0), _minute(1)])
+    resampler.on_minute('BTCUSDT', *_minute(2), False)
+
+    # Llega tarde otra versión del minuto 1: no retrocede el cierre ni duplica volumen
+    assert resampler.on_minute('BTCUSDT', *_minute(1, close=150.0), True) == []
+    updates = _feed(resampler, [_minute(2), _minute(3), _minute(4)])
+
+    assert _closed(updates) == [('5m', 0, 99.5, 151.0, 99.0, 104.0, 5.0, True)]
+
+def test_buckets_are_utc_aligned_and_per_timeframe():
+    resampler = KlineResampler(['5m', '15m'])
+    updates = _feed(resampler, [_minute(i) for i in range(3, 18)])
+
+    assert [u[1] for u in _closed(updates, '5m')] == [0, FIVE, 2 * FIVE]
+    assert [u[1] for u in _closed(updates, '15m')] == [0]
+    first = _closed(updates, '5m')[0]
+    assert first[2] == pytest.approx(102.5) and first[6] == 2.0  # Sólo los minutos 3 y 4
+
+
+def test_seed_discounts_minute_the_stream_will_resend():
+    resampler = KlineResampler(['5m'])
+    resampler.seed('BTCUSDT', '5m', (0, 99.5, 103.0, 98.0, 102.0, 10.0), _minute(2, close=102.0, volume=4.0))
+    updates = _feed(resampler, [_minute(2, close=102.0, volume=4.0), _minute(3), _minute(4)])
+
+    assert _closed(updates) == [('5m', 0, 99.5, 105.0, 98.0, 104.0, 10.0 + 2.0, True)]
+
+
+def test_symbols_are_independent():
+    resampler = KlineResampler(['5m'])
+    _feed(resampler, [_minute(i) for i in range(3)], symbol='BTCUSDT')
+    updates = _feed(resampler, [_minute(i, close=10.0) for i in range(5)], symbol='ETHUSDT')
+
+    assert _closed(updates) == [('5m', 0, 9.5, 11.0, 9.0, 10.0, 5.0, True)]
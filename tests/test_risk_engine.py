@@ -0,0 +1,92 @@
+# tests/test_risk_engine.py
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.services.risk_engine import YEAR_SECONDS, HorizonReturns, OnlineMoments, RiskMetricsEngine
+
+rng = np.random.default_rng(11)
+RETURNS = rng.normal(0.0004, 0.01, 2000)
+
+
+def _moments(values):
+    moments = OnlineMoments()
+    for x in values:
+        moments.add(float(x))
+    return moments
+
+
+@pytest.mark.parametrize('values', [RETURNS, RETURNS[:2], RETURNS + 1e6])
+def test_online_moments_match_numpy(values):
+    moments = _moments(values)
+
+    assert moments.count == len(values)
+    assert moments.mean == pytest.approx(values.mean(), rel=1e-12)
+    # Welford sigue estable con un offset grande (la fórmula de la suma de cuadrados no)
+    assert moments.std == pytest.approx(values.std(ddof=1), rel=1e-9)
+    downside = np.minimum(values, 0.0)
+    assert moments.downside_deviation == pytest.approx(np.sqrt((downside ** 2).mean()), rel=1e-12)
+
+
+def test_online_moments_degenerate_counts():
+    assert OnlineMoments().std == 0.0 and OnlineMoments().downside_deviation == 0.0
+    single = _moments([0.5])
+    assert single.mean == 0.5 and single.std == 0.0 and single.downside_deviation == 0.0
+
+
+def test_horizon_samples_first_snapshot_of_each_period():
+    horizon = HorizonReturns(3600)
+    # Varios snapshots por hora: sólo cuenta el primero de cada hora
+    for ts, equity in [(0, 100.0), (600, 150.0), (3600, 110.0), (5000, 90.0), (7200, 99.0), (7100, 1.0)]:
+        horizon.observe(equity, ts)
+
+    assert horizon.moments.count == 2
+    assert horizon.moments.mean == pytest.approx(np.mean([0.1, -0.1]))
+    assert horizon.elapsed == 7200
+
+
+def test_horizon_metrics_match_batch_formulas():
+    horizon = HorizonReturns(None)
+    equity = 1000 * np.cumprod(1 + RETURNS)
+    for i, value in enumerate(equity):
+        horizon.observe(float(value), i * 60.0)
+
+    returns = equity[1:] / equity[:-1] - 1
+    scale = math.sqrt(YEAR_SECONDS / 60.0)
+    excess = returns.mean() - 0.02 * 60.0 / YEAR_SECONDS
+    downside = np.sqrt((np.minimum(returns, 0) ** 2).mean())
+    metrics = horizon.metrics(0.02, max_drawdown_pct=10.0, min_samples=2)
+
+    assert metrics['volatility'] == pytest.approx(returns.std(ddof=1) * scale, rel=1e-9)
+    assert metrics['sharpe_ratio'] == pytest.approx(excess / returns.std(ddof=1) * scale, rel=1e-9)
+    assert metrics['sortino_ratio'] == pytest.approx(excess / downside * scale, rel=1e-9)
+    assert metrics['calmar_ratio'] == pytest.approx(metrics['annual_return'] / 0.10, rel=1e-12)
+
+
+def test_horizon_metrics_need_min_samples():
+    horizon = HorizonReturns(None)
+    for i, equity in enumerate([100.0, 101.0, 102.0]):
+        horizon.observe(equity, float(i))
+
+    assert horizon.metrics(0.0, 0.0, min_samples=3) == {}
+    # Sin retornos negativos ni drawdown no hay Sortino ni Calmar
+    assert set(horizon.metrics(0.0, 0.0, min_samples=2)) == {'volatility', 'annual_return', 'sharpe_ratio'}
+
+
+def test_engine_snapshot_per_horizon():
+    engine = RiskMetricsEngine(1, horizons=('session', 'hourly'))
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i, equity in enumerate([100.0, 95.0, 97.0, 99.0]):
+        engine.observe(equity, start + timedelta(minutes=30 * i))
+
+    snapshot = engine.snapshot()
+    assert engine.drawdown.max_drawdown == pytest.approx(5.0)
+    assert snapshot['hourly'] == {}  # Un solo retorno horario
+    assert snapshot['session']['calmar_ratio'] == pytest.approx(snapshot['session']['annual_return'] / 0.05)
+
+
+def test_engine_rejects_unknown_horizon():
+    with pytest.raises(ValueError, match='weekly'):
+        RiskMetricsEngine(1, horizons=('session', 'weekly'))
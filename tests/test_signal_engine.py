@@ -0,0 +1,89 @@
+# tests/test_signal_engine.py
+import numpy as np
+import pytest
+
+from app.services import signal_engine
+from app.services.indicators import RSI
+from app.services.market_buffer import MarketDataBuffer
+
+CFG = {'sma_fast': 5, 'sma_slow': 20, 'rsi_period': 14, 'volume_period': 10}
+rng = np.random.default_rng(21)
+
+
+def _klines(n, start=100.0):
+    closes = start + np.cumsum(rng.normal(0, 1, n))
+    volumes = rng.uniform(1, 10, n)
+    return [{'open_time': i * 60_000, 'open': c, 'high': c + 1, 'low': c - 1, 'close': c, 'volume': v}
+            for i, (c, v) in enumerate(zip(closes, volumes))]
+
+
+def _buffer(**series):
+    buffer = MarketDataBuffer(capacity=200)
+    for symbol, n in series.items():
+        buffer.load(symbol, '1m', _klines(n))
+    return buffer
+
+
+def test_stack_series_skips_symbols_without_enough_history():
+    buffer = _buffer(BTCUSDT=120, ETHUSDT=30, SOLUSDT=90)
+    window = signal_engine.batch_window(CFG)
+
+    symbols, closes, volumes = signal_engine.stack_series(buffer, ['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'XRPUSDT'],
+                                                          '1m', window)
+
+    assert window == 43 and symbols == ['BTCUSDT', 'SOLUSDT']
+    assert closes.shape == volumes.shape == (2, window)
+    np.testing.assert_array_equal(closes[1], buffer.get('SOLUSDT', '1m').closes(window))
+
+
+def test_batch_window_is_capped():
+    assert signal_engine.batch_window(CFG, max_window=30) == 30
+    assert signal_engine.batch_window({'sma_slow': 100}) == 100
+
+
+def test_evaluate_batch_matches_per_symbol_evaluation():
+    buffer = _buffer(BTCUSDT=150, ETHUSDT=150, SOLUSDT=150)
+    window = signal_engine.batch_window(CFG)
+    symbols, closes, volumes = signal_engine.stack_series(buffer, ['BTCUSDT', 'ETHUSDT', 'SOLUSDT'], '1m', window)
+
+    result = signal_engine.evaluate_batch(closes, volumes, CFG, iteration=3)
+
+    for row, symbol in enumerate(symbols):
+        c, v = closes[row], volumes[row]
+        fast, slow = c[-5:].mean(), c[-20:].mean()
+        rsi = RSI(14)
+        for close in c:
+            rsi.push(close)
+        assert result['close'][row] == c[-1]
+        assert result['sma_fast'][row] == pytest.approx(fast)
+        assert result['sma_slow'][row] == pytest.approx(slow)
+        assert result['rsi'][row] == pytest.approx(rsi.value)
+        assert result['volume_ratio'][row] == pytest.approx(v[-1] / v[-10:].mean())
+        expected = signal_engine.sma_cross_decision(fast, slow, True)
+        assert signal_engine.DECISION_NAMES[int(result['decision'][row])] == expected
+
+
+def test_decisions_only_on_gated_iterations():
+    closes = np.vstack([np.arange(1.0, 44.0), np.arange(43.0, 0.0, -1), np.full(43, 5.0)])
+    volumes = np.ones_like(closes)
+
+    gated = signal_engine.evaluate_batch(closes, volumes, CFG, iteration=6)['decision']
+    idle = signal_engine.evaluate_batch(closes, volumes, CFG, iteration=7)['decision']
+
+    assert gated.tolist() == [signal_engine.BUY, signal_engine.SELL, signal_engine.HOLD]
+    assert idle.tolist() == [signal_engine.HOLD] * 3
+
+
+def test_rsi_last_edge_cases():
+    assert np.isnan(signal_engine.rsi_last(np.ones((2, 14)), 14)).all()
+    assert signal_engine.rsi_last(np.arange(1.0, 31.0)[None, :], 14).tolist() == [100.0]
+
+
+def test_rolling_mean_matches_convolution():
+    values = rng.normal(size=(3, 50))
+    out = signal_engine.rolling_mean(values, 7)
+
+    assert np.isnan(out[:, :6]).all()
+    for row in range(3):
+        np.testing.assert_allclose(out[row, 6:], np.convolve(values[row], np.ones(7) / 7, mode='valid'))
+    assert np.isnan(signal_engine.rolling_mean(values[:, :5], 7)).all()
@@ -0,0 +1,48 @@
+# tests/test_tick_handler.py
+from app.services.tick_handler import KlineTickHandler
+
+
+def _msg(symbol='BTCUSDT', close='100.5', closed=False, open_time=60_000):
+    return {'e': 'kline', 'E': open_time + 1_000, 's': symbol,
+            'k': {'i': '1m', 't': open_time, 'o': '100.0', 'h': '101.0', 'l': '99.0',
+                  'c': close, 'v': '2.5', 'x': closed}}
+
+
+def test_tick_is_parsed_once_and_reused_per_symbol():
+    seen = []
+    handler = KlineTickHandler([lambda tick: seen.append((id(tick), tick.as_bar(), tick.is_closed))])
+
+    handler(_msg())
+    handler(_msg(close='102.0', closed=True))
+    handler(_msg('ETHUSDT'))
+
+    assert seen[0][0] == seen[1][0] != seen[2][0]
+    assert seen[1][1:] == ((60_000, 100.0, 101.0, 99.0, 102.0, 2.5), True)
+    assert handler.messages == 3 and handler.errors == 0
+    assert handler.ticks['BTCUSDT'].as_dict()['close'] == 102.0
+
+
+def test_failing_consumer_does_not_skip_the_rest():
+    exits = []
+
+    def broken(tick):
+        raise RuntimeError('boom')
+
+    handler = KlineTickHandler([broken])
+    handler.add_consumer(lambda tick: exits.append(tick.close))
+
+    handler(_msg())
+    handler(_msg(close='99.0'))
+
+    assert exits == [100.5, 99.0]
+    assert handler.errors == 2
+
+
+def test_malformed_and_non_kline_messages():
+    consumed = []
+    handler = KlineTickHandler([consumed.append])
+
+    handler({'e': 'error', 'm': 'desconectado'})
+    handler({'e': 'kline', 's': 'BTCUSDT', 'E': 1, 'k': {'t': 0}})
+
+    assert consumed == [] and handler.messages == 0 and handler.errors == 1
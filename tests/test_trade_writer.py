@@ -0,0 +1,152 @@
+# tests/test_trade_writer.py
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import exc as sa_exc
+
+from conftest import pg_rows, pg_session
+from app.services import trade_writer
+from app.services.trade_writer import IdBlockAllocator, TradeWriter, WriteJournal
+
+
+def _order(order_id, session_id, side='BUY'):
+    return {'id': order_id, 'session_id': session_id, 'symbol': 'BTCUSDT', 'side': side, 'type': 'MARKET',
+            'status': 'filled', 'quantity': 0.5, 'executed_quantity': 0.5, 'executed_price': 100.0,
+            'created_time': datetime(2024, 3, 1, 12), 'real_trade': False}
+
+
+def _trade(trade_id, session_id, entry_order_id, **changes):
+    row = {'id': trade_id, 'session_id': session_id, 'symbol': 'BTCUSDT', 'entry_order_id': entry_order_id,
+           'entry_price': 100.0, 'quantity': 0.5, 'status': 'open', 'entry_time': datetime(2024, 3, 1, 12),
+           'real_trade': False}
+    row.update(changes)
+    return row
+
+
+def _writer(tmp_path, **kwargs):
+    return TradeWriter(flush_interval=0.05, id_block_size=4, journal_path=str(tmp_path / 'trades.jsonl'), **kwargs)
+
+
+# ==================== JOURNAL ====================
+
+def test_journal_recovers_events_after_last_commit(tmp_path):
+    journal = WriteJournal(str(tmp_path / 'j.jsonl'))
+    for seq in (1, 2, 3):
+        journal.append(seq, 'orders', {'id': seq})
+    journal.mark_committed(2)
+    journal.append(4, 'trades', {'id': 9, 'entry_time': datetime(2024, 1, 1)})
+    journal.close()
+    with open(tmp_path / 'j.jsonl', 'a') as f:
+        f.write('{"seq": 5, "tab')  # Escritura cortada por una caída
+
+    pending, last_seq = WriteJournal(str(tmp_path / 'j.jsonl')).recover()
+
+    assert pending == [(3, 'orders', {'id': 3}), (4, 'trades', {'id': 9, 'entry_time': '2024-01-01T00:00:00'})]
+    assert last_seq == 4
+
+
+def test_journal_truncates_once_everything_is_committed(tmp_path):
+    journal = WriteJournal(str(tmp_path / 'j.jsonl'), max_bytes=200)
+    for seq in range(1, 6):
+        journal.append(seq, 'orders', {'id': seq, 'symbol': 'BTCUSDT'})
+    journal.mark_committed(3)  # Quedan eventos sin confirmar: no se trunca
+    assert len(open(tmp_path / 'j.jsonl').readlines()) == 6
+
+    journal.mark_committed(5)
+    journal.close()
+    assert [json.loads(line) for line in open(tmp_path / 'j.jsonl')] == [{'committed': 5}]
+
+
+# ==================== IDS ====================
+
+def test_id_blocks_come_from_the_serial_sequence(postgres):
+    allocator = IdBlockAllocator('orders', block_size=4)
+
+    assert [allocator.next_id() for _ in range(3)] == [1, 2, 3]
+    allocator.prefetch()  # Queda 1 < 4 // 2: se reserva otro bloque
+    assert [allocator.next_id() for _ in range(5)] == [4, 5, 6, 7, 8]
+    assert pg_rows(postgres, "SELECT last_value FROM orders_id_seq") == [(8,)]
+
+
+# ==================== ESCRITOR ====================
+
+def test_writer_persists_in_order_and_upserts_closed_trades(postgres, tmp_path):
+    session_id = pg_session(postgres)
+    writer = _writer(tmp_path)
+    writer.start()
+    entry, trade_id, position_id = writer.next_id('orders'), writer.next_id('trades'), writer.next_id('positions')
+    writer.submit('orders', _order(entry, session_id))
+    writer.submit('trades', _trade(trade_id, session_id, entry))
+    writer.submit('positions', {'id': position_id, 'session_id': session_id, 'trade_id': trade_id,
+                                'symbol': 'BTCUSDT', 'quantity': 0.5, 'entry_price': 100.0, 'current_price': 100.0,
+                                'unrealized_pnl': 0, 'unrealized_pnl_percent': 0, 'stop_loss': 98.0,
+                                'take_profit': 103.0, 'created_at': datetime(2024, 3, 1, 12)})
+    exit_order = writer.next_id('orders')
+    writer.submit('orders', _order(exit_order, session_id, side='SELL'))
+    writer.submit('trades', _trade(trade_id, session_id, entry, exit_order_id=exit_order, exit_price=103.0,
+                                   pnl=1.5, status='closed', close_reason='take_profit'))
+    writer.submit_delete('positions', position_id)
+    writer.stop()
+
+    assert pg_rows(postgres, "SELECT id, side FROM orders ORDER BY id") == [(entry, 'BUY'), (exit_order, 'SELL')]
+    assert pg_rows(postgres, "SELECT status, exit_order_id, close_reason FROM trades") == [
+        ('closed', exit_order, 'take_profit')
+    ]
+    assert pg_rows(postgres, "SELECT count(*) FROM positions") == [(0,)]
+    assert writer.journal.recover()[0] == [] and writer.written == 6
+
+
+def test_restart_replays_uncommitted_journal(postgres, tmp_path):
+    session_id = pg_session(postgres)
+    journal = WriteJournal(str(tmp_path / 'trades.jsonl'))
+    journal.append(1, 'orders', _order(1, session_id))
+    journal.close()
+
+    writer = _writer(tmp_path)
+    writer.start()
+    writer.stop()
+
+    assert pg_rows(postgres, "SELECT id FROM orders") == [(1,)]
+    assert writer.journal.recover() == ([], 1)
+
+
+def test_poison_event_goes_to_dead_letter_and_rest_commits(postgres, tmp_path):
+    session_id = pg_session(postgres)
+    writer = _writer(tmp_path, max_retries=2)
+    batch = [(1, 'orders', _order(1, session_id)),
+             (2, 'trades', _trade(1, session_id, 1)),
+             (3, 'trades', _trade(2, session_id, 999)),   # Orden inexistente: viola la FK
+             (4, 'orders', _order(2, session_id)),
+             (5, 'trades', _trade(3, session_id, 2))]
+
+    assert not writer._write_batch(batch)  # Primer fallo: se reintenta entero
+    assert writer._write_batch(batch)
+
+    assert pg_rows(postgres, "SELECT id FROM trades ORDER BY id") == [(1,), (3,)]
+    dead = writer.dead_letter.read()
+    assert [(d['seq'], d['table'], d['row']['id']) for d in dead] == [(3, 'trades', 2)]
+    assert 'foreign key' in dead[0]['error'] and writer.dead_lettered == 1
+
+
+def test_unavailable_database_is_retried_without_dead_letter(tmp_path, monkeypatch):
+    writer = _writer(tmp_path, max_retries=1)
+
+    class DownEngine:
+        def raw_connection(self):
+            raise sa_exc.OperationalError('connect', None, Exception('connection refused'))
+
+    monkeypatch.setattr(trade_writer, 'engine', DownEngine())
+
+    for _ in range(3):
+        assert not writer._write_batch([(1, 'orders', {'id': 1})])
+    assert writer.dead_letter.read() == []
+
+
+def test_submit_rejects_unknown_tables(tmp_path):
+    writer = _writer(tmp_path)
+
+    with pytest.raises(ValueError):
+        writer.submit('users', {'id': 1})
+    with pytest.raises(ValueError):
+        writer.submit_delete('trades', 1)
@@ -0,0 +1,100 @@
+# tests/test_trigger_index.py
+import random
+
+from app.services.trigger_index import STOP_LOSS, TAKE_PROFIT, Trigger, TriggerIndex
+
+
+def test_long_levels_trigger_on_crossing():
+    index = TriggerIndex()
+    index.add(1, 'BTCUSDT', 0.5, 95.0, 110.0)
+    index.add(2, 'BTCUSDT', 0.5, 90.0, 105.0)
+
+    assert index.on_price('BTCUSDT', 100.0) == []
+    assert index.on_price('BTCUSDT', 105.0) == [Trigger(2, 'BTCUSDT', TAKE_PROFIT, 105.0, 105.0)]
+    assert index.on_price('BTCUSDT', 94.0) == [Trigger(1, 'BTCUSDT', STOP_LOSS, 95.0, 94.0)]
+    assert len(index) == 0
+
+
+def test_short_levels_are_mirrored():
+    index = TriggerIndex()
+    index.add(1, 'BTCUSDT', -1.0, 105.0, 90.0)
+
+    assert index.on_price('BTCUSDT', 95.0) == []
+    assert index.on_price('BTCUSDT', 105.0) == [Trigger(1, 'BTCUSDT', STOP_LOSS, 105.0, 105.0)]
+
+
+def test_gap_through_many_levels_fires_each_position_once():
+    index = TriggerIndex()
+    for position_id, stop in enumerate([99.0, 98.0, 97.0, 96.0], start=1):
+        index.add(position_id, 'BTCUSDT', 1.0, stop, None)
+    # Objetivo de un corto: misma lista que los stops de los largos
+    index.add(5, 'BTCUSDT', -1.0, 120.0, 97.5)
+
+    triggers = index.on_price('BTCUSDT', 97.0)
+
+    assert sorted(t.position_id for t in triggers) == [1, 2, 3, 5]
+    assert [t.position_id for t in index.on_price('BTCUSDT', 50.0)] == [4]
+
+
+def test_symbols_are_isolated():
+    index = TriggerIndex()
+    index.add(1, 'BTCUSDT', 1.0, 95.0, None)
+    index.add(2, 'ETHUSDT', 1.0, 95.0, None)
+
+    assert [t.position_id for t in index.on_price('ETHUSDT', 90.0)] == [2]
+    assert index.on_price('SOLUSDT', 1.0) == []
+    assert len(index) == 1
+
+
+def test_update_level_moves_only_that_level():
+    index = TriggerIndex()
+    index.add(1, 'BTCUSDT', 1.0, 95.0, 110.0)
+
+    assert index.update_level(1, STOP_LOSS, 101.0)
+    assert not index.update_level(2, STOP_LOSS, 101.0)
+    assert index.on_price('BTCUSDT', 100.0) == [Trigger(1, 'BTCUSDT', STOP_LOSS, 101.0, 100.0)]
+
+    # Sin take-profit (toma parcial): no hay nivel que mover
+    index.add(3, 'BTCUSDT', 1.0, 95.0, None)
+    assert not index.update_level(3, TAKE_PROFIT, 120.0)
+
+
+def test_readding_and_removing():
+    index = TriggerIndex()
+    index.add(1, 'BTCUSDT', 1.0, 95.0, 110.0)
+    index.add(1, 'BTCUSDT', 1.0, 90.0, 120.0)  # Reemplaza los niveles anteriores
+
+    assert index.on_price('BTCUSDT', 94.0) == []
+    assert index.remove(1) and not index.remove(1)
+    assert index.on_price('BTCUSDT', 50.0) == []
+
+
+def test_matches_brute_force_scan():
+    rng = random.Random(5)
+    index = TriggerIndex()
+    levels = {}
+    for position_id in range(300):
+        quantity = rng.choice([1.0, -1.0])
+        entry = rng.uniform(90, 110)
+        stop = entry * (1 - quantity * rng.uniform(0.005, 0.05))
+        target = entry * (1 + quantity * rng.uniform(0.005, 0.05)) if rng.random() < 0.8 else None
+        index.add(position_id, 'BTCUSDT', quantity, stop, target)
+        levels[position_id] = (quantity, stop, target)
+
+    price = 100.0
+    for _ in range(500):
+        price = max(1.0, price + rng.gauss(0, 1.5))
+        expected = {
+            position_id for position_id, (quantity, stop, target) in levels.items()
+            if (quantity * (price - stop) <= 0) or (target is not None and quantity * (price - target) >= 0)
+        }
+        fired = index.on_price('BTCUSDT', price)
+
+        assert {t.position_id for t in fired} == expected
+        for trigger in fired:
+            quantity, stop, target = levels.pop(trigger.position_id)
+            # El motivo es el de un nivel que el precio cruzó de verdad
+            level = stop if trigger.reason == STOP_LOSS else target
+            assert trigger.level == level
+            assert quantity * (price - level) <= 0 if trigger.reason == STOP_LOSS else quantity * (price - level) >= 0
+    assert len(index) == len(levels)